@@ -3,21 +3,34 @@ import gzip
 import json
 import logging
 import re
+import zlib
 from collections import defaultdict
 from dataclasses import dataclass
 from typing import List, Any, Union, Optional, Tuple, Mapping, Iterator, Set, Iterable, Dict
 
+from publish import jsoncodec
 from publish.unittestresults import Numeric, UnitTestSuite, UnitTestCaseResults, UnitTestRunResults, \
-    UnitTestRunDeltaResults, UnitTestRunResultsOrDeltaResults, ParseError
+    UnitTestRunDeltaResults, UnitTestRunResultsOrDeltaResults, ParseError, UnitTestCase
 
 # keep the version in sync with action.yml and docker/action.yml
 __version__ = 'v2.24.0'
 
 logger = logging.getLogger('publish')
 digest_prefix = '[test-results]:data:'
-digest_mime_type = 'application/gzip'
-digest_encoding = 'base64'
-digest_header = f'{digest_prefix}{digest_mime_type};{digest_encoding},'
+# version 1 digests are gzipped JSON objects of stats, still read for earlier commits
+digest_v1_mime_type = 'application/gzip'
+digest_v1_encoding = 'base64'
+digest_v1_format = f'{digest_v1_mime_type};{digest_v1_encoding}'
+digest_v1_header = f'{digest_prefix}{digest_v1_format},'
+# version 2 digests are raw deflated JSON arrays of stats in the order of digest_fields
+digest_format = 'v2;deflate;base64'
+digest_header = f'{digest_prefix}{digest_format},'
+digest_fields = ['files', 'suites', 'duration',
+                 'tests', 'tests_succ', 'tests_skip', 'tests_fail', 'tests_error',
+                 'runs', 'runs_succ', 'runs_skip', 'runs_fail', 'runs_error',
+                 'commit']
+# matches the format and the digest of any version
+digest_regex = re.compile(re.escape(digest_prefix) + r'([^,\n]*),([^\n]*)')
 digit_space = ' '
 punctuation_space = ' '
 
@@ -61,6 +74,31 @@ pull_request_build_modes = [
     pull_request_build_mode_merge
 ]
 
+profile_mode_off = 'off'
+profile_mode_cpu = 'cpu'
+profile_mode_memory = 'memory'
+profile_mode_all = 'all'
+profile_modes = [
+    profile_mode_off,
+    profile_mode_cpu,
+    profile_mode_memory,
+    profile_mode_all
+]
+
+trace_format_otlp = 'otlp'
+trace_format_chrome = 'chrome'
+trace_formats = [
+    trace_format_otlp,
+    trace_format_chrome
+]
+
+arrow_format_ipc = 'ipc'
+arrow_format_parquet = 'parquet'
+arrow_formats = [
+    arrow_format_ipc,
+    arrow_format_parquet
+]
+
 all_tests_list = 'all tests'
 skipped_tests_list = 'skipped tests'
 none_annotations = 'none'
@@ -382,14 +420,29 @@ def ungest_string(string: str) -> str:
     return str(gzip.decompress(base64.decodebytes(bytes(string, 'utf8'))), 'utf8')
 
 
+def deflate_string(string: str) -> str:
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return str(base64.b64encode(compressor.compress(bytes(string, 'utf8')) + compressor.flush()), 'utf8')
+
+
+def inflate_string(string: str) -> str:
+    return str(zlib.decompress(base64.b64decode(bytes(string, 'utf8')), -zlib.MAX_WBITS), 'utf8')
+
+
 def get_digest_from_stats(stats: UnitTestRunResults) -> str:
-    d = stats.to_dict()
-    del d['errors']  # we don't need errors in the digest
-    return digest_string(json.dumps(d, ensure_ascii=False))
+    # errors are not needed in the digest, the json module writes the same digest whatever JSON backend is installed
+    values = [getattr(stats, field) for field in digest_fields]
+    return deflate_string(json.dumps(values, ensure_ascii=False, separators=(',', ':')))
 
 
-def get_stats_from_digest(digest: str) -> UnitTestRunResults:
-    return UnitTestRunResults.from_dict(json.loads(ungest_string(digest)))
+def get_stats_from_digest(digest: str, format: str = digest_format) -> UnitTestRunResults:
+    if format == digest_format:
+        # digests of later versions may append fields
+        values = jsoncodec.loads(inflate_string(digest))
+        return UnitTestRunResults.from_dict(dict(zip(digest_fields, values)))
+    if format == digest_v1_format:
+        return UnitTestRunResults.from_dict(jsoncodec.loads(ungest_string(digest)))
+    raise ValueError(f'Unsupported digest format: {format}')
 
 
 def get_short_summary(stats: UnitTestRunResults) -> str:
@@ -452,6 +505,14 @@ failed_tests_label_md = '❌'
 test_errors_label_md = '🔥'
 duration_label_md = '⏱️'
 
+# GitHub rejects pull request comments longer than 65536 characters, check run summaries longer than 65535 characters
+# and job summaries larger than 1 MiB, we measure in bytes, which are at least as many as characters
+max_comment_bytes = 65536
+max_check_run_summary_bytes = 65535
+max_job_summary_bytes = 1024 * 1024
+# appended to summaries with sections omitted to fit into the size limits of GitHub
+summary_truncated_md = '<i>… truncated to fit into the size limit of GitHub.</i>'
+
 
 def get_short_summary_md(stats: UnitTestRunResultsOrDeltaResults) -> str:
     """Provides a single-line summary with markdown for the given stats."""
@@ -561,8 +622,68 @@ def get_test_changes_list_md(tests: List[str], limit: Optional[int]) -> str:
 def get_long_summary_md(stats: UnitTestRunResultsOrDeltaResults,
                         details_url: Optional[str] = None,
                         test_changes: Optional[SomeTestChanges] = None,
-                        test_list_changes_limit: Optional[int] = None) -> str:
-    """Provides a long summary in Markdown notation for the given stats."""
+                        test_list_changes_limit: Optional[int] = None,
+                        max_bytes: Optional[int] = None) -> str:
+    """
+    Provides a long summary in Markdown notation for the given stats.
+    With max_bytes given, the lists of test changes are shortened to fit the summary into max_bytes.
+    If that does not suffice, whole sections are omitted in the order of their priority (test changes, details line,
+    all but the short summary), and a note tells that the summary has been truncated.
+    """
+    def fits(summary: str) -> bool:
+        return max_bytes is None or len(summary.encode('utf8')) <= max_bytes
+
+    summary = get_unlimited_long_summary_md(stats, details_url, test_changes, test_list_changes_limit)
+    if fits(summary):
+        return summary
+
+    # test changes have the lowest priority, we halve the length of their lists until the summary fits
+    limit = get_longest_test_changes_list(test_changes) if test_list_changes_limit is None else test_list_changes_limit
+    while limit > 1:
+        limit //= 2
+        summary = get_unlimited_long_summary_md(stats, details_url, test_changes, limit)
+        if fits(summary):
+            logger.debug(f'limited test changes lists to {limit} tests to fit summary into {max_bytes} bytes')
+            return summary
+
+    # omitting whole sections keeps the Markdown intact, other than cutting it at some byte
+    for summary in [get_unlimited_long_summary_md(stats, details_url, test_changes, 0),
+                    get_unlimited_long_summary_md(stats, None, test_changes, 0),
+                    get_short_summary_md(stats)]:
+        summary = summary.rstrip('\n') + f'\n\n{summary_truncated_md}\n'
+        if fits(summary):
+            logger.debug(f'omitted sections of summary to fit into {max_bytes} bytes')
+            return summary
+
+    # the short summary is a single line without any Markdown structure
+    return truncate_bytes(get_short_summary_md(stats), max_bytes)
+
+
+def get_longest_test_changes_list(changes: Optional[SomeTestChanges]) -> int:
+    if not changes:
+        return 0
+    return max(len(tests or [])
+               for tests in [changes.removes(), changes.adds(),
+                             changes.removed_skips(), changes.added_and_skipped(),
+                             changes.remaining_and_skipped(), changes.remaining_and_un_skipped()])
+
+
+def truncate_bytes(string: str, max_bytes: int) -> str:
+    """Truncates the string to max_bytes UTF-8 bytes, marking the truncation with a trailing '…'."""
+    encoded = string.encode('utf8')
+    if len(encoded) <= max_bytes:
+        return string
+    ellipsis = '…'.encode('utf8')
+    if max_bytes < len(ellipsis):
+        return ''
+    # cutting through a multi-byte character leaves an incomplete character, which we drop
+    return encoded[:max_bytes - len(ellipsis)].decode('utf8', errors='ignore') + '…'
+
+
+def get_unlimited_long_summary_md(stats: UnitTestRunResultsOrDeltaResults,
+                                  details_url: Optional[str] = None,
+                                  test_changes: Optional[SomeTestChanges] = None,
+                                  test_list_changes_limit: Optional[int] = None) -> str:
     trivial_runs = stats.runs == stats.tests and \
         stats.runs_succ == stats.tests_succ and \
         stats.runs_skip == stats.tests_skip and \
@@ -719,20 +840,24 @@ def get_long_summary_with_digest_md(stats: UnitTestRunResultsOrDeltaResults,
                                     digest_stats: Optional[UnitTestRunResults] = None,
                                     details_url: Optional[str] = None,
                                     test_changes: Optional[SomeTestChanges] = None,
-                                    test_list_changes_limit: Optional[int] = None) -> str:
+                                    test_list_changes_limit: Optional[int] = None,
+                                    max_bytes: Optional[int] = None) -> str:
     """
     Provides the summary of stats with digest of digest_stats if given, otherwise
     digest of stats. In that case, stats must be UnitTestRunResults.
 
     :param stats: stats to summarize
     :param digest_stats: stats to digest
+    :param max_bytes: limits the summary with digest to this many bytes, the digest is never shortened
     :return: summary with digest
     """
     if digest_stats is None and isinstance(stats, UnitTestRunDeltaResults):
         raise ValueError('stats must be UnitTestRunResults when no digest_stats is given')
-    summary = get_long_summary_md(stats, details_url, test_changes, test_list_changes_limit)
     digest = get_digest_from_stats(stats if digest_stats is None else digest_stats)
-    return f'{summary}\n{digest_header}{digest}\n'
+    digest_line = f'\n{digest_header}{digest}\n'
+    max_summary_bytes = max(max_bytes - len(digest_line.encode('utf8')), 0) if max_bytes is not None else None
+    summary = get_long_summary_md(stats, details_url, test_changes, test_list_changes_limit, max_summary_bytes)
+    return f'{summary}{digest_line}'
 
 
 def get_case_messages(case_results: UnitTestCaseResults) -> CaseMessages:
@@ -849,17 +974,100 @@ def get_case_annotation(messages: CaseMessages,
     )
 
 
+def get_case_annotation_rank(messages: CaseMessages,
+                             key: Tuple[Optional[str], Optional[str], Optional[str]],
+                             state: str,
+                             message: Optional[str],
+                             report_individual_runs: bool) -> Tuple[int, int]:
+    # test errors rank before test failures, then tests with more affected runs rank first
+    same_cases = len(messages[key][state][message]) if report_individual_runs else \
+        sum(len(cases) for cases in messages[key][state].values())
+    return 0 if state == 'error' else 1, -same_cases
+
+
+def get_failure_fingerprint(case: UnitTestCase) -> str:
+    """
+    Normalizes message and content of the test case, so that failures that differ only in
+    numbers (e.g. line numbers, durations, ids), memory addresses or paths have the same fingerprint.
+    """
+    details = '\n'.join(detail for detail in [case.message, case.content] if detail)
+    details = re.sub(r'0x[0-9a-fA-F]+', '<address>', details)
+    details = re.sub(r'(?:[A-Za-z]:)?(?:[\\/][\w.\-]+)+', '<path>', details)
+    details = re.sub(r'\d+', '<number>', details)
+    details = re.sub(r'\s+', ' ', details).strip()
+    return f'{case.result}:{details}'
+
+
+def get_cluster_annotation(messages: CaseMessages,
+                           keys: List[Tuple[Tuple[Optional[str], Optional[str], Optional[str]], str, Optional[str]]]) -> Annotation:
+    key, state, message = keys[0]
+    case = messages[key][state][message][0]
+    tests = [get_test_name(*key) for key, _, _ in keys]
+    title_state = 'failed' if state == 'failure' else 'with error'
+    level = 'warning' if state == 'failure' else 'failure'  # failure is used for test errors
+
+    # the details of the first test represent all tests of the cluster
+    maybe_message = [case.message] if not message_is_contained_in_content(case.message, case.content) else []
+    details = [detail.rstrip()
+               for detail in maybe_message + [case.content, case.stdout, case.stderr]
+               if detail and detail.rstrip()]
+
+    return Annotation(
+        path=case.test_file or case.class_name or '/',
+        start_line=case.line or 0,
+        end_line=case.line or 0,
+        start_column=None,
+        end_column=None,
+        annotation_level=level,
+        message=f'{len(tests)} tests {title_state} the same way, see "Raw output" for details of the first test:\n' +
+                '\n'.join(tests),
+        title=f'{len(tests)} tests {title_state} the same way',
+        raw_details='\n'.join(details) if details else None
+    )
+
+
 def get_case_annotations(case_results: UnitTestCaseResults,
-                         report_individual_runs: bool) -> List[Annotation]:
+                         report_individual_runs: bool,
+                         ranked: bool = False,
+                         cluster_size: Optional[int] = None) -> List[Annotation]:
+    """
+    Returns annotations of failing tests and tests with errors.
+    With cluster_size given, tests that failed the same way (see get_failure_fingerprint) are collapsed into
+    a single annotation that lists all those tests, if there are at least cluster_size such tests.
+    """
     messages = get_case_messages(case_results)
-    return [
-        get_case_annotation(messages, key, state, message, report_individual_runs)
+    keys = [
+        (key, state, message)
         for key in messages
         for state in messages[key] if state not in ['success', 'skipped']
         for message in (messages[key][state] if report_individual_runs else
                         [list(messages[key][state].keys())[0]])
     ]
 
+    clusters = [[key] for key in keys]
+    if cluster_size is not None:
+        fingerprints = [get_failure_fingerprint(messages[key][state][message][0]) for key, state, message in keys]
+        same_failures = defaultdict(list)
+        for fingerprint, key in zip(fingerprints, keys):
+            same_failures[fingerprint].append(key)
+        # clusters take the place of their first test
+        clusters = [same_failures[fingerprint] if len(same_failures[fingerprint]) >= cluster_size else [key]
+                    for fingerprint, key in zip(fingerprints, keys)
+                    if len(same_failures[fingerprint]) < cluster_size or same_failures[fingerprint][0] == key]
+
+    if ranked:
+        def get_cluster_rank(cluster) -> Tuple[int, int]:
+            ranks = [get_case_annotation_rank(messages, *key, report_individual_runs) for key in cluster]
+            return min(rank[0] for rank in ranks), sum(rank[1] for rank in ranks)
+
+        clusters = sorted(clusters, key=get_cluster_rank)
+
+    return [
+        get_case_annotation(messages, *cluster[0], report_individual_runs) if len(cluster) == 1 else
+        get_cluster_annotation(messages, cluster)
+        for cluster in clusters
+    ]
+
 
 def get_error_annotation(error: ParseError) -> Annotation:
     return Annotation(
@@ -904,6 +1112,32 @@ def get_suite_annotations(suites: List[UnitTestSuite], with_suite_out_logs: bool
             for annotation in get_suite_annotations_for_suite(suite, with_suite_out_logs, with_suite_err_logs)]
 
 
+def get_limited_annotations(annotations: List[Annotation], max_annotations: int) -> List[Annotation]:
+    """
+    Returns the first max_annotations annotations, plus a single annotation that lists the titles
+    of all remaining annotations. Annotations are expected to be ordered by priority.
+    """
+    if len(annotations) <= max_annotations:
+        return annotations
+
+    remaining = annotations[max_annotations:]
+    levels = {annotation.annotation_level for annotation in remaining}
+    level = 'failure' if 'failure' in levels else 'warning' if 'warning' in levels else 'notice'
+    is_are, label = ('is', 'annotation') if len(remaining) == 1 else ('are', 'annotations')
+    return annotations[:max_annotations] + [Annotation(
+        path='.github',
+        start_line=0,
+        end_line=0,
+        start_column=None,
+        end_column=None,
+        annotation_level=level,
+        message=f'There {is_are} {len(remaining)} more {label} than published (max_annotations is {max_annotations}), '
+                f'see "Raw output" for their titles.',
+        title=f'{len(remaining)} more {label}',
+        raw_details='\n'.join(annotation.title or annotation.message for annotation in remaining)
+    )]
+
+
 def get_test_name(file_name: Optional[str],
                   class_name: Optional[str],
                   test_name: Optional[str]) -> str:
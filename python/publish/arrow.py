@@ -0,0 +1,83 @@
+from typing import Optional, List, Dict, Any, Tuple
+
+from publish import logger, arrow_format_ipc, arrow_format_parquet
+from publish.unittestresults import UnitTestCase, UnitTestCaseResults, UnitTestSuite
+
+# string columns with few distinct values are dictionary-encoded
+case_dictionary_columns = ['commit', 'result_file', 'file_name', 'class_name', 'test_name', 'state', 'result']
+suite_dictionary_columns = ['commit']
+
+
+def get_case_runs(cases: UnitTestCaseResults) -> List[Tuple[Tuple[Optional[str], Optional[str], Optional[str]], str, UnitTestCase]]:
+    """Flattens test case results into (test, state, case) tuples, one per test case run."""
+    return [(test, state, case)
+            for test, states in cases.items()
+            for state, state_cases in states.items()
+            for case in state_cases]
+
+
+def get_case_columns(cases: UnitTestCaseResults) -> Dict[str, List[Any]]:
+    """Turns test case results into one list of values per column, one row per test case run."""
+    runs = get_case_runs(cases)
+    return dict(
+        result_file=[case.result_file for _, _, case in runs],
+        file_name=[file_name for (file_name, _, _), _, _ in runs],
+        class_name=[class_name for (_, class_name, _), _, _ in runs],
+        test_name=[test_name for (_, _, test_name), _, _ in runs],
+        state=[state for _, state, _ in runs],
+        result=[case.result for _, _, case in runs],
+        line=[case.line for _, _, case in runs],
+        time=[case.time for _, _, case in runs],
+    )
+
+
+def get_suite_columns(suites: List[UnitTestSuite]) -> Dict[str, List[Any]]:
+    """Turns test suite details into one list of values per column, one row per test suite."""
+    return dict(
+        name=[suite.name for suite in suites],
+        tests=[suite.tests for suite in suites],
+        skipped=[suite.skipped for suite in suites],
+        failures=[suite.failures for suite in suites],
+        errors=[suite.errors for suite in suites],
+    )
+
+
+def get_table(columns: Dict[str, List[Any]], dictionary_columns: List[str], commit: Optional[str]):
+    # pyarrow is an optional dependency, only needed when writing Arrow files
+    import pyarrow
+
+    types = dict(line=pyarrow.int64(), time=pyarrow.float64(),
+                 tests=pyarrow.int64(), skipped=pyarrow.int64(), failures=pyarrow.int64(), errors=pyarrow.int64())
+    arrays = {name: pyarrow.array(values, type=types.get(name, pyarrow.string()))
+              for name, values in columns.items()}
+    # the commit is the same for all rows, pyarrow repeats it to the length of the other columns
+    rows = len(next(iter(columns.values()), []))
+    arrays = dict(commit=pyarrow.repeat(pyarrow.scalar(commit, type=pyarrow.string()), rows), **arrays)
+    return pyarrow.table({name: array.dictionary_encode() if name in dictionary_columns else array
+                          for name, array in arrays.items()})
+
+
+def write_table(table, path: str, format: str):
+    import pyarrow
+    import pyarrow.ipc
+
+    if format == arrow_format_ipc:
+        with pyarrow.OSFile(path, 'wb') as sink, pyarrow.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    elif format == arrow_format_parquet:
+        import pyarrow.parquet
+        pyarrow.parquet.write_table(table, path)
+    else:
+        raise ValueError(f'Unsupported Arrow format: {format}')
+
+
+def write_cases(cases: UnitTestCaseResults, path: str, format: str, commit: Optional[str]):
+    table = get_table(get_case_columns(cases), case_dictionary_columns, commit)
+    write_table(table, path, format)
+    logger.info(f'Wrote {table.num_rows} test case runs to {path}')
+
+
+def write_suites(suites: List[UnitTestSuite], path: str, format: str, commit: Optional[str]):
+    table = get_table(get_suite_columns(suites), suite_dictionary_columns, commit)
+    write_table(table, path, format)
+    logger.info(f'Wrote {table.num_rows} test suites to {path}')
@@ -0,0 +1,148 @@
+import dataclasses
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Mapping
+
+import humanize
+
+from publish import logger
+
+default_http_cache_size = 32 * 1024 * 1024
+http_cache_version = 1
+
+
+@dataclass(frozen=True)
+class HttpCacheEntry:
+    etag: str
+    headers: Mapping[str, str]
+    body: str
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + sum(len(k) + len(v) for k, v in self.headers.items())
+
+
+class HttpCache:
+    """
+    Caches bodies of GitHub API responses together with their ETag.
+    A cached body is only used after the API confirmed via a 304 Not Modified response
+    that the body has not changed, which does not count against the primary rate limit.
+    The least recently used entries are evicted when the cache exceeds max_size bytes.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_size: int = default_http_cache_size):
+        self._path = path
+        self._max_size = max_size
+        self._entries: OrderedDict[str, HttpCacheEntry] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def get_key(url: str, accept: Optional[str], authorization: Optional[str]) -> str:
+        return hashlib.sha256(
+            '\n'.join([url, accept or '', HttpCache.get_auth_scope(authorization)]).encode('utf-8')
+        ).hexdigest()
+
+    @staticmethod
+    def get_auth_scope(authorization: Optional[str]) -> str:
+        if not authorization:
+            return 'anonymous'
+        token = authorization.split(' ')[-1]
+        # installation tokens (e.g. GITHUB_TOKEN) are issued for every job, using them as the scope
+        # would never see a cached entry again, their scope is the installation they have been issued for,
+        # which is implied by the repository in the url
+        if token.startswith('ghs_'):
+            return 'installation'
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def get(self, key: str) -> Optional[HttpCacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, entry: HttpCacheEntry):
+        with self._lock:
+            self._put(key, entry)
+
+    def _put(self, key: str, entry: HttpCacheEntry):
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._size -= previous.size
+        if entry.size > self._max_size:
+            return
+        self._entries[key] = entry
+        self._size += entry.size
+
+        # evict least recently used entries
+        while self._size > self._max_size:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= evicted.size
+
+    def hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def load(self) -> 'HttpCache':
+        if self._path is None or not os.path.exists(self._path):
+            return self
+
+        try:
+            with open(self._path, 'rt', encoding='utf-8') as r:
+                cache = json.load(r)
+            if cache.get('version') != http_cache_version:
+                logger.info(f'Ignoring GitHub API cache file {self._path} of unsupported version {cache.get("version")}')
+                return self
+            with self._lock:
+                for key, entry in cache.get('entries', []):
+                    self._put(key, HttpCacheEntry(**entry))
+            logger.debug(f'loaded {len(self._entries)} entries from GitHub API cache file {self._path}')
+        except Exception as e:
+            logger.warning(f'Failed to load GitHub API cache file {self._path}: {str(e)}')
+            logger.debug('loading GitHub API cache file failed', exc_info=e)
+        return self
+
+    def save(self):
+        if self._path is None:
+            return
+
+        try:
+            with self._lock:
+                cache = dict(version=http_cache_version,
+                             entries=[(key, dataclasses.asdict(entry)) for key, entry in self._entries.items()])
+            # write atomically, so that a failing save does not corrupt an existing cache file
+            tmp_path = f'{self._path}.tmp'
+            with open(tmp_path, 'wt', encoding='utf-8') as w:
+                json.dump(cache, w, ensure_ascii=False)
+            os.replace(tmp_path, self._path)
+            logger.debug(f'saved {len(self._entries)} entries to GitHub API cache file {self._path}')
+        except Exception as e:
+            logger.warning(f'Failed to save GitHub API cache file {self._path}: {str(e)}')
+            logger.debug('saving GitHub API cache file failed', exc_info=e)
+
+    def log_stats(self):
+        requests = self.hits + self.misses
+        if requests == 0 and not logger.isEnabledFor(logging.DEBUG):
+            return
+        hit_rate = self.hits / requests if requests else 0.0
+        logger.info(f'GitHub API cache: {self.hits} of {requests} reads not modified ({hit_rate:.0%}), '
+                    f'{len(self._entries)} cached responses of {humanize.naturalsize(self._size, binary=True)}')
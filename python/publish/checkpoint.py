@@ -0,0 +1,63 @@
+import json
+import os
+from dataclasses import dataclass, asdict
+from typing import Optional
+
+from publish import logger
+
+annotations_checkpoint_version = 1
+
+
+@dataclass(frozen=True)
+class AnnotationsCheckpoint:
+    """
+    Progress of publishing the annotations of a check run in batches of 50 annotations.
+    A retry of a failed job can continue publishing into the same check run, as long as
+    repository, check name, commit and the content of the check run did not change.
+    """
+    repo: str
+    check_name: str
+    commit: str
+    content_hash: str
+    check_run_id: int
+    # index of the last batch that has been published
+    batch: int
+    batches: int
+
+    @property
+    def complete(self) -> bool:
+        return self.batch >= self.batches - 1
+
+    def matches(self, repo: str, check_name: str, commit: str, content_hash: str, batches: int) -> bool:
+        return (self.repo, self.check_name, self.commit, self.content_hash, self.batches) == \
+            (repo, check_name, commit, content_hash, batches)
+
+
+def load_annotations_checkpoint(path: str) -> Optional[AnnotationsCheckpoint]:
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with open(path, 'rt', encoding='utf-8') as r:
+            checkpoint = json.load(r)
+        if checkpoint.get('version') != annotations_checkpoint_version:
+            logger.info(f'Ignoring annotations checkpoint file {path} of unsupported version {checkpoint.get("version")}')
+            return None
+        del checkpoint['version']
+        return AnnotationsCheckpoint(**checkpoint)
+    except Exception as e:
+        logger.warning(f'Failed to load annotations checkpoint file {path}: {str(e)}')
+        logger.debug('loading annotations checkpoint file failed', exc_info=e)
+        return None
+
+
+def save_annotations_checkpoint(path: str, checkpoint: AnnotationsCheckpoint):
+    try:
+        # write atomically, so that a job cancelled while saving does not corrupt the checkpoint
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wt', encoding='utf-8') as w:
+            json.dump(dict(version=annotations_checkpoint_version, **asdict(checkpoint)), w, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logger.warning(f'Failed to save annotations checkpoint file {path}: {str(e)}')
+        logger.debug('saving annotations checkpoint file failed', exc_info=e)
@@ -0,0 +1,40 @@
+import os
+import subprocess
+from typing import Optional, List
+
+from publish import logger
+
+default_git_timeout = 10.0
+
+
+def run_git(directory: str, *args: str, timeout: float = default_git_timeout) -> Optional[str]:
+    """Runs git in the given directory, returns its output or None if git is not available or fails."""
+    # the workspace may be owned by a different user (e.g. when running in a Docker container),
+    # we only read from the repository, so we trust it, but no other repository
+    directory = os.path.abspath(directory)
+    command = ['git', '-c', f'safe.directory={directory}', '-C', directory] + list(args)
+    try:
+        process = subprocess.run(command, stdin=subprocess.DEVNULL, capture_output=True, text=True, timeout=timeout)
+    except (OSError, subprocess.SubprocessError) as e:
+        logger.debug(f'running git {" ".join(args)} failed: {str(e)}')
+        return None
+
+    if process.returncode != 0:
+        logger.debug(f'git {" ".join(args)} failed with exit code {process.returncode}: {process.stderr.strip()}')
+        return None
+    return process.stdout.strip()
+
+
+def get_merge_base(directory: str, refs: List[Optional[str]], commit: str) -> Optional[str]:
+    """
+    Returns the best common ancestor of the commit and the first of the given refs that is known to the git repository
+    in the given directory. Returns None if there is no such repository, the commit or all refs are unknown,
+    or the common ancestor is not part of the repository (e.g. in shallow clones).
+    """
+    for ref in refs:
+        if not ref:
+            continue
+        merge_base = run_git(directory, 'merge-base', ref, commit)
+        if merge_base:
+            return merge_base
+    return None
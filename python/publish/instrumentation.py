@@ -0,0 +1,160 @@
+import bisect
+import dataclasses
+import logging
+import re
+import threading
+from dataclasses import dataclass
+from typing import Optional, Dict, List, Any, Mapping, Union
+
+import humanize
+
+from publish import logger
+from publish.tracing import Tracer, span_kind_client
+
+# upper bounds of the latency histogram buckets in seconds
+latency_buckets = [0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+
+endpoint_templates = [
+    (re.compile(r'/repos/[^/]+/[^/]+'), '/repos/{owner}/{repo}'),
+    (re.compile(r'/commits/[^/]+'), '/commits/{sha}'),
+    (re.compile(r'/compare/[^/]+'), '/compare/{basehead}'),
+    (re.compile(r'/\d+(?=/|$)'), '/{id}'),
+]
+graphql_operation = re.compile(r'"query":\s*"\s*(?:query|mutation)\s+(\w+)')
+
+
+@dataclass
+class EndpointStats:
+    calls: int = 0
+    errors: int = 0
+    retries: int = 0
+    seconds: float = 0.0
+    max_seconds: float = 0.0
+    throttle_seconds: float = 0.0
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    latencies: List[int] = dataclasses.field(default_factory=lambda: [0] * (len(latency_buckets) + 1))
+
+    def add(self, status: Optional[int], seconds: float, retries: int, throttle_seconds: float, bytes_sent: int, bytes_received: int):
+        self.calls += 1
+        self.errors += 1 if status is None or status >= 400 else 0
+        self.retries += retries
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.throttle_seconds += throttle_seconds
+        self.bytes_sent += bytes_sent
+        self.bytes_received += bytes_received
+        self.latencies[bisect.bisect_left(latency_buckets, seconds)] += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(
+            calls=self.calls,
+            errors=self.errors,
+            retries=self.retries,
+            seconds=round(self.seconds, 3),
+            max_seconds=round(self.max_seconds, 3),
+            throttle_seconds=round(self.throttle_seconds, 3),
+            bytes_sent=self.bytes_sent,
+            bytes_received=self.bytes_received,
+            latency_histogram={str(bound): count for bound, count in zip(latency_buckets + ['+Inf'], self.latencies)}
+        )
+
+
+class ApiInstrumentation:
+    """
+    Records GitHub API requests per endpoint: calls, errors, retries, latency, time throttled and bytes transferred.
+    Endpoints are request paths where owner, repository, commits and ids are replaced by placeholders,
+    GraphQL requests are distinguished by their operation name.
+    With a tracer, each request is traced as a client span named by its endpoint.
+    """
+
+    def __init__(self, tracer: Optional[Tracer] = None):
+        self._endpoints: Dict[str, EndpointStats] = {}
+        self._lock = threading.Lock()
+        self._tracer = tracer
+
+    @staticmethod
+    def get_endpoint(verb: str, url: str, input: Optional[Union[str, bytes]] = None) -> str:
+        path = url.split('?')[0]
+        if path.endswith('/graphql'):
+            match = graphql_operation.search(input) if isinstance(input, str) else None
+            return f'{verb} {path} {match.group(1)}' if match else f'{verb} {path}'
+        for pattern, template in endpoint_templates:
+            path = pattern.sub(template, path)
+        return f'{verb} {path}'
+
+    def record(self,
+               verb: str,
+               url: str,
+               input: Optional[Union[str, bytes]],
+               status: Optional[int],
+               seconds: float,
+               retries: int = 0,
+               throttle_seconds: float = 0.0,
+               bytes_received: int = 0):
+        endpoint = self.get_endpoint(verb, url, input)
+        bytes_sent = len(input.encode('utf-8')) if isinstance(input, str) else len(input) if input else 0
+        with self._lock:
+            self._endpoints.setdefault(endpoint, EndpointStats()) \
+                .add(status, seconds, retries, throttle_seconds, bytes_sent, bytes_received)
+        if self._tracer is not None:
+            self._tracer.record(endpoint, seconds + throttle_seconds,
+                                kind=span_kind_client,
+                                error=f'HTTP status {status}' if status is not None and status >= 400 else
+                                      'no response' if status is None else None,
+                                **{'http.request.method': verb,
+                                   'url.path': url.split('?')[0],
+                                   'http.response.status_code': status,
+                                   'github.retries': retries,
+                                   'github.throttle_seconds': round(throttle_seconds, 3),
+                                   'github.bytes_sent': bytes_sent,
+                                   'github.bytes_received': bytes_received})
+
+    @property
+    def endpoints(self) -> Mapping[str, EndpointStats]:
+        with self._lock:
+            return dict(self._endpoints)
+
+    def to_dict(self) -> Dict[str, Any]:
+        # most expensive endpoints first
+        endpoints = sorted(self.endpoints.items(), key=lambda item: (-item[1].seconds - item[1].throttle_seconds, item[0]))
+        total = EndpointStats()
+        for _, stats in endpoints:
+            total.calls += stats.calls
+            total.errors += stats.errors
+            total.retries += stats.retries
+            total.seconds += stats.seconds
+            total.throttle_seconds += stats.throttle_seconds
+            total.bytes_sent += stats.bytes_sent
+            total.bytes_received += stats.bytes_received
+        return dict(
+            requests=total.calls,
+            errors=total.errors,
+            retries=total.retries,
+            seconds=round(total.seconds, 3),
+            throttle_seconds=round(total.throttle_seconds, 3),
+            bytes_sent=total.bytes_sent,
+            bytes_received=total.bytes_received,
+            endpoints=[dict(endpoint=endpoint, **stats.to_dict()) for endpoint, stats in endpoints]
+        )
+
+    def log_stats(self):
+        if not logger.isEnabledFor(logging.DEBUG):
+            return
+
+        rows = [['endpoint', 'calls', 'errors', 'retries', 'seconds', 'max', 'throttled', 'sent', 'received']]
+        for endpoint in self.to_dict()['endpoints']:
+            rows.append([endpoint['endpoint'],
+                         str(endpoint['calls']),
+                         str(endpoint['errors']),
+                         str(endpoint['retries']),
+                         f'{endpoint["seconds"]:.3f}',
+                         f'{endpoint["max_seconds"]:.3f}',
+                         f'{endpoint["throttle_seconds"]:.3f}',
+                         humanize.naturalsize(endpoint['bytes_sent'], binary=True),
+                         humanize.naturalsize(endpoint['bytes_received'], binary=True)])
+        widths = [max(len(row[column]) for row in rows) for column in range(len(rows[0]))]
+        lines = ['  '.join(cell.ljust(width) if column == 0 else cell.rjust(width)
+                           for column, (cell, width) in enumerate(zip(row, widths)))
+                 for row in rows]
+        logger.debug('GitHub API requests:\n' + '\n'.join(lines))
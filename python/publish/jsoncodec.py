@@ -0,0 +1,115 @@
+"""
+Encodes and decodes JSON with the fastest available backend: orjson or msgspec when installed, the json module otherwise.
+
+All backends write UTF-8 strings unescaped (like ensure_ascii=False) and produce the same indented output.
+Without indentation, the json module writes the same as json.dumps(value, ensure_ascii=False),
+while orjson and msgspec write compact JSON without spaces after separators.
+The fast backends write floats in exponent notation without leading zeros and plus sign (1e-7 vs. 1e-07).
+Values that a fast backend cannot encode (e.g. integers beyond 64 bits) are encoded by the json module,
+as well as non-finite floats (NaN, Infinity), which the fast backends would write as null.
+"""
+import json
+import logging
+import math
+from dataclasses import dataclass
+from typing import Any, Callable, Optional, Union, Dict
+
+logger = logging.getLogger('publish')
+
+try:
+    import orjson
+    orjson_available = True
+except ImportError:
+    orjson_available = False
+
+try:
+    import msgspec
+    msgspec_available = True
+except ImportError:
+    msgspec_available = False
+
+
+@dataclass(frozen=True)
+class JsonBackend:
+    name: str
+    dumps: Callable[[Any, bool], str]
+    loads: Callable[[Union[str, bytes]], Any]
+
+
+def stdlib_dumps(value: Any, indent: bool) -> str:
+    if indent:
+        return json.dumps(value, ensure_ascii=False, indent=2)
+    return json.dumps(value, ensure_ascii=False)
+
+
+def orjson_dumps(value: Any, indent: bool) -> str:
+    option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+    return orjson.dumps(value, option=option).decode('utf-8')
+
+
+def msgspec_dumps(value: Any, indent: bool) -> str:
+    encoded = msgspec.json.encode(value)
+    if indent:
+        encoded = msgspec.json.format(encoded, indent=2)
+    return encoded.decode('utf-8')
+
+
+stdlib_backend = JsonBackend('json', stdlib_dumps, json.loads)
+backends: Dict[str, JsonBackend] = {stdlib_backend.name: stdlib_backend}
+if msgspec_available:
+    backends['msgspec'] = JsonBackend('msgspec', msgspec_dumps, msgspec.json.decode)
+if orjson_available:
+    backends['orjson'] = JsonBackend('orjson', orjson_dumps, orjson.loads)
+
+# the fastest available backend is the default
+_backend = backends.get('orjson') or backends.get('msgspec') or stdlib_backend
+
+
+def get_backend() -> str:
+    return _backend.name
+
+
+def set_backend(name: str):
+    """Sets the backend used by dumps and loads, must be one of the installed backends."""
+    global _backend
+    if name not in backends:
+        raise ValueError(f'Unsupported JSON backend: {name}, expected one of: {", ".join(sorted(backends))}')
+    _backend = backends[name]
+
+
+def has_non_finite_floats(value: Any) -> bool:
+    if isinstance(value, float):
+        return not math.isfinite(value)
+    if isinstance(value, dict):
+        return any(has_non_finite_floats(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return any(has_non_finite_floats(item) for item in value)
+    return False
+
+
+def dumps(value: Any, indent: Optional[int] = None) -> str:
+    """
+    Encodes the value as a JSON string, or indented by two spaces per level when indent is 2.
+    Other indentations are encoded by the json module, as json.dumps(value, ensure_ascii=False, indent=indent).
+    """
+    if indent not in [None, 2]:
+        return json.dumps(value, ensure_ascii=False, indent=indent)
+    if _backend is not stdlib_backend:
+        try:
+            text = _backend.dumps(value, indent is not None)
+            # fast backends write non-finite floats as null, which only needs checking if there is any null
+            if 'null' not in text or not has_non_finite_floats(value):
+                return text
+        except Exception as e:
+            logger.debug(f'Encoding JSON with {_backend.name} failed, falling back to json: {e}')
+    return stdlib_backend.dumps(value, indent is not None)
+
+
+def loads(text: Union[str, bytes]) -> Any:
+    if _backend is not stdlib_backend:
+        try:
+            return _backend.loads(text)
+        except Exception:
+            # the json module accepts more (e.g. NaN) and raises the well-known exceptions otherwise
+            pass
+    return stdlib_backend.loads(text)
@@ -0,0 +1,45 @@
+import json
+from typing import Any, Iterable, Tuple, TextIO
+
+
+class StreamedList:
+    """An iterable of values that is written as a JSON array one value at a time."""
+    def __init__(self, values: Iterable[Any]):
+        self.values = values
+
+
+class StreamedDict:
+    """An iterable of key-value pairs that is written as a JSON object one value at a time."""
+    def __init__(self, items: Iterable[Tuple[str, Any]]):
+        self.items = items
+
+
+def dump(value: Any, writer: TextIO, indent: int = 2):
+    """
+    Writes the value exactly as json.dump(value, writer, ensure_ascii=False, indent=indent) would,
+    except that StreamedList and StreamedDict values are consumed and written incrementally.
+    Only those values are turned into JSON one at a time.
+    """
+    _dump(value, writer, indent, 0)
+
+
+def _dump(value: Any, writer: TextIO, indent: int, level: int):
+    if isinstance(value, StreamedDict):
+        _dump_container(((json.dumps(key, ensure_ascii=False) + ': ', value) for key, value in value.items),
+                        '{', '}', writer, indent, level)
+    elif isinstance(value, StreamedList):
+        _dump_container((('', value) for value in value.values), '[', ']', writer, indent, level)
+    else:
+        text = json.dumps(value, ensure_ascii=False, indent=indent)
+        # JSON strings escape line breaks, so all line breaks are indentation
+        writer.write(text.replace('\n', '\n' + ' ' * (indent * level)) if level else text)
+
+
+def _dump_container(items: Iterable[Tuple[str, Any]], start: str, end: str, writer: TextIO, indent: int, level: int):
+    item_indent = '\n' + ' ' * (indent * (level + 1))
+    empty = True
+    for prefix, value in items:
+        writer.write((start if empty else ',') + item_indent + prefix)
+        _dump(value, writer, indent, level + 1)
+        empty = False
+    writer.write(start + end if empty else '\n' + ' ' * (indent * level) + end)
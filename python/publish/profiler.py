@@ -0,0 +1,301 @@
+import contextlib
+import hashlib
+import json
+import os
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, Callable, Iterator, List, Tuple, ContextManager
+
+import humanize
+import psutil
+
+from publish import __version__, logger
+from publish.tracing import Tracer
+from publish.unittestresults import ParsedUnitTestResults, UnitTestResults
+
+
+def get_peak_rss(process: Optional[psutil.Process] = None) -> Optional[int]:
+    """Returns the highest resident memory of this process so far in bytes, if the platform provides it."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS reports bytes
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except ImportError:
+        return getattr((process or psutil.Process()).memory_info(), 'peak_wset', None)
+
+
+@dataclass
+class PhaseStats:
+    calls: int = 0
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    rss: int = 0
+    peak_rss: Optional[int] = None
+    traced_peak: Optional[int] = None
+
+    def add(self, wall_seconds: float, cpu_seconds: float, rss: int, peak_rss: Optional[int], traced_peak: Optional[int]):
+        self.calls += 1
+        self.wall_seconds += wall_seconds
+        self.cpu_seconds += cpu_seconds
+        self.rss = rss
+        self.peak_rss = peak_rss
+        if traced_peak is not None:
+            self.traced_peak = max(self.traced_peak or 0, traced_peak)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {k: v for k, v in dict(
+            calls=self.calls,
+            wall_seconds=round(self.wall_seconds, 3),
+            cpu_seconds=round(self.cpu_seconds, 3),
+            rss=self.rss,
+            peak_rss=self.peak_rss,
+            traced_peak=self.traced_peak,
+        ).items() if v is not None}
+
+
+class PhaseProfiler:
+    """
+    Records wall time, CPU time and memory of the phases of an action run.
+    Phases with the same name accumulate, e.g. parsing one file after the other.
+    Phases are expected to be entered sequentially by the main thread, not nested.
+
+    Memory is the resident memory (RSS) at the end of a phase and the highest RSS of the process so far.
+    When tracemalloc is tracing (e.g. PYTHONTRACEMALLOC=1), the peak of traced memory within each phase is recorded as well.
+    Before Python 3.9, tracemalloc cannot reset the peak, so this is the peak since tracing started.
+    The optional listener is called with the name of each phase before the phase starts.
+    With a tracer, each phase is traced as a span with the given attributes, and finer-grained spans can be traced via span.
+    """
+
+    def __init__(self,
+                 clock: Callable[[], float] = time.monotonic,
+                 cpu_clock: Callable[[], float] = time.process_time,
+                 memory: Optional[Callable[[], int]] = None,
+                 peak_memory: Optional[Callable[[], Optional[int]]] = None,
+                 listener: Optional[Callable[[str], None]] = None,
+                 tracer: Optional[Tracer] = None):
+        self._listener = listener
+        self.tracer = tracer
+        self._clock = clock
+        self._cpu_clock = cpu_clock
+        # inspecting the process once, not at the end of every phase
+        self._process = psutil.Process() if memory is None or peak_memory is None else None
+        self._memory = memory or (lambda: self._process.memory_info().rss)
+        self._peak_memory = peak_memory or (lambda: get_peak_rss(self._process))
+        self._phases: Dict[str, PhaseStats] = {}
+        self._start = clock()
+        self._cpu_start = cpu_clock()
+
+    @contextlib.contextmanager
+    def phase(self, name: str, **attributes) -> Iterator[None]:
+        if self._listener is not None:
+            self._listener(name)
+        tracing = tracemalloc.is_tracing()
+        if tracing and hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        start = self._clock()
+        cpu_start = self._cpu_clock()
+        try:
+            with self.span(name, **attributes):
+                yield
+        finally:
+            wall_seconds = self._clock() - start
+            cpu_seconds = self._cpu_clock() - cpu_start
+            traced_peak = tracemalloc.get_traced_memory()[1] if tracing else None
+            rss = self._memory()
+            self._phases.setdefault(name, PhaseStats()) \
+                .add(wall_seconds, cpu_seconds, rss, self.get_peak_rss(rss), traced_peak)
+
+    def span(self, name: str, **attributes) -> ContextManager[Any]:
+        return self.tracer.span(name, **attributes) if self.tracer is not None else contextlib.nullcontext()
+
+    def get_peak_rss(self, rss: int = 0) -> Optional[int]:
+        # the peak reported by the OS may lag behind the current RSS
+        peak = self._peak_memory()
+        return max(peak, rss, *(stats.rss for stats in self._phases.values())) if peak is not None else None
+
+    @property
+    def phases(self) -> Dict[str, PhaseStats]:
+        return dict(self._phases)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(
+            wall_seconds=round(self._clock() - self._start, 3),
+            cpu_seconds=round(self._cpu_clock() - self._cpu_start, 3),
+            peak_rss=self.get_peak_rss(),
+            phases=[dict(phase=name, **stats.to_dict()) for name, stats in self._phases.items()]
+        )
+
+    def log_stats(self):
+        d = self.to_dict()
+        traced = any('traced_peak' in phase for phase in d['phases'])
+
+        def size(value: Optional[int]) -> str:
+            return humanize.naturalsize(value, binary=True) if value is not None else ''
+
+        rows = [['phase', 'calls', 'wall seconds', 'cpu seconds', 'rss', 'peak rss'] + (['traced peak'] if traced else [])]
+        for phase in d['phases']:
+            rows.append([phase['phase'],
+                         str(phase['calls']),
+                         f'{phase["wall_seconds"]:.3f}',
+                         f'{phase["cpu_seconds"]:.3f}',
+                         size(phase['rss']),
+                         size(phase.get('peak_rss'))] + ([size(phase.get('traced_peak'))] if traced else []))
+        rows.append(['total', '', f'{d["wall_seconds"]:.3f}', f'{d["cpu_seconds"]:.3f}', '', size(d['peak_rss'])] +
+                    ([''] if traced else []))
+        widths = [max(len(row[column]) for row in rows) for column in range(len(rows[0]))]
+        lines = ['  '.join(cell.ljust(width) if column == 0 else cell.rjust(width)
+                           for column, (cell, width) in enumerate(zip(row, widths))).rstrip()
+                 for row in rows]
+        logger.info('Phases:\n' + '\n'.join(lines))
+
+
+def hash_string(value: Optional[str]) -> Optional[str]:
+    return f'sha256:{hashlib.sha256(value.encode("utf-8")).hexdigest()[:16]}' if value is not None else None
+
+
+class ProfileCapture:
+    """
+    Captures a CPU profile (cProfile) and memory snapshots (tracemalloc) of an action run,
+    and writes them together with the shape of the test results into a directory:
+
+    - profile.json: phases and shape of the test results, e.g. number of files, tests and runs, or size of messages
+    - cpu.prof: the CPU profile, can be inspected with pstats or tools like snakeviz
+    - cpu.txt: functions with the highest cumulative and own time
+    - memory.txt: top allocations before each phase and at the end, and their growth since the previous snapshot
+
+    Memory snapshots are taken before the first occurrence of a phase, not before its repetitions.
+    Unless hash_strings is False, test and file names in profile.json are hashed, messages are only measured.
+    The profilers only run inside the context of this capture.
+    """
+
+    def __init__(self, directory: str, cpu: bool, memory: bool, hash_strings: bool = True, top: int = 25, frames: int = 10):
+        self._directory = directory
+        self._cpu = cpu
+        self._memory = memory
+        self._hash_strings = hash_strings
+        self._top = top
+        self._frames = frames
+        self._cpu_profile = None
+        self._snapshot: Optional[Tuple[str, tracemalloc.Snapshot]] = None
+        self._snapshot_phases = set()
+        self._memory_report: List[str] = []
+        self._results: Optional[Dict[str, Any]] = None
+        self.profiler = PhaseProfiler(listener=self.snapshot if memory else None)
+
+    def __enter__(self) -> 'ProfileCapture':
+        os.makedirs(self._directory, exist_ok=True)
+        if self._memory:
+            tracemalloc.start(self._frames)
+        if self._cpu:
+            import cProfile
+            self._cpu_profile = cProfile.Profile()
+            self._cpu_profile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._cpu_profile is not None:
+            self._cpu_profile.disable()
+        if self._memory:
+            self.take_snapshot('end')
+            tracemalloc.stop()
+        try:
+            self.write()
+        except Exception as e:
+            logger.warning(f'Failed to write profile to {self._directory}', exc_info=e)
+        return False
+
+    def hash(self, value: Optional[str]) -> Optional[str]:
+        return hash_string(value) if self._hash_strings else value
+
+    def snapshot(self, phase: str):
+        if phase not in self._snapshot_phases:
+            self._snapshot_phases.add(phase)
+            self.take_snapshot(f'before {phase}')
+
+    def take_snapshot(self, label: str):
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+            tracemalloc.Filter(False, '<unknown>'),
+        ])
+        current, peak = tracemalloc.get_traced_memory()
+
+        def size(value: int) -> str:
+            return humanize.naturalsize(value, binary=True)
+
+        lines = [f'{label}: {size(current)} traced, {size(peak)} peak',
+                 'top allocations:']
+        lines.extend(f'  {size(stat.size)} in {stat.count} blocks: {stat.traceback[0]}'
+                     for stat in snapshot.statistics('lineno')[:self._top])
+        if self._snapshot is not None:
+            previous_label, previous = self._snapshot
+            lines.append(f'growth since {previous_label}:')
+            lines.extend(f'  {"+" if stat.size_diff >= 0 else "-"}{size(abs(stat.size_diff))} '
+                         f'({stat.count_diff:+d} blocks): {stat.traceback[0]}'
+                         for stat in snapshot.compare_to(previous, 'lineno')[:self._top])
+        self._memory_report.append('\n'.join(lines))
+        # only the latest snapshot is kept to compare the next snapshot with
+        self._snapshot = (label, snapshot)
+
+    def describe(self, parsed: ParsedUnitTestResults, results: UnitTestResults):
+        """Records the shape of the test results, which allows to reproduce the run with synthetic test result files."""
+        def lengths(values: List[Optional[str]]) -> Dict[str, int]:
+            values = [len(value) for value in values if value]
+            return dict(count=len(values), max=max(values, default=0), total=sum(values))
+
+        cases = parsed.cases
+        result_files = sorted({case.result_file for case in cases if case.result_file} |
+                              {error.file for error in parsed.errors if error.file})
+        runs = [sum(len(runs) for runs in states.values()) for states in results.case_results.values()]
+        slowest = sorted((case for case in cases if case.time is not None), key=lambda case: -case.time)[:self._top]
+
+        self._results = dict(
+            files=[dict(file=self.hash(file), size=os.path.getsize(file) if os.path.exists(file) else None)
+                   for file in result_files],
+            errors=len(parsed.errors),
+            suites=parsed.suites,
+            tests=len(results.case_results),
+            runs=len(cases),
+            max_runs_per_test=max(runs, default=0),
+            results=dict(sorted(Counter(case.result for case in cases).items())),
+            class_names=lengths([case.class_name for case in cases]),
+            test_names=lengths([case.test_name for case in cases]),
+            messages=lengths([case.message for case in cases]),
+            contents=lengths([case.content for case in cases]),
+            stdout=lengths([case.stdout for case in cases]),
+            stderr=lengths([case.stderr for case in cases]),
+            slowest_runs=[dict(class_name=self.hash(case.class_name), test_name=self.hash(case.test_name), time=case.time)
+                          for case in slowest],
+        )
+
+    def write(self):
+        profile = dict(
+            version=__version__,
+            cpu=self._cpu,
+            memory=self._memory,
+            hashed=self._hash_strings,
+            phases=self.profiler.to_dict(),
+            results=self._results,
+        )
+        with open(os.path.join(self._directory, 'profile.json'), 'wt', encoding='utf-8') as w:
+            json.dump(profile, w, ensure_ascii=False, indent=2)
+
+        if self._cpu_profile is not None:
+            import pstats
+            self._cpu_profile.dump_stats(os.path.join(self._directory, 'cpu.prof'))
+            with open(os.path.join(self._directory, 'cpu.txt'), 'wt', encoding='utf-8') as w:
+                stats = pstats.Stats(self._cpu_profile, stream=w).strip_dirs()
+                stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self._top)
+                stats.sort_stats(pstats.SortKey.TIME).print_stats(self._top)
+
+        if self._memory_report:
+            with open(os.path.join(self._directory, 'memory.txt'), 'wt', encoding='utf-8') as w:
+                w.write('\n\n'.join(self._memory_report))
+                w.write('\n')
+
+        logger.info(f'Wrote profile to {self._directory}')
@@ -1,32 +1,44 @@
 from __future__ import annotations
 
+import contextlib
 import dataclasses
+import functools
+import hashlib
 import json
 import logging
 import os
 import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from copy import deepcopy
 from dataclasses import dataclass
-from typing import List, Any, Optional, Tuple, Mapping, Dict, Union, Callable
+from typing import List, Any, Optional, Tuple, Mapping, Dict, Union, Callable, TypeVar, ContextManager, Iterator
 
 from github import Github, GithubException, UnknownObjectException
 from github.CheckRun import CheckRun
 from github.CheckRunAnnotation import CheckRunAnnotation
 from github.PullRequest import PullRequest
+from github.Repository import Repository
 from github.IssueComment import IssueComment
 
 from publish import __version__, get_json_path, comment_mode_off, digest_prefix, restrict_unicode_list, \
     comment_mode_always, comment_mode_changes, comment_mode_changes_failures, comment_mode_changes_errors, \
-    comment_mode_failures, comment_mode_errors, \
-    get_stats_from_digest, digest_header, get_short_summary, get_long_summary_md, \
+    comment_mode_failures, comment_mode_errors, get_digest_from_stats, \
+    get_stats_from_digest, digest_regex, digest_format, digest_v1_format, get_short_summary, get_long_summary_md, \
     get_long_summary_with_digest_md, get_error_annotations, get_case_annotations, get_suite_annotations, \
-    get_all_tests_list_annotation, get_skipped_tests_list_annotation, get_all_tests_list, \
+    get_limited_annotations, max_comment_bytes, max_check_run_summary_bytes, max_job_summary_bytes, get_all_tests_list_annotation, get_skipped_tests_list_annotation, get_all_tests_list, \
     get_skipped_tests_list, all_tests_list, skipped_tests_list, pull_request_build_mode_merge, \
     Annotation, SomeTestChanges
-from publish import logger
+from publish import logger, jsonstream, jsoncodec, arrow
+from publish.checkpoint import AnnotationsCheckpoint, load_annotations_checkpoint, save_annotations_checkpoint
+from publish.git import get_merge_base
 from publish.github_action import GithubAction
+from publish.instrumentation import ApiInstrumentation
+from publish.jsonstream import StreamedDict, StreamedList
+from publish.profiler import PhaseProfiler
+from publish.store import ResultsStore, StoredResults
 from publish.unittestresults import UnitTestCaseResults, UnitTestRunResults, UnitTestRunDeltaResults, \
-    UnitTestRunResultsOrDeltaResults, get_stats_delta, get_diff_value
+    UnitTestRunResultsOrDeltaResults, UnitTestCaseResultKey, get_stats_delta, get_diff_value
 
 
 @dataclass(frozen=True)
@@ -42,10 +54,16 @@ class Settings:
     is_fork: bool
     repo: str
     commit: str
+    workspace: Optional[str]
     json_file: Optional[str]
     json_thousands_separator: str
     json_suite_details: bool
     json_test_case_results: bool
+    json_cases_file: Optional[str]
+    json_cases_messages: bool
+    arrow_file: Optional[str]
+    arrow_suites_file: Optional[str]
+    arrow_format: str
     fail_on_errors: bool
     fail_on_failures: bool
     action_fail: bool
@@ -73,10 +91,27 @@ class Settings:
     large_files: bool
     ignore_runs: bool
     check_run_annotation: List[str]
+    max_annotations: Optional[int]
+    cluster_annotations: Optional[int]
     seconds_between_github_reads: float
     seconds_between_github_writes: float
     secondary_rate_limit_wait_seconds: float
+    adaptive_request_pacing: bool
+    max_concurrent_reads: int
+    max_concurrent_writes: int
+    batch_reads: bool
+    github_api_cache_file: Optional[str]
+    results_store_file: Optional[str]
+    profile: str
+    profile_directory: str
+    profile_hash_strings: bool
+    trace_file: Optional[str]
+    trace_format: str
     search_pull_requests: bool
+    skip_unchanged_check_run: bool
+    defer_annotations: bool
+    annotations_checkpoint_file: Optional[str]
+    dry_run_directory: Optional[str]
 
 
 @dataclasses.dataclass(frozen=True)
@@ -147,9 +182,22 @@ class PublishData:
             d.update(before_stats=cls._format(before_stats, thousands_separator))
         return d
 
+    @staticmethod
+    def _dict_factory(items: List[Tuple[str, Any]]) -> Dict[str, Any]:
+        # removes None values
+        return {k: v for (k, v) in items if v is not None}
+
     def _as_dict(self) -> Dict[str, Any]:
-        # the dict_factory removes None values
-        return dataclasses.asdict(self, dict_factory=lambda x: {k: v for (k, v) in x if v is not None})
+        return dataclasses.asdict(self, dict_factory=self._dict_factory)
+
+    @staticmethod
+    def _case_to_dict(test: UnitTestCaseResultKey, states: Mapping[str, Any]) -> Dict[str, Any]:
+        # beautify cases, turn tuple-key into proper fields
+        return {k: v for k, v in [('file_name', test[0]),
+                                  ('class_name', test[1]),
+                                  ('test_name', test[2]),
+                                  ('states', states)]
+                if v}
 
     def to_dict(self, thousands_separator: str, with_suite_details: bool, with_cases: bool) -> Mapping[str, Any]:
         data = self.without_exceptions().without_summary_with_digest()
@@ -159,14 +207,8 @@ class PublishData:
             data = data.without_cases()
         d = data._as_dict()
 
-        # beautify cases, turn tuple-key into proper fields
         if d.get('cases'):
-            d['cases'] = [{k: v for k, v in [('file_name', test[0]),
-                                             ('class_name', test[1]),
-                                             ('test_name', test[2]),
-                                             ('states', states)]
-                           if v}
-                          for test, states in d['cases'].items()]
+            d['cases'] = [self._case_to_dict(test, states) for test, states in d['cases'].items()]
 
         # provide formatted stats and delta
         d.update(formatted=self._formatted_stats_and_delta(
@@ -175,6 +217,34 @@ class PublishData:
 
         return d
 
+    def to_streamed_dict(self, thousands_separator: str, with_suite_details: bool, with_cases: bool) -> StreamedDict:
+        """
+        Provides the same content as to_dict, but annotations and cases are turned into dicts
+        one at a time while being written by publish.jsonstream.dump.
+        """
+        annotations = self.annotations
+        cases = self.cases if with_cases else None
+        d = dataclasses.replace(self, annotations=[] if annotations is not None else None, cases=None) \
+            .to_dict(thousands_separator, with_suite_details, with_cases=False)
+
+        def stream_annotations() -> Iterator[Dict[str, Any]]:
+            for annotation in annotations:
+                yield dataclasses.asdict(annotation, dict_factory=self._dict_factory)
+
+        def stream_cases() -> Iterator[Dict[str, Any]]:
+            for test, states in cases.items():
+                yield self._case_to_dict(test, {state: [dataclasses.asdict(case, dict_factory=self._dict_factory)
+                                                        for case in state_cases]
+                                                for state, state_cases in states.items()})
+
+        items = []
+        for key, value in d.items():
+            # cases is the last field, it precedes the formatted stats
+            if key == 'formatted' and cases:
+                items.append(('cases', StreamedList(stream_cases())))
+            items.append((key, StreamedList(stream_annotations()) if key == 'annotations' else value))
+        return StreamedDict(items)
+
     def to_reduced_dict(self, thousands_separator: str) -> Mapping[str, Any]:
         # remove exceptions, suite details and cases
         data = self.without_exceptions().without_summary_with_digest().without_suite_details().without_cases()._as_dict()
@@ -202,14 +272,66 @@ class PublishData:
         return data
 
 
+T = TypeVar('T')
+
+
+def memoized_read(key: Callable[..., Any]):
+    # memoizes the decorated read once Publisher.read_concurrently started reading, keyed by the given key of the arguments
+    # reads are traced as spans named after the read, e.g. 'get latest comment'
+    def decorator(read: Callable[..., T]) -> Callable[..., T]:
+        name = read.__name__.replace('_', ' ')
+
+        @functools.wraps(read)
+        def wrapper(self: 'Publisher', *args) -> T:
+            with self._span(name):
+                if vars(self).get('_reads') is None:
+                    return read(self, *args)
+                return self._read((read.__name__, key(*args)), lambda: read(self, *args))
+        return wrapper
+    return decorator
+
+
+def get_restricted_test_lists(cases: UnitTestCaseResults) -> Tuple[List[str], List[str]]:
+    all_tests, skipped_tests = get_all_tests_list(cases), get_skipped_tests_list(cases)
+    # 'before' test names are retrieved from check runs, which have restricted unicode
+    # so we have to apply the same restriction to the test names retrieved from cases, so that they match
+    return restrict_unicode_list(all_tests), restrict_unicode_list(skipped_tests)
+
+
 class Publisher:
 
-    def __init__(self, settings: Settings, gh: Github, gha: GithubAction):
+    def __init__(self, settings: Settings, gh: Github, gha: GithubAction,
+                 instrumentation: Optional[ApiInstrumentation] = None,
+                 profiler: Optional[PhaseProfiler] = None,
+                 store: Optional[ResultsStore] = None):
         self._settings = settings
         self._gh = gh
         self._gha = gha
-        self._repo = gh.get_repo(self._settings.repo)
+        self._instrumentation = instrumentation
+        self._profiler = profiler
+        self._store = store
+        # the repository is requested from the API only when it is first used, which it is not in a dry run
+        self._resolved_repo: Optional[Repository] = None
+        self._repo_lock = threading.Lock()
         self._req = gh._Github__requester
+        # reads are memoized only after read_concurrently started to read them
+        self._reads: Optional[Dict[Tuple[Any, ...], Future]] = None
+        self._reads_lock = threading.Lock()
+        # publishes annotations that publish_check deferred
+        self._deferred_annotations: Optional[Callable[[], Any]] = None
+
+    @property
+    def _repo(self) -> Repository:
+        with self._repo_lock:
+            if self._resolved_repo is None:
+                self._resolved_repo = self._gh.get_repo(self._settings.repo)
+            return self._resolved_repo
+
+    def _phase(self, name: str) -> ContextManager[None]:
+        return self._profiler.phase(name) if self._profiler is not None else contextlib.nullcontext()
+
+    def _span(self, name: str, **attributes) -> ContextManager[Any]:
+        return self._profiler.span(name, **attributes) if self._profiler is not None else contextlib.nullcontext()
 
     def publish(self,
                 stats: UnitTestRunResults,
@@ -219,8 +341,19 @@ class Publisher:
         if logger.isEnabledFor(logging.DEBUG):
             logger.debug(f'Publishing {stats}')
 
+        # read everything from GitHub that is needed below at once
+        if self._settings.dry_run_directory:
+            logger.info(f'Dry run, writing check run and comment to {self._settings.dry_run_directory} instead of publishing them')
+            os.makedirs(self._settings.dry_run_directory, exist_ok=True)
+        else:
+            if self._settings.batch_reads:
+                self.read_references(stats)
+            if self._settings.max_concurrent_reads > 1:
+                self.read_concurrently(stats)
+
         # construct publish data (test results)
-        data = self.get_publish_data(stats, cases, conclusion)
+        with self._span('get publish data'):
+            data = self.get_publish_data(stats, cases, conclusion)
 
         # publish the check status
         if self._settings.check_run:
@@ -232,26 +365,248 @@ class Publisher:
                             'To fully run the action on fork repository pull requests, see '
                             f'https://github.com/EnricoMi/publish-unit-test-result-action/blob/{__version__}/README.md#support-fork-repositories-and-dependabot-branches')
             else:
-                data = self.publish_check(data)
-
-        # create data as json
-        self.publish_json(data)
-
-        # publish job summary
-        if self._settings.job_summary:
-            self.publish_job_summary(self._settings.comment_title, data)
-
-        # publish pr comments
-        if not self._settings.is_fork:
-            if self._settings.comment_mode != comment_mode_off:
-                pulls = self.get_pulls(self._settings.commit)
-                if pulls:
-                    for pull in pulls:
-                        self.publish_comment(self._settings.comment_title, stats, pull, data.check_url, cases)
+                with self._phase('publish check run'):
+                    data = self.publish_check(data)
+                # a dry run does not publish the check run, so later runs have to find no results of this commit
+                if self._store is not None and not self._settings.dry_run_directory:
+                    self.store_results(self._settings.commit, self.get_results_from_cases(stats, cases))
+
+        try:
+            # create data as json
+            with self._phase('publish json'):
+                self.publish_json(data)
+
+            # export test results as Arrow files
+            if self._settings.arrow_file or self._settings.arrow_suites_file:
+                with self._phase('publish arrow'):
+                    self.publish_arrow(data)
+
+            # publish job summary
+            if self._settings.job_summary:
+                with self._phase('publish job summary'):
+                    self.publish_job_summary(self._settings.comment_title, data)
+
+            # publish pr comments
+            if not self._settings.is_fork:
+                if self._settings.comment_mode != comment_mode_off and self._settings.dry_run_directory:
+                    with self._phase('publish comments'):
+                        self.publish_dry_run_comment(self._settings.comment_title, stats, data.check_url, cases)
+                elif self._settings.comment_mode != comment_mode_off:
+                    with self._phase('publish comments'):
+                        pulls = self.get_pulls(self._settings.commit)
+                        if len(pulls) > 1:
+                            # pull requests with the same base commit share reads of the base check run and test lists
+                            self._start_reads()
+
+                        def publish_comment(pull: PullRequest):
+                            with self._span('publish comment'):
+                                self.publish_comment(self._settings.comment_title, stats, pull, data.check_url, cases)
+
+                        if len(pulls) > 1 and self._settings.max_concurrent_writes > 1:
+                            logger.debug(f'publishing comments with up to {self._settings.max_concurrent_writes} concurrent writes')
+                            with ThreadPoolExecutor(max_workers=min(self._settings.max_concurrent_writes, len(pulls)),
+                                                    thread_name_prefix='github-write') as executor:
+                                futures = [executor.submit(publish_comment, pull) for pull in pulls]
+                            # raises the first failure
+                            for future in futures:
+                                future.result()
+                        elif pulls:
+                            for pull in pulls:
+                                publish_comment(pull)
+                        else:
+                            logger.info(f'There is no pull request for commit {self._settings.commit}')
                 else:
-                    logger.info(f'There is no pull request for commit {self._settings.commit}')
-            else:
-                logger.info('Commenting on pull requests disabled')
+                    logger.info('Commenting on pull requests disabled')
+        except BaseException:
+            # deferred annotations are still published, but a failure must not hide the original failure
+            if self._settings.defer_annotations:
+                try:
+                    with self._phase('publish deferred annotations'):
+                        self.publish_deferred_annotations()
+                except Exception as e:
+                    logger.warning(f'Failed to publish deferred annotations: {str(e)}')
+                    logger.debug('publishing deferred annotations failed', exc_info=e)
+            raise
+
+        # annotations deferred by publish_check are published after everything else has been published
+        if self._settings.defer_annotations:
+            with self._phase('publish deferred annotations'):
+                self.publish_deferred_annotations()
+
+    def read_concurrently(self, stats: UnitTestRunResults):
+        compare_earlier = self._settings.compare_earlier and self._settings.check_run
+        comment = not self._settings.is_fork and self._settings.comment_mode != comment_mode_off
+        if not compare_earlier and not comment:
+            return
+
+        logger.debug(f'reading from GitHub with up to {self._settings.max_concurrent_reads} concurrent reads')
+        self._start_reads()
+
+        def read_base(pull: PullRequest):
+            base_commit_sha = self.get_base_commit_sha(pull)
+            if stats.commit != base_commit_sha and not self.has_stored_results(base_commit_sha):
+                self.get_test_lists_from_check_run(self.get_check_run(base_commit_sha))
+
+        # all reads store their result (or exception) in self._reads, publish picks them up from there
+        with ThreadPoolExecutor(max_workers=self._settings.max_concurrent_reads,
+                                thread_name_prefix='github-read') as executor:
+            before_commit_sha = get_json_path(self._settings.event, 'before')
+            if compare_earlier and not self.has_stored_results(before_commit_sha):
+                executor.submit(self.get_check_run, before_commit_sha)
+            if comment:
+                for pull in self.get_pulls(self._settings.commit):
+                    if compare_earlier:
+                        executor.submit(read_base, pull)
+                    executor.submit(self.get_latest_comment, pull)
+
+    def read_references(self, stats: UnitTestRunResults):
+        compare_earlier = self._settings.compare_earlier and self._settings.check_run
+        comment = not self._settings.is_fork and self._settings.comment_mode != comment_mode_off
+        if not compare_earlier and not comment:
+            return
+
+        self._start_reads()
+        pulls = self.get_pulls(self._settings.commit) if comment else []
+        commit_shas = [get_json_path(self._settings.event, 'before')] if compare_earlier else []
+        if compare_earlier:
+            commit_shas.extend([self.get_base_commit_sha(pull) for pull in pulls])
+        # base commits that equal the commit are never compared to
+        commit_shas = [sha for sha in dict.fromkeys(commit_shas)
+                       if sha is not None and sha != '0000000000000000000000000000000000000000' and sha != stats.commit
+                       and not self.has_stored_results(sha)]
+        if not commit_shas and not pulls:
+            return
+
+        # read check runs of all reference commits and comments of all pull requests in one request,
+        # reads that cannot be answered by this are read individually later
+        logger.debug(f'reading check runs of {len(commit_shas)} commits and comments of {len(pulls)} pull requests')
+        try:
+            headers, data = self._req.requestJsonAndCheck(
+                "POST", self._settings.graphql_url, input=self.get_references_query(commit_shas, pulls)
+            )
+        except GithubException as e:
+            logger.warning(f'Failed to read check runs and comments via GraphQL: {str(e)}')
+            logger.debug('reading references via GraphQL failed', exc_info=e)
+            return
+
+        for idx, commit_sha in enumerate(commit_shas):
+            self.remember_check_run_from_graphql(commit_sha, get_json_path(data, f'data.repository.commit{idx}.checkSuites'))
+        for idx, pull in enumerate(pulls):
+            comments = get_json_path(data, f'data.repository.pull{idx}.comments.nodes')
+            if comments is not None:
+                self._remember(('get_latest_comment', pull.number), self.get_latest_comment_from_graphql(comments))
+
+    def get_references_query(self, commit_shas: List[str], pulls: List[PullRequest]) -> Mapping[str, Any]:
+        check_runs = (
+            r'      checkSuites(first: 10, filterBy: { checkName: $checkName }) {'
+            r'        pageInfo { hasNextPage }'
+            r'        nodes {'
+            r'          checkRuns(first: 10, filterBy: { checkName: $checkName }) {'
+            r'            pageInfo { hasNextPage }'
+            r'            nodes {'
+            r'              databaseId, name, status, startedAt, title, summary'
+            r'              annotations(first: 50) {'
+            r'                pageInfo { hasNextPage }'
+            r'                nodes { title, message, rawDetails }'
+            r'              }'
+            r'            }'
+            r'          }'
+            r'        }'
+            r'      }'
+        )
+        comments = (
+            r'      comments(last: 100, orderBy: { direction: ASC, field: UPDATED_AT }) {'
+            r'        nodes {'
+            r'          id, databaseId, viewerDidAuthor, body, isMinimized, url'
+            r'        }'
+            r'      }'
+        )
+        commits = [f'    commit{idx}: object(oid: "{commit_sha}") {{ ... on Commit {{{check_runs}}} }}'
+                   for idx, commit_sha in enumerate(commit_shas)]
+        pull_requests = [f'    pull{idx}: pullRequest(number: {pull.number}) {{{comments}}}'
+                         for idx, pull in enumerate(pulls)]
+
+        return dict(
+            query=r'query ListReferences($owner: String!, $name: String!, $checkName: String!) {'
+                  r'  repository(owner: $owner, name: $name) {' +
+                  ''.join(commits + pull_requests) +
+                  r'  }'
+                  r'}',
+            variables=dict(owner=self._repo.owner.login, name=self._repo.name, checkName=self._settings.check_name)
+        )
+
+    def remember_check_run_from_graphql(self, commit_sha: str, suites: Optional[Mapping[str, Any]]):
+        if suites is None or get_json_path(suites, 'pageInfo.hasNextPage') or \
+                any(get_json_path(suite, 'checkRuns.pageInfo.hasNextPage') for suite in suites.get('nodes', [])):
+            logger.debug(f'could not read all check runs of commit {commit_sha} via GraphQL')
+            return
+
+        runs = [(run, self._gh.create_from_raw_data(CheckRun, dict(
+                    id=run.get('databaseId'),
+                    name=run.get('name'),
+                    head_sha=commit_sha,
+                    status=run.get('status', '').lower(),
+                    started_at=run.get('startedAt'),
+                    output=dict(title=run.get('title'), summary=run.get('summary')),
+                    url=f'{self._repo.url}/check-runs/{run.get("databaseId")}'
+                )))
+                for suite in suites.get('nodes', [])
+                for run in get_json_path(suite, 'checkRuns.nodes') or []]
+        logger.debug(f'found {len(runs)} check runs for commit {commit_sha}')
+
+        check_run = self.get_check_run_from_list([check_run for _, check_run in runs])
+        self._remember(('get_check_run', commit_sha), check_run)
+        if check_run is None:
+            return
+
+        run = next(run for run, run_check_run in runs if run_check_run is check_run)
+        if not get_json_path(run, 'annotations.pageInfo.hasNextPage'):
+            annotations = [self._gh.create_from_raw_data(CheckRunAnnotation, dict(
+                               title=annotation.get('title'),
+                               message=annotation.get('message'),
+                               raw_details=annotation.get('rawDetails')
+                           ))
+                           for annotation in get_json_path(run, 'annotations.nodes') or []]
+            self._remember(('get_test_lists_from_check_run', check_run.id), self.get_test_lists_from_annotations(annotations))
+
+    def get_latest_comment_from_graphql(self, comments: List[Mapping[str, Any]]) -> Optional[IssueComment]:
+        comments = self.get_action_comments(comments)
+        if len(comments) == 0:
+            return None
+
+        comment = comments[-1]
+        return self._gh.create_from_raw_data(IssueComment, dict(
+            id=comment.get('databaseId'),
+            body=comment.get('body'),
+            url=f'{self._repo.url}/issues/comments/{comment.get("databaseId")}',
+            html_url=comment.get('url')
+        ))
+
+    def _start_reads(self):
+        with self._reads_lock:
+            if self._reads is None:
+                self._reads = {}
+
+    def _remember(self, key: Tuple[Any, ...], value: Any):
+        future = Future()
+        future.set_result(value)
+        with self._reads_lock:
+            self._reads.setdefault(key, future)
+
+    def _read(self, key: Tuple[Any, ...], read: Callable[[], T]) -> T:
+        with self._reads_lock:
+            future = self._reads.get(key)
+            is_first = future is None
+            if is_first:
+                future = self._reads[key] = Future()
+
+        # only the first caller reads, all other callers wait for its result
+        if is_first:
+            try:
+                future.set_result(read())
+            except BaseException as e:
+                future.set_exception(e)
+        return future.result()
 
     def get_pull_from_event(self) -> Optional[PullRequest]:
         number = get_json_path(self._settings.event, 'pull_request.number')
@@ -285,6 +640,7 @@ class Publisher:
         logger.debug(f'found {len(pull_requests)} pull requests in repo {self._settings.repo} containing commit {commit}')
         return pull_requests
 
+    @memoized_read(key=lambda commit: commit)
     def get_pulls(self, commit: str) -> List[PullRequest]:
         # get all pull requests associated with this commit
         # TODO: simplify to event pr only, breaking change for version 3.0
@@ -328,6 +684,37 @@ class Publisher:
         check_run = self.get_check_run(commit_sha)
         return self.get_stats_from_check_run(check_run) if check_run is not None else None
 
+    def get_store_key(self, commit_sha: str) -> Tuple[str, str, str]:
+        return self._settings.repo, self._settings.check_name, commit_sha
+
+    def has_stored_results(self, commit_sha: Optional[str]) -> bool:
+        return self._store is not None and commit_sha is not None and self.get_store_key(commit_sha) in self._store
+
+    def get_stored_results(self, commit_sha: Optional[str]) -> Optional[StoredResults]:
+        # results of a commit do not change, so stored results are used instead of reading the check run
+        if self._store is None or commit_sha is None or commit_sha == '0000000000000000000000000000000000000000':
+            return None
+        results = self._store.get(self.get_store_key(commit_sha))
+        if results is not None:
+            logger.debug(f'found results of commit {commit_sha} in results store')
+        return results
+
+    def get_results_from_cases(self, stats: UnitTestRunResults, cases: UnitTestCaseResults) -> StoredResults:
+        # test lists as they are read from the annotations of the published check run
+        all_tests = sorted(restrict_unicode_list(get_all_tests_list(cases))) \
+            if all_tests_list in self._settings.check_run_annotation else []
+        skipped_tests = sorted(restrict_unicode_list(get_skipped_tests_list(cases))) \
+            if skipped_tests_list in self._settings.check_run_annotation else []
+        # stats as they are read from the digest of the published check run
+        return StoredResults(stats=get_stats_from_digest(get_digest_from_stats(stats)),
+                             all_tests=all_tests or None, skipped_tests=skipped_tests or None)
+
+    def store_results(self, commit_sha: str, results: StoredResults):
+        if self._store is not None:
+            self._store.put(self.get_store_key(commit_sha), results)
+            logger.debug(f'stored results of commit {commit_sha} in results store')
+
+    @memoized_read(key=lambda commit_sha: commit_sha)
     def get_check_run(self, commit_sha: str) -> Optional[CheckRun]:
         if commit_sha is None or commit_sha == '0000000000000000000000000000000000000000':
             return None
@@ -392,16 +779,19 @@ class Publisher:
 
     @staticmethod
     def get_stats_from_summary_md(summary: str) -> Optional[UnitTestRunResults]:
-        start = summary.index(digest_header) if digest_header in summary else None
-        if start:
-            digest = summary[start + len(digest_header):]
-            end = digest.index('\n') if '\n' in digest else None
-            if end:
-                digest = digest[:end]
-            logger.debug(f'digest: {digest}')
-            stats = get_stats_from_digest(digest)
-            logger.debug(f'stats: {stats}')
-            return stats
+        match = digest_regex.search(summary)
+        if match is None:
+            return None
+
+        format, digest = match.groups()
+        logger.debug(f'digest: {format},{digest}')
+        if format not in [digest_format, digest_v1_format]:
+            # digest written by a later version of this action
+            logger.debug(f'unsupported digest format: {format}')
+            return None
+        stats = get_stats_from_digest(digest, format)
+        logger.debug(f'stats: {stats}')
+        return stats
 
     @staticmethod
     def get_test_list_from_annotation(annotation: CheckRunAnnotation) -> Optional[List[str]]:
@@ -418,20 +808,33 @@ class Publisher:
         if self._settings.compare_earlier and self._settings.check_run:
             before_commit_sha = get_json_path(self._settings.event, 'before')
             logger.debug(f'comparing against before={before_commit_sha}')
-            before_check_run = self.get_check_run(before_commit_sha)
-            before_stats = self.get_stats_from_check_run(before_check_run) if before_check_run is not None else None
+            before_results = self.get_stored_results(before_commit_sha) if self._store is not None else None
+            if before_results is not None:
+                before_stats = before_results.stats
+            elif not self._settings.dry_run_directory:
+                before_check_run = self.get_check_run(before_commit_sha)
+                before_stats = self.get_stats_from_check_run(before_check_run) if before_check_run is not None else None
         stats_with_delta = get_stats_delta(stats, before_stats, 'earlier') if before_stats is not None else stats
         logger.debug(f'stats with delta: {stats_with_delta}')
 
-        error_annotations = get_error_annotations(stats.errors)
-        case_annotations = get_case_annotations(cases, self._settings.report_individual_runs)
-        output_annotations = get_suite_annotations(stats.suite_details, self._settings.report_suite_out_logs, self._settings.report_suite_err_logs)
-        test_list_annotations = self.get_test_list_annotations(cases)
-        all_annotations = error_annotations + case_annotations + output_annotations + test_list_annotations
-
-        title = get_short_summary(stats)
-        summary = get_long_summary_md(stats_with_delta)
-        summary_with_digest = get_long_summary_with_digest_md(stats_with_delta, stats)
+        with self._phase('build annotations'):
+            max_annotations = self._settings.max_annotations
+            error_annotations = get_error_annotations(stats.errors)
+            case_annotations = get_case_annotations(cases, self._settings.report_individual_runs, ranked=max_annotations is not None,
+                                                    cluster_size=self._settings.cluster_annotations)
+            output_annotations = get_suite_annotations(stats.suite_details, self._settings.report_suite_out_logs, self._settings.report_suite_err_logs)
+            result_annotations = error_annotations + case_annotations + output_annotations
+            if max_annotations is not None:
+                result_annotations = get_limited_annotations(result_annotations, max_annotations)
+            # test lists are always published, later runs read them to find test changes
+            test_list_annotations = self.get_test_list_annotations(cases)
+            all_annotations = result_annotations + test_list_annotations
+
+        with self._phase('build summary'):
+            title = get_short_summary(stats)
+            summary = get_long_summary_md(stats_with_delta)
+        with self._phase('build digest'):
+            summary_with_digest = get_long_summary_with_digest_md(stats_with_delta, stats, max_bytes=max_check_run_summary_bytes)
 
         return PublishData(
             title=title,
@@ -447,37 +850,158 @@ class Publisher:
         )
 
     def publish_check(self, data: PublishData) -> PublishData:
+        if self._settings.dry_run_directory:
+            self.write_dry_run_check(data)
+            return data
+
+        content_hash = None
+        if self._settings.skip_unchanged_check_run:
+            # re-runs of a workflow publish the same check run again, which we can skip
+            content_hash = self.get_check_run_content_hash(self._settings.check_name, data)
+            existing_check_run = self.get_check_run(self._settings.commit)
+            if existing_check_run is not None and existing_check_run.external_id == content_hash:
+                logger.info(f'Check {existing_check_run.html_url} has the same content, skipping creating check')
+                return data.with_check_url(existing_check_run.html_url)
+
         # we can send only 50 annotations at once, so we split them into chunks of 50
-        check_run = None
         split_annotations = [annotation.to_dict() for annotation in data.annotations]
         split_annotations = [split_annotations[x:x+50] for x in range(0, len(split_annotations), 50)] or [[]]
-        for annotations in split_annotations:
+        batches = range(len(split_annotations))
+
+        check_run = None
+        if self._settings.annotations_checkpoint_file:
+            if content_hash is None:
+                content_hash = self.get_check_run_content_hash(self._settings.check_name, data)
+            check_run, next_batch = self.get_checkpointed_check_run(content_hash, len(split_annotations))
+            batches = batches[next_batch:]
+            if not batches:
+                logger.info(f'Check {check_run.html_url} has been published completely already')
+                return data.with_check_url(check_run.html_url)
+
+        if self._settings.defer_annotations and len(batches) > 1:
+            # publish the first batch only, publish_deferred_annotations adds the remaining batches
+            check_run = self.publish_check_batches(check_run, data, split_annotations, batches[:1], content_hash)
+            self._deferred_annotations = functools.partial(
+                self.publish_check_batches, check_run, data, split_annotations, batches[1:], content_hash
+            )
+            logger.debug(f'deferred publishing {len(batches) - 1} batches of annotations')
+        else:
+            check_run = self.publish_check_batches(check_run, data, split_annotations, batches, content_hash)
+
+        return data.with_check_url(check_run.html_url)
+
+    def write_dry_run_check(self, data: PublishData):
+        # the check run as it would be created with all annotations at once
+        check_run = dict(
+            name=self._settings.check_name,
+            head_sha=self._settings.commit,
+            status='completed',
+            conclusion=data.conclusion,
+            output=dict(
+                title=data.title,
+                summary=data.summary_with_digest,
+                annotations=[annotation.to_dict() for annotation in data.annotations]
+            )
+        )
+        path = os.path.join(self._settings.dry_run_directory, 'check-run.json')
+        with open(path, 'wt', encoding='utf-8') as w:
+            json.dump(check_run, w, ensure_ascii=False, indent=2)
+        logger.info(f'Wrote check run to {path}')
+
+    def get_checkpointed_check_run(self, content_hash: str, batches: int) -> Tuple[Optional[CheckRun], int]:
+        """
+        Returns the check run and the index of the next batch of annotations to publish
+        as recorded in the annotations checkpoint file, or (None, 0) if publishing has to start from scratch.
+        """
+        checkpoint = load_annotations_checkpoint(self._settings.annotations_checkpoint_file)
+        if checkpoint is None:
+            return None, 0
+        if not checkpoint.matches(self._settings.repo, self._settings.check_name, self._settings.commit, content_hash, batches):
+            logger.debug('annotations checkpoint belongs to a different check run, ignoring')
+            return None, 0
+
+        try:
+            check_run = self._repo.get_check_run(checkpoint.check_run_id)
+        except GithubException as e:
+            logger.warning(f'Failed to get check run {checkpoint.check_run_id} of annotations checkpoint: {str(e)}')
+            return None, 0
+
+        if not checkpoint.complete:
+            logger.info(f'Resuming publishing annotations to check {check_run.html_url} '
+                        f'after {checkpoint.batch + 1} of {checkpoint.batches} batches')
+        return check_run, checkpoint.batch + 1
+
+    def save_annotations_checkpoint(self, check_run: CheckRun, content_hash: str, batch: int, batches: int):
+        checkpoint = AnnotationsCheckpoint(
+            repo=self._settings.repo,
+            check_name=self._settings.check_name,
+            commit=self._settings.commit,
+            content_hash=content_hash,
+            check_run_id=check_run.id,
+            batch=batch,
+            batches=batches
+        )
+        save_annotations_checkpoint(self._settings.annotations_checkpoint_file, checkpoint)
+
+    def publish_check_batches(self,
+                              check_run: Optional[CheckRun],
+                              data: PublishData,
+                              split_annotations: List[List[Mapping[str, Any]]],
+                              batches: range,
+                              content_hash: Optional[str]) -> CheckRun:
+        for batch in batches:
+            annotations = split_annotations[batch]
             output = dict(
                 title=data.title,
                 summary=data.summary_with_digest,
                 annotations=annotations
             )
+            # the content hash is only set with the last batch, so that incompletely published checks are not skipped
+            external_id = dict(external_id=content_hash) \
+                if content_hash is not None and batch == len(split_annotations) - 1 else {}
+
+            with self._span('publish check run batch', batch=batch, annotations=len(annotations)):
+                if check_run is None:
+                    logger.debug(f'creating check with {len(annotations)} annotations')
+                    check_run = self._repo.create_check_run(name=self._settings.check_name,
+                                                            head_sha=self._settings.commit,
+                                                            status='completed',
+                                                            conclusion=data.conclusion,
+                                                            output=output,
+                                                            **external_id)
+                    logger.info(f'Created check {check_run.html_url}')
+                else:
+                    logger.debug(f'updating check with {len(annotations)} more annotations')
+                    check_run.edit(output=output, **external_id)
+                    logger.debug(f'updated check')
 
-            if check_run is None:
-                logger.debug(f'creating check with {len(annotations)} annotations')
-                check_run = self._repo.create_check_run(name=self._settings.check_name,
-                                                        head_sha=self._settings.commit,
-                                                        status='completed',
-                                                        conclusion=data.conclusion,
-                                                        output=output)
-                logger.info(f'Created check {check_run.html_url}')
-            else:
-                logger.debug(f'updating check with {len(annotations)} more annotations')
-                check_run.edit(output=output)
-                logger.debug(f'updated check')
+            if self._settings.annotations_checkpoint_file:
+                self.save_annotations_checkpoint(check_run, content_hash, batch, len(split_annotations))
 
-        return data.with_check_url(check_run.html_url)
+        return check_run
+
+    def publish_deferred_annotations(self):
+        deferred, self._deferred_annotations = self._deferred_annotations, None
+        if deferred is not None:
+            deferred()
+            logger.info('Added deferred annotations to check')
+
+    @staticmethod
+    def get_check_run_content_hash(check_name: str, data: PublishData) -> str:
+        content = dict(name=check_name, conclusion=data.conclusion, title=data.title,
+                       summary=data.summary_with_digest, annotations=[annotation.to_dict() for annotation in data.annotations])
+        # the json module encodes the same content always the same way, other than the JSON backends in jsoncodec
+        encoded = json.dumps(content, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode('utf-8')
+        return f'sha256:{hashlib.sha256(encoded).hexdigest()}'
 
     def publish_json(self, data: PublishData):
         if self._settings.json_file:
             try:
                 with open(self._settings.json_file, 'wt', encoding='utf-8') as w:
-                    self.write_json(data, w, self._settings)
+                    # API requests made after writing the file are not contained
+                    api = self._instrumentation.to_dict() if self._instrumentation is not None else None
+                    phases = self._profiler.to_dict() if self._profiler is not None else None
+                    self.write_json(data, w, self._settings, api, phases)
             except Exception as e:
                 self._gha.error(f'Failed to write JSON file {self._settings.json_file}: {str(e)}')
                 try:
@@ -485,31 +1009,82 @@ class Publisher:
                 except:
                     pass
 
+        if self._settings.json_cases_file and data.cases:
+            try:
+                # appending allows to collect test case results of multiple jobs in one file
+                with open(self._settings.json_cases_file, 'at', encoding='utf-8') as w:
+                    self.write_json_cases(data.cases, w, self._settings)
+            except Exception as e:
+                self._gha.error(f'Failed to write JSON Lines file {self._settings.json_cases_file}: {str(e)}')
+
         # provide a reduced version to Github actions
         self._gha.add_to_output('json', json.dumps(data.to_reduced_dict(self._settings.json_thousands_separator), ensure_ascii=False))
 
     @staticmethod
-    def write_json(data: PublishData, writer, settings: Settings):
-        json.dump(data.to_dict(
+    def write_json(data: PublishData, writer, settings: Settings,
+                   api: Optional[Mapping[str, Any]] = None,
+                   phases: Optional[Mapping[str, Any]] = None):
+        d = data.to_streamed_dict(
             settings.json_thousands_separator,
             settings.json_suite_details,
             settings.json_test_case_results
-        ), writer, ensure_ascii=False, indent=2)
+        )
+        extras = [(key, value) for key, value in [('api', api), ('phases', phases)] if value is not None]
+        if extras:
+            d = StreamedDict(list(d.items) + extras)
+        jsonstream.dump(d, writer)
+
+    @staticmethod
+    def write_json_cases(cases: UnitTestCaseResults, writer, settings: Settings):
+        # one JSON object per line and test case run
+        for (file_name, class_name, test_name), states in cases.items():
+            for state, state_cases in states.items():
+                for case in state_cases:
+                    line = {k: v for k, v in [('commit', settings.commit),
+                                              ('file_name', file_name),
+                                              ('class_name', class_name),
+                                              ('test_name', test_name),
+                                              ('state', state),
+                                              ('result', case.result),
+                                              ('result_file', case.result_file),
+                                              ('time', case.time),
+                                              ('message', case.message if settings.json_cases_messages else None)]
+                            if v is not None}
+                    writer.write(jsoncodec.dumps(line))
+                    writer.write('\n')
+
+    def publish_arrow(self, data: PublishData):
+        files = [(self._settings.arrow_file, data.cases, arrow.write_cases),
+                 (self._settings.arrow_suites_file, data.stats.suite_details, arrow.write_suites)]
+        for path, values, write in files:
+            if path and values is not None:
+                try:
+                    write(values, path, self._settings.arrow_format, self._settings.commit)
+                except ImportError as e:
+                    self._gha.error(f'Writing Arrow file {path} requires the pyarrow package: {str(e)}')
+                except Exception as e:
+                    self._gha.error(f'Failed to write Arrow file {path}: {str(e)}')
 
     def publish_job_summary(self, title: str, data: PublishData):
         title = title
         stats_with_delta = data.stats_with_delta if data.stats_with_delta is not None else data.stats
         details_url = data.check_url
-        summary = get_long_summary_md(stats_with_delta, details_url)
-        markdown = f'## {title}\n{summary}'
+        heading = f'## {title}\n'
+        summary = get_long_summary_md(stats_with_delta, details_url, max_bytes=max_job_summary_bytes - len(heading.encode('utf8')))
+        markdown = f'{heading}{summary}'
         self._gha.add_to_job_summary(markdown)
         logger.info(f'Created job summary')
 
-    @staticmethod
-    def get_test_lists_from_check_run(check_run: Optional[CheckRun]) -> Tuple[Optional[List[str]], Optional[List[str]]]:
+    @memoized_read(key=lambda check_run: check_run.id if check_run is not None else None)
+    def get_test_lists_from_check_run(self, check_run: Optional[CheckRun]) -> Tuple[Optional[List[str]], Optional[List[str]]]:
         if check_run is None:
             return None, None
 
+        annotations = list(check_run.get_annotations())
+        return Publisher.get_test_lists_from_annotations(annotations)
+
+    @staticmethod
+    def get_test_lists_from_annotations(annotations: List[CheckRunAnnotation]) -> Tuple[Optional[List[str]], Optional[List[str]]]:
         all_tests_title_regexp = re.compile(r'^\d+ test(s)? found( \(test \d+ to \d+\))?$')
         skipped_tests_title_regexp = re.compile(r'^\d+ skipped test(s)? found( \(test \d+ to \d+\))?$')
 
@@ -522,7 +1097,6 @@ class Publisher:
             r'(There are \d+ skipped tests, see "Raw output" for the full list of skipped tests)|'
             r'(There are \d+ skipped tests, see "Raw output" for the list of skipped tests \d+ to \d+)\.$')
 
-        annotations = list(check_run.get_annotations())
         all_tests_list = Publisher.get_test_list_from_annotations(annotations, all_tests_title_regexp, all_tests_message_regexp)
         skipped_tests_list = Publisher.get_test_list_from_annotations(annotations, skipped_tests_title_regexp, skipped_tests_message_regexp)
 
@@ -562,6 +1136,7 @@ class Publisher:
                         cases: Optional[UnitTestCaseResults] = None):
         # compare them with earlier stats
         base_check_run = None
+        base_results = None
         if self._settings.compare_earlier and self._settings.check_run:
             base_commit_sha = self.get_base_commit_sha(pull_request)
             if stats.commit == base_commit_sha:
@@ -569,17 +1144,26 @@ class Publisher:
                 # that would overwrite earlier comments without change stats
                 return pull_request
             logger.debug(f'comparing against base={base_commit_sha}')
-            base_check_run = self.get_check_run(base_commit_sha)
-        base_stats = self.get_stats_from_check_run(base_check_run) if base_check_run is not None else None
+            base_results = self.get_stored_results(base_commit_sha) if self._store is not None else None
+            if base_results is None:
+                base_check_run = self.get_check_run(base_commit_sha)
+
+        # gather stats and test lists from results store or check run
+        if base_results is not None:
+            base_stats = base_results.stats
+            before_all_tests, before_skipped_tests = base_results.all_tests, base_results.skipped_tests
+        else:
+            base_stats = self.get_stats_from_check_run(base_check_run) if base_check_run is not None else None
+            before_all_tests, before_skipped_tests = self.get_test_lists_from_check_run(base_check_run)
+            if self._store is not None and base_stats is not None:
+                self.store_results(base_commit_sha, StoredResults(base_stats, before_all_tests, before_skipped_tests))
         stats_with_delta = get_stats_delta(stats, base_stats, 'base') if base_stats is not None else stats
         logger.debug(f'stats with delta: {stats_with_delta}')
 
-        # gather test lists from check run and cases
-        before_all_tests, before_skipped_tests = self.get_test_lists_from_check_run(base_check_run)
-        all_tests, skipped_tests = get_all_tests_list(cases), get_skipped_tests_list(cases)
-        # 'before' test names are retrieved from check runs, which have restricted unicode
-        # so we have to apply the same restriction to the test names retrieved from cases, so that they match
-        all_tests, skipped_tests = restrict_unicode_list(all_tests), restrict_unicode_list(skipped_tests)
+        # gather test lists from cases, only once for all pull requests
+        get_test_lists = functools.partial(get_restricted_test_lists, cases)
+        all_tests, skipped_tests = get_test_lists() if vars(self).get('_reads') is None else \
+            self._read(('get_restricted_test_lists', id(cases)), get_test_lists)
         test_changes = SomeTestChanges(before_all_tests, all_tests, before_skipped_tests, skipped_tests)
 
         latest_comment = self.get_latest_comment(pull_request)
@@ -591,16 +1175,53 @@ class Publisher:
             logger.info(f'No pull request comment required as comment mode is {self._settings.comment_mode} (comment_mode)')
             return
 
-        summary = get_long_summary_with_digest_md(stats_with_delta, stats, details_url, test_changes, self._settings.test_changes_limit)
-        body = f'## {title}\n{summary}'
+        heading = f'## {title}\n'
+        summary = get_long_summary_with_digest_md(stats_with_delta, stats, details_url, test_changes, self._settings.test_changes_limit,
+                                                  max_bytes=max_comment_bytes - len(heading.encode('utf8')))
+        body = f'{heading}{summary}'
 
-        # only create new comment none exists already
-        if latest_comment is None:
+        # only create new comment if none exists already or the existing one could not be edited
+        if latest_comment is None or not self.reuse_comment(latest_comment, body):
             comment = pull_request.create_issue_comment(body)
             logger.info(f'Created comment for pull request #{pull_request.number}: {comment.html_url}')
-        else:
-            self.reuse_comment(latest_comment, body)
-            logger.info(f'Edited comment for pull request #{pull_request.number}: {latest_comment.html_url}')
+
+    def publish_dry_run_comment(self,
+                                title: str,
+                                stats: UnitTestRunResults,
+                                details_url: Optional[str] = None,
+                                cases: Optional[UnitTestCaseResults] = None):
+        # without access to the GitHub API, we can only comment on the pull request of the event,
+        # and compare against results of the base commit in the results store
+        if get_json_path(self._settings.event, 'pull_request.number') is None:
+            logger.info('Dry run for an event without pull request, no comment written')
+            return
+
+        base_results = None
+        if self._settings.compare_earlier and self._settings.check_run:
+            base_commit_sha = get_json_path(self._settings.event, 'pull_request.base.sha')
+            base_ref = get_json_path(self._settings.event, 'pull_request.base.ref')
+            if self._settings.workspace and base_ref:
+                base_commit_sha = get_merge_base(self._settings.workspace,
+                                                 [f'refs/remotes/origin/{base_ref}', base_commit_sha],
+                                                 self._settings.commit) or base_commit_sha
+            base_results = self.get_stored_results(base_commit_sha) if base_commit_sha != stats.commit else None
+
+        base_stats = base_results.stats if base_results is not None else None
+        stats_with_delta = get_stats_delta(stats, base_stats, 'base') if base_stats is not None else stats
+        all_tests, skipped_tests = get_restricted_test_lists(cases) if cases is not None else (None, None)
+        test_changes = SomeTestChanges(base_results.all_tests, all_tests, base_results.skipped_tests, skipped_tests) \
+            if base_results is not None else None
+        if not self.require_comment(stats_with_delta, None):
+            logger.info(f'No pull request comment required as comment mode is {self._settings.comment_mode} (comment_mode)')
+            return
+
+        heading = f'## {title}\n'
+        summary = get_long_summary_with_digest_md(stats_with_delta, stats, details_url, test_changes, self._settings.test_changes_limit,
+                                                  max_bytes=max_comment_bytes - len(heading.encode('utf8')))
+        path = os.path.join(self._settings.dry_run_directory, 'comment.md')
+        with open(path, 'wt', encoding='utf-8') as w:
+            w.write(f'{heading}{summary}')
+        logger.info(f'Wrote comment for pull request #{get_json_path(self._settings.event, "pull_request.number")} to {path}')
 
     def require_comment(self,
                         stats: UnitTestRunResultsOrDeltaResults,
@@ -681,6 +1302,7 @@ class Publisher:
 
         return False
 
+    @memoized_read(key=lambda pull: pull.number)
     def get_latest_comment(self, pull: PullRequest) -> Optional[IssueComment]:
         # get comments of this pull request
         comments = self.get_pull_request_comments(pull, order_by_updated=True)
@@ -696,16 +1318,26 @@ class Publisher:
         comment_id = comments[-1].get("databaseId")
         return pull.get_issue_comment(comment_id)
 
-    def reuse_comment(self, comment: IssueComment, body: str):
+    def reuse_comment(self, comment: IssueComment, body: str) -> bool:
+        """Edits the comment to hold the body, returns False if that failed."""
         if ':recycle:' not in body:
             body = f'{body}\n:recycle: This comment has been updated with latest results.'
 
+        if comment.body == body:
+            # e.g. re-runs of a workflow
+            logger.info(f'Comment has not changed: {comment.html_url}')
+            return True
+
         try:
             comment.edit(body)
         except Exception as e:
-            self._gha.warning(f'Failed to edit existing comment #{comment.id}')
+            self._gha.warning(f'Failed to edit existing comment #{comment.id}, creating a new comment')
             logger.debug('editing existing comment failed', exc_info=e)
+            return False
+        logger.info(f'Edited comment: {comment.html_url}')
+        return True
 
+    @memoized_read(key=lambda pull_request: pull_request.number)
     def get_base_commit_sha(self, pull_request: PullRequest) -> Optional[str]:
         if self._settings.pull_request_build == pull_request_build_mode_merge:
             if self._settings.event:
@@ -718,8 +1350,18 @@ class Publisher:
                 if self._settings.event_name == 'workflow_run':
                     return None
 
+        # we always fall back to where the branch merged off base ref
+        if self._settings.workspace:
+            # the git checkout in the workspace usually knows the base ref and the commit,
+            # which saves comparing them via the GitHub API
+            merge_base = get_merge_base(self._settings.workspace,
+                                        [f'refs/remotes/origin/{pull_request.base.ref}', pull_request.base.sha],
+                                        self._settings.commit)
+            if merge_base is not None:
+                logger.debug(f'found best common ancestor {merge_base} of {pull_request.base.ref} and {self._settings.commit} in workspace')
+                return merge_base
+
         try:
-            # we always fall back to where the branch merged off base ref
             logger.debug(f'comparing {pull_request.base.ref} with {self._settings.commit}')
             compare = self._repo.compare(pull_request.base.ref, self._settings.commit)
             return compare.merge_base_commit.sha
@@ -0,0 +1,161 @@
+import functools
+import threading
+import time
+from typing import Optional, Mapping
+
+from github.Requester import Requester, RequestsResponse, HTTPRequestsConnectionClass, HTTPSRequestsConnectionClass
+
+from publish.cache import HttpCache, HttpCacheEntry
+from publish.instrumentation import ApiInstrumentation
+from publish.scheduler import RequestScheduler
+
+
+def thread_local_attribute(name: str) -> property:
+    return property(lambda self: getattr(self._local, name, None),
+                    lambda self, value: setattr(self._local, name, value))
+
+
+class CachedResponse:
+    # mimics the RequestsResponse of PyGithub
+    def __init__(self, entry: HttpCacheEntry, response: RequestsResponse):
+        self.status = 200
+        # headers of the 304 response carry current rate limit information
+        self.headers = {**entry.headers, **{k.lower(): v for k, v in response.headers.items() if k.lower() != 'content-length'}}
+        self.body = entry.body
+        # the actual response, which is what went over the wire
+        self.response = response.response
+
+    def getheaders(self):
+        return self.headers.items()
+
+    def read(self) -> str:
+        return self.body
+
+
+class RequestsConnection:
+    # PyGithub connections store the request in the connection instance, before sending it in getresponse,
+    # so concurrent threads would send each other's requests; we keep those request attributes thread-local
+    verb = thread_local_attribute('verb')
+    url = thread_local_attribute('url')
+    input = thread_local_attribute('input')
+    headers = thread_local_attribute('headers')
+    stream = thread_local_attribute('stream')
+
+    def __init__(self,
+                 *args,
+                 cache: Optional[HttpCache] = None,
+                 scheduler: Optional[RequestScheduler] = None,
+                 instrumentation: Optional[ApiInstrumentation] = None,
+                 **kwargs):
+        self._local = threading.local()
+        self._cache = cache
+        self._scheduler = scheduler
+        self._instrumentation = instrumentation
+        super().__init__(*args, **kwargs)
+
+    def getresponse(self) -> RequestsResponse:
+        if self._instrumentation is None:
+            return self._getscheduledresponse()
+
+        backoff = self._scheduler.thread_backoff_seconds if self._scheduler else 0.0
+        start = time.monotonic()
+        response = None
+        try:
+            response = self._getscheduledresponse()
+            return response
+        finally:
+            seconds = time.monotonic() - start
+            throttle_seconds = self._local.pacing_seconds + \
+                (self._scheduler.thread_backoff_seconds - backoff if self._scheduler else 0.0)
+            self._instrumentation.record(self.verb, self.url, self.input,
+                                         status=response.status if response is not None else None,
+                                         seconds=max(0.0, seconds - throttle_seconds),
+                                         retries=self.get_retries(response),
+                                         throttle_seconds=throttle_seconds,
+                                         bytes_received=self.get_bytes_received(response))
+
+    def _getscheduledresponse(self) -> RequestsResponse:
+        self._local.pacing_seconds = 0.0
+        if self._scheduler is None:
+            return self._getresponse()
+
+        self._local.pacing_seconds = self._scheduler.acquire(self.verb, self.url)
+        response = self._getresponse()
+        # only a 403 response body is needed to tell rate limits from missing permissions
+        body = response.read() if response.status == 403 else None
+        self._scheduler.update(self.verb, self.url, response.status, response.headers, body)
+        return response
+
+    def _getresponse(self) -> RequestsResponse:
+        if self._cache is None or self.verb != 'GET' or self.stream or \
+                any(header.lower() in ['if-none-match', 'if-modified-since'] for header in self.headers):
+            return super().getresponse()
+
+        headers = {k.lower(): v for k, v in self.headers.items()}
+        key = HttpCache.get_key(f'{self.host}:{self.port}{self.url}', headers.get('accept'), headers.get('authorization'))
+        entry = self._cache.get(key)
+        if entry is not None:
+            self.headers = {**self.headers, 'If-None-Match': entry.etag}
+
+        response = super().getresponse()
+        if entry is not None and response.status == 304:
+            self._cache.hit()
+            return CachedResponse(entry, response)
+
+        self._cache.miss()
+        etag = response.headers.get('ETag')
+        if response.status == 200 and etag:
+            self._cache.put(key, HttpCacheEntry(etag=etag,
+                                                headers={k.lower(): v for k, v in response.headers.items()},
+                                                body=response.read()))
+        return response
+
+    @staticmethod
+    def get_retries(response: Optional[RequestsResponse]) -> int:
+        retries = getattr(getattr(getattr(response, 'response', None), 'raw', None), 'retries', None)
+        return len(retries.history) if retries is not None and retries.history else 0
+
+    def get_bytes_received(self, response: Optional[RequestsResponse]) -> int:
+        response = getattr(response, 'response', None)
+        if response is None:
+            return 0
+        if self.stream:
+            # do not consume streamed content
+            length = response.headers.get('content-length', '')
+            return int(length) if length.isdigit() else 0
+        return len(response.content)
+
+
+class ThreadSafeHTTPRequestsConnectionClass(RequestsConnection, HTTPRequestsConnectionClass):
+    pass
+
+
+class ThreadSafeHTTPSRequestsConnectionClass(RequestsConnection, HTTPSRequestsConnectionClass):
+    pass
+
+
+def configure_requester(requester: Requester,
+                        cache: Optional[HttpCache] = None,
+                        scheduler: Optional[RequestScheduler] = None,
+                        instrumentation: Optional[ApiInstrumentation] = None) -> Requester:
+    """
+    Allows the given requester to be used by concurrent threads, to cache responses in the given cache,
+    to pace requests by the given scheduler, and to record requests in the given instrumentation.
+    All threads share the same connection pool.
+    """
+    # there is no public API to set the connection class of a single requester instance
+    connection_class = ThreadSafeHTTPSRequestsConnectionClass \
+        if requester.scheme == 'https' else ThreadSafeHTTPRequestsConnectionClass
+    requester._Requester__connectionClass = functools.partial(connection_class,
+                                                                cache=cache,
+                                                                scheduler=scheduler,
+                                                                instrumentation=instrumentation)
+    requester._Requester__connection = None
+
+    # the requester iterates over the time of the last request per verb to defer the next request,
+    # adding verbs while another thread iterates would fail that thread
+    last_requests = requester._Requester__last_requests
+    for verb in ['HEAD', 'GET', 'POST', 'PATCH', 'PUT', 'DELETE']:
+        last_requests.setdefault(verb, 0.0)
+
+    return requester
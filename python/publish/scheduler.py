@@ -0,0 +1,205 @@
+import json
+import random
+import threading
+import time
+from typing import Optional, Mapping, Any, Callable
+
+from github.GithubRetry import GithubRetry
+from github.Requester import Requester
+
+from publish import logger
+
+# GitHub recommends to wait at least one second between write requests
+# https://docs.github.com/en/rest/using-the-rest-api/best-practices-for-using-the-rest-api#pause-between-mutative-requests
+min_seconds_between_writes = 1.0
+# GitHub allows for 900 points per minute, where a read request costs one point
+# https://docs.github.com/en/rest/using-the-rest-api/rate-limits-for-the-rest-api#about-secondary-rate-limits
+min_seconds_between_reads = 60.0 / 900
+# pace requests by the remaining primary rate limit once less than this fraction is left
+rate_limit_reserve = 0.1
+# pacing by the remaining primary rate limit waits at most this factor of the configured seconds between requests
+max_rate_limit_pacing_factor = 2.0
+
+
+class TokenBucket:
+    """
+    Provides one token every interval seconds, holding at most capacity tokens.
+    Reserving a token returns the number of seconds to wait until that token is available.
+    """
+
+    def __init__(self, interval: float, capacity: float = 1.0, clock: Callable[[], float] = time.monotonic):
+        self.interval = interval
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+
+    def reserve(self) -> float:
+        now = self._clock()
+        if self.interval > 0:
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) / self.interval)
+        else:
+            self._tokens = self.capacity
+        self._updated = now
+        self._tokens -= 1
+        return max(0.0, -self._tokens * self.interval)
+
+
+class RequestScheduler:
+    """
+    Paces requests to the GitHub API by the rate limit signals of its responses.
+
+    Reads and writes are paced by token buckets, starting with the given seconds between requests.
+    Every response that does not signal a rate limit shortens the interval towards the minimum that GitHub allows,
+    every rate limit signal sets the interval back to the given seconds. When the primary rate limit runs low,
+    the remaining requests are spread until the rate limit resets, waiting at most twice the given seconds,
+    and when it is exhausted, requests wait for that reset.
+
+    The clock provides seconds since the epoch, as the rate limit reset is given in those.
+    """
+
+    def __init__(self,
+                 seconds_between_reads: float,
+                 seconds_between_writes: float,
+                 speedup: float = 0.8,
+                 jitter: float = 0.25,
+                 clock: Callable[[], float] = time.time,
+                 sleep: Callable[[float], None] = time.sleep):
+        self._seconds_between = dict(read=seconds_between_reads, write=seconds_between_writes)
+        self._min_seconds_between = dict(read=min(seconds_between_reads, min_seconds_between_reads),
+                                         write=min(seconds_between_writes, min_seconds_between_writes))
+        self._buckets = dict(read=TokenBucket(seconds_between_reads, clock=clock),
+                             write=TokenBucket(seconds_between_writes, clock=clock))
+        self._budget_interval = 0.0
+        self._not_before = 0.0
+        self._speedup = speedup
+        self._jitter = jitter
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        self.requests = 0
+        self.throttled = 0
+        self.pacing_seconds = 0.0
+        self.backoff_seconds = 0.0
+
+    @staticmethod
+    def get_kind(verb: str, url: str) -> str:
+        # GraphQL queries are POST requests, but read
+        return 'read' if verb in ['GET', 'HEAD'] or url.endswith('/graphql') else 'write'
+
+    def interval(self, kind: str) -> float:
+        return self._buckets[kind].interval
+
+    @property
+    def waiting_seconds(self) -> float:
+        return self.pacing_seconds + self.backoff_seconds
+
+    @property
+    def thread_backoff_seconds(self) -> float:
+        # retries back off in the thread that sends the request
+        return getattr(self._local, 'backoff_seconds', 0.0)
+
+    def acquire(self, verb: str, url: str) -> float:
+        kind = self.get_kind(verb, url)
+        with self._lock:
+            self.requests += 1
+            wait = max(self._buckets[kind].reserve(), self._not_before - self._clock())
+            self.pacing_seconds += wait
+        if wait > 0:
+            logger.debug(f'waiting {wait:.3f}s before {verb} request')
+            self._sleep(wait)
+        return wait
+
+    @staticmethod
+    def is_rate_limited(status: int, headers: Mapping[str, Any], body: Optional[str]) -> bool:
+        if status == 429 or 'retry-after' in headers:
+            return True
+        if status != 403:
+            return False
+        # 403 also signals missing permissions or bad credentials, which are not rate limits
+        if str(headers.get('x-ratelimit-remaining')) == '0':
+            return True
+        try:
+            message = json.loads(body).get('message') if body else None
+        except (ValueError, AttributeError):
+            message = body
+        return Requester.isRateLimitError(message)
+
+    def update(self, verb: str, url: str, status: int, headers: Mapping[str, Any], body: Optional[str] = None):
+        kind = self.get_kind(verb, url)
+        headers = {k.lower(): v for k, v in headers.items()}
+        with self._lock:
+            self._update_rate_limit(headers)
+            if self.is_rate_limited(status, headers, body):
+                self._throttle(kind)
+            else:
+                bucket = self._buckets[kind]
+                bucket.interval = max(self._min_seconds_between[kind], self._get_budget_interval(kind), bucket.interval * self._speedup)
+
+    def _update_rate_limit(self, headers: Mapping[str, Any]):
+        remaining, limit, reset = (headers.get(f'x-ratelimit-{name}') for name in ['remaining', 'limit', 'reset'])
+        if not all(value is not None and str(value).isdigit() for value in [remaining, limit, reset]):
+            return
+        remaining, limit, reset = int(remaining), int(limit), int(reset)
+        seconds_to_reset = max(0.0, reset - self._clock())
+
+        if remaining == 0:
+            # plus 1s as it is not clear when in that second the reset occurs
+            self._not_before = self._clock() + seconds_to_reset + 1
+            logger.info(f'GitHub API rate limit exhausted, waiting {seconds_to_reset + 1:.0f}s for reset')
+        elif remaining < limit * rate_limit_reserve:
+            self._budget_interval = seconds_to_reset / remaining
+        else:
+            self._budget_interval = 0.0
+
+    def _get_budget_interval(self, kind: str) -> float:
+        # spreading the remaining requests must not stall the action for long
+        return min(self._budget_interval, self._seconds_between[kind] * max_rate_limit_pacing_factor)
+
+    def _throttle(self, kind: str):
+        self.throttled += 1
+        bucket = self._buckets[kind]
+        bucket.interval = max(bucket.interval, self._seconds_between[kind], self._get_budget_interval(kind))
+
+    def backoff(self, verb: Optional[str], url: Optional[str], seconds: float):
+        kind = self.get_kind(verb or 'GET', url or '')
+        wait = seconds * (1 + random.uniform(0, self._jitter))
+        with self._lock:
+            self._throttle(kind)
+            self.backoff_seconds += wait
+        self._local.backoff_seconds = self.thread_backoff_seconds + wait
+        logger.debug(f'backing off {wait:.3f}s before retrying {verb} request')
+        self._sleep(wait)
+
+    def log_stats(self):
+        logger.info(f'Waited {self.waiting_seconds:.1f}s for {self.requests} GitHub API requests '
+                    f'({self.pacing_seconds:.1f}s pacing, {self.backoff_seconds:.1f}s backing off after {self.throttled} rate limits)')
+
+
+class ScheduledRetry(GithubRetry):
+    """
+    A GithubRetry that also retries 429 responses and backs off with jitter through the RequestScheduler.
+    """
+
+    def __init__(self, scheduler: Optional[RequestScheduler] = None, **kwargs: Any):
+        self.scheduler = scheduler
+        kwargs["status_forcelist"] = kwargs.get("status_forcelist", list(range(500, 600))) + [429]
+        super().__init__(**kwargs)
+
+    def new(self, **kw: Any) -> 'ScheduledRetry':
+        kw.update(scheduler=self.scheduler)
+        return super().new(**kw)
+
+    def sleep(self, response=None):
+        backoff = self.get_retry_after(response) if self.respect_retry_after_header and response else None
+        if backoff is None:
+            backoff = self.get_backoff_time()
+        if self.scheduler is None:
+            if backoff > 0:
+                time.sleep(backoff)
+            return
+
+        last = self.history[-1] if self.history else None
+        self.scheduler.backoff(last.method if last else None, last.url if last else None, backoff)
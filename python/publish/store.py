@@ -0,0 +1,144 @@
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, List, Tuple, Dict, Any, Mapping
+
+import humanize
+
+from publish import logger, get_digest_from_stats, get_stats_from_digest
+from publish.unittestresults import UnitTestRunResults
+
+default_results_store_size = 32 * 1024 * 1024
+results_store_version = 1
+
+ResultsStoreKey = Tuple[str, str, str]
+
+
+@dataclass(frozen=True)
+class StoredResults:
+    stats: Optional[UnitTestRunResults]
+    # test lists as read from the check run annotations, None if the check run has no such annotations
+    all_tests: Optional[List[str]]
+    skipped_tests: Optional[List[str]]
+
+    @property
+    def size(self) -> int:
+        digest = get_digest_from_stats(self.stats) if self.stats is not None else ''
+        return len(digest) + sum(len(test) for tests in [self.all_tests, self.skipped_tests] if tests for test in tests)
+
+    def to_dict(self) -> Dict[str, Any]:
+        # stats are stored as the digest written into check run summaries
+        return dict(digest=get_digest_from_stats(self.stats) if self.stats is not None else None,
+                    all_tests=self.all_tests, skipped_tests=self.skipped_tests)
+
+    @staticmethod
+    def from_dict(entry: Mapping[str, Any]) -> 'StoredResults':
+        digest = entry.get('digest')
+        return StoredResults(stats=get_stats_from_digest(digest) if digest is not None else None,
+                             all_tests=entry.get('all_tests'), skipped_tests=entry.get('skipped_tests'))
+
+
+class ResultsStore:
+    """
+    Stores the stats and test lists of commits, which are otherwise read from the check runs of those commits.
+    Results of a commit do not change, so stored results of reference commits (e.g. the base commit of a pull request)
+    do not need to be read from the GitHub API again.
+    Results are keyed by repository, check name and commit.
+    The least recently used entries are evicted when the store exceeds max_size bytes.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_size: int = default_results_store_size):
+        self._path = path
+        self._max_size = max_size
+        self._entries: OrderedDict[ResultsStoreKey, StoredResults] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: ResultsStoreKey) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def get(self, key: ResultsStoreKey) -> Optional[StoredResults]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: ResultsStoreKey, entry: StoredResults):
+        with self._lock:
+            self._put(key, entry)
+
+    def _put(self, key: ResultsStoreKey, entry: StoredResults):
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._size -= previous.size
+        if entry.size > self._max_size:
+            return
+        self._entries[key] = entry
+        self._size += entry.size
+
+        # evict least recently used entries
+        while self._size > self._max_size:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= evicted.size
+
+    def load(self) -> 'ResultsStore':
+        if self._path is None or not os.path.exists(self._path):
+            return self
+
+        try:
+            with open(self._path, 'rt', encoding='utf-8') as r:
+                store = json.load(r)
+            if store.get('version') != results_store_version:
+                logger.info(f'Ignoring results store file {self._path} of unsupported version {store.get("version")}')
+                return self
+            with self._lock:
+                for key, entry in store.get('entries', []):
+                    self._put(tuple(key), StoredResults.from_dict(entry))
+            logger.debug(f'loaded results of {len(self._entries)} commits from results store file {self._path}')
+        except Exception as e:
+            logger.warning(f'Failed to load results store file {self._path}: {str(e)}')
+            logger.debug('loading results store file failed', exc_info=e)
+        return self
+
+    def save(self):
+        if self._path is None:
+            return
+
+        try:
+            with self._lock:
+                store = dict(version=results_store_version,
+                             entries=[(list(key), entry.to_dict()) for key, entry in self._entries.items()])
+            # write atomically, so that a failing save does not corrupt an existing store file
+            tmp_path = f'{self._path}.tmp'
+            with open(tmp_path, 'wt', encoding='utf-8') as w:
+                json.dump(store, w, ensure_ascii=False)
+            os.replace(tmp_path, self._path)
+            logger.debug(f'saved results of {len(self._entries)} commits to results store file {self._path}')
+        except Exception as e:
+            logger.warning(f'Failed to save results store file {self._path}: {str(e)}')
+            logger.debug('saving results store file failed', exc_info=e)
+
+    def log_stats(self):
+        requests = self.hits + self.misses
+        if requests == 0 and not logger.isEnabledFor(logging.DEBUG):
+            return
+        hit_rate = self.hits / requests if requests else 0.0
+        logger.info(f'Results store: {self.hits} of {requests} reference commits found ({hit_rate:.0%}), '
+                    f'results of {len(self._entries)} commits stored in {humanize.naturalsize(self._size, binary=True)}')
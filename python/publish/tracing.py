@@ -0,0 +1,198 @@
+import contextlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, List, Iterator, Callable, Mapping
+
+from publish import __version__, trace_format_otlp, trace_format_chrome
+
+# span kinds and status codes of OpenTelemetry
+span_kind_internal = 1
+span_kind_client = 3
+status_code_error = 2
+
+
+@dataclass
+class Span:
+    name: str
+    span_id: str
+    parent_span_id: Optional[str]
+    start_ns: int
+    end_ns: Optional[int] = None
+    kind: int = span_kind_internal
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+    thread_id: int = 0
+    thread_name: str = ''
+
+    def set_attribute(self, key: str, value: Any):
+        if value is not None:
+            self.attributes[key] = value
+
+
+def get_otlp_value(value: Any) -> Dict[str, Any]:
+    # bool is an int, so it has to be tested first
+    if isinstance(value, bool):
+        return dict(boolValue=value)
+    if isinstance(value, int):
+        # 64-bit integers are strings in OTLP JSON
+        return dict(intValue=str(value))
+    if isinstance(value, float):
+        return dict(doubleValue=value)
+    return dict(stringValue=str(value))
+
+
+def get_otlp_attributes(attributes: Mapping[str, Any]) -> List[Dict[str, Any]]:
+    return [dict(key=key, value=get_otlp_value(value)) for key, value in attributes.items()]
+
+
+class Tracer:
+    """
+    Records spans of an action run, e.g. phases, parsing individual files, and GitHub API requests.
+    Spans nest within a thread, spans without a parent in their thread are children of the root span,
+    which starts with the tracer and ends when the trace is written.
+
+    The trace is written in the OTLP JSON format, as read by the otlpjsonfile receiver of the OpenTelemetry collector,
+    or in the Chrome trace event format, as read by chrome://tracing or https://ui.perfetto.dev.
+    """
+
+    def __init__(self,
+                 name: str,
+                 attributes: Optional[Mapping[str, Any]] = None,
+                 clock: Callable[[], int] = time.time_ns):
+        self._clock = clock
+        self._resource = {key: value for key, value in (attributes or {}).items() if value is not None}
+        self._spans: List[Span] = []
+        self._threads: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.trace_id = os.urandom(16).hex()
+        self.root = self._start(name, span_kind_internal, {}, None)
+
+    def _stack(self) -> List[Span]:
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def _start(self, name: str, kind: int, attributes: Mapping[str, Any], parent: Optional[Span], start_ns: Optional[int] = None) -> Span:
+        thread = threading.current_thread()
+        with self._lock:
+            thread_id = self._threads.setdefault(thread.ident, len(self._threads) + 1)
+        span = Span(name=name,
+                    span_id=os.urandom(8).hex(),
+                    parent_span_id=parent.span_id if parent is not None else None,
+                    start_ns=start_ns if start_ns is not None else self._clock(),
+                    kind=kind,
+                    thread_id=thread_id,
+                    thread_name=thread.name)
+        for key, value in attributes.items():
+            span.set_attribute(key, value)
+        return span
+
+    def _end(self, span: Span, end_ns: Optional[int] = None):
+        span.end_ns = end_ns if end_ns is not None else self._clock()
+        with self._lock:
+            self._spans.append(span)
+
+    @contextlib.contextmanager
+    def span(self, name: str, kind: int = span_kind_internal, **attributes) -> Iterator[Span]:
+        stack = self._stack()
+        span = self._start(name, kind, attributes, stack[-1] if stack else self.root)
+        stack.append(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f'{type(e).__name__}: {e}'
+            raise
+        finally:
+            stack.pop()
+            self._end(span)
+
+    def record(self,
+               name: str,
+               seconds: float,
+               kind: int = span_kind_internal,
+               error: Optional[str] = None,
+               **attributes):
+        """Records a span that ended just now and lasted the given seconds."""
+        end_ns = self._clock()
+        stack = self._stack()
+        span = self._start(name, kind, attributes, stack[-1] if stack else self.root, start_ns=end_ns - int(seconds * 1e9))
+        span.error = error
+        self._end(span, end_ns)
+
+    @property
+    def spans(self) -> List[Span]:
+        """Returns the root span and all ended spans, ordered by their start time."""
+        with self._lock:
+            spans = list(self._spans)
+        return sorted([self.root] + spans, key=lambda span: span.start_ns)
+
+    def to_otlp(self) -> Dict[str, Any]:
+        def to_dict(span: Span) -> Dict[str, Any]:
+            d = dict(
+                traceId=self.trace_id,
+                spanId=span.span_id,
+                parentSpanId=span.parent_span_id,
+                name=span.name,
+                kind=span.kind,
+                startTimeUnixNano=str(span.start_ns),
+                endTimeUnixNano=str(span.end_ns if span.end_ns is not None else self._clock()),
+                attributes=get_otlp_attributes(dict(span.attributes, **{'thread.id': span.thread_id, 'thread.name': span.thread_name})),
+                status=dict(code=status_code_error, message=span.error) if span.error is not None else {},
+            )
+            return {k: v for k, v in d.items() if v is not None}
+
+        return dict(resourceSpans=[dict(
+            resource=dict(attributes=get_otlp_attributes(self._resource)),
+            scopeSpans=[dict(
+                scope=dict(name='publish', version=__version__),
+                spans=[to_dict(span) for span in self.spans]
+            )]
+        )])
+
+    def to_chrome(self) -> Dict[str, Any]:
+        pid = os.getpid()
+        spans = self.spans
+        start_ns = self.root.start_ns
+        threads = {span.thread_id: span.thread_name for span in spans}
+
+        def to_event(span: Span) -> Dict[str, Any]:
+            end_ns = span.end_ns if span.end_ns is not None else self._clock()
+            args = dict(span.attributes)
+            if span.error is not None:
+                args['error'] = span.error
+            return dict(name=span.name,
+                        cat='client' if span.kind == span_kind_client else 'internal',
+                        ph='X',
+                        # timestamps and durations are in microseconds
+                        ts=(span.start_ns - start_ns) / 1000,
+                        dur=(end_ns - span.start_ns) / 1000,
+                        pid=pid,
+                        tid=span.thread_id,
+                        args=args)
+
+        return dict(
+            traceEvents=[dict(name='thread_name', ph='M', pid=pid, tid=thread_id, args=dict(name=thread_name))
+                         for thread_id, thread_name in sorted(threads.items())] +
+                        [to_event(span) for span in spans],
+            displayTimeUnit='ms',
+            otherData=dict(self._resource, trace_id=self.trace_id, start_time_unix_nano=start_ns),
+        )
+
+    def write(self, path: str, format: str):
+        if self.root.end_ns is None:
+            self.root.end_ns = self._clock()
+        if format == trace_format_otlp:
+            trace = self.to_otlp()
+        elif format == trace_format_chrome:
+            trace = self.to_chrome()
+        else:
+            raise ValueError(f'Unsupported trace format: {format}')
+
+        with open(path, 'wt', encoding='utf-8') as w:
+            # the OTLP JSON file receiver reads one request per line
+            json.dump(trace, w, ensure_ascii=False, separators=(',', ':'))
+            w.write('\n')
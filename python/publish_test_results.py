@@ -18,12 +18,20 @@ import publish.github_action
 from publish import __version__, available_annotations, default_annotations, none_annotations, \
     report_suite_out_log, report_suite_err_log, report_suite_logs, default_report_suite_logs, available_report_suite_logs, \
     pull_request_build_modes, fail_on_modes, fail_on_mode_errors, fail_on_mode_failures, \
-    comment_mode_always, comment_modes, punctuation_space
+    comment_mode_always, comment_modes, punctuation_space, profile_mode_off, profile_mode_cpu, profile_mode_memory, \
+    profile_mode_all, profile_modes, trace_format_otlp, trace_formats, arrow_format_ipc, arrow_formats
+from publish.cache import HttpCache
+from publish.store import ResultsStore
 from publish.github_action import GithubAction
 from publish.junit import JUnitTree, parse_junit_xml_files, parse_junit_xml_file, process_junit_xml_elems, \
     ParsedJUnitFile, progress_safe_parse_xml_file, is_junit
 from publish.progress import progress_logger
 from publish.publisher import Publisher, Settings
+from publish.instrumentation import ApiInstrumentation
+from publish.profiler import PhaseProfiler, ProfileCapture
+from publish.requester import configure_requester
+from publish.scheduler import RequestScheduler, ScheduledRetry
+from publish.tracing import Tracer
 from publish.unittestresults import get_test_results, get_stats, ParsedUnitTestResults, ParsedUnitTestResultsWithCommit, \
     ParseError
 
@@ -47,17 +55,34 @@ def get_github(auth: github.Auth,
                backoff_factor: float,
                seconds_between_requests: Optional[float],
                seconds_between_writes: Optional[float],
-               secondary_rate_wait: float) -> github.Github:
-    retry = github.GithubRetry(total=retries,
+               secondary_rate_wait: float,
+               max_concurrent_requests: int = 1,
+               cache: Optional[HttpCache] = None,
+               scheduler: Optional[RequestScheduler] = None,
+               instrumentation: Optional[ApiInstrumentation] = None) -> github.Github:
+    if scheduler is not None:
+        # the scheduler paces requests instead of fixed seconds between requests
+        seconds_between_requests = None
+        seconds_between_writes = None
+        retry = ScheduledRetry(scheduler=scheduler,
+                               total=retries,
                                backoff_factor=backoff_factor,
                                secondary_rate_wait=secondary_rate_wait)
-    return github.Github(auth=auth,
-                         base_url=url,
-                         per_page=100,
-                         verify=verify,
-                         retry=retry,
-                         seconds_between_requests=seconds_between_requests,
-                         seconds_between_writes=seconds_between_writes)
+    else:
+        retry = github.GithubRetry(total=retries,
+                                   backoff_factor=backoff_factor,
+                                   secondary_rate_wait=secondary_rate_wait)
+    gh = github.Github(auth=auth,
+                       base_url=url,
+                       per_page=100,
+                       verify=verify,
+                       retry=retry,
+                       seconds_between_requests=seconds_between_requests,
+                       seconds_between_writes=seconds_between_writes,
+                       pool_size=max_concurrent_requests if max_concurrent_requests > 1 else None)
+    if max_concurrent_requests > 1 or cache is not None or scheduler is not None or instrumentation is not None:
+        configure_requester(gh._Github__requester, cache, scheduler, instrumentation)
+    return gh
 
 
 def get_files(multiline_files_globs: str) -> Tuple[List[str], bool]:
@@ -120,7 +145,9 @@ def get_number_of_files(files: List[str], label: str = 'file') -> str:
 
 
 def parse_files_as_xml(files: Iterable[str], large_files: bool, drop_testcases: bool,
-                       progress: Callable[[ParsedJUnitFile], ParsedJUnitFile] = lambda x: x) -> Iterable[ParsedJUnitFile]:
+                       progress: Callable[[ParsedJUnitFile], ParsedJUnitFile] = lambda x: x,
+                       profiler: Optional[PhaseProfiler] = None) -> Iterable[ParsedJUnitFile]:
+    profiler = profiler or PhaseProfiler()
     junit_files = []
     nunit_files = []
     xunit_files = []
@@ -129,38 +156,41 @@ def parse_files_as_xml(files: Iterable[str], large_files: bool, drop_testcases:
     mocha_json_files = []
     unknown_files = []
 
-    def parse(path: str) -> JUnitTree:
+    def detect(path: str) -> Tuple[str, List[str], Optional[Callable[[], JUnitTree]]]:
         if is_junit(path):
-            junit_files.append(path)
-            return parse_junit_xml_file(path, large_files, drop_testcases)
+            return 'JUnit XML', junit_files, lambda: parse_junit_xml_file(path, large_files, drop_testcases)
 
         from publish.nunit import is_nunit, parse_nunit_file
         if is_nunit(path):
-            nunit_files.append(path)
-            return parse_nunit_file(path, large_files)
+            return 'NUnit XML', nunit_files, lambda: parse_nunit_file(path, large_files)
 
         from publish.xunit import is_xunit, parse_xunit_file
         if is_xunit(path):
-            xunit_files.append(path)
-            return parse_xunit_file(path, large_files)
+            return 'XUnit XML', xunit_files, lambda: parse_xunit_file(path, large_files)
 
         from publish.trx import is_trx, parse_trx_file
         if is_trx(path):
-            trx_files.append(path)
-            return parse_trx_file(path, large_files)
+            return 'TRX', trx_files, lambda: parse_trx_file(path, large_files)
 
         from publish.dart import is_dart_json, parse_dart_json_file
         if is_dart_json(path):
-            dart_json_files.append(path)
-            return parse_dart_json_file(path)
+            return 'Dart JSON', dart_json_files, lambda: parse_dart_json_file(path)
 
         from publish.mocha import is_mocha_json, parse_mocha_json_file
         if is_mocha_json(path):
-            mocha_json_files.append(path)
-            return parse_mocha_json_file(path)
+            return 'Mocha JSON', mocha_json_files, lambda: parse_mocha_json_file(path)
 
-        unknown_files.append(path)
-        raise RuntimeError(f'Unsupported file format: {path}')
+        return 'unsupported', unknown_files, None
+
+    def parse(path: str) -> JUnitTree:
+        # spans are only recorded when tracing, the phase of all files is recorded by the caller
+        with profiler.span('detect file', file=path):
+            flavour, flavour_files, parse_file = detect(path)
+        flavour_files.append(path)
+        if parse_file is None:
+            raise RuntimeError(f'Unsupported file format: {path}')
+        with profiler.span(f'parse {flavour} file', file=path):
+            return parse_file()
 
     try:
         return progress_safe_parse_xml_file(files, parse, progress)
@@ -183,13 +213,16 @@ def parse_files_as_xml(files: Iterable[str], large_files: bool, drop_testcases:
                     logger.debug(f'detected {flavour} files {list(files)}')
 
 
-def parse_files(settings: Settings, gha: GithubAction) -> ParsedUnitTestResultsWithCommit:
+def parse_files(settings: Settings, gha: GithubAction, profiler: Optional[PhaseProfiler] = None) -> ParsedUnitTestResultsWithCommit:
+    profiler = profiler or PhaseProfiler()
+
     # expand file globs
-    files = expand_glob(settings.files_glob, None, gha)
-    junit_files = expand_glob(settings.junit_files_glob, 'JUnit XML', gha)
-    nunit_files = expand_glob(settings.nunit_files_glob, 'NUnit XML', gha)
-    xunit_files = expand_glob(settings.xunit_files_glob, 'XUnit XML', gha)
-    trx_files = expand_glob(settings.trx_files_glob, 'TRX', gha)
+    with profiler.phase('expand globs'):
+        files = expand_glob(settings.files_glob, None, gha)
+        junit_files = expand_glob(settings.junit_files_glob, 'JUnit XML', gha)
+        nunit_files = expand_glob(settings.nunit_files_glob, 'NUnit XML', gha)
+        xunit_files = expand_glob(settings.xunit_files_glob, 'XUnit XML', gha)
+        trx_files = expand_glob(settings.trx_files_glob, 'TRX', gha)
 
     elems = []
 
@@ -202,26 +235,33 @@ def parse_files(settings: Settings, gha: GithubAction) -> ParsedUnitTestResultsW
                          progress_item_type=Tuple[str, Any],
                          logger=logger) as progress:
         if files:
-            elems.extend(parse_files_as_xml(files, settings.large_files, settings.ignore_runs, progress))
+            with profiler.phase('parse files', files=len(files)):
+                elems.extend(parse_files_as_xml(files, settings.large_files, settings.ignore_runs, progress, profiler))
         if junit_files:
-            elems.extend(parse_junit_xml_files(junit_files, settings.large_files, settings.ignore_runs, progress))
+            with profiler.phase('parse JUnit XML files', files=len(junit_files)):
+                elems.extend(parse_junit_xml_files(junit_files, settings.large_files, settings.ignore_runs, progress))
         if xunit_files:
             from publish.xunit import parse_xunit_files
-            elems.extend(parse_xunit_files(xunit_files, settings.large_files, progress))
+            with profiler.phase('parse XUnit XML files', files=len(xunit_files)):
+                elems.extend(parse_xunit_files(xunit_files, settings.large_files, progress))
         if nunit_files:
             from publish.nunit import parse_nunit_files
-            elems.extend(parse_nunit_files(nunit_files, settings.large_files, progress))
+            with profiler.phase('parse NUnit XML files', files=len(nunit_files)):
+                elems.extend(parse_nunit_files(nunit_files, settings.large_files, progress))
         if trx_files:
             from publish.trx import parse_trx_files
-            elems.extend(parse_trx_files(trx_files, settings.large_files, progress))
+            with profiler.phase('parse TRX files', files=len(trx_files)):
+                elems.extend(parse_trx_files(trx_files, settings.large_files, progress))
 
     # get the test results
-    return process_junit_xml_elems(
-        elems,
-        time_factor=settings.time_factor,
-        test_file_prefix=settings.test_file_prefix,
-        add_suite_details=settings.report_suite_out_logs or settings.report_suite_err_logs or settings.json_suite_details
-    ).with_commit(settings.commit)
+    with profiler.phase('process files'):
+        return process_junit_xml_elems(
+            elems,
+            time_factor=settings.time_factor,
+            test_file_prefix=settings.test_file_prefix,
+            add_suite_details=settings.report_suite_out_logs or settings.report_suite_err_logs or settings.json_suite_details or
+                              settings.arrow_suites_file is not None
+        ).with_commit(settings.commit)
 
 
 def log_parse_errors(errors: List[ParseError], gha: GithubAction):
@@ -234,7 +274,7 @@ def action_fail_required(conclusion: str, action_fail: bool, action_fail_on_inco
            action_fail_on_inconclusive and conclusion == 'neutral'
 
 
-def main(settings: Settings, gha: GithubAction) -> None:
+def main(settings: Settings, gha: GithubAction, capture: Optional[ProfileCapture] = None) -> None:
     if settings.is_fork and not settings.job_summary:
         gha.warning(f'This action is running on a pull_request event for a fork repository. '
                     f'The only useful thing it can do in this situation is creating a job summary, which is disabled in settings. '
@@ -248,21 +288,46 @@ def main(settings: Settings, gha: GithubAction) -> None:
     avail_mem = humanize.naturalsize(psutil.virtual_memory().available, binary=True)
     logger.info(f'Available memory to read files: {avail_mem}')
 
+    tracer = Tracer('publish test results', {
+        'service.name': 'publish-unit-test-result-action',
+        'service.version': __version__,
+        'github.repository': settings.repo,
+        'github.sha': settings.commit,
+        'github.event_name': settings.event_name,
+        'github.run_id': os.environ.get('GITHUB_RUN_ID'),
+        'github.run_attempt': os.environ.get('GITHUB_RUN_ATTEMPT'),
+        'github.job': os.environ.get('GITHUB_JOB'),
+    }) if settings.trace_file else None
+    profiler = capture.profiler if capture is not None else PhaseProfiler()
+    profiler.tracer = tracer
+
     # get the unit test results
-    parsed = parse_files(settings, gha)
+    with profiler.span('read files'):
+        parsed = parse_files(settings, gha, profiler)
     log_parse_errors(parsed.errors, gha)
 
-    # process the parsed results
-    results = get_test_results(parsed, settings.dedup_classes_by_file_name)
+    with profiler.phase('aggregate results'):
+        # process the parsed results
+        with profiler.span('get test results'):
+            results = get_test_results(parsed, settings.dedup_classes_by_file_name)
+
+        # turn them into stats
+        with profiler.span('get stats'):
+            stats = get_stats(results)
 
-    # turn them into stats
-    stats = get_stats(results)
+    if capture is not None:
+        capture.describe(parsed, results)
 
     # derive check run conclusion from files
     conclusion = get_conclusion(parsed, fail_on_failures=settings.fail_on_failures, fail_on_errors=settings.fail_on_errors)
 
     # publish the delta stats
     backoff_factor = max(settings.seconds_between_github_reads, settings.seconds_between_github_writes)
+    cache = HttpCache(settings.github_api_cache_file).load() if settings.github_api_cache_file else None
+    store = ResultsStore(settings.results_store_file).load() if settings.results_store_file else None
+    scheduler = RequestScheduler(settings.seconds_between_github_reads, settings.seconds_between_github_writes) \
+        if settings.adaptive_request_pacing else None
+    instrumentation = ApiInstrumentation(tracer)
     gh = get_github(auth=github.Auth.Token(settings.token),
                     url=settings.api_url,
                     retries=settings.api_retries,
@@ -270,8 +335,31 @@ def main(settings: Settings, gha: GithubAction) -> None:
                     backoff_factor=backoff_factor,
                     seconds_between_requests=settings.seconds_between_github_reads,
                     seconds_between_writes=settings.seconds_between_github_writes,
-                    secondary_rate_wait=settings.secondary_rate_limit_wait_seconds)
-    Publisher(settings, gh, gha).publish(stats, results.case_results, conclusion)
+                    secondary_rate_wait=settings.secondary_rate_limit_wait_seconds,
+                    max_concurrent_requests=max(settings.max_concurrent_reads, settings.max_concurrent_writes),
+                    cache=cache,
+                    scheduler=scheduler,
+                    instrumentation=instrumentation)
+    try:
+        Publisher(settings, gh, gha, instrumentation, profiler, store).publish(stats, results.case_results, conclusion)
+    finally:
+        with profiler.phase('exit'):
+            instrumentation.log_stats()
+            if scheduler is not None:
+                scheduler.log_stats()
+            if cache is not None:
+                cache.save()
+                cache.log_stats()
+            if store is not None:
+                store.save()
+                store.log_stats()
+        profiler.log_stats()
+        if tracer is not None:
+            try:
+                tracer.write(settings.trace_file, settings.trace_format)
+                logger.info(f'Wrote trace to {settings.trace_file}')
+            except Exception as e:
+                gha.warning(f'Failed to write trace file {settings.trace_file}: {str(e)}')
 
     if action_fail_required(conclusion, settings.action_fail, settings.action_fail_on_inconclusive):
         status = f"{conclusion} / inconclusive" if conclusion == "neutral" else conclusion
@@ -421,6 +509,10 @@ def get_settings(options: dict, gha: GithubAction) -> Settings:
         ssl_verify = ssl_verify_str
     test_changes_limit = get_var('TEST_CHANGES_LIMIT', options) or '10'
     check_var_condition(test_changes_limit.isnumeric(), f'TEST_CHANGES_LIMIT must be a positive integer or 0: {test_changes_limit}')
+    max_annotations = get_var('MAX_ANNOTATIONS', options) or 'unlimited'
+    check_var_condition(max_annotations == 'unlimited' or max_annotations.isnumeric(), f'MAX_ANNOTATIONS must be a positive integer, 0 or "unlimited": {max_annotations}')
+    cluster_annotations = get_var('CLUSTER_ANNOTATIONS', options) or 'off'
+    check_var_condition(cluster_annotations == 'off' or cluster_annotations.isnumeric() and int(cluster_annotations) > 1, f'CLUSTER_ANNOTATIONS must be an integer larger than 1 or "off": {cluster_annotations}')
 
     default_files_glob = None
     flavours = ['JUNIT', 'NUNIT', 'XUNIT', 'TRX']
@@ -451,10 +543,14 @@ def get_settings(options: dict, gha: GithubAction) -> Settings:
     seconds_between_github_reads = get_var('SECONDS_BETWEEN_GITHUB_READS', options) or '1'
     seconds_between_github_writes = get_var('SECONDS_BETWEEN_GITHUB_WRITES', options) or '2'
     secondary_rate_limit_wait_seconds = get_var('SECONDARY_RATE_LIMIT_WAIT_SECONDS', options) or str(DEFAULT_SECONDARY_RATE_WAIT)
+    max_concurrent_github_reads = get_var('MAX_CONCURRENT_GITHUB_READS', options) or '1'
+    max_concurrent_github_writes = get_var('MAX_CONCURRENT_GITHUB_WRITES', options) or '1'
     check_var_condition(retries.isnumeric(), f'GITHUB_RETRIES must be a positive integer or 0: {retries}')
     check_var_condition(is_float(seconds_between_github_reads), f'SECONDS_BETWEEN_GITHUB_READS must be an integer or float number: {seconds_between_github_reads}')
     check_var_condition(is_float(seconds_between_github_writes), f'SECONDS_BETWEEN_GITHUB_WRITES must be an integer or float number: {seconds_between_github_writes}')
     check_var_condition(is_float(secondary_rate_limit_wait_seconds), f'SECONDARY_RATE_LIMIT_WAIT_SECONDS must be an integer or float number: {secondary_rate_limit_wait_seconds}')
+    check_var_condition(max_concurrent_github_reads.isnumeric(), f'MAX_CONCURRENT_GITHUB_READS must be a positive integer: {max_concurrent_github_reads}')
+    check_var_condition(max_concurrent_github_writes.isnumeric(), f'MAX_CONCURRENT_GITHUB_WRITES must be a positive integer: {max_concurrent_github_writes}')
 
     settings = Settings(
         token=get_var('GITHUB_TOKEN', options),
@@ -468,10 +564,16 @@ def get_settings(options: dict, gha: GithubAction) -> Settings:
         is_fork=is_fork,
         repo=repo,
         commit=get_var('COMMIT', options) or get_commit_sha(event, event_name, options),
+        workspace=get_var('GITHUB_WORKSPACE', options),
         json_file=get_var('JSON_FILE', options),
         json_thousands_separator=get_var('JSON_THOUSANDS_SEPARATOR', options) or punctuation_space,
         json_suite_details=get_bool_var('JSON_SUITE_DETAILS', options, default=False),
         json_test_case_results=get_bool_var('JSON_TEST_CASE_RESULTS', options, default=False),
+        json_cases_file=get_var('JSON_CASES_FILE', options) or None,
+        json_cases_messages=get_bool_var('JSON_CASES_MESSAGES', options, default=False),
+        arrow_file=get_var('ARROW_FILE', options) or None,
+        arrow_suites_file=get_var('ARROW_SUITES_FILE', options) or None,
+        arrow_format=get_var('ARROW_FORMAT', options) or arrow_format_ipc,
         fail_on_errors=fail_on_errors,
         fail_on_failures=fail_on_failures,
         action_fail=get_bool_var('ACTION_FAIL', options, default=False),
@@ -498,10 +600,27 @@ def get_settings(options: dict, gha: GithubAction) -> Settings:
         large_files=get_bool_var('LARGE_FILES', options, default=ignore_runs),
         ignore_runs=ignore_runs,
         check_run_annotation=annotations,
+        max_annotations=None if max_annotations == 'unlimited' else int(max_annotations),
+        cluster_annotations=None if cluster_annotations == 'off' else int(cluster_annotations),
         seconds_between_github_reads=float(seconds_between_github_reads),
         seconds_between_github_writes=float(seconds_between_github_writes),
         secondary_rate_limit_wait_seconds=float(secondary_rate_limit_wait_seconds),
+        adaptive_request_pacing=get_bool_var('ADAPTIVE_GITHUB_REQUEST_PACING', options, default=True),
+        max_concurrent_reads=int(max_concurrent_github_reads),
+        max_concurrent_writes=int(max_concurrent_github_writes),
+        batch_reads=get_bool_var('BATCH_GITHUB_READS', options, default=False),
+        github_api_cache_file=get_var('GITHUB_API_CACHE_FILE', options) or None,
+        results_store_file=get_var('RESULTS_STORE_FILE', options) or None,
+        profile=get_var('PROFILE', options) or profile_mode_off,
+        profile_directory=get_var('PROFILE_DIRECTORY', options) or 'profile',
+        profile_hash_strings=get_bool_var('PROFILE_HASH_STRINGS', options, default=True),
+        trace_file=get_var('TRACE_FILE', options) or None,
+        trace_format=get_var('TRACE_FORMAT', options) or trace_format_otlp,
         search_pull_requests=get_bool_var('SEARCH_PULL_REQUESTS', options, default=False),
+        skip_unchanged_check_run=get_bool_var('SKIP_UNCHANGED_CHECK_RUN', options, default=False),
+        defer_annotations=get_bool_var('DEFER_ANNOTATIONS', options, default=False),
+        annotations_checkpoint_file=get_var('ANNOTATIONS_CHECKPOINT_FILE', options) or None,
+        dry_run_directory=get_var('DRY_RUN_DIRECTORY', options) or None,
     )
 
     check_var(settings.token, 'GITHUB_TOKEN', 'GitHub token')
@@ -513,6 +632,9 @@ def get_settings(options: dict, gha: GithubAction) -> Settings:
     )
     check_var(settings.comment_mode, 'COMMENT_MODE', 'Comment mode', comment_modes)
     check_var(settings.pull_request_build, 'PULL_REQUEST_BUILD', 'Pull Request build', pull_request_build_modes)
+    check_var(settings.profile, 'PROFILE', 'Profile mode', profile_modes)
+    check_var(settings.trace_format, 'TRACE_FORMAT', 'Trace format', trace_formats)
+    check_var(settings.arrow_format, 'ARROW_FORMAT', 'Arrow format', arrow_formats)
     check_var(suite_logs_mode, 'REPORT_SUITE_LOGS', 'Report suite logs mode', available_report_suite_logs)
     check_var(settings.check_run_annotation, 'CHECK_RUN_ANNOTATIONS', 'Check run annotations', available_annotations)
     check_var_condition(
@@ -525,6 +647,8 @@ def get_settings(options: dict, gha: GithubAction) -> Settings:
     check_var_condition(settings.seconds_between_github_reads > 0, f'SECONDS_BETWEEN_GITHUB_READS must be a positive number: {seconds_between_github_reads}')
     check_var_condition(settings.seconds_between_github_writes > 0, f'SECONDS_BETWEEN_GITHUB_WRITES must be a positive number: {seconds_between_github_writes}')
     check_var_condition(settings.secondary_rate_limit_wait_seconds > 0, f'SECONDARY_RATE_LIMIT_WAIT_SECONDS must be a positive number: {secondary_rate_limit_wait_seconds}')
+    check_var_condition(settings.max_concurrent_reads > 0, f'MAX_CONCURRENT_GITHUB_READS must be a positive integer: {max_concurrent_github_reads}')
+    check_var_condition(settings.max_concurrent_writes > 0, f'MAX_CONCURRENT_GITHUB_WRITES must be a positive integer: {max_concurrent_github_writes}')
 
     return settings
 
@@ -553,4 +677,11 @@ if __name__ == "__main__":
     settings = get_settings(options, gha)
     logger.debug(f'Settings: {settings}')
 
-    main(settings, gha)
+    if settings.profile == profile_mode_off:
+        main(settings, gha)
+    else:
+        with ProfileCapture(settings.profile_directory,
+                            cpu=settings.profile in [profile_mode_cpu, profile_mode_all],
+                            memory=settings.profile in [profile_mode_memory, profile_mode_all],
+                            hash_strings=settings.profile_hash_strings) as capture:
+            main(settings, gha, capture)
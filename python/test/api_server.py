@@ -0,0 +1,78 @@
+import logging
+import time
+import unittest
+from threading import Thread
+
+import requests
+import requests.exceptions
+from flask import Flask
+from werkzeug.serving import make_server
+
+
+class FlaskThread(Thread):
+    def __init__(self, app: Flask, port: int = 12380, threaded: bool = False):
+        Thread.__init__(self, daemon=True)
+        # port 0 picks a free port, threaded servers serve concurrent requests
+        self.server = make_server('localhost', port, app, threaded=threaded)
+        self.port = self.server.server_port
+        self.ctx = app.app_context()
+        self.ctx.push()
+
+    def run(self):
+        self.server.serve_forever()
+
+    def shutdown(self):
+        self.server.shutdown()
+
+
+def start_api(app: Flask, port: int = 12380, threaded: bool = False) -> FlaskThread:
+    """Starts the app in a server thread and waits until its /health endpoint responds."""
+    server = FlaskThread(app, port, threaded)
+    server.start()
+    attempt = 0
+    while attempt < 100:
+        try:
+            attempt += 1
+            requests.get(f'http://localhost:{server.port}/health')
+            return server
+        except requests.exceptions.ConnectionError as e:
+            if attempt % 10 == 0:
+                logging.warning(f'mock api server is not up yet, tried {attempt} times: {str(e)}')
+            time.sleep(0.01)
+    stop_api(server)
+    raise RuntimeError('Failed to start mock api server, could not connect to health endpoint')
+
+
+def stop_api(server: FlaskThread) -> None:
+    server.shutdown()
+    server.join(2)
+
+
+class ApiServerTestCase(unittest.TestCase):
+    """
+    Runs a mock API server on port for every test. Subclasses add their endpoints in add_routes,
+    the /health endpoint used to wait for the server is provided.
+    """
+
+    port = 12380
+    threaded = False
+
+    @property
+    def base_url(self) -> str:
+        return f'http://localhost:{self.port}/api'
+
+    def add_routes(self, app: Flask) -> None:
+        raise NotImplementedError()
+
+    def setUp(self) -> None:
+        app = Flask(self.__class__.__name__)
+
+        @app.route('/health')
+        def health():
+            return {'health': 'alive'}
+
+        self.add_routes(app)
+        self.server = start_api(app, self.port, self.threaded)
+
+    def tearDown(self) -> None:
+        stop_api(self.server)
@@ -0,0 +1,69 @@
+"""
+Benchmarks the stats digest codecs: size of the digest, time to encode and to decode stats for every digest format.
+
+    python test/benchmark_digest.py --repeat 10000
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+from typing import List, Optional, Callable, Dict
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from publish import digest_format, digest_v1_format, digest_header, digest_v1_header, \
+    digest_string, get_digest_from_stats, get_stats_from_digest
+from publish.publisher import Publisher
+from publish.unittestresults import UnitTestRunResults
+
+stats = UnitTestRunResults(files=123, errors=[], suites=456, duration=12345, suite_details=None,
+                           tests=23456, tests_succ=22000, tests_skip=1234, tests_fail=200, tests_error=22,
+                           runs=34567, runs_succ=33000, runs_skip=1345, runs_fail=200, runs_error=22,
+                           commit='0123456789abcdef0123456789abcdef01234567')
+
+
+def get_v1_digest_from_stats(stats: UnitTestRunResults) -> str:
+    d = stats.to_dict()
+    del d['errors']
+    return digest_string(json.dumps(d, ensure_ascii=False))
+
+
+encoders: Dict[str, Callable[[UnitTestRunResults], str]] = {
+    digest_v1_format: get_v1_digest_from_stats,
+    digest_format: get_digest_from_stats,
+}
+headers = {digest_v1_format: digest_v1_header, digest_format: digest_header}
+
+
+def benchmark(repeat: int) -> List[List[str]]:
+    rows = [['format', 'digest chars', 'encode µs', 'decode µs', 'summary decode µs']]
+    summary = 'summary\n' * 10
+    for format, encode in encoders.items():
+        digest = encode(stats)
+        assert get_stats_from_digest(digest, format) == stats
+        summary_with_digest = f'{summary}\n{headers[format]}{digest}\n'
+        encode_seconds = timeit.timeit(lambda: encode(stats), number=repeat) / repeat
+        decode_seconds = timeit.timeit(lambda: get_stats_from_digest(digest, format), number=repeat) / repeat
+        summary_seconds = timeit.timeit(lambda: Publisher.get_stats_from_summary_md(summary_with_digest), number=repeat) / repeat
+        rows.append([format, f'{len(digest)}', f'{encode_seconds * 1e6:.1f}', f'{decode_seconds * 1e6:.1f}', f'{summary_seconds * 1e6:.1f}'])
+    return rows
+
+
+def format_rows(rows: List[List[str]]) -> str:
+    widths = [max(len(row[column]) for row in rows) for column in range(len(rows[0]))]
+    return '\n'.join('  '.join(cell.ljust(width) if column < 1 else cell.rjust(width)
+                               for column, (cell, width) in enumerate(zip(row, widths)))
+                     for row in rows)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmarks the stats digest codecs.')
+    parser.add_argument('--repeat', type=int, default=10000, help='number of repetitions')
+    args = parser.parse_args(argv)
+    print(format_rows(benchmark(args.repeat)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
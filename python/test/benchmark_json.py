@@ -0,0 +1,108 @@
+"""
+Benchmarks the JSON outputs of the action that use the installed JSON backends (see publish.jsoncodec):
+encoding the json_cases_file and decoding the digest. The json_file and the json output are written by the json module.
+
+    python test/benchmark_json.py --cases 100000
+"""
+import argparse
+import io
+import os
+import sys
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Callable
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from publish import jsoncodec, get_digest_from_stats, get_stats_from_digest
+from publish.publisher import PublishData, Publisher
+from publish.unittestresults import UnitTestCase, UnitTestResults, create_unit_test_case_results, get_stats
+from test_publisher import TestPublisher
+
+
+@dataclass(frozen=True)
+class EncodeResult:
+    backend: str
+    output: str
+    bytes: int
+    seconds: float
+
+    @property
+    def mb_per_second(self) -> float:
+        return self.bytes / 1024 / 1024 / self.seconds if self.seconds else 0.0
+
+
+def get_publish_data(cases: int) -> PublishData:
+    results = create_unit_test_case_results()
+    for index in range(cases):
+        state = 'failure' if index % 10 == 0 else 'success'
+        case = UnitTestCase(result_file=f'test-results/result-{index % 25}.xml', test_file=f'tests/test_{index % 100}.py',
+                            line=index % 1000, class_name=f'tests.test_{index % 100}.Test', test_name=f'test_{index} ✅',
+                            result=state, message='assertion failed: expected "ä" but was "b"' if state == 'failure' else None,
+                            content=None, stdout=None, stderr=None, time=index / 1000)
+        results[(case.test_file, case.class_name, case.test_name)][state].append(case)
+    stats = get_stats(UnitTestResults(files=25, errors=[], suites=100, suite_tests=cases, suite_skipped=0,
+                                      suite_failures=cases // 10, suite_errors=0, suite_time=cases, suite_details=[],
+                                      cases=cases, cases_skipped=0, cases_failures=cases // 10, cases_errors=0,
+                                      cases_time=cases, case_results=results, tests=cases, tests_skipped=0,
+                                      tests_failures=cases // 10, tests_errors=0, commit='commit'))
+    return PublishData(title='title', summary='summary', summary_with_digest='summary', conclusion='failure',
+                       stats=stats, stats_with_delta=None, before_stats=None, annotations=[], check_url=None, cases=results)
+
+
+def measure(backend: str, output: str, repeat: int, func: Callable[[], int]) -> EncodeResult:
+    jsoncodec.set_backend(backend)
+    size = func()
+    start = time.monotonic()
+    for _ in range(repeat):
+        func()
+    return EncodeResult(backend=backend, output=output, bytes=size, seconds=(time.monotonic() - start) / repeat)
+
+
+def benchmark(cases: int, backends: List[str], repeat: int) -> List[EncodeResult]:
+    data = get_publish_data(cases)
+    settings = TestPublisher.create_settings()
+    digest = get_digest_from_stats(data.stats)
+
+    def json_cases_file() -> int:
+        writer = io.StringIO()
+        Publisher.write_json_cases(data.cases, writer, settings)
+        return len(writer.getvalue().encode('utf-8'))
+
+    def digest_decode() -> int:
+        get_stats_from_digest(digest)
+        return len(digest)
+
+    outputs = dict(json_cases_file=json_cases_file, digest_decode=digest_decode)
+    current = jsoncodec.get_backend()
+    try:
+        return [measure(backend, output, repeat, func) for output, func in outputs.items() for backend in backends]
+    finally:
+        jsoncodec.set_backend(current)
+
+
+def format_results(results: List[EncodeResult]) -> str:
+    rows = [['output', 'backend', 'MB', 'seconds', 'MB/s']]
+    rows.extend([result.output, result.backend, f'{result.bytes / 1024 / 1024:.3f}', f'{result.seconds:.6f}',
+                 f'{result.mb_per_second:.1f}'] for result in results)
+    widths = [max(len(row[column]) for row in rows) for column in range(len(rows[0]))]
+    return '\n'.join('  '.join(cell.ljust(width) if column < 2 else cell.rjust(width)
+                               for column, (cell, width) in enumerate(zip(row, widths)))
+                     for row in rows)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmarks the JSON outputs with all installed JSON backends.')
+    parser.add_argument('--cases', type=int, nargs='+', default=[10000, 100000], help='number of test cases')
+    parser.add_argument('--backend', choices=list(jsoncodec.backends), action='append', help='backends to benchmark, default: all installed backends')
+    parser.add_argument('--repeat', type=int, default=3, help='number of measured repetitions')
+    args = parser.parse_args(argv)
+
+    for cases in args.cases:
+        print(f'{cases:,} cases')
+        print(format_results(benchmark(cases, args.backend or list(jsoncodec.backends), args.repeat)), flush=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
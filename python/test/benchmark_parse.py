@@ -0,0 +1,210 @@
+"""
+Benchmarks parsing test result files: runs parse_files for synthetic files of every format and parser engine.
+
+Each measurement runs in a fresh process, so the peak resident memory (RSS) is that of a single parse.
+Measurements are compared against stored baselines, throughput below or peak memory above
+the baseline by more than the threshold is reported as a regression:
+
+    python test/benchmark_parse.py --cases 100000 --check
+    python test/benchmark_parse.py --cases 100000 --update-baseline
+"""
+import argparse
+import dataclasses
+import io
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Dict, Any
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from generate_results import GeneratorOptions, formats, write_files
+from publish.github_action import GithubAction
+
+engines = dict(
+    default={},
+    large_files=dict(LARGE_FILES='true'),
+    # ignoring runs drops test cases while parsing JUnit files
+    ignore_runs=dict(IGNORE_RUNS='true'),
+)
+baseline_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_parse_baseline.json')
+
+
+@dataclass(frozen=True)
+class ParseResult:
+    format: str
+    engine: str
+    cases: int
+    runs: int
+    bytes: int
+    seconds: float
+    peak_rss: int
+
+    @property
+    def mb_per_second(self) -> float:
+        return self.bytes / 1024 / 1024 / self.seconds if self.seconds else 0.0
+
+    @property
+    def cases_per_second(self) -> float:
+        return self.cases / self.seconds if self.seconds else 0.0
+
+    @property
+    def key(self) -> str:
+        return f'{self.format}/{self.engine}/{self.cases}'
+
+
+def get_peak_rss() -> int:
+    """Returns the peak resident memory of this process in bytes."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS reports bytes
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except ImportError:
+        import psutil
+        return psutil.Process().memory_info().peak_wset
+
+
+def parse(path: str, format: str, engine: str) -> Dict[str, Any]:
+    """Parses all files of the format in a fresh process, returns number of runs, seconds and peak RSS."""
+    import publish_test_results
+
+    event_path = os.path.join(path, 'event.json')
+    options = dict(
+        GITHUB_TOKEN='token',
+        GITHUB_REPOSITORY='owner/repo',
+        GITHUB_EVENT_PATH=event_path,
+        GITHUB_EVENT_NAME='push',
+        GITHUB_SHA='commit',
+        FILES=os.path.join(path, f'{format}-*'),
+        **engines[engine]
+    )
+    gha = GithubAction(file=io.StringIO())
+    settings = publish_test_results.get_settings(options, gha)
+
+    start = time.monotonic()
+    results = publish_test_results.parse_files(settings, gha)
+    seconds = time.monotonic() - start
+
+    if results.errors:
+        raise RuntimeError(f'Failed to parse {format} files: {results.errors[0].message}')
+    return dict(runs=len(results.cases), seconds=seconds, peak_rss=get_peak_rss())
+
+
+def benchmark(cases: int, formats: List[str], engines: List[str],
+              options: Optional[GeneratorOptions] = None) -> List[ParseResult]:
+    options = dataclasses.replace(options or GeneratorOptions(), cases=cases)
+    context = multiprocessing.get_context('spawn')
+    results = []
+    with tempfile.TemporaryDirectory() as path:
+        with open(os.path.join(path, 'event.json'), 'wt', encoding='utf-8') as w:
+            w.write('{}')
+
+        for format in formats:
+            generated = write_files(path, format, options)
+            for engine in engines:
+                with context.Pool(1, maxtasksperchild=1) as pool:
+                    measurement = pool.apply(parse, (path, format, engine))
+                results.append(ParseResult(format=format, engine=engine, cases=generated.cases, bytes=generated.bytes,
+                                           **measurement))
+    return results
+
+
+def read_baseline(path: str) -> Dict[str, Dict[str, float]]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'rt', encoding='utf-8') as r:
+        return json.load(r)
+
+
+def write_baseline(path: str, results: List[ParseResult], baseline: Dict[str, Dict[str, float]]):
+    baseline = dict(baseline)
+    baseline.update({result.key: dict(mb_per_second=round(result.mb_per_second, 3),
+                                      cases_per_second=round(result.cases_per_second, 1),
+                                      peak_rss=result.peak_rss)
+                     for result in results})
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wt', encoding='utf-8') as w:
+        json.dump(dict(sorted(baseline.items())), w, indent=2)
+        w.write('\n')
+
+
+def get_regressions(results: List[ParseResult], baseline: Dict[str, Dict[str, float]], threshold: float) -> List[str]:
+    """Compares results against the baseline, returns a description of every regression beyond the threshold."""
+    regressions = []
+    for result in results:
+        expected = baseline.get(result.key)
+        if expected is None:
+            continue
+        for metric, key, actual, higher_is_better in [('MB/s', 'mb_per_second', result.mb_per_second, True),
+                                                      ('cases/s', 'cases_per_second', result.cases_per_second, True),
+                                                      ('peak RSS', 'peak_rss', result.peak_rss, False)]:
+            if key not in expected:
+                continue
+            limit = expected[key] * (1 - threshold if higher_is_better else 1 + threshold)
+            if actual < limit if higher_is_better else actual > limit:
+                regressions.append(f'{result.key}: {metric} {actual:,.1f} vs. baseline {expected[key]:,.1f}')
+    return regressions
+
+
+def format_results(results: List[ParseResult]) -> str:
+    rows = [['format', 'engine', 'cases', 'runs', 'MB', 'seconds', 'MB/s', 'cases/s', 'peak RSS MB']]
+    rows.extend([result.format, result.engine, f'{result.cases:,}', f'{result.runs:,}', f'{result.bytes / 1024 / 1024:.1f}',
+                 f'{result.seconds:.3f}', f'{result.mb_per_second:.1f}', f'{result.cases_per_second:,.0f}',
+                 f'{result.peak_rss / 1024 / 1024:.1f}'] for result in results)
+    widths = [max(len(row[column]) for row in rows) for column in range(len(rows[0]))]
+    return '\n'.join('  '.join(cell.ljust(width) if column < 2 else cell.rjust(width)
+                               for column, (cell, width) in enumerate(zip(row, widths)))
+                     for row in rows)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmarks parsing synthetic test result files of all formats.')
+    parser.add_argument('--cases', type=int, nargs='+', default=[10000, 100000], help='number of test cases to parse')
+    parser.add_argument('--format', choices=formats, action='append', help='formats to benchmark, default: all formats')
+    parser.add_argument('--engine', choices=list(engines), action='append', help='engines to benchmark, default: all engines')
+    parser.add_argument('--depth', type=int, default=GeneratorOptions.depth, help='nesting depth of test suites')
+    parser.add_argument('--reruns', type=int, default=GeneratorOptions.reruns, help='reruns of failing test cases, the last rerun succeeds')
+    parser.add_argument('--stdout-size', type=int, default=GeneratorOptions.stdout_size, help='characters of stdout per run')
+    parser.add_argument('--non-bmp', action='store_true', help='add characters outside the Basic Multilingual Plane')
+    parser.add_argument('--baseline', default=baseline_path, help='baseline JSON file')
+    parser.add_argument('--check', action='store_true', help='fail on regressions against the baseline')
+    parser.add_argument('--threshold', type=float, default=0.25, help='tolerated relative regression, default: 0.25')
+    parser.add_argument('--update-baseline', action='store_true', help='store results as the new baseline')
+    parser.add_argument('--json', help='write results to this JSON file')
+    args = parser.parse_args(argv)
+
+    # parse_files logs every file
+    logging.getLogger('publish').setLevel(logging.WARNING)
+
+    options = GeneratorOptions(depth=args.depth, reruns=args.reruns, stdout_size=args.stdout_size, non_bmp=args.non_bmp)
+    results = []
+    for cases in args.cases:
+        results.extend(benchmark(cases, args.format or formats, args.engine or list(engines), options))
+        print(format_results(results), flush=True)
+
+    if args.json:
+        with open(args.json, 'wt', encoding='utf-8') as w:
+            json.dump([dict(dataclasses.asdict(result), mb_per_second=result.mb_per_second,
+                            cases_per_second=result.cases_per_second)
+                       for result in results], w, indent=2)
+
+    baseline = read_baseline(args.baseline)
+    if args.update_baseline:
+        write_baseline(args.baseline, results, baseline)
+    if args.check:
+        regressions = get_regressions(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f'Regression: {regression}')
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
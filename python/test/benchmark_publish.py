@@ -0,0 +1,146 @@
+"""
+Benchmarks publishing test results end to end: runs the action's main() against a local fake GitHub API.
+
+Each scale publishes the same result files twice: first for a commit without any earlier results,
+then for a later commit of an open pull request, which compares against the first commit and comments.
+
+    python test/benchmark_publish.py --tests 1000 10000 100000 1000000 --latency 0.1
+"""
+import argparse
+import dataclasses
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Dict, Any
+
+import mock
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import publish_test_results
+from fake_github import FakeGitHub
+from generate_results import GeneratorOptions, write_files
+from publish.github_action import GithubAction
+from publish.scheduler import RequestScheduler
+
+
+@dataclass(frozen=True)
+class BenchmarkResult:
+    tests: int
+    run: str
+    seconds: float
+    api_calls: int
+    rate_limited: int
+    sleep_seconds: float
+
+
+def publish(fake: FakeGitHub, path: str, commit: str, event: Dict[str, Any], options: Dict[str, str]) -> BenchmarkResult:
+    event_path = os.path.join(path, f'event-{commit}.json')
+    with open(event_path, 'wt', encoding='utf-8') as w:
+        json.dump(event, w)
+
+    options = dict(
+        GITHUB_TOKEN='token',
+        GITHUB_REPOSITORY=fake.full_name,
+        GITHUB_API_URL=fake.api_url,
+        GITHUB_GRAPHQL_URL=fake.graphql_url,
+        GITHUB_EVENT_PATH=event_path,
+        GITHUB_EVENT_NAME='push',
+        GITHUB_SHA=commit,
+        JUNIT_FILES=os.path.join(path, 'junit-*.xml'),
+        **options
+    )
+    gha = GithubAction(file=io.StringIO())
+    settings = publish_test_results.get_settings(options, gha)
+
+    schedulers: List[RequestScheduler] = []
+
+    def create_scheduler(*args, **kwargs) -> RequestScheduler:
+        scheduler = RequestScheduler(*args, **kwargs)
+        schedulers.append(scheduler)
+        return scheduler
+
+    api_calls = len(fake.requests)
+    rate_limited = fake.rate_limited + fake.secondary_rate_limited
+    environ = dict(GITHUB_OUTPUT=os.path.join(path, 'output'), GITHUB_STEP_SUMMARY=os.path.join(path, 'summary'))
+    with mock.patch.dict(os.environ, environ), \
+            mock.patch('publish_test_results.RequestScheduler', create_scheduler):
+        start = time.monotonic()
+        publish_test_results.main(settings, gha)
+        seconds = time.monotonic() - start
+
+    return BenchmarkResult(
+        tests=0,
+        run='',
+        seconds=seconds,
+        api_calls=len(fake.requests) - api_calls,
+        rate_limited=fake.rate_limited + fake.secondary_rate_limited - rate_limited,
+        sleep_seconds=sum(scheduler.waiting_seconds for scheduler in schedulers)
+    )
+
+
+def benchmark(tests: int, fake: FakeGitHub, options: Optional[Dict[str, str]] = None) -> List[BenchmarkResult]:
+    options = options or {}
+    with tempfile.TemporaryDirectory() as path:
+        write_files(path, 'junit', GeneratorOptions(cases=tests))
+
+        # publish results of the first commit, nothing to compare against
+        first = publish(fake, path, 'commit-1', dict(before='0000000000000000000000000000000000000000'), options)
+
+        # publish results of a pull request commit, compare against the first commit
+        fake.add_pull(head_sha='commit-2', base_ref='main', base_sha='commit-1')
+        second = publish(fake, path, 'commit-2', dict(before='commit-1'), options)
+
+    return [dataclasses.replace(first, tests=tests, run='first commit'),
+            dataclasses.replace(second, tests=tests, run='pull request')]
+
+
+def format_results(results: List[BenchmarkResult]) -> str:
+    rows = [['tests', 'run', 'seconds', 'api calls', 'rate limited', 'sleep seconds']]
+    rows.extend([f'{result.tests:,}', result.run, f'{result.seconds:.3f}', f'{result.api_calls:,}',
+                 str(result.rate_limited), f'{result.sleep_seconds:.3f}'] for result in results)
+    widths = [max(len(row[column]) for row in rows) for column in range(len(rows[0]))]
+    return '\n'.join('  '.join(cell.ljust(width) if column == 1 else cell.rjust(width)
+                               for column, (cell, width) in enumerate(zip(row, widths)))
+                     for row in rows)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Benchmarks publishing test results against a local fake GitHub API.')
+    parser.add_argument('--tests', type=int, nargs='+', default=[1000, 10000, 100000, 1000000], help='number of tests to publish')
+    parser.add_argument('--latency', type=float, default=0.05, help='latency of the fake GitHub API in seconds')
+    parser.add_argument('--max-per-page', type=int, default=100, help='maximum page size of the fake GitHub API')
+    parser.add_argument('--rate-limit', type=int, default=5000, help='primary rate limit of the fake GitHub API')
+    parser.add_argument('--rate-limit-window', type=float, default=3600, help='seconds until the primary rate limit resets')
+    parser.add_argument('--secondary-rate-limit-every', type=int, default=0, help='every n-th write hits the secondary rate limit')
+    parser.add_argument('--option', action='append', default=[], metavar='NAME=VALUE',
+                        help='action option, e.g. SECONDS_BETWEEN_GITHUB_WRITES=0.5 or MAX_CONCURRENT_GITHUB_READS=4')
+    parser.add_argument('--json', help='write results to this JSON file')
+    args = parser.parse_args(argv)
+
+    # the fake API logs every request
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+
+    options = dict(option.split('=', 1) for option in args.option)
+    results = []
+    for tests in args.tests:
+        with FakeGitHub(latency=args.latency,
+                        max_per_page=args.max_per_page,
+                        rate_limit=args.rate_limit,
+                        rate_limit_window=args.rate_limit_window,
+                        secondary_rate_limit_every=args.secondary_rate_limit_every) as fake:
+            results.extend(benchmark(tests, fake, options))
+        print(format_results(results), flush=True)
+
+    if args.json:
+        with open(args.json, 'wt', encoding='utf-8') as w:
+            json.dump([dataclasses.asdict(result) for result in results], w, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,345 @@
+import itertools
+import json
+import re
+import threading
+import time
+from collections import Counter
+from typing import Optional, List, Dict, Any, Mapping
+from urllib.parse import urlencode
+
+from flask import Flask, Response, request
+
+from api_server import FlaskThread, start_api, stop_api
+
+
+class FakeGitHub:
+    """
+    A local stand-in for the REST and GraphQL endpoints of the GitHub API that the publisher uses.
+
+    Check runs, annotations, pull requests and comments are kept in memory, so that consecutive runs
+    of the action see what earlier runs published. Every request is delayed by latency seconds,
+    lists are paginated by at most max_per_page items, and requests count against a primary rate limit
+    of rate_limit requests per rate_limit_window seconds. Every secondary_rate_limit_every-th write
+    request is rejected with a secondary rate limit error.
+    """
+
+    def __init__(self,
+                 owner: str = 'owner',
+                 repo: str = 'repo',
+                 latency: float = 0.0,
+                 max_per_page: int = 100,
+                 rate_limit: int = 5000,
+                 rate_limit_window: float = 3600,
+                 secondary_rate_limit_every: int = 0,
+                 secondary_rate_limit_retry_after: Optional[int] = None):
+        self.owner = owner
+        self.repo = repo
+        self.latency = latency
+        self.max_per_page = max_per_page
+        self.rate_limit = rate_limit
+        self.rate_limit_window = rate_limit_window
+        self.secondary_rate_limit_every = secondary_rate_limit_every
+        self.secondary_rate_limit_retry_after = secondary_rate_limit_retry_after
+
+        self.check_runs: Dict[str, List[Dict[str, Any]]] = {}
+        self.annotations: Dict[int, List[Dict[str, Any]]] = {}
+        self.pulls: List[Dict[str, Any]] = []
+        self.comments: Dict[int, List[Dict[str, Any]]] = {}
+        self.requests: List[str] = []
+        self.rate_limited = 0
+        self.secondary_rate_limited = 0
+
+        self._ids = itertools.count(1)
+        self._writes = 0
+        self._rate_limit_used = 0
+        self._rate_limit_reset = time.time() + rate_limit_window
+        self._lock = threading.Lock()
+        self._server: Optional[FlaskThread] = None
+
+    @property
+    def full_name(self) -> str:
+        return f'{self.owner}/{self.repo}'
+
+    @property
+    def api_url(self) -> str:
+        return f'http://localhost:{self._server.port}/api'
+
+    @property
+    def graphql_url(self) -> str:
+        return f'{self.api_url}/graphql'
+
+    @property
+    def repo_url(self) -> str:
+        return f'{self.api_url}/repos/{self.full_name}'
+
+    @property
+    def endpoints(self) -> Counter:
+        with self._lock:
+            return Counter(self.requests)
+
+    def add_pull(self, head_sha: str, base_ref: str = 'main', base_sha: str = 'base', state: str = 'open') -> int:
+        with self._lock:
+            number = len(self.pulls) + 1
+            self.pulls.append(dict(number=number, state=state, head_sha=head_sha, base_ref=base_ref, base_sha=base_sha))
+            return number
+
+    def add_check_run(self, head_sha: str, name: str, summary: str, annotations: Optional[List[Dict[str, Any]]] = None) -> int:
+        with self._lock:
+            return self._add_check_run(dict(name=name, head_sha=head_sha, status='completed', conclusion='success',
+                                            output=dict(title=name, summary=summary, annotations=annotations or [])))
+
+    def _add_check_run(self, run: Mapping[str, Any]) -> int:
+        run_id = next(self._ids)
+        output = run.get('output') or {}
+        self.check_runs.setdefault(run['head_sha'], []).append(dict(
+            id=run_id, name=run.get('name'), head_sha=run['head_sha'],
+            status=run.get('status', 'queued'), conclusion=run.get('conclusion'),
+            started_at=time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            output=dict(title=output.get('title'), summary=output.get('summary'))
+        ))
+        self.annotations[run_id] = list(output.get('annotations') or [])
+        return run_id
+
+    def _check_run(self, run: Dict[str, Any]) -> Dict[str, Any]:
+        return dict(run,
+                    output=dict(run['output'], annotations_count=len(self.annotations[run['id']])),
+                    url=f'{self.repo_url}/check-runs/{run["id"]}',
+                    html_url=f'https://github.com/{self.full_name}/runs/{run["id"]}')
+
+    def _find_check_run(self, run_id: int) -> Optional[Dict[str, Any]]:
+        return next((run for runs in self.check_runs.values() for run in runs if run['id'] == run_id), None)
+
+    def _pull(self, pull: Mapping[str, Any]) -> Dict[str, Any]:
+        repo = dict(full_name=self.full_name, name=self.repo, owner=dict(login=self.owner))
+        return dict(number=pull['number'], state=pull['state'], merge_commit_sha=f'merge-{pull["number"]}',
+                    head=dict(sha=pull['head_sha'], ref=f'branch-{pull["number"]}', repo=repo),
+                    base=dict(sha=pull['base_sha'], ref=pull['base_ref'], repo=repo),
+                    url=f'{self.repo_url}/pulls/{pull["number"]}',
+                    issue_url=f'{self.repo_url}/issues/{pull["number"]}',
+                    html_url=f'https://github.com/{self.full_name}/pull/{pull["number"]}')
+
+    def _comment(self, comment: Mapping[str, Any]) -> Dict[str, Any]:
+        return dict(id=comment['id'], body=comment['body'],
+                    url=f'{self.repo_url}/issues/comments/{comment["id"]}',
+                    html_url=f'https://github.com/{self.full_name}/pull/{comment["pull"]}#issuecomment-{comment["id"]}')
+
+    def _find_comment(self, comment_id: int) -> Optional[Dict[str, Any]]:
+        return next((comment for comments in self.comments.values() for comment in comments if comment['id'] == comment_id), None)
+
+    def _paginate(self, items: List[Any], wrap: Optional[str] = None, **fields) -> Response:
+        per_page = min(request.args.get('per_page', 30, type=int), self.max_per_page)
+        page = request.args.get('page', 1, type=int)
+        pages = max(1, (len(items) + per_page - 1) // per_page)
+        body = items[(page - 1) * per_page:page * per_page]
+        if wrap:
+            body = {**fields, wrap: body}
+
+        links = []
+        if page < pages:
+            args = {**request.args.to_dict(), 'page': page + 1}
+            links.append(f'<{request.base_url}?{urlencode(args)}>; rel="next"')
+            args = {**request.args.to_dict(), 'page': pages}
+            links.append(f'<{request.base_url}?{urlencode(args)}>; rel="last"')
+        response = Response(json.dumps(body), content_type='application/json')
+        if links:
+            response.headers['Link'] = ', '.join(links)
+        return response
+
+    def _rate_limit_headers(self) -> Dict[str, str]:
+        return {'X-RateLimit-Limit': str(self.rate_limit),
+                'X-RateLimit-Remaining': str(max(0, self.rate_limit - self._rate_limit_used)),
+                'X-RateLimit-Used': str(self._rate_limit_used),
+                'X-RateLimit-Reset': str(int(self._rate_limit_reset))}
+
+    def _limit(self) -> Optional[Response]:
+        # returns a rate limit error response if the request exceeds a rate limit
+        with self._lock:
+            now = time.time()
+            if now >= self._rate_limit_reset:
+                self._rate_limit_used = 0
+                self._rate_limit_reset = now + self.rate_limit_window
+            if self._rate_limit_used >= self.rate_limit:
+                self.rate_limited += 1
+                return Response(json.dumps(dict(message=f'API rate limit exceeded for installation ID 1.')),
+                                status=403, content_type='application/json', headers=self._rate_limit_headers())
+            self._rate_limit_used += 1
+
+            if request.method not in ['GET', 'HEAD'] and not request.path.endswith('/graphql'):
+                self._writes += 1
+                if self.secondary_rate_limit_every and self._writes % self.secondary_rate_limit_every == 0:
+                    self.secondary_rate_limited += 1
+                    headers = self._rate_limit_headers()
+                    if self.secondary_rate_limit_retry_after is not None:
+                        headers['Retry-After'] = str(self.secondary_rate_limit_retry_after)
+                    return Response(json.dumps(dict(message='You have exceeded a secondary rate limit. '
+                                                            'Please wait a few minutes before you try again.')),
+                                    status=403, content_type='application/json', headers=headers)
+        return None
+
+    def create_app(self) -> Flask:
+        app = Flask('fake-github')
+        prefix = '/api/repos/<owner>/<repo>'
+
+        @app.before_request
+        def before():
+            if request.path == '/health':
+                return None
+            with self._lock:
+                self.requests.append(f'{request.method} {request.url_rule.rule if request.url_rule else request.path}')
+            if self.latency:
+                time.sleep(self.latency)
+            return self._limit()
+
+        @app.after_request
+        def after(response: Response) -> Response:
+            if request.path != '/health':
+                with self._lock:
+                    for header, value in self._rate_limit_headers().items():
+                        response.headers.setdefault(header, value)
+            return response
+
+        @app.route('/health')
+        def health():
+            return {'health': 'alive'}
+
+        @app.route(prefix)
+        def get_repo(owner: str, repo: str):
+            return dict(id=1, name=self.repo, full_name=self.full_name, owner=dict(login=self.owner), url=self.repo_url)
+
+        @app.route(f'{prefix}/commits/<sha>')
+        def get_commit(owner: str, repo: str, sha: str):
+            return dict(sha=sha, url=f'{self.repo_url}/commits/{sha}')
+
+        @app.route(f'{prefix}/commits/<sha>/check-runs')
+        def get_check_runs(owner: str, repo: str, sha: str):
+            with self._lock:
+                runs = [self._check_run(run) for run in self.check_runs.get(sha, [])
+                        if request.args.get('check_name') in [None, run['name']]]
+            return self._paginate(runs, 'check_runs', total_count=len(runs))
+
+        @app.route(f'{prefix}/check-runs', methods=['POST'])
+        def create_check_run(owner: str, repo: str):
+            with self._lock:
+                run_id = self._add_check_run(request.json)
+                return self._check_run(self._find_check_run(run_id)), 201
+
+        @app.route(f'{prefix}/check-runs/<int:run_id>', methods=['GET', 'PATCH'])
+        def check_run(owner: str, repo: str, run_id: int):
+            with self._lock:
+                run = self._find_check_run(run_id)
+                if run is None:
+                    return dict(message='Not Found'), 404
+                if request.method == 'PATCH':
+                    output = request.json.get('output') or {}
+                    run['output'].update({k: v for k, v in output.items() if k in ['title', 'summary']})
+                    self.annotations[run_id].extend(output.get('annotations') or [])
+                return self._check_run(run)
+
+        @app.route(f'{prefix}/check-runs/<int:run_id>/annotations')
+        def get_annotations(owner: str, repo: str, run_id: int):
+            with self._lock:
+                annotations = list(self.annotations.get(run_id, []))
+            return self._paginate(annotations)
+
+        @app.route(f'{prefix}/compare/<path:basehead>')
+        def compare(owner: str, repo: str, basehead: str):
+            base, head = basehead.split('...', 1)
+            with self._lock:
+                base_sha = next((pull['base_sha'] for pull in self.pulls if pull['base_ref'] == base), base)
+            return dict(merge_base_commit=dict(sha=base_sha), status='ahead', ahead_by=1, behind_by=0)
+
+        @app.route(f'{prefix}/commits/<sha>/pulls')
+        def get_commit_pulls(owner: str, repo: str, sha: str):
+            with self._lock:
+                pulls = [self._pull(pull) for pull in self.pulls if pull['head_sha'] == sha]
+            return self._paginate(pulls)
+
+        @app.route(f'{prefix}/pulls/<int:number>')
+        def get_pull(owner: str, repo: str, number: int):
+            with self._lock:
+                if not 0 < number <= len(self.pulls):
+                    return dict(message='Not Found'), 404
+                return self._pull(self.pulls[number - 1])
+
+        @app.route('/api/search/issues')
+        def search_issues():
+            query = request.args.get('q', '')
+            with self._lock:
+                issues = [dict(number=pull['number'], state=pull['state'],
+                               url=f'{self.repo_url}/issues/{pull["number"]}',
+                               pull_request=dict(url=f'{self.repo_url}/pulls/{pull["number"]}'),
+                               repository_url=self.repo_url)
+                          for pull in self.pulls if pull['head_sha'] in query]
+            return self._paginate(issues, 'items', total_count=len(issues), incomplete_results=False)
+
+        @app.route(f'{prefix}/issues/<int:number>/comments', methods=['POST'])
+        def create_comment(owner: str, repo: str, number: int):
+            with self._lock:
+                comment = dict(id=next(self._ids), pull=number, body=request.json['body'], minimized=False)
+                self.comments.setdefault(number, []).append(comment)
+                return self._comment(comment), 201
+
+        @app.route(f'{prefix}/issues/comments/<int:comment_id>', methods=['GET', 'PATCH'])
+        def comment(owner: str, repo: str, comment_id: int):
+            with self._lock:
+                comment = self._find_comment(comment_id)
+                if comment is None:
+                    return dict(message='Not Found'), 404
+                if request.method == 'PATCH':
+                    comment['body'] = request.json['body']
+                return self._comment(comment)
+
+        @app.route('/api/graphql', methods=['POST'])
+        def graphql():
+            query = request.json['query']
+            with self._lock:
+                if query.startswith('query ListReferences'):
+                    commits = {f'commit{idx}': self._graphql_commit(sha, request.json['variables']['checkName'])
+                               for idx, sha in re.findall(r'commit(\d+): object\(oid: "([^"]+)"\)', query)}
+                    pulls = {f'pull{idx}': dict(comments=dict(nodes=self._graphql_comments(int(number))))
+                             for idx, number in re.findall(r'pull(\d+): pullRequest\(number: (\d+)\)', query)}
+                    return dict(data=dict(repository={**commits, **pulls}))
+                if query.startswith('query ListComments'):
+                    number = int(re.search(r'pullRequest\(number: (\d+)\)', query).group(1))
+                    return dict(data=dict(repository=dict(pullRequest=dict(comments=dict(nodes=self._graphql_comments(number))))))
+                if query.startswith('mutation MinimizeComment'):
+                    node_id = re.search(r'subjectId: "([^"]+)"', query).group(1)
+                    comment = self._find_comment(int(node_id.split('-')[-1]))
+                    if comment is not None:
+                        comment['minimized'] = True
+                    return dict(data=dict(minimizeComment=dict(minimizedComment=dict(isMinimized=comment is not None))))
+            return dict(errors=[dict(message=f'Unsupported query: {query[:50]}')]), 200
+
+        return app
+
+    def _graphql_commit(self, sha: str, check_name: str) -> Dict[str, Any]:
+        runs = [dict(databaseId=run['id'], name=run['name'], status=run['status'].upper(),
+                     startedAt=run['started_at'], title=run['output']['title'], summary=run['output']['summary'],
+                     annotations=dict(pageInfo=dict(hasNextPage=len(self.annotations[run['id']]) > 50),
+                                      nodes=[dict(title=annotation.get('title'), message=annotation.get('message'),
+                                                  rawDetails=annotation.get('raw_details'))
+                                             for annotation in self.annotations[run['id']][:50]]))
+                for run in self.check_runs.get(sha, []) if run['name'] == check_name]
+        return dict(checkSuites=dict(pageInfo=dict(hasNextPage=False),
+                                     nodes=[dict(checkRuns=dict(pageInfo=dict(hasNextPage=False), nodes=runs))]))
+
+    def _graphql_comments(self, number: int) -> List[Dict[str, Any]]:
+        return [dict(id=f'IC-{comment["id"]}', databaseId=comment['id'], viewerDidAuthor=True, body=comment['body'],
+                     isMinimized=comment['minimized'], url=self._comment(comment)['html_url'])
+                for comment in self.comments.get(number, [])][-100:]
+
+    def start(self) -> 'FakeGitHub':
+        # the fake API has to serve concurrent requests to show the effect of concurrent reads
+        self._server = start_api(self.create_app(), port=0, threaded=True)
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            stop_api(self._server)
+            self._server = None
+
+    def __enter__(self) -> 'FakeGitHub':
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
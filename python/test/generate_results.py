@@ -0,0 +1,451 @@
+"""
+Generates synthetic test result files of all supported formats for tests and benchmarks.
+
+All formats render the same plan of test suites, test cases and runs, so their parsed results are comparable.
+Formats that cannot express nested test suites (xUnit, TRX) flatten the nesting into class names,
+formats that have no error state (xUnit) report errors as failures.
+
+    python test/generate_results.py --format nunit3 --cases 100000 --depth 3 --reruns 2 --non-bmp out/
+"""
+import argparse
+import json
+import os
+import random
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import List, Optional, Callable, Dict, Iterator, TextIO, Tuple
+from xml.sax.saxutils import escape, quoteattr
+
+formats = ['junit', 'nunit2', 'nunit3', 'xunit', 'trx', 'dart', 'mocha']
+extensions = dict(junit='xml', nunit2='xml', nunit3='xml', xunit='xml', trx='trx', dart='json', mocha='json')
+non_bmp_chars = '\U0001F600\U0001F9EA\U00010348\U0001D11E'
+words = ['assert', 'expected', 'actual', 'value', 'but', 'was', 'at', 'line', 'in', 'module', 'call', 'result']
+
+
+@dataclass(frozen=True)
+class GeneratorOptions:
+    cases: int = 1000
+    cases_per_file: int = 10000
+    cases_per_suite: int = 100
+    suites_per_suite: int = 10
+    depth: int = 1
+    failure_rate: float = 0.01
+    error_rate: float = 0.0
+    skip_rate: float = 0.05
+    reruns: int = 0
+    message_size: int = 64
+    stdout_size: int = 0
+    non_bmp: bool = False
+    seed: int = 0
+
+
+@dataclass(frozen=True)
+class Run:
+    result: str
+    time: float
+    message: Optional[str] = None
+    content: Optional[str] = None
+    stdout: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class Case:
+    class_name: str
+    test_name: str
+    test_file: str
+    line: int
+    runs: List[Run]
+
+
+@dataclass
+class Suite:
+    name: str
+    suites: List['Suite'] = field(default_factory=list)
+    cases: List[Case] = field(default_factory=list)
+
+    def iter_cases(self) -> Iterator[Case]:
+        for suite in self.suites:
+            yield from suite.iter_cases()
+        yield from self.cases
+
+    def iter_leaves(self, path: List[str]) -> Iterator[Tuple[List[str], 'Suite']]:
+        path = path + [self.name]
+        for suite in self.suites:
+            yield from suite.iter_leaves(path)
+        if self.cases:
+            yield path, self
+
+    def counts(self) -> Counter:
+        return Counter(run.result for case in self.iter_cases() for run in case.runs)
+
+    def time(self) -> float:
+        return sum(run.time for case in self.iter_cases() for run in case.runs)
+
+
+@dataclass(frozen=True)
+class GeneratedFiles:
+    files: List[str]
+    bytes: int
+    cases: int
+    runs: Counter
+
+
+class TextPool:
+    """Provides random texts of a given size without generating a new text per run."""
+    def __init__(self, rnd: random.Random, size: int, non_bmp: bool, pool_size: int = 64):
+        self.rnd = rnd
+        self.texts = [self.text(size, non_bmp) for _ in range(pool_size)] if size > 0 else [None]
+
+    def text(self, size: int, non_bmp: bool) -> str:
+        chars = []
+        length = 0
+        while length < size:
+            word = self.rnd.choice(words)
+            if non_bmp and self.rnd.random() < 0.25:
+                word += self.rnd.choice(non_bmp_chars)
+            chars.append(word)
+            length += len(word) + 1
+        return ' '.join(chars)[:size]
+
+    def get(self) -> Optional[str]:
+        return self.rnd.choice(self.texts)
+
+
+def generate_suites(options: GeneratorOptions) -> List[List[Suite]]:
+    """Plans the test suites of all files, returns the top-level suites per file."""
+    rnd = random.Random(options.seed)
+    messages = TextPool(rnd, options.message_size, options.non_bmp)
+    stdouts = TextPool(rnd, options.stdout_size, options.non_bmp)
+    name_suffix = non_bmp_chars[0] if options.non_bmp else ''
+
+    def get_run(result: str) -> Run:
+        message = messages.get() if result != 'success' else None
+        return Run(result=result,
+                   time=round(rnd.random() * 0.02, 3),
+                   message=message,
+                   content=f'{message}\n  at Test.method() in file:line' if message and result != 'skipped' else None,
+                   stdout=stdouts.get())
+
+    def get_case(file: int, idx: int) -> Case:
+        value = rnd.random()
+        if value < options.failure_rate:
+            result = 'failure'
+        elif value < options.failure_rate + options.error_rate:
+            result = 'error'
+        elif value < options.failure_rate + options.error_rate + options.skip_rate:
+            result = 'skipped'
+        else:
+            result = 'success'
+        runs = [get_run(result)]
+        # failing cases are rerun, the last rerun succeeds
+        if result in ['failure', 'error'] and options.reruns > 0:
+            runs.extend(get_run(result) for _ in range(options.reruns - 1))
+            runs.append(get_run('success'))
+        module = f'module{idx // options.cases_per_suite}'
+        return Case(class_name=f'package{file}.{module}.TestClass{name_suffix}',
+                    test_name=f'test_{idx}{name_suffix}',
+                    test_file=f'package{file}/{module}.py',
+                    line=idx % options.cases_per_suite * 10 + 1,
+                    runs=runs)
+
+    files = []
+    for file, first in enumerate(range(0, options.cases, options.cases_per_file)):
+        indices = range(first, min(options.cases, first + options.cases_per_file))
+        suites = [Suite(name=f'package{file}.module{indices[start] // options.cases_per_suite}',
+                        cases=[get_case(file, idx) for idx in indices[start:start + options.cases_per_suite]])
+                  for start in range(0, len(indices), options.cases_per_suite)]
+        for level in range(1, options.depth):
+            suites = [Suite(name=f'level{options.depth - level}.group{start // options.suites_per_suite}',
+                            suites=suites[start:start + options.suites_per_suite])
+                      for start in range(0, len(suites), options.suites_per_suite)]
+        files.append(suites)
+    return files
+
+
+def write_junit(w: TextIO, suites: List[Suite]):
+    def write_suite(suite: Suite, indent: str):
+        counts = suite.counts()
+        w.write(f'{indent}<testsuite name={quoteattr(suite.name)} tests="{sum(counts.values())}" '
+                f'failures="{counts["failure"]}" errors="{counts["error"]}" skipped="{counts["skipped"]}" '
+                f'time="{suite.time():.3f}">\n')
+        for child in suite.suites:
+            write_suite(child, indent + '  ')
+        for case in suite.cases:
+            for run in case.runs:
+                w.write(f'{indent}  <testcase classname={quoteattr(case.class_name)} name={quoteattr(case.test_name)} '
+                        f'file={quoteattr(case.test_file)} line="{case.line}" time="{run.time:.3f}">')
+                if run.result != 'success':
+                    w.write(f'<{run.result} message={quoteattr(run.message or "")}>{escape(run.content or "")}</{run.result}>')
+                if run.stdout:
+                    w.write(f'<system-out>{escape(run.stdout)}</system-out>')
+                w.write('</testcase>\n')
+        w.write(f'{indent}</testsuite>\n')
+
+    w.write('<?xml version="1.0" encoding="utf-8"?>\n<testsuites>\n')
+    for suite in suites:
+        write_suite(suite, '  ')
+    w.write('</testsuites>\n')
+
+
+def write_nunit(w: TextIO, suites: List[Suite], version: int):
+    nunit_results = dict(success='Success', failure='Failure', error='Error', skipped='Ignored') if version == 2 else \
+        dict(success='Passed', failure='Failed', error='Error', skipped='Skipped')
+
+    def write_suite(suite: Suite, indent: str):
+        counts = suite.counts()
+        suite_type = 'TestFixture' if suite.cases else 'TestSuite' if version == 3 else 'Namespace'
+        if version == 2:
+            w.write(f'{indent}<test-suite type="{suite_type}" name={quoteattr(suite.name)} executed="True" '
+                    f'result="{"Failure" if counts["failure"] or counts["error"] else "Success"}" time="{suite.time():.3f}">'
+                    f'<results>\n')
+        else:
+            w.write(f'{indent}<test-suite type="{suite_type}" name={quoteattr(suite.name)} fullname={quoteattr(suite.name)} '
+                    f'testcasecount="{sum(counts.values())}" passed="{counts["success"]}" failed="{counts["failure"]}" '
+                    f'errors="{counts["error"]}" skipped="{counts["skipped"]}" duration="{suite.time():.3f}">\n')
+        for child in suite.suites:
+            write_suite(child, indent + '  ')
+        for case in suite.cases:
+            for run in case.runs:
+                result = nunit_results[run.result]
+                if version == 2:
+                    w.write(f'{indent}  <test-case name={quoteattr(case.class_name + "." + case.test_name)} '
+                            f'executed="{run.result != "skipped"}" result="{result}" '
+                            f'success="{run.result == "success"}" time="{run.time:.3f}">')
+                else:
+                    w.write(f'{indent}  <test-case name={quoteattr(case.test_name)} '
+                            f'fullname={quoteattr(case.class_name + "." + case.test_name)} '
+                            f'classname={quoteattr(case.class_name)} result="{result}" duration="{run.time:.3f}">')
+                if run.result == 'skipped':
+                    w.write(f'<reason><message>{escape(run.message or "")}</message></reason>')
+                elif run.result != 'success':
+                    w.write(f'<failure><message>{escape(run.message or "")}</message>'
+                            f'<stack-trace>{escape(run.content or "")}</stack-trace></failure>')
+                if run.stdout and version == 3:
+                    w.write(f'<output>{escape(run.stdout)}</output>')
+                w.write('</test-case>\n')
+        w.write(f'{indent}{"</results>" if version == 2 else ""}</test-suite>\n')
+
+    counts = sum((suite.counts() for suite in suites), Counter())
+    w.write('<?xml version="1.0" encoding="utf-8"?>\n')
+    if version == 2:
+        w.write(f'<test-results name="generated" total="{sum(counts.values()) - counts["skipped"]}" errors="{counts["error"]}" '
+                f'failures="{counts["failure"]}" not-run="{counts["skipped"]}" inconclusive="0" ignored="0" skipped="0" invalid="0">\n'
+                f'<test-suite type="Assembly" name="generated.dll" executed="True" result="Success"><results>\n')
+    else:
+        w.write(f'<test-run id="0" testcasecount="{sum(counts.values())}" result="Passed" total="{sum(counts.values())}" '
+                f'passed="{counts["success"]}" failed="{counts["failure"]}" errors="{counts["error"]}" skipped="{counts["skipped"]}">\n')
+    for suite in suites:
+        write_suite(suite, '  ')
+    w.write('</results></test-suite>\n</test-results>\n' if version == 2 else '</test-run>\n')
+
+
+def write_xunit(w: TextIO, suites: List[Suite]):
+    xunit_results = dict(success='Pass', failure='Fail', error='Fail', skipped='Skip')
+    leaves = [('.'.join(path), suite) for top in suites for path, suite in top.iter_leaves([])]
+    counts = sum((suite.counts() for suite in suites), Counter())
+
+    w.write('<?xml version="1.0" encoding="utf-8"?>\n<assemblies>\n')
+    w.write(f'  <assembly name="generated.dll" total="{sum(counts.values())}" passed="{counts["success"]}" '
+            f'failed="{counts["failure"] + counts["error"]}" skipped="{counts["skipped"]}" '
+            f'time="{sum(suite.time() for suite in suites):.3f}" run-date="2023-01-01" run-time="00:00:00">\n')
+    for name, suite in leaves:
+        counts = suite.counts()
+        w.write(f'    <collection name={quoteattr(name)} total="{sum(counts.values())}" passed="{counts["success"]}" '
+                f'failed="{counts["failure"] + counts["error"]}" skipped="{counts["skipped"]}" time="{suite.time():.3f}">\n')
+        for case in suite.cases:
+            for run in case.runs:
+                w.write(f'      <test name={quoteattr(case.class_name + "." + case.test_name)} type={quoteattr(case.class_name)} '
+                        f'method={quoteattr(case.test_name)} time="{run.time:.3f}" result="{xunit_results[run.result]}">')
+                if run.result == 'skipped':
+                    w.write(f'<reason>{escape(run.message or "")}</reason>')
+                elif run.result != 'success':
+                    w.write(f'<failure exception-type="Exception"><message>{escape(run.message or "")}</message>'
+                            f'<stack-trace>{escape(run.content or "")}</stack-trace></failure>')
+                if run.stdout:
+                    w.write(f'<output>{escape(run.stdout)}</output>')
+                w.write('</test>\n')
+        w.write('    </collection>\n')
+    w.write('  </assembly>\n</assemblies>\n')
+
+
+def write_trx(w: TextIO, suites: List[Suite]):
+    trx_outcomes = dict(success='Passed', failure='Failed', error='Error', skipped='NotExecuted')
+    counts = sum((suite.counts() for suite in suites), Counter())
+    rnd = random.Random(sum(counts.values()))
+    runs = [(f'{".".join(path[:-1] + [case.class_name])}' if len(path) > 1 else case.class_name, case, run,
+             uuid.UUID(int=rnd.getrandbits(128)), uuid.UUID(int=rnd.getrandbits(128)))
+            for top in suites
+            for path, suite in top.iter_leaves([])
+            for case in suite.cases
+            for run in case.runs]
+
+    w.write('<?xml version="1.0" encoding="utf-8"?>\n'
+            '<TestRun id="00000000-0000-0000-0000-000000000000" name="generated" '
+            'xmlns="http://microsoft.com/schemas/VisualStudio/TeamTest/2010">\n')
+    w.write(f'  <ResultSummary outcome="Completed"><Counters total="{sum(counts.values())}" '
+            f'executed="{sum(counts.values()) - counts["skipped"]}" passed="{counts["success"]}" '
+            f'failed="{counts["failure"]}" error="{counts["error"]}" notExecuted="{counts["skipped"]}"/></ResultSummary>\n')
+    w.write('  <TestDefinitions>\n')
+    for class_name, case, run, test_id, execution_id in runs:
+        w.write(f'    <UnitTest name={quoteattr(case.test_name)} id="{test_id}"><Execution id="{execution_id}"/>'
+                f'<TestMethod className={quoteattr(class_name)} name={quoteattr(case.test_name)}/></UnitTest>\n')
+    w.write('  </TestDefinitions>\n  <Results>\n')
+    for class_name, case, run, test_id, execution_id in runs:
+        w.write(f'    <UnitTestResult executionId="{execution_id}" testId="{test_id}" testName={quoteattr(case.test_name)} '
+                f'duration="00:00:{run.time:010.7f}" outcome="{trx_outcomes[run.result]}">')
+        if run.stdout or run.result != 'success':
+            w.write('<Output>')
+            if run.stdout:
+                w.write(f'<StdOut>{escape(run.stdout)}</StdOut>')
+            if run.result != 'success':
+                w.write(f'<ErrorInfo><Message>{escape(run.message or "")}</Message>'
+                        f'<StackTrace>{escape(run.content or "")}</StackTrace></ErrorInfo>')
+            w.write('</Output>')
+        w.write('</UnitTestResult>\n')
+    w.write('  </Results>\n</TestRun>\n')
+
+
+def write_dart(w: TextIO, suites: List[Suite]):
+    # https://github.com/dart-lang/test/blob/master/pkgs/test/doc/json_reporter.md
+    ids = iter(range(1, 2 ** 31))
+    now = [0]
+
+    def event(type: str, **kwargs):
+        w.write(json.dumps(dict(kwargs, type=type, time=now[0])))
+        w.write('\n')
+
+    def write_group(suite: Suite, suite_id: int, group_ids: List[int], names: List[str]):
+        group_id = next(ids)
+        event('group', group=dict(id=group_id, suiteID=suite_id, parentID=group_ids[-1] if group_ids else None,
+                                  name=' '.join(names + [suite.name]), testCount=sum(len(case.runs) for case in suite.iter_cases())))
+        for child in suite.suites:
+            write_group(child, suite_id, group_ids + [group_id], names + [suite.name])
+        for case in suite.cases:
+            for run in case.runs:
+                test_id = next(ids)
+                event('testStart', test=dict(id=test_id, name=' '.join(names + [suite.name, case.test_name]), suiteID=suite_id,
+                                             groupIDs=group_ids + [group_id], line=case.line, column=1, url=f'file:///{case.test_file}'))
+                if run.stdout:
+                    event('print', testID=test_id, messageType='print', message=run.stdout)
+                if run.result == 'skipped':
+                    event('print', testID=test_id, messageType='skip', message=f'Skip: {run.message}')
+                elif run.result != 'success':
+                    event('error', testID=test_id, error=run.message, stackTrace=run.content, isFailure=run.result == 'failure')
+                now[0] += int(run.time * 1000)
+                event('testDone', testID=test_id, result=run.result if run.result != 'skipped' else 'success',
+                      skipped=run.result == 'skipped', hidden=False)
+
+    event('start', protocolVersion='0.1.1', runnerVersion='1.23.1', pid=1)
+    for suite in suites:
+        suite_id = next(ids)
+        event('suite', suite=dict(id=suite_id, platform='vm', path=f'test/{suite.name}_test.dart'))
+        write_group(suite, suite_id, [], [])
+    event('done', success=True)
+
+
+def write_mocha(w: TextIO, suites: List[Suite]):
+    def get_tests(suite: Suite, titles: List[str]) -> Iterator[dict]:
+        titles = titles + [suite.name]
+        for child in suite.suites:
+            yield from get_tests(child, titles)
+        for case in suite.cases:
+            for retry, run in enumerate(case.runs):
+                test = dict(title=case.test_name, fullTitle=' '.join(titles + [case.test_name]), file=f'/{case.test_file}',
+                            duration=int(run.time * 1000), currentRetry=retry, err={}, result=run.result)
+                if run.result in ['failure', 'error']:
+                    test['err'] = dict(stack=run.content, message=run.message, name='AssertionError')
+                    if run.result == 'error':
+                        test['err']['errorMode'] = 'error'
+                if run.stdout:
+                    test['stdout'] = run.stdout
+                yield test
+
+    tests = [test for suite in suites for test in get_tests(suite, [])]
+    results = dict(
+        stats=dict(suites=sum(1 for suite in suites for _ in suite.iter_leaves([])), tests=len(tests),
+                   passes=sum(1 for test in tests if test['result'] == 'success'),
+                   pending=sum(1 for test in tests if test['result'] == 'skipped'),
+                   failures=sum(1 for test in tests if test['result'] in ['failure', 'error']),
+                   start='2023-01-01T00:00:00.000Z', end='2023-01-01T00:00:01.000Z',
+                   duration=sum(test['duration'] for test in tests)),
+        tests=tests,
+        pending=[test for test in tests if test['result'] == 'skipped'],
+        failures=[test for test in tests if test['result'] in ['failure', 'error']],
+        passes=[test for test in tests if test['result'] == 'success'],
+    )
+    for test in tests:
+        del test['result']
+    json.dump(results, w, indent=2)
+
+
+writers: Dict[str, Callable[[TextIO, List[Suite]], None]] = dict(
+    junit=write_junit,
+    nunit2=lambda w, suites: write_nunit(w, suites, 2),
+    nunit3=lambda w, suites: write_nunit(w, suites, 3),
+    xunit=write_xunit,
+    trx=write_trx,
+    dart=write_dart,
+    mocha=write_mocha,
+)
+
+
+def get_expected_runs(format: str, runs: Counter) -> Counter:
+    """Returns the results that parsing the generated files of the given format is expected to yield."""
+    if format == 'xunit':
+        runs = runs.copy()
+        runs['failure'] += runs.pop('error', 0)
+    return +runs
+
+
+def write_files(path: str, format: str, options: GeneratorOptions = GeneratorOptions()) -> GeneratedFiles:
+    if format not in writers:
+        raise ValueError(f'Unsupported format: {format}, supported formats: {", ".join(formats)}')
+
+    files = []
+    cases = 0
+    runs = Counter()
+    for idx, suites in enumerate(generate_suites(options)):
+        filename = os.path.join(path, f'{format}-{idx:05d}.{extensions[format]}')
+        with open(filename, 'wt', encoding='utf-8') as w:
+            writers[format](w, suites)
+        files.append(filename)
+        cases += sum(1 for suite in suites for _ in suite.iter_cases())
+        runs.update(sum((suite.counts() for suite in suites), Counter()))
+
+    return GeneratedFiles(files=files,
+                          bytes=sum(os.path.getsize(file) for file in files),
+                          cases=cases,
+                          runs=get_expected_runs(format, runs))
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Generates synthetic test result files.')
+    parser.add_argument('path', help='directory to write files into')
+    parser.add_argument('--format', choices=formats, action='append', help='formats to generate, default: all formats')
+    parser.add_argument('--cases', type=int, default=GeneratorOptions.cases, help='number of test cases')
+    parser.add_argument('--cases-per-file', type=int, default=GeneratorOptions.cases_per_file, help='number of test cases per file')
+    parser.add_argument('--depth', type=int, default=GeneratorOptions.depth, help='nesting depth of test suites')
+    parser.add_argument('--failure-rate', type=float, default=GeneratorOptions.failure_rate, help='fraction of failing test cases')
+    parser.add_argument('--error-rate', type=float, default=GeneratorOptions.error_rate, help='fraction of erroring test cases')
+    parser.add_argument('--skip-rate', type=float, default=GeneratorOptions.skip_rate, help='fraction of skipped test cases')
+    parser.add_argument('--reruns', type=int, default=GeneratorOptions.reruns, help='reruns of failing test cases, the last rerun succeeds')
+    parser.add_argument('--message-size', type=int, default=GeneratorOptions.message_size, help='characters of failure messages')
+    parser.add_argument('--stdout-size', type=int, default=GeneratorOptions.stdout_size, help='characters of stdout per run')
+    parser.add_argument('--non-bmp', action='store_true', help='add characters outside the Basic Multilingual Plane')
+    parser.add_argument('--seed', type=int, default=GeneratorOptions.seed, help='random seed')
+    args = parser.parse_args(argv)
+
+    options = GeneratorOptions(cases=args.cases, cases_per_file=args.cases_per_file, depth=args.depth,
+                               failure_rate=args.failure_rate, error_rate=args.error_rate, skip_rate=args.skip_rate,
+                               reruns=args.reruns, message_size=args.message_size, stdout_size=args.stdout_size,
+                               non_bmp=args.non_bmp, seed=args.seed)
+    os.makedirs(args.path, exist_ok=True)
+    for format in args.format or formats:
+        generated = write_files(args.path, format, options)
+        print(f'{format}: {len(generated.files)} files, {generated.bytes:,} bytes, '
+              f'{generated.cases:,} cases, {sum(generated.runs.values()):,} runs')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import importlib.util
 import io
 import json
 import os
@@ -18,9 +19,11 @@ from publish import __version__, pull_request_build_mode_merge, fail_on_mode_fai
     fail_on_mode_nothing, comment_modes, comment_mode_always, report_suite_out_log, report_suite_err_log, \
     report_suite_logs, report_no_suite_logs, default_report_suite_logs, \
     default_annotations, all_tests_list, skipped_tests_list, none_annotations, \
-    pull_request_build_modes, punctuation_space
+    pull_request_build_modes, punctuation_space, profile_modes, profile_mode_off, trace_formats, trace_format_otlp, \
+    arrow_formats, arrow_format_ipc
+from publish.arrow import write_suites
 from publish.github_action import GithubAction
-from publish.unittestresults import UnitTestSuite, ParsedUnitTestResults, ParseError
+from publish.unittestresults import UnitTestSuite, ParsedUnitTestResults, ParseError, get_stats, get_test_results
 from publish_test_results import action_fail_required, get_conclusion, get_commit_sha, get_var, \
     check_var, check_var_condition, deprecate_var, deprecate_val, log_parse_errors, \
     get_settings, get_annotations_config, Settings, get_files, is_float, parse_files, \
@@ -172,6 +175,7 @@ class Test(unittest.TestCase):
                      is_fork=False,
                      repo='repo',
                      commit='commit',
+                     workspace=None,
                      fail_on_errors=True,
                      fail_on_failures=True,
                      action_fail=False,
@@ -198,14 +202,36 @@ class Test(unittest.TestCase):
                      large_files=False,
                      ignore_runs=False,
                      check_run_annotation=default_annotations,
+                     max_annotations=None,
+                     cluster_annotations=None,
                      seconds_between_github_reads=1.5,
                      seconds_between_github_writes=2.5,
                      secondary_rate_limit_wait_seconds=6.0,
+                     adaptive_request_pacing=True,
+                     max_concurrent_reads=1,
+                     max_concurrent_writes=1,
+                     batch_reads=False,
+                     github_api_cache_file=None,
+                     results_store_file=None,
+                     profile=profile_mode_off,
+                     profile_directory='profile',
+                     profile_hash_strings=True,
+                     trace_file=None,
+                     trace_format=trace_format_otlp,
                      json_file=None,
                      json_thousands_separator=punctuation_space,
                      json_suite_details=False,
                      json_test_case_results=False,
-                     search_pull_requests=False) -> Settings:
+                     json_cases_file=None,
+                     json_cases_messages=False,
+                     arrow_file=None,
+                     arrow_suites_file=None,
+                     arrow_format=arrow_format_ipc,
+                     search_pull_requests=False,
+                     skip_unchanged_check_run=False,
+                     defer_annotations=False,
+                     annotations_checkpoint_file=None,
+                     dry_run_directory=None) -> Settings:
         return Settings(
             token=token,
             api_url=api_url,
@@ -218,10 +244,16 @@ class Test(unittest.TestCase):
             is_fork=is_fork,
             repo=repo,
             commit=commit,
+            workspace=workspace,
             json_file=json_file,
             json_thousands_separator=json_thousands_separator,
             json_suite_details=json_suite_details,
             json_test_case_results=json_test_case_results,
+            json_cases_file=json_cases_file,
+            json_cases_messages=json_cases_messages,
+            arrow_file=arrow_file,
+            arrow_suites_file=arrow_suites_file,
+            arrow_format=arrow_format,
             fail_on_errors=fail_on_errors,
             fail_on_failures=fail_on_failures,
             action_fail=action_fail,
@@ -248,10 +280,27 @@ class Test(unittest.TestCase):
             large_files=large_files,
             ignore_runs=ignore_runs,
             check_run_annotation=check_run_annotation.copy(),
+            max_annotations=max_annotations,
+            cluster_annotations=cluster_annotations,
             seconds_between_github_reads=seconds_between_github_reads,
             seconds_between_github_writes=seconds_between_github_writes,
             secondary_rate_limit_wait_seconds=secondary_rate_limit_wait_seconds,
+            adaptive_request_pacing=adaptive_request_pacing,
+            max_concurrent_reads=max_concurrent_reads,
+            max_concurrent_writes=max_concurrent_writes,
+            batch_reads=batch_reads,
+            github_api_cache_file=github_api_cache_file,
+            results_store_file=results_store_file,
+            profile=profile,
+            profile_directory=profile_directory,
+            profile_hash_strings=profile_hash_strings,
+            trace_file=trace_file,
+            trace_format=trace_format,
             search_pull_requests=search_pull_requests,
+            skip_unchanged_check_run=skip_unchanged_check_run,
+            defer_annotations=defer_annotations,
+            annotations_checkpoint_file=annotations_checkpoint_file,
+            dry_run_directory=dry_run_directory,
         )
 
     def test_get_settings(self):
@@ -261,6 +310,11 @@ class Test(unittest.TestCase):
                    if key not in {'GITHUB_API_URL', 'GITHUB_GRAPHQL_URL', 'GITHUB_SHA', 'GITHUB_EVENT_PATH'}}
         self.do_test_get_settings(**options)
 
+    def test_get_settings_workspace(self):
+        for workspace in [None, '', '/home/runner/work/repo/repo']:
+            with self.subTest(workspace=workspace):
+                self.do_test_get_settings(GITHUB_WORKSPACE=workspace, expected=self.get_settings(workspace=workspace or None))
+
     def test_get_settings_event_file(self):
         self.do_test_get_settings(expected=self.get_settings(event_file=None))
         self.do_test_get_settings(EVENT_FILE='', expected=self.get_settings(event_file=None))
@@ -437,6 +491,30 @@ class Test(unittest.TestCase):
                     self.do_test_get_settings(TEST_CHANGES_LIMIT=limit, expected=self.get_settings(test_changes_limit=10))
                 self.assertIn(f'TEST_CHANGES_LIMIT must be a positive integer or 0: {limit}', re.exception.args)
 
+    def test_get_settings_max_annotations(self):
+        self.do_test_get_settings(MAX_ANNOTATIONS='0', expected=self.get_settings(max_annotations=0))
+        self.do_test_get_settings(MAX_ANNOTATIONS='1000', expected=self.get_settings(max_annotations=1000))
+        self.do_test_get_settings(MAX_ANNOTATIONS='unlimited', expected=self.get_settings(max_annotations=None))
+        self.do_test_get_settings(MAX_ANNOTATIONS=None, expected=self.get_settings(max_annotations=None))
+
+        for limit in ['-1', '1.0', '12e', 'string']:
+            with self.subTest(limit=limit):
+                with self.assertRaises(RuntimeError) as re:
+                    self.do_test_get_settings(MAX_ANNOTATIONS=limit, expected=self.get_settings(max_annotations=None))
+                self.assertIn(f'MAX_ANNOTATIONS must be a positive integer, 0 or "unlimited": {limit}', re.exception.args)
+
+    def test_get_settings_cluster_annotations(self):
+        self.do_test_get_settings(CLUSTER_ANNOTATIONS='2', expected=self.get_settings(cluster_annotations=2))
+        self.do_test_get_settings(CLUSTER_ANNOTATIONS='100', expected=self.get_settings(cluster_annotations=100))
+        self.do_test_get_settings(CLUSTER_ANNOTATIONS='off', expected=self.get_settings(cluster_annotations=None))
+        self.do_test_get_settings(CLUSTER_ANNOTATIONS=None, expected=self.get_settings(cluster_annotations=None))
+
+        for size in ['-1', '0', '1', '1.0', 'on', 'string']:
+            with self.subTest(size=size):
+                with self.assertRaises(RuntimeError) as re:
+                    self.do_test_get_settings(CLUSTER_ANNOTATIONS=size, expected=self.get_settings(cluster_annotations=None))
+                self.assertIn(f'CLUSTER_ANNOTATIONS must be an integer larger than 1 or "off": {size}', re.exception.args)
+
     def test_get_settings_check_name(self):
         self.do_test_get_settings(CHECK_NAME='name', expected=self.get_settings(check_name='name'))
         self.do_test_get_settings(CHECK_NAME=None, expected=self.get_settings(check_name='Test Results'))
@@ -561,6 +639,96 @@ class Test(unittest.TestCase):
     def test_get_settings_secondary_rate_limit_wait_seconds(self):
         self.do_test_get_settings_seconds('SECONDARY_RATE_LIMIT_WAIT_SECONDS', 'secondary_rate_limit_wait_seconds', 60)
 
+    def test_get_settings_max_concurrent_github_reads(self):
+        self.do_test_get_settings(MAX_CONCURRENT_GITHUB_READS=None, expected=self.get_settings(max_concurrent_reads=1))
+        self.do_test_get_settings(MAX_CONCURRENT_GITHUB_READS='1', expected=self.get_settings(max_concurrent_reads=1))
+        self.do_test_get_settings(MAX_CONCURRENT_GITHUB_READS='8', expected=self.get_settings(max_concurrent_reads=8))
+
+        for val in ['none', '1.5', '-1']:
+            with self.subTest(reads=val):
+                with self.assertRaises(RuntimeError) as re:
+                    self.do_test_get_settings(MAX_CONCURRENT_GITHUB_READS=val, expected=None)
+                self.assertIn(f'MAX_CONCURRENT_GITHUB_READS must be a positive integer: {val}', re.exception.args)
+
+        with self.assertRaises(RuntimeError) as re:
+            self.do_test_get_settings(MAX_CONCURRENT_GITHUB_READS='0', expected=None)
+        self.assertIn('MAX_CONCURRENT_GITHUB_READS must be a positive integer: 0', re.exception.args)
+
+    def test_get_settings_max_concurrent_github_writes(self):
+        self.do_test_get_settings(MAX_CONCURRENT_GITHUB_WRITES=None, expected=self.get_settings(max_concurrent_writes=1))
+        self.do_test_get_settings(MAX_CONCURRENT_GITHUB_WRITES='1', expected=self.get_settings(max_concurrent_writes=1))
+        self.do_test_get_settings(MAX_CONCURRENT_GITHUB_WRITES='4', expected=self.get_settings(max_concurrent_writes=4))
+
+        for val in ['none', '1.5', '-1']:
+            with self.subTest(writes=val):
+                with self.assertRaises(RuntimeError) as re:
+                    self.do_test_get_settings(MAX_CONCURRENT_GITHUB_WRITES=val, expected=None)
+                self.assertIn(f'MAX_CONCURRENT_GITHUB_WRITES must be a positive integer: {val}', re.exception.args)
+
+        with self.assertRaises(RuntimeError) as re:
+            self.do_test_get_settings(MAX_CONCURRENT_GITHUB_WRITES='0', expected=None)
+        self.assertIn('MAX_CONCURRENT_GITHUB_WRITES must be a positive integer: 0', re.exception.args)
+
+    def test_get_settings_adaptive_github_request_pacing(self):
+        self.do_test_get_settings(ADAPTIVE_GITHUB_REQUEST_PACING='false', expected=self.get_settings(adaptive_request_pacing=False))
+        self.do_test_get_settings(ADAPTIVE_GITHUB_REQUEST_PACING='true', expected=self.get_settings(adaptive_request_pacing=True))
+        self.do_test_get_settings(ADAPTIVE_GITHUB_REQUEST_PACING=None, expected=self.get_settings(adaptive_request_pacing=True))
+
+    def test_get_settings_batch_github_reads(self):
+        warning = 'Option batch_github_reads has to be boolean, so either "true" or "false": foo'
+        self.do_test_get_settings(BATCH_GITHUB_READS='false', expected=self.get_settings(batch_reads=False))
+        self.do_test_get_settings(BATCH_GITHUB_READS='False', expected=self.get_settings(batch_reads=False))
+        self.do_test_get_settings(BATCH_GITHUB_READS='true', expected=self.get_settings(batch_reads=True))
+        self.do_test_get_settings(BATCH_GITHUB_READS='True', expected=self.get_settings(batch_reads=True))
+        self.do_test_get_settings(BATCH_GITHUB_READS='foo', expected=self.get_settings(batch_reads=False), warning=warning, exception=RuntimeError)
+        self.do_test_get_settings(BATCH_GITHUB_READS=None, expected=self.get_settings(batch_reads=False))
+
+    def test_get_settings_github_api_cache_file(self):
+        for cache_file in [None, '', 'cache.json', '/path/cache.json']:
+            with self.subTest(cache_file=cache_file):
+                self.do_test_get_settings(GITHUB_API_CACHE_FILE=cache_file, expected=self.get_settings(github_api_cache_file=cache_file or None))
+
+    def test_get_settings_results_store_file(self):
+        for store_file in [None, '', 'results.json', '/path/results.json']:
+            with self.subTest(store_file=store_file):
+                self.do_test_get_settings(RESULTS_STORE_FILE=store_file, expected=self.get_settings(results_store_file=store_file or None))
+
+    def test_get_settings_profile(self):
+        for mode in profile_modes:
+            with self.subTest(mode=mode):
+                self.do_test_get_settings(PROFILE=mode, expected=self.get_settings(profile=mode))
+        self.do_test_get_settings(PROFILE=None, expected=self.get_settings(profile=profile_mode_off))
+
+        with self.assertRaises(RuntimeError) as re:
+            self.do_test_get_settings(PROFILE='time')
+        self.assertEqual("Value 'time' is not supported for variable PROFILE, expected: off, cpu, memory, all", str(re.exception))
+
+    def test_get_settings_profile_directory(self):
+        self.do_test_get_settings(PROFILE_DIRECTORY='/tmp/profile', expected=self.get_settings(profile_directory='/tmp/profile'))
+        self.do_test_get_settings(PROFILE_DIRECTORY=None, expected=self.get_settings(profile_directory='profile'))
+
+    def test_get_settings_profile_hash_strings(self):
+        warning = 'Option profile_hash_strings has to be boolean, so either "true" or "false": foo'
+        self.do_test_get_settings(PROFILE_HASH_STRINGS='false', expected=self.get_settings(profile_hash_strings=False))
+        self.do_test_get_settings(PROFILE_HASH_STRINGS='true', expected=self.get_settings(profile_hash_strings=True))
+        self.do_test_get_settings(PROFILE_HASH_STRINGS='foo', expected=self.get_settings(profile_hash_strings=True), warning=warning, exception=RuntimeError)
+        self.do_test_get_settings(PROFILE_HASH_STRINGS=None, expected=self.get_settings(profile_hash_strings=True))
+
+    def test_get_settings_trace_file(self):
+        for trace_file in [None, '', 'trace.json', '/path/trace.json']:
+            with self.subTest(trace_file=trace_file):
+                self.do_test_get_settings(TRACE_FILE=trace_file, expected=self.get_settings(trace_file=trace_file or None))
+
+    def test_get_settings_trace_format(self):
+        for trace_format in trace_formats:
+            with self.subTest(trace_format=trace_format):
+                self.do_test_get_settings(TRACE_FORMAT=trace_format, expected=self.get_settings(trace_format=trace_format))
+        self.do_test_get_settings(TRACE_FORMAT=None, expected=self.get_settings(trace_format=trace_format_otlp))
+
+        with self.assertRaises(RuntimeError) as re:
+            self.do_test_get_settings(TRACE_FORMAT='zipkin')
+        self.assertEqual("Value 'zipkin' is not supported for variable TRACE_FORMAT, expected: otlp, chrome", str(re.exception))
+
     def do_test_get_settings_seconds(self, env_var_name: str, settings_var_name: str, default: float):
         self.do_test_get_settings(**{env_var_name: '0.001', 'expected': self.get_settings(**{settings_var_name: 0.001})})
         self.do_test_get_settings(**{env_var_name: '1', 'expected': self.get_settings(**{settings_var_name: 1.0})})
@@ -591,6 +759,38 @@ class Test(unittest.TestCase):
         self.do_test_get_settings(JSON_THOUSANDS_SEPARATOR='.', expected=self.get_settings(json_thousands_separator='.'))
         self.do_test_get_settings(JSON_THOUSANDS_SEPARATOR=' ', expected=self.get_settings(json_thousands_separator=' '))
 
+    def test_get_settings_json_cases_file(self):
+        for json_cases_file in [None, '', 'cases.jsonl', '/path/cases.jsonl']:
+            with self.subTest(json_cases_file=json_cases_file):
+                self.do_test_get_settings(JSON_CASES_FILE=json_cases_file, expected=self.get_settings(json_cases_file=json_cases_file or None))
+
+    def test_get_settings_json_cases_messages(self):
+        warning = 'Option json_cases_messages has to be boolean, so either "true" or "false": foo'
+        self.do_test_get_settings(JSON_CASES_MESSAGES='false', expected=self.get_settings(json_cases_messages=False))
+        self.do_test_get_settings(JSON_CASES_MESSAGES='true', expected=self.get_settings(json_cases_messages=True))
+        self.do_test_get_settings(JSON_CASES_MESSAGES='foo', expected=self.get_settings(json_cases_messages=False), warning=warning, exception=RuntimeError)
+        self.do_test_get_settings(JSON_CASES_MESSAGES=None, expected=self.get_settings(json_cases_messages=False))
+
+    def test_get_settings_arrow_file(self):
+        for arrow_file in [None, '', 'cases.arrow', '/path/cases.parquet']:
+            with self.subTest(arrow_file=arrow_file):
+                self.do_test_get_settings(ARROW_FILE=arrow_file, expected=self.get_settings(arrow_file=arrow_file or None))
+
+    def test_get_settings_arrow_suites_file(self):
+        for arrow_suites_file in [None, '', 'suites.arrow', '/path/suites.parquet']:
+            with self.subTest(arrow_suites_file=arrow_suites_file):
+                self.do_test_get_settings(ARROW_SUITES_FILE=arrow_suites_file, expected=self.get_settings(arrow_suites_file=arrow_suites_file or None))
+
+    def test_get_settings_arrow_format(self):
+        for arrow_format in arrow_formats:
+            with self.subTest(arrow_format=arrow_format):
+                self.do_test_get_settings(ARROW_FORMAT=arrow_format, expected=self.get_settings(arrow_format=arrow_format))
+        self.do_test_get_settings(ARROW_FORMAT=None, expected=self.get_settings(arrow_format=arrow_format_ipc))
+
+        with self.assertRaises(RuntimeError) as re:
+            self.do_test_get_settings(ARROW_FORMAT='csv')
+        self.assertEqual("Value 'csv' is not supported for variable ARROW_FORMAT, expected: ipc, parquet", str(re.exception))
+
     def test_get_settings_json_test_case_results(self):
         warning = 'Option json_test_case_results has to be boolean, so either "true" or "false": foo'
         self.do_test_get_settings(JSON_TEST_CASE_RESULTS='false', expected=self.get_settings(json_test_case_results=False))
@@ -618,6 +818,34 @@ class Test(unittest.TestCase):
         self.do_test_get_settings(SEARCH_PULL_REQUESTS='foo', expected=self.get_settings(search_pull_requests=False), warning=warning, exception=RuntimeError)
         self.do_test_get_settings(SEARCH_PULL_REQUESTS=None, expected=self.get_settings(search_pull_requests=False))
 
+    def test_get_settings_skip_unchanged_check_run(self):
+        warning = 'Option skip_unchanged_check_run has to be boolean, so either "true" or "false": foo'
+        self.do_test_get_settings(SKIP_UNCHANGED_CHECK_RUN='false', expected=self.get_settings(skip_unchanged_check_run=False))
+        self.do_test_get_settings(SKIP_UNCHANGED_CHECK_RUN='False', expected=self.get_settings(skip_unchanged_check_run=False))
+        self.do_test_get_settings(SKIP_UNCHANGED_CHECK_RUN='true', expected=self.get_settings(skip_unchanged_check_run=True))
+        self.do_test_get_settings(SKIP_UNCHANGED_CHECK_RUN='True', expected=self.get_settings(skip_unchanged_check_run=True))
+        self.do_test_get_settings(SKIP_UNCHANGED_CHECK_RUN='foo', expected=self.get_settings(skip_unchanged_check_run=False), warning=warning, exception=RuntimeError)
+        self.do_test_get_settings(SKIP_UNCHANGED_CHECK_RUN=None, expected=self.get_settings(skip_unchanged_check_run=False))
+
+    def test_get_settings_defer_annotations(self):
+        warning = 'Option defer_annotations has to be boolean, so either "true" or "false": foo'
+        self.do_test_get_settings(DEFER_ANNOTATIONS='false', expected=self.get_settings(defer_annotations=False))
+        self.do_test_get_settings(DEFER_ANNOTATIONS='False', expected=self.get_settings(defer_annotations=False))
+        self.do_test_get_settings(DEFER_ANNOTATIONS='true', expected=self.get_settings(defer_annotations=True))
+        self.do_test_get_settings(DEFER_ANNOTATIONS='True', expected=self.get_settings(defer_annotations=True))
+        self.do_test_get_settings(DEFER_ANNOTATIONS='foo', expected=self.get_settings(defer_annotations=False), warning=warning, exception=RuntimeError)
+        self.do_test_get_settings(DEFER_ANNOTATIONS=None, expected=self.get_settings(defer_annotations=False))
+
+    def test_get_settings_annotations_checkpoint_file(self):
+        for checkpoint_file in [None, '', 'checkpoint.json']:
+            with self.subTest(checkpoint_file=checkpoint_file):
+                self.do_test_get_settings(ANNOTATIONS_CHECKPOINT_FILE=checkpoint_file, expected=self.get_settings(annotations_checkpoint_file=checkpoint_file or None))
+
+    def test_get_settings_dry_run_directory(self):
+        for directory in [None, '', 'dry-run']:
+            with self.subTest(directory=directory):
+                self.do_test_get_settings(DRY_RUN_DIRECTORY=directory, expected=self.get_settings(dry_run_directory=directory or None))
+
     def test_get_settings_missing_github_vars(self):
         with self.assertRaises(RuntimeError) as re:
             self.do_test_get_settings(GITHUB_EVENT_PATH=None)
@@ -1098,7 +1326,8 @@ class Test(unittest.TestCase):
             {'report_suite_out_logs': True, 'report_suite_err_logs': False},
             {'report_suite_out_logs': False, 'report_suite_err_logs': True},
             {'report_suite_out_logs': True, 'report_suite_err_logs': True},
-            {'json_suite_details': True}
+            {'json_suite_details': True},
+            {'arrow_suites_file': 'suites.arrow'}
         ]:
             with self.subTest(**options):
                 gha = mock.MagicMock()
@@ -1111,6 +1340,23 @@ class Test(unittest.TestCase):
 
                 self.assertEqual(364, len(actual.suite_details))
 
+    @unittest.skipUnless(importlib.util.find_spec('pyarrow') is not None, 'pyarrow not installed')
+    def test_parse_files_and_write_arrow_suites_file(self):
+        import pyarrow
+
+        gha = mock.MagicMock()
+        with tempfile.TemporaryDirectory() as path:
+            filepath = os.path.join(path, 'suites.arrow')
+            settings = self.get_settings(junit_files_glob=str(test_files_path / 'junit-xml' / '**' / '*.xml'),
+                                         arrow_suites_file=filepath)
+            stats = get_stats(get_test_results(parse_files(settings, gha), settings.dedup_classes_by_file_name))
+            write_suites(stats.suite_details, filepath, settings.arrow_format, settings.commit)
+
+            with pyarrow.memory_map(filepath, 'r') as source:
+                table = pyarrow.ipc.open_file(source).read_all()
+            self.assertGreater(table.num_rows, 0)
+            self.assertEqual(len(stats.suite_details), table.num_rows)
+
     def test_parse_files_no_matches(self):
         gha = mock.MagicMock()
         with tempfile.TemporaryDirectory() as path:
@@ -1187,9 +1433,16 @@ class Test(unittest.TestCase):
             ), gha)
 
             with mock.patch('publish_test_results.get_github'), \
-                 mock.patch('publish.publisher.Publisher.publish') as m:
+                 mock.patch('publish.publisher.Publisher.publish') as m, \
+                 self.assertLogs('publish', 'INFO') as logs:
                 main(settings, gha)
 
+                # phases are logged at the end
+                self.assertTrue(logs.output[-1].startswith('INFO:publish:Phases:\nphase '), logs.output[-1])
+                for phase in ['expand globs', 'parse files', 'parse JUnit XML files', 'parse NUnit XML files',
+                              'process files', 'aggregate results', 'exit', 'total']:
+                    self.assertIn(f'\n{phase} ', logs.output[-1])
+
                 # Publisher.publish is expected to have been called once
                 self.assertEqual(1, len(m.call_args_list))
                 self.assertEqual(3, len(m.call_args_list[0].args))
@@ -1202,6 +1455,52 @@ class Test(unittest.TestCase):
                 self.assertEqual(1817, len(cases))
                 self.assertEqual('failure', conclusion)
 
+    def test_main_with_trace_file(self):
+        with tempfile.TemporaryDirectory() as path:
+            filepath = os.path.join(path, 'event.json')
+            with open(filepath, 'wt', encoding='utf-8') as file:
+                file.write('{}')
+            trace_file = os.path.join(path, 'trace.json')
+
+            gha = mock.MagicMock()
+            settings = get_settings(dict(
+                COMMIT='commit',
+                GITHUB_TOKEN='********',
+                GITHUB_EVENT_PATH=filepath,
+                GITHUB_EVENT_NAME='push',
+                GITHUB_REPOSITORY='repo',
+                FILES=str(test_files_path / 'junit-xml' / 'pytest' / '*.xml'),
+                NUNIT_FILES=str(test_files_path / 'nunit' / 'nunit3' / 'jenkins' / 'NUnit-simple.xml'),
+                TRACE_FILE=trace_file,
+            ), gha)
+
+            with mock.patch('publish_test_results.get_github'), \
+                 mock.patch('publish.publisher.Publisher.publish'):
+                main(settings, gha)
+
+            with open(trace_file, 'rt', encoding='utf-8') as r:
+                trace = json.load(r)
+
+        gha.warning.assert_not_called()
+        resource = trace['resourceSpans'][0]['resource']['attributes']
+        self.assertIn(dict(key='github.repository', value=dict(stringValue='repo')), resource)
+        spans = trace['resourceSpans'][0]['scopeSpans'][0]['spans']
+        names = [span['name'] for span in spans]
+        self.assertEqual('publish test results', names[0])
+        for name in ['read files', 'expand globs', 'parse files', 'detect file', 'parse JUnit XML file', 'parse NUnit XML files',
+                     'process files', 'aggregate results', 'get test results', 'get stats', 'exit']:
+            self.assertIn(name, names)
+
+        # every file parsed via FILES has its own spans
+        parsed = [span for span in spans if span['name'] == 'parse JUnit XML file']
+        self.assertEqual(len(list((test_files_path / 'junit-xml' / 'pytest').glob('*.xml'))), len(parsed))
+        self.assertTrue(all(span['attributes'][0]['key'] == 'file' for span in parsed))
+        nunit = [span for span in spans if span['name'] == 'parse NUnit XML files']
+        self.assertEqual([dict(key='files', value=dict(intValue='1'))], nunit[0]['attributes'][:1])
+
+        parents = {span['spanId']: span['name'] for span in spans}
+        self.assertEqual('parse files', parents[parsed[0]['parentSpanId']])
+
     def test_main_fork_pr_check_wo_summary(self):
         with tempfile.TemporaryDirectory() as path:
             filepath = os.path.join(path, 'file')
@@ -0,0 +1,116 @@
+import importlib.util
+import os
+import sys
+import tempfile
+import unittest
+
+import mock
+
+from publish import arrow_formats, arrow_format_ipc, arrow_format_parquet
+from publish.arrow import get_case_columns, get_suite_columns, write_cases, write_suites
+from publish.unittestresults import UnitTestCase, UnitTestSuite, create_unit_test_case_results
+
+pyarrow_available = importlib.util.find_spec('pyarrow') is not None
+
+
+class TestArrow(unittest.TestCase):
+
+    cases = create_unit_test_case_results({
+        ('test file', 'class', 'test'): dict(
+            success=[UnitTestCase(result_file='result.xml', test_file='test file', line=12, class_name='class', test_name='test',
+                                  result='success', message=None, content=None, stdout=None, stderr=None, time=1.5)],
+            failure=[UnitTestCase(result_file='result.xml', test_file='test file', line=12, class_name='class', test_name='test',
+                                  result='failure', message='message', content=None, stdout=None, stderr=None, time=2.0)],
+        ),
+        (None, 'class', 'test2'): dict(
+            skipped=[UnitTestCase(result_file='result2.xml', test_file=None, line=None, class_name='class', test_name='test2',
+                                  result='skipped', message=None, content=None, stdout=None, stderr=None, time=None)],
+        ),
+    })
+    suites = [
+        UnitTestSuite(name='suite', tests=2, skipped=0, failures=1, errors=0, stdout='out', stderr=None),
+        UnitTestSuite(name='suite2', tests=1, skipped=1, failures=0, errors=0, stdout=None, stderr=None),
+    ]
+
+    def test_get_case_columns(self):
+        self.assertEqual(dict(
+            result_file=['result.xml', 'result.xml', 'result2.xml'],
+            file_name=['test file', 'test file', None],
+            class_name=['class', 'class', 'class'],
+            test_name=['test', 'test', 'test2'],
+            state=['success', 'failure', 'skipped'],
+            result=['success', 'failure', 'skipped'],
+            line=[12, 12, None],
+            time=[1.5, 2.0, None],
+        ), get_case_columns(self.cases))
+
+    def test_get_suite_columns(self):
+        self.assertEqual(dict(
+            name=['suite', 'suite2'],
+            tests=[2, 1],
+            skipped=[0, 1],
+            failures=[1, 0],
+            errors=[0, 0],
+        ), get_suite_columns(self.suites))
+
+    def test_write_without_pyarrow(self):
+        with tempfile.TemporaryDirectory() as path, mock.patch.dict(sys.modules, {'pyarrow': None}):
+            filepath = os.path.join(path, 'cases.arrow')
+            with self.assertRaises(ImportError):
+                write_cases(self.cases, filepath, arrow_format_ipc, 'commit')
+            self.assertFalse(os.path.exists(filepath))
+
+    @staticmethod
+    def read_table(path: str, format: str):
+        import pyarrow
+        import pyarrow.parquet
+
+        if format == arrow_format_ipc:
+            with pyarrow.memory_map(path, 'r') as source:
+                return pyarrow.ipc.open_file(source).read_all()
+        return pyarrow.parquet.read_table(path)
+
+    @unittest.skipUnless(pyarrow_available, 'pyarrow not installed')
+    def test_write_cases(self):
+        import pyarrow
+
+        for format in arrow_formats:
+            with self.subTest(format=format), tempfile.TemporaryDirectory() as path:
+                filepath = os.path.join(path, 'cases')
+                write_cases(self.cases, filepath, format, 'commit')
+                table = self.read_table(filepath, format)
+
+                self.assertEqual(dict(commit=['commit'] * 3, **get_case_columns(self.cases)), table.to_pydict())
+                for column in ['commit', 'result_file', 'file_name', 'class_name', 'test_name', 'state', 'result']:
+                    self.assertTrue(pyarrow.types.is_dictionary(table.schema.field(column).type), column)
+                self.assertEqual(pyarrow.int64(), table.schema.field('line').type)
+                self.assertEqual(pyarrow.float64(), table.schema.field('time').type)
+
+    @unittest.skipUnless(pyarrow_available, 'pyarrow not installed')
+    def test_write_suites(self):
+        import pyarrow
+
+        for format in arrow_formats:
+            with self.subTest(format=format), tempfile.TemporaryDirectory() as path:
+                filepath = os.path.join(path, 'suites')
+                write_suites(self.suites, filepath, format, 'commit')
+                table = self.read_table(filepath, format)
+
+                self.assertEqual(dict(commit=['commit'] * 2, **get_suite_columns(self.suites)), table.to_pydict())
+                self.assertTrue(pyarrow.types.is_dictionary(table.schema.field('commit').type))
+                self.assertEqual(pyarrow.string(), table.schema.field('name').type)
+                self.assertEqual(pyarrow.int64(), table.schema.field('tests').type)
+
+    @unittest.skipUnless(pyarrow_available, 'pyarrow not installed')
+    def test_write_empty(self):
+        with tempfile.TemporaryDirectory() as path:
+            filepath = os.path.join(path, 'cases.parquet')
+            write_cases(create_unit_test_case_results(), filepath, arrow_format_parquet, 'commit')
+            self.assertEqual(0, self.read_table(filepath, arrow_format_parquet).num_rows)
+
+    @unittest.skipUnless(pyarrow_available, 'pyarrow not installed')
+    def test_write_unsupported_format(self):
+        with tempfile.TemporaryDirectory() as path:
+            with self.assertRaises(ValueError) as e:
+                write_cases(self.cases, os.path.join(path, 'cases.csv'), 'csv', 'commit')
+            self.assertEqual('Unsupported Arrow format: csv', str(e.exception))
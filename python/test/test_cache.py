@@ -0,0 +1,153 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+import github
+from flask import Flask, request, Response
+
+from api_server import ApiServerTestCase
+from publish.cache import HttpCache, HttpCacheEntry, http_cache_version
+from publish_test_results import get_github
+
+
+def entry(body: str, etag: str = '"etag"') -> HttpCacheEntry:
+    return HttpCacheEntry(etag=etag, headers={}, body=body)
+
+
+class TestHttpCache(unittest.TestCase):
+
+    def test_get_key(self):
+        key = HttpCache.get_key('host:443/repos/owner/repo', 'application/json', 'token ghp_abc')
+        self.assertEqual(key, HttpCache.get_key('host:443/repos/owner/repo', 'application/json', 'token ghp_abc'))
+        self.assertNotEqual(key, HttpCache.get_key('host:443/repos/owner/repo2', 'application/json', 'token ghp_abc'))
+        self.assertNotEqual(key, HttpCache.get_key('host:443/repos/owner/repo', 'application/vnd.github.raw', 'token ghp_abc'))
+        self.assertNotEqual(key, HttpCache.get_key('host:443/repos/owner/repo', 'application/json', 'token ghp_def'))
+        self.assertNotEqual(key, HttpCache.get_key('host:443/repos/owner/repo', 'application/json', None))
+
+    def test_get_auth_scope(self):
+        self.assertEqual('anonymous', HttpCache.get_auth_scope(None))
+        self.assertEqual('installation', HttpCache.get_auth_scope('token ghs_abc'))
+        self.assertEqual(HttpCache.get_auth_scope('token ghs_abc'), HttpCache.get_auth_scope('Bearer ghs_def'))
+        self.assertNotEqual(HttpCache.get_auth_scope('token ghp_abc'), HttpCache.get_auth_scope('token ghp_def'))
+        self.assertNotIn('ghp_abc', HttpCache.get_auth_scope('token ghp_abc'))
+
+    def test_put_and_get(self):
+        cache = HttpCache()
+        self.assertIsNone(cache.get('key'))
+        cache.put('key', entry('body'))
+        self.assertEqual(entry('body'), cache.get('key'))
+        cache.put('key', entry('other body'))
+        self.assertEqual(entry('other body'), cache.get('key'))
+        self.assertEqual(1, len(cache))
+        self.assertEqual(len('other body'), cache.size)
+
+    def test_evicts_least_recently_used(self):
+        cache = HttpCache(max_size=10)
+        cache.put('one', entry('1111'))
+        cache.put('two', entry('2222'))
+        # accessing 'one' makes 'two' the least recently used entry
+        cache.get('one')
+        cache.put('three', entry('3333'))
+
+        self.assertEqual(entry('1111'), cache.get('one'))
+        self.assertIsNone(cache.get('two'))
+        self.assertEqual(entry('3333'), cache.get('three'))
+        self.assertEqual(8, cache.size)
+
+        # entries larger than the cache are not cached at all
+        cache.put('large', entry('12345678901'))
+        self.assertIsNone(cache.get('large'))
+        self.assertEqual(2, len(cache))
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as path:
+            filename = os.path.join(path, 'cache.json')
+            cache = HttpCache(filename)
+            cache.put('one', HttpCacheEntry(etag='"1"', headers={'link': 'next'}, body='1111'))
+            cache.put('two', entry('2222'))
+            cache.save()
+
+            loaded = HttpCache(filename).load()
+            self.assertEqual(2, len(loaded))
+            self.assertEqual(cache.size, loaded.size)
+            self.assertEqual(HttpCacheEntry(etag='"1"', headers={'link': 'next'}, body='1111'), loaded.get('one'))
+            self.assertEqual(entry('2222'), loaded.get('two'))
+
+            # loading respects the size limit, keeping the most recently used entries
+            loaded = HttpCache(filename, max_size=4).load()
+            self.assertEqual(1, len(loaded))
+            self.assertEqual(entry('2222'), loaded.get('two'))
+
+    def test_load_missing_unsupported_and_corrupt_files(self):
+        with tempfile.TemporaryDirectory() as path:
+            filename = os.path.join(path, 'cache.json')
+            self.assertEqual(0, len(HttpCache(filename).load()))
+
+            with open(filename, 'wt', encoding='utf-8') as w:
+                json.dump(dict(version=http_cache_version + 1, entries=[['key', dict(etag='', headers={}, body='')]]), w)
+            self.assertEqual(0, len(HttpCache(filename).load()))
+
+            with open(filename, 'wt', encoding='utf-8') as w:
+                w.write('{"version": 1, "entries": [')
+            with self.assertLogs('publish', 'WARNING') as logs:
+                self.assertEqual(0, len(HttpCache(filename).load()))
+            self.assertTrue(logs.output[0].startswith(f'WARNING:publish:Failed to load GitHub API cache file {filename}: '))
+
+
+@unittest.skipUnless(sys.platform != 'win32', 'Stopping the server is slow on Windows')
+class TestHttpCacheWithGitHub(ApiServerTestCase):
+
+    port = 12382
+    auth = github.Auth.Token('ghs_token')
+
+    def setUp(self) -> None:
+        self.repo_etag = '"etag-1"'
+        self.requests = []
+        super().setUp()
+
+    def add_routes(self, app: Flask) -> None:
+        @app.route('/api/repos/owner/repo')
+        def repo():
+            self.requests.append(request.headers.get('If-None-Match'))
+            if request.headers.get('If-None-Match') == self.repo_etag:
+                return Response(status=304, headers={'ETag': self.repo_etag, 'X-RateLimit-Remaining': '4999'})
+            body = json.dumps({'name': 'repo', 'full_name': 'owner/repo', 'description': self.repo_etag})
+            return Response(body, status=200, content_type='application/json', headers={'ETag': self.repo_etag})
+
+    def get_github(self, cache: HttpCache) -> github.Github:
+        return get_github(self.auth, self.base_url, verify=True, retries=1, backoff_factor=0.1,
+                          seconds_between_requests=None, seconds_between_writes=None, secondary_rate_wait=3,
+                          cache=cache)
+
+    def test_conditional_requests(self):
+        with tempfile.TemporaryDirectory() as path:
+            filename = os.path.join(path, 'cache.json')
+            cache = HttpCache(filename).load()
+            gh = self.get_github(cache)
+
+            self.assertEqual('"etag-1"', gh.get_repo('owner/repo').description)
+            self.assertEqual('"etag-1"', gh.get_repo('owner/repo').description)
+            self.assertEqual([None, '"etag-1"'], self.requests)
+            self.assertEqual((1, 1), (cache.hits, cache.misses))
+            cache.save()
+
+            # a later run revalidates the cached response
+            cache = HttpCache(filename).load()
+            gh = self.get_github(cache)
+            self.assertEqual('"etag-1"', gh.get_repo('owner/repo').description)
+            self.assertEqual((1, 0), (cache.hits, cache.misses))
+
+            # a modified response replaces the cached response
+            self.repo_etag = '"etag-2"'
+            self.assertEqual('"etag-2"', gh.get_repo('owner/repo').description)
+            self.assertEqual('"etag-2"', gh.get_repo('owner/repo').description)
+            self.assertEqual([None, '"etag-1"', '"etag-1"', '"etag-1"', '"etag-2"'], self.requests)
+            self.assertEqual((2, 1), (cache.hits, cache.misses))
+            self.assertEqual(1, len(cache))
+
+            with self.assertLogs('publish', 'INFO') as logs:
+                cache.log_stats()
+            self.assertEqual(1, len(logs.output))
+            self.assertRegex(logs.output[0], r'^INFO:publish:GitHub API cache: 2 of 3 reads not modified \(67%\), 1 cached responses of \d+ Bytes$')
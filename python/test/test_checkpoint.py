@@ -0,0 +1,46 @@
+import json
+import os
+import tempfile
+import unittest
+
+from publish.checkpoint import AnnotationsCheckpoint, load_annotations_checkpoint, save_annotations_checkpoint, \
+    annotations_checkpoint_version
+
+checkpoint = AnnotationsCheckpoint(repo='owner/repo', check_name='Test Results', commit='commit',
+                                   content_hash='sha256:hash', check_run_id=1234, batch=2, batches=5)
+
+
+class TestAnnotationsCheckpoint(unittest.TestCase):
+
+    def test_complete(self):
+        self.assertFalse(checkpoint.complete)
+        self.assertTrue(AnnotationsCheckpoint(**dict(checkpoint.__dict__, batch=4)).complete)
+
+    def test_matches(self):
+        self.assertTrue(checkpoint.matches('owner/repo', 'Test Results', 'commit', 'sha256:hash', 5))
+        self.assertFalse(checkpoint.matches('owner/other', 'Test Results', 'commit', 'sha256:hash', 5))
+        self.assertFalse(checkpoint.matches('owner/repo', 'Other Results', 'commit', 'sha256:hash', 5))
+        self.assertFalse(checkpoint.matches('owner/repo', 'Test Results', 'other', 'sha256:hash', 5))
+        self.assertFalse(checkpoint.matches('owner/repo', 'Test Results', 'commit', 'sha256:other', 5))
+        self.assertFalse(checkpoint.matches('owner/repo', 'Test Results', 'commit', 'sha256:hash', 6))
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as path:
+            filename = os.path.join(path, 'checkpoint.json')
+            self.assertIsNone(load_annotations_checkpoint(filename))
+            save_annotations_checkpoint(filename, checkpoint)
+            self.assertEqual(checkpoint, load_annotations_checkpoint(filename))
+            self.assertFalse(os.path.exists(f'{filename}.tmp'))
+
+    def test_load_unsupported_and_corrupt_files(self):
+        with tempfile.TemporaryDirectory() as path:
+            filename = os.path.join(path, 'checkpoint.json')
+            with open(filename, 'wt', encoding='utf-8') as w:
+                json.dump(dict(checkpoint.__dict__, version=annotations_checkpoint_version + 1), w)
+            self.assertIsNone(load_annotations_checkpoint(filename))
+
+            with open(filename, 'wt', encoding='utf-8') as w:
+                w.write('{"version": 1, "repo": ')
+            with self.assertLogs('publish', 'WARNING') as logs:
+                self.assertIsNone(load_annotations_checkpoint(filename))
+            self.assertTrue(logs.output[0].startswith(f'WARNING:publish:Failed to load annotations checkpoint file {filename}: '))
@@ -0,0 +1,107 @@
+import sys
+import unittest
+
+import github
+
+from benchmark_publish import benchmark, format_results, BenchmarkResult
+from fake_github import FakeGitHub
+from publish import digest_prefix
+from publish.scheduler import RequestScheduler
+from publish_test_results import get_github
+
+
+@unittest.skipUnless(sys.platform != 'win32', 'Stopping the server is slow on Windows')
+class TestFakeGitHub(unittest.TestCase):
+
+    @staticmethod
+    def get_github(fake: FakeGitHub, scheduler: RequestScheduler = None) -> github.Github:
+        return get_github(github.Auth.Token('token'), fake.api_url, verify=True, retries=3, backoff_factor=0.01,
+                          seconds_between_requests=None, seconds_between_writes=None, secondary_rate_wait=0.01,
+                          scheduler=scheduler)
+
+    def test_pagination(self):
+        with FakeGitHub(max_per_page=2) as fake:
+            for idx in range(5):
+                fake.add_check_run('commit', f'check {idx}', 'summary',
+                                   annotations=[dict(path='file', start_line=1, end_line=1,
+                                                     annotation_level='notice', message=f'{idx}-{annotation}')
+                                                for annotation in range(idx)])
+            gh = self.get_github(fake)
+            repo = gh.get_repo(fake.full_name)
+            runs = list(repo.get_commit('commit').get_check_runs())
+            self.assertEqual([f'check {idx}' for idx in range(5)], [run.name for run in runs])
+            self.assertEqual(['4-0', '4-1', '4-2', '4-3'], [annotation.message for annotation in runs[4].get_annotations()])
+
+            self.assertEqual({
+                'GET /api/repos/<owner>/<repo>': 1,
+                'GET /api/repos/<owner>/<repo>/commits/<sha>': 1,
+                'GET /api/repos/<owner>/<repo>/commits/<sha>/check-runs': 3,
+                'GET /api/repos/<owner>/<repo>/check-runs/<int:run_id>/annotations': 2,
+            }, fake.endpoints)
+
+    def test_publish_check_run_and_comment(self):
+        with FakeGitHub() as fake:
+            number = fake.add_pull('commit')
+            gh = self.get_github(fake)
+            repo = gh.get_repo(fake.full_name)
+
+            run = repo.create_check_run(name='check', head_sha='commit', status='completed', conclusion='success',
+                                        output=dict(title='title', summary='summary', annotations=[dict(message='one')]))
+            run.edit(output=dict(title='title', summary='summary', annotations=[dict(message='two')]))
+            self.assertEqual(['one', 'two'], [annotation['message'] for annotation in fake.annotations[run.id]])
+
+            pull = repo.get_commit('commit').get_pulls()[0]
+            self.assertEqual(number, pull.number)
+            comment = pull.create_issue_comment('body')
+            pull.get_issue_comment(comment.id).edit('edited')
+            self.assertEqual(['edited'], [comment['body'] for comment in fake.comments[number]])
+
+    def test_primary_rate_limit(self):
+        with FakeGitHub(rate_limit=2, rate_limit_window=1) as fake:
+            scheduler = RequestScheduler(0.01, 0.01)
+            gh = self.get_github(fake, scheduler)
+            for _ in range(3):
+                gh.get_repo(fake.full_name)
+
+            self.assertEqual(3, len(fake.requests))
+            self.assertEqual(0, fake.rate_limited)
+            # the scheduler waited for the rate limit to reset
+            self.assertGreater(scheduler.pacing_seconds, 0.5)
+
+    def test_secondary_rate_limit(self):
+        with FakeGitHub(secondary_rate_limit_every=2, secondary_rate_limit_retry_after=1) as fake:
+            scheduler = RequestScheduler(0.01, 0.01, sleep=lambda seconds: None)
+            gh = self.get_github(fake, scheduler)
+            repo = gh.get_repo(fake.full_name)
+            for _ in range(2):
+                repo.create_check_run(name='check', head_sha='commit')
+
+            self.assertEqual(2, len(fake.check_runs['commit']))
+            self.assertEqual(1, fake.secondary_rate_limited)
+            self.assertEqual(1, scheduler.throttled)
+            self.assertGreaterEqual(scheduler.backoff_seconds, 1.0)
+
+    def test_benchmark(self):
+        options = dict(SECONDS_BETWEEN_GITHUB_READS='0.001', SECONDS_BETWEEN_GITHUB_WRITES='0.001')
+        with FakeGitHub() as fake:
+            results = benchmark(100, fake, options)
+
+            # the first commit's check run is the reference of the pull request commit
+            self.assertEqual(['commit-1', 'commit-2'], list(fake.check_runs))
+            self.assertIn(digest_prefix, fake.check_runs['commit-1'][0]['output']['summary'])
+            self.assertEqual([1], list(fake.comments))
+            self.assertIn('Results for commit commit-2.\u2003± Comparison against base commit commit-1.',
+                          fake.comments[1][0]['body'])
+
+        self.assertEqual([(100, 'first commit'), (100, 'pull request')], [(result.tests, result.run) for result in results])
+        self.assertTrue(all(result.api_calls > 0 for result in results))
+        self.assertLess(results[0].api_calls, results[1].api_calls)
+
+    def test_format_results(self):
+        self.assertEqual(
+            '    tests  run           seconds  api calls  rate limited  sleep seconds\n'
+            '    1,000  first commit    1.235          4             0          0.500\n'
+            '1,000,000  pull request  123.400      1,234             2         12.000',
+            format_results([BenchmarkResult(1000, 'first commit', 1.2346, 4, 0, 0.5),
+                            BenchmarkResult(1000000, 'pull request', 123.4, 1234, 2, 12.0)])
+        )
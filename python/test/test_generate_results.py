@@ -0,0 +1,99 @@
+import io
+import os
+import tempfile
+import unittest
+from collections import Counter
+
+import publish_test_results
+from benchmark_parse import ParseResult, benchmark, format_results, get_regressions, parse
+from generate_results import GeneratorOptions, formats, non_bmp_chars, write_files
+from publish.github_action import GithubAction
+
+
+class TestGenerateResults(unittest.TestCase):
+
+    options = GeneratorOptions(cases=250, cases_per_file=100, cases_per_suite=20, suites_per_suite=2, depth=3,
+                               failure_rate=0.1, error_rate=0.05, skip_rate=0.1, reruns=2, stdout_size=32, non_bmp=True)
+
+    def test_formats(self):
+        for format in formats:
+            with self.subTest(format=format), tempfile.TemporaryDirectory() as path:
+                generated = write_files(path, format, self.options)
+                self.assertEqual(3, len(generated.files))
+                self.assertEqual(250, generated.cases)
+                self.assertEqual(sum(os.path.getsize(file) for file in generated.files), generated.bytes)
+
+                with open(os.path.join(path, 'event.json'), 'wt', encoding='utf-8') as w:
+                    w.write('{}')
+                options = dict(GITHUB_TOKEN='token', GITHUB_REPOSITORY='owner/repo', GITHUB_SHA='commit',
+                               GITHUB_EVENT_PATH=os.path.join(path, 'event.json'), GITHUB_EVENT_NAME='push',
+                               FILES=os.path.join(path, f'{format}-*'))
+                gha = GithubAction(file=io.StringIO())
+                results = publish_test_results.parse_files(publish_test_results.get_settings(options, gha), gha)
+
+                self.assertEqual([], results.errors)
+                self.assertEqual(3, results.files)
+                self.assertEqual(generated.runs, Counter(case.result for case in results.cases))
+                # failing cases are rerun until they succeed
+                self.assertEqual(250 - generated.runs['skipped'], generated.runs['success'])
+                self.assertTrue(all(non_bmp_chars[0] in case.test_name for case in results.cases))
+
+    def test_options(self):
+        with tempfile.TemporaryDirectory() as path:
+            generated = write_files(path, 'junit', GeneratorOptions(cases=100, failure_rate=1.0, skip_rate=0.0, reruns=3))
+            self.assertEqual(Counter(failure=300, success=100), generated.runs)
+
+            generated = write_files(path, 'xunit', GeneratorOptions(cases=100, failure_rate=0.0, error_rate=1.0))
+            self.assertEqual(Counter(failure=100), generated.runs)
+
+            with self.assertRaises(ValueError):
+                write_files(path, 'unknown')
+
+    def test_depth(self):
+        with tempfile.TemporaryDirectory() as path:
+            generated = write_files(path, 'junit', GeneratorOptions(cases=100, cases_per_suite=10, suites_per_suite=2, depth=4))
+            with open(generated.files[0], 'rt', encoding='utf-8') as r:
+                content = r.read()
+            self.assertEqual(10 + 5 + 3 + 2, content.count('<testsuite '))
+            self.assertIn('    <testsuite name="level2.group0"', content)
+
+
+class TestBenchmarkParse(unittest.TestCase):
+
+    def test_parse(self):
+        with tempfile.TemporaryDirectory() as path:
+            with open(os.path.join(path, 'event.json'), 'wt', encoding='utf-8') as w:
+                w.write('{}')
+            write_files(path, 'junit', GeneratorOptions(cases=100, failure_rate=1.0, reruns=2))
+
+            self.assertEqual(300, parse(path, 'junit', 'default')['runs'])
+            # ignoring runs drops test cases
+            self.assertEqual(0, parse(path, 'junit', 'ignore_runs')['runs'])
+
+    def test_benchmark(self):
+        results = benchmark(100, ['mocha'], ['default'])
+        self.assertEqual(1, len(results))
+        self.assertEqual(('mocha', 'default', 100, 100), (results[0].format, results[0].engine, results[0].cases, results[0].runs))
+        self.assertGreater(results[0].seconds, 0)
+        self.assertGreater(results[0].peak_rss, 0)
+
+    def test_get_regressions(self):
+        baseline = {'junit/default/1000': dict(mb_per_second=10.0, cases_per_second=10000.0, peak_rss=100),
+                    'nunit3/default/1000': dict(mb_per_second=10.0)}
+        results = [ParseResult('junit', 'default', 1000, 1000, 1024 * 1024, 0.125, 110),
+                   ParseResult('nunit3', 'default', 1000, 1000, 1024 * 1024, 0.2, 200),
+                   ParseResult('trx', 'default', 1000, 1000, 1024 * 1024, 1.0, 200)]
+
+        self.assertEqual([], get_regressions(results[:1], baseline, 0.25))
+        self.assertEqual(['junit/default/1000: MB/s 8.0 vs. baseline 10.0',
+                          'junit/default/1000: cases/s 8,000.0 vs. baseline 10,000.0',
+                          'junit/default/1000: peak RSS 110.0 vs. baseline 100.0',
+                          'nunit3/default/1000: MB/s 5.0 vs. baseline 10.0'],
+                         get_regressions(results, baseline, 0.05))
+
+    def test_format_results(self):
+        self.assertEqual(
+            'format  engine   cases   runs   MB  seconds  MB/s  cases/s  peak RSS MB\n'
+            'junit   default  1,000  1,010  2.0    0.500   4.0    2,000         64.0',
+            format_results([ParseResult('junit', 'default', 1000, 1010, 2 * 1024 * 1024, 0.5, 64 * 1024 * 1024)])
+        )
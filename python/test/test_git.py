@@ -0,0 +1,71 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+import mock
+
+from publish.git import run_git, get_merge_base
+
+
+@unittest.skipUnless(shutil.which('git'), 'git is not installed')
+class TestGit(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = self.tmp.name
+        self.git('init', '--quiet', '--initial-branch', 'main')
+        self.base = self.commit('base')
+        self.git('checkout', '--quiet', '-b', 'branch')
+        self.branch = self.commit('branch')
+        self.git('checkout', '--quiet', 'main')
+        self.main = self.commit('main')
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def git(self, *args: str) -> str:
+        env = dict(os.environ, GIT_AUTHOR_NAME='author', GIT_AUTHOR_EMAIL='author@example.com',
+                   GIT_COMMITTER_NAME='committer', GIT_COMMITTER_EMAIL='committer@example.com')
+        return subprocess.run(['git', '-C', self.path] + list(args), check=True, capture_output=True, text=True, env=env).stdout.strip()
+
+    def commit(self, message: str) -> str:
+        self.git('commit', '--quiet', '--allow-empty', '--message', message)
+        return self.git('rev-parse', 'HEAD')
+
+    def test_run_git(self):
+        self.assertEqual(self.main, run_git(self.path, 'rev-parse', 'HEAD'))
+        self.assertIsNone(run_git(self.path, 'rev-parse', 'unknown-ref'))
+        with tempfile.TemporaryDirectory() as path:
+            self.assertIsNone(run_git(path, 'rev-parse', 'HEAD'))
+        self.assertIsNone(run_git(os.path.join(self.path, 'does-not-exist'), 'rev-parse', 'HEAD'))
+
+    def test_run_git_trusts_only_directory(self):
+        with mock.patch('subprocess.run', wraps=subprocess.run) as run:
+            self.assertEqual(self.main, run_git(self.path, 'rev-parse', 'HEAD'))
+        command = run.call_args.args[0]
+        self.assertIn(f'safe.directory={os.path.abspath(self.path)}', command)
+        self.assertNotIn('safe.directory=*', command)
+
+    def test_run_git_not_installed(self):
+        with mock.patch('subprocess.run', side_effect=FileNotFoundError('git')):
+            self.assertIsNone(run_git(self.path, 'rev-parse', 'HEAD'))
+
+    def test_get_merge_base(self):
+        self.assertEqual(self.base, get_merge_base(self.path, ['main'], self.branch))
+        self.assertEqual(self.base, get_merge_base(self.path, [self.main], self.branch))
+        self.assertEqual(self.main, get_merge_base(self.path, ['main'], self.main))
+
+        # falls back to later refs
+        self.assertEqual(self.base, get_merge_base(self.path, ['refs/remotes/origin/main', None, '', 'main'], self.branch))
+        self.assertIsNone(get_merge_base(self.path, ['refs/remotes/origin/main'], self.branch))
+        self.assertIsNone(get_merge_base(self.path, [], self.branch))
+
+        # unknown commit
+        self.assertIsNone(get_merge_base(self.path, ['main'], '0123456789abcdef0123456789abcdef01234567'))
+
+    def test_get_merge_base_unrelated_histories(self):
+        self.git('checkout', '--quiet', '--orphan', 'orphan')
+        orphan = self.commit('orphan')
+        self.assertIsNone(get_merge_base(self.path, ['main'], orphan))
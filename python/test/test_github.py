@@ -5,32 +5,17 @@ import time
 import unittest
 from datetime import datetime, timezone
 from json import JSONDecodeError
-from threading import Thread
 from typing import Union, Tuple, Optional
 
 import github.GithubException
 import mock
 import requests.exceptions
 from flask import Flask, Response, request
-from werkzeug.serving import make_server
 
+from api_server import start_api, stop_api
 from publish_test_results import get_github
 
 
-class FlaskThread(Thread):
-    def __init__(self, app: Flask):
-        Thread.__init__(self, daemon=True)
-        self.server = make_server('localhost', 12380, app)
-        self.ctx = app.app_context()
-        self.ctx.push()
-
-    def run(self):
-        self.server.serve_forever()
-
-    def shutdown(self):
-        self.server.shutdown()
-
-
 @unittest.skipUnless(sys.platform != 'win32', 'Stopping the server is slow on Windows')
 class TestGitHub(unittest.TestCase):
 
@@ -38,28 +23,6 @@ class TestGitHub(unittest.TestCase):
     auth = github.Auth.Token('login or token')
     gh = get_github(auth, base_url, verify=True, retries=1, backoff_factor=0.1, seconds_between_requests=None, seconds_between_writes=None, secondary_rate_wait=3)
 
-    @classmethod
-    def start_api(cls, app: Flask) -> FlaskThread:
-        server = FlaskThread(app)
-        server.start()
-        attempt = 0
-        while attempt < 100:
-            try:
-                attempt += 1
-                requests.get('http://localhost:12380/health')
-                return server
-            except requests.exceptions.ConnectionError as e:
-                if attempt % 10 == 0:
-                    logging.warning(f'mock api server is not up yet, tried {attempt} times: {str(e)}')
-                time.sleep(0.01)
-        cls.stop_api(server)
-        raise RuntimeError('Failed to start mock api server, could not connect to health endpoint')
-
-    @staticmethod
-    def stop_api(server: FlaskThread) -> None:
-        server.shutdown()
-        server.join(2)
-
     @contextlib.contextmanager
     def api_server(self,
                    app_name: str,
@@ -99,11 +62,11 @@ class TestGitHub(unittest.TestCase):
         def graphql():
             return graphql_response
 
-        server = self.start_api(app)
+        server = start_api(app)
         try:
             yield server
         finally:
-            self.stop_api(server)
+            stop_api(server)
 
     test_http_status_to_retry = [500, 502, 503, 504]
     test_http_status_to_not_retry = [400, 401, 404, 429]
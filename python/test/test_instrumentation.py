@@ -0,0 +1,145 @@
+import json
+import sys
+import unittest
+
+import github
+import mock
+from flask import Flask, request, Response
+
+from api_server import ApiServerTestCase
+from publish.cache import HttpCache
+from publish.instrumentation import ApiInstrumentation
+from publish.scheduler import RequestScheduler
+from publish.tracing import Tracer, span_kind_client
+from publish_test_results import get_github
+
+
+class TestApiInstrumentation(unittest.TestCase):
+
+    def test_get_endpoint(self):
+        for verb, url, input, expected in [
+            ('GET', '/repos/owner/repo', None, 'GET /repos/{owner}/{repo}'),
+            ('GET', '/api/v3/repos/owner/repo', None, 'GET /api/v3/repos/{owner}/{repo}'),
+            ('GET', '/repos/owner/repo/commits/a1b2c3/check-runs?check_name=Test+Results&per_page=100', None,
+             'GET /repos/{owner}/{repo}/commits/{sha}/check-runs'),
+            ('GET', '/repos/owner/repo/check-runs/1234/annotations?page=2', None, 'GET /repos/{owner}/{repo}/check-runs/{id}/annotations'),
+            ('GET', '/repos/owner/repo/compare/main...feature%2Fbranch', None, 'GET /repos/{owner}/{repo}/compare/{basehead}'),
+            ('GET', '/repos/owner/repo/pulls/12', None, 'GET /repos/{owner}/{repo}/pulls/{id}'),
+            ('POST', '/repos/owner/repo/issues/12/comments', '{"body": "text"}', 'POST /repos/{owner}/{repo}/issues/{id}/comments'),
+            ('PATCH', '/repos/owner/repo/check-runs/1234', '{}', 'PATCH /repos/{owner}/{repo}/check-runs/{id}'),
+            ('GET', '/search/issues?q=sha', None, 'GET /search/issues'),
+            ('POST', '/graphql', json.dumps(dict(query='query ListComments {  repository {}}')), 'POST /graphql ListComments'),
+            ('POST', '/api/graphql', json.dumps(dict(query='mutation MinimizeComment {}')), 'POST /api/graphql MinimizeComment'),
+            ('POST', '/graphql', json.dumps(dict(query='{ viewer { login } }')), 'POST /graphql'),
+            ('POST', '/graphql', None, 'POST /graphql'),
+        ]:
+            with self.subTest(url=url):
+                self.assertEqual(expected, ApiInstrumentation.get_endpoint(verb, url, input))
+
+    def test_record(self):
+        instrumentation = ApiInstrumentation()
+        instrumentation.record('GET', '/repos/owner/repo/pulls/1', None, 200, 0.05, bytes_received=100)
+        instrumentation.record('GET', '/repos/owner/repo/pulls/2', None, 404, 0.3, bytes_received=20)
+        instrumentation.record('POST', '/repos/owner/repo/check-runs', '{"name": "täst"}', 201, 1.5,
+                               retries=2, throttle_seconds=3.0, bytes_received=50)
+        instrumentation.record('POST', '/repos/owner/repo/check-runs', b'{}', None, 20.0)
+
+        self.assertEqual(dict(
+            requests=4, errors=2, retries=2, seconds=21.85, throttle_seconds=3.0, bytes_sent=19, bytes_received=170,
+            endpoints=[
+                dict(endpoint='POST /repos/{owner}/{repo}/check-runs', calls=2, errors=1, retries=2,
+                     seconds=21.5, max_seconds=20.0, throttle_seconds=3.0, bytes_sent=19, bytes_received=50,
+                     latency_histogram={'0.1': 0, '0.25': 0, '0.5': 0, '1.0': 0, '2.5': 1, '5.0': 0, '10.0': 0, '+Inf': 1}),
+                dict(endpoint='GET /repos/{owner}/{repo}/pulls/{id}', calls=2, errors=1, retries=0,
+                     seconds=0.35, max_seconds=0.3, throttle_seconds=0.0, bytes_sent=0, bytes_received=120,
+                     latency_histogram={'0.1': 1, '0.25': 0, '0.5': 1, '1.0': 0, '2.5': 0, '5.0': 0, '10.0': 0, '+Inf': 0}),
+            ]
+        ), instrumentation.to_dict())
+
+    def test_record_with_tracer(self):
+        tracer = Tracer('test', clock=mock.MagicMock(side_effect=[0, 1000000000, 4000000000]))
+        instrumentation = ApiInstrumentation(tracer)
+        instrumentation.record('GET', '/repos/owner/repo/pulls/1?page=2', None, 200, 0.25, bytes_received=100)
+        instrumentation.record('POST', '/repos/owner/repo/check-runs', '{}', 403, 1.5, retries=2, throttle_seconds=0.5)
+
+        get, post = tracer.spans[1:]
+        self.assertEqual(('GET /repos/{owner}/{repo}/pulls/{id}', span_kind_client, 750000000, 1000000000, None),
+                         (get.name, get.kind, get.start_ns, get.end_ns, get.error))
+        self.assertEqual({'http.request.method': 'GET', 'url.path': '/repos/owner/repo/pulls/1',
+                          'http.response.status_code': 200, 'github.retries': 0, 'github.throttle_seconds': 0.0,
+                          'github.bytes_sent': 0, 'github.bytes_received': 100}, get.attributes)
+        self.assertEqual(tracer.root.span_id, get.parent_span_id)
+        # the span includes the time throttled
+        self.assertEqual((2000000000, 4000000000, 'HTTP status 403'), (post.start_ns, post.end_ns, post.error))
+
+    def test_log_stats(self):
+        instrumentation = ApiInstrumentation()
+        instrumentation.record('GET', '/repos/owner/repo', None, 200, 0.05, bytes_received=2048)
+        instrumentation.record('POST', '/repos/owner/repo/check-runs', '{}', 201, 1.5, throttle_seconds=1.0)
+
+        with self.assertLogs('publish', 'DEBUG') as logs:
+            instrumentation.log_stats()
+        self.assertEqual(['DEBUG:publish:GitHub API requests:\n'
+                          'endpoint                               calls  errors  retries  seconds    max  throttled     sent  received\n'
+                          'POST /repos/{owner}/{repo}/check-runs      1       0        0    1.500  1.500      1.000  2 Bytes   0 Bytes\n'
+                          'GET /repos/{owner}/{repo}                  1       0        0    0.050  0.050      0.000  0 Bytes   2.0 KiB'],
+                         logs.output)
+
+
+@unittest.skipUnless(sys.platform != 'win32', 'Stopping the server is slow on Windows')
+class TestApiInstrumentationWithGitHub(ApiServerTestCase):
+
+    port = 12384
+
+    def setUp(self) -> None:
+        self.failures = 0
+        super().setUp()
+
+    def add_routes(self, app: Flask) -> None:
+        @app.route('/api/repos/owner/repo')
+        def repo():
+            if self.failures:
+                self.failures -= 1
+                return Response(status=502)
+            if request.headers.get('If-None-Match') == '"etag"':
+                return Response(status=304, headers={'ETag': '"etag"'})
+            body = json.dumps({'name': 'repo', 'full_name': 'owner/repo', 'url': f'{self.base_url}/repos/owner/repo'})
+            return Response(body, status=200, content_type='application/json', headers={'ETag': '"etag"'})
+
+        @app.route('/api/repos/owner/repo/issues/<int:number>/comments', methods=['POST'])
+        def create_comment(number: int):
+            return {'id': 1, 'body': request.json['body']}
+
+        @app.route('/api/repos/owner/repo/issues/<int:number>', methods=['GET'])
+        def issue(number: int):
+            return {'number': number, 'url': f'{self.base_url}/repos/owner/repo/issues/{number}'}
+
+    def test_instrumentation(self):
+        instrumentation = ApiInstrumentation()
+        scheduler = RequestScheduler(0.0, 0.0, sleep=lambda seconds: None)
+        gh = get_github(github.Auth.Token('token'), self.base_url, verify=True, retries=3, backoff_factor=0.01,
+                        seconds_between_requests=None, seconds_between_writes=None, secondary_rate_wait=3,
+                        cache=HttpCache(), scheduler=scheduler, instrumentation=instrumentation)
+
+        self.failures = 2
+        repo = gh.get_repo('owner/repo')
+        # second read is answered by the cache
+        gh.get_repo('owner/repo')
+        repo.get_issue(3).create_comment('comment')
+
+        api = instrumentation.to_dict()
+        self.assertEqual(['GET /api/repos/{owner}/{repo}', 'GET /api/repos/{owner}/{repo}/issues/{id}',
+                          'POST /api/repos/{owner}/{repo}/issues/{id}/comments'],
+                         sorted(endpoint['endpoint'] for endpoint in api['endpoints']))
+        endpoints = {endpoint['endpoint']: endpoint for endpoint in api['endpoints']}
+
+        repo = endpoints['GET /api/repos/{owner}/{repo}']
+        self.assertEqual((2, 0, 2), (repo['calls'], repo['errors'], repo['retries']))
+        self.assertGreater(repo['throttle_seconds'], 0)
+        self.assertGreater(repo['bytes_received'], 0)
+        self.assertEqual(0, repo['bytes_sent'])
+
+        comment = endpoints['POST /api/repos/{owner}/{repo}/issues/{id}/comments']
+        self.assertEqual((1, 0, 0), (comment['calls'], comment['errors'], comment['retries']))
+        self.assertEqual(len(json.dumps({'body': 'comment'})), comment['bytes_sent'])
+        self.assertEqual(1, sum(comment['latency_histogram'].values()))
@@ -0,0 +1,112 @@
+import json
+import unittest
+
+import mock
+
+from publish import jsoncodec
+from publish.jsoncodec import backends, get_backend, set_backend, dumps, loads, orjson_available, msgspec_available
+
+values = [
+    None,
+    True,
+    0,
+    -12345678901234,
+    1.5,
+    0.001,
+    '',
+    'text with "quotes", \\ backslash, \n\t\r\b\f control \u0001 and \u007f characters',
+    'unicode ä ü ö ‑       𝒂 ✅',
+    [],
+    {},
+    [1, 'two', 3.0, None, [], {}],
+    {'key': 'value', 'list': [{'nested': {'deeply': [1, 2, {}]}}], 'empty': {}, 'ünicode': '✅'},
+    (1, 2, 3),
+]
+
+
+def expected_dumps(backend: str, value) -> str:
+    # the json module writes as json.dumps does by default, fast backends write compact JSON
+    separators = None if backend == 'json' else (',', ':')
+    return json.dumps(value, ensure_ascii=False, separators=separators)
+
+
+class TestJsonCodec(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.backend = get_backend()
+
+    def tearDown(self) -> None:
+        set_backend(self.backend)
+
+    def test_default_backend(self):
+        expected = 'orjson' if orjson_available else 'msgspec' if msgspec_available else 'json'
+        self.assertEqual(expected, get_backend())
+
+    def test_set_backend(self):
+        set_backend('json')
+        self.assertEqual('json', get_backend())
+
+        with self.assertRaises(ValueError) as e:
+            set_backend('ujson')
+        self.assertEqual(f'Unsupported JSON backend: ujson, expected one of: {", ".join(sorted(backends))}', str(e.exception))
+        self.assertEqual('json', get_backend())
+
+    def test_compatibility(self):
+        for backend in backends:
+            set_backend(backend)
+            for value in values:
+                with self.subTest(backend=backend, value=value):
+                    self.assertEqual(expected_dumps(backend, value), dumps(value))
+                    self.assertEqual(json.dumps(value, ensure_ascii=False, indent=2), dumps(value, indent=2))
+                    self.assertEqual(json.dumps(value, ensure_ascii=False, indent=4), dumps(value, indent=4))
+                    expected = list(value) if isinstance(value, tuple) else value
+                    self.assertEqual(expected, loads(dumps(value)))
+                    self.assertEqual(expected, loads(dumps(value).encode('utf-8')))
+
+    def test_float_notation(self):
+        for backend in backends:
+            set_backend(backend)
+            with self.subTest(backend=backend):
+                # fast backends write a shorter exponent notation, which decodes to the same value
+                actual = dumps([1e-7, 1e16])
+                self.assertIn(actual, ['[1e-07, 1e+16]', '[1e-7,1e16]'])
+                self.assertEqual([1e-7, 1e16], json.loads(actual))
+
+    def test_fallback(self):
+        for backend in backends:
+            set_backend(backend)
+            for value in [2 ** 70, {1: 'int key'}]:
+                with self.subTest(backend=backend, value=value):
+                    expected = expected_dumps(backend, value)
+                    self.assertEqual(expected, dumps(value))
+                    self.assertEqual(json.loads(expected), loads(expected))
+
+            with self.subTest(backend=backend, value='NaN'):
+                # the json module decodes NaN, which fast backends do not support
+                self.assertEqual(['nan'], [str(value) for value in loads('[NaN]')])
+
+    def test_fallback_on_non_finite_floats(self):
+        for backend in backends:
+            set_backend(backend)
+            for value in [float('nan'), [1.5, float('inf')], {'time': -float('inf')}, (dict(list=[float('nan')]),)]:
+                with self.subTest(backend=backend, value=value):
+                    # fast backends would write null
+                    self.assertEqual(json.dumps(value, ensure_ascii=False), dumps(value))
+                    self.assertEqual(json.dumps(value, ensure_ascii=False, indent=2), dumps(value, indent=2))
+
+    def test_fallback_on_error(self):
+        backend = mock.Mock(dumps=mock.Mock(side_effect=TypeError('unsupported')), loads=mock.Mock(side_effect=ValueError('invalid')))
+        with mock.patch.object(jsoncodec, '_backend', backend):
+            self.assertEqual('{"a": [1, 2]}', dumps(dict(a=[1, 2])))
+            self.assertEqual(dict(a=[1, 2]), loads('{"a": [1, 2]}'))
+        backend.dumps.assert_called_once_with(dict(a=[1, 2]), False)
+        backend.loads.assert_called_once_with('{"a": [1, 2]}')
+
+    def test_loads_invalid(self):
+        for backend in backends:
+            set_backend(backend)
+            with self.subTest(backend=backend):
+                with self.assertRaises(json.JSONDecodeError):
+                    loads('{"a": ')
+                with self.assertRaises(TypeError):
+                    dumps(object())
@@ -0,0 +1,67 @@
+import io
+import json
+import unittest
+
+from publish import jsonstream, jsoncodec
+from publish.jsonstream import StreamedDict, StreamedList
+
+
+class TestJsonStream(unittest.TestCase):
+
+    def assert_dump(self, expected, value, indent: int = 2):
+        writer = io.StringIO()
+        jsonstream.dump(value, writer, indent=indent)
+        self.assertEqual(json.dumps(expected, ensure_ascii=False, indent=indent), writer.getvalue())
+
+    def test_dump_values(self):
+        for value in [None, True, 1, 1.5, 'täst "\n" 😀', [], {}, [1, [2, {}], {'a': []}],
+                      {'a': {'b': [1, 2], 'c': {'d': 'line\nbreak'}}, 'e': None}]:
+            with self.subTest(value=value):
+                self.assert_dump(value, value)
+
+    def test_dump_streamed(self):
+        self.assert_dump([], StreamedList([]))
+        self.assert_dump({}, StreamedDict([]))
+        self.assert_dump([1, {'a': [1, 2]}], StreamedList(iter([1, {'a': [1, 2]}])))
+
+        def cases():
+            for idx in range(3):
+                yield {'name': f'test {idx}', 'states': {'success': [{'time': idx, 'message': 'mëssage\nline'}]}}
+
+        expected = {'title': 'title', 'annotations': [], 'cases': list(cases()), 'nested': {'list': [1, 2]}, 'formatted': {}}
+        for indent in [2, 4]:
+            with self.subTest(indent=indent):
+                self.assert_dump(expected, StreamedDict([
+                    ('title', 'title'),
+                    ('annotations', StreamedList(iter([]))),
+                    ('cases', StreamedList(cases())),
+                    ('nested', StreamedDict([('list', StreamedList([1, 2]))])),
+                    ('formatted', {}),
+                ]), indent=indent)
+
+    def test_dump_consumes_generators_once(self):
+        consumed = []
+
+        def values():
+            for idx in range(3):
+                consumed.append(idx)
+                yield idx
+
+        writer = io.StringIO()
+        jsonstream.dump(StreamedList(values()), writer)
+        self.assertEqual([0, 1, 2], consumed)
+        self.assertEqual('[\n  0,\n  1,\n  2\n]', writer.getvalue())
+
+    def test_dump_floats_with_fast_backend(self):
+        # the json module writes exponents with leading zeros and plus sign, other than the fast backends
+        value = {'time': 1e-07, 'times': [1e16, 2.5e-10, 0.1], 'nested': {'time': 1e-05}}
+        backend = jsoncodec.get_backend()
+        for name in jsoncodec.backends:
+            with self.subTest(backend=name):
+                jsoncodec.set_backend(name)
+                try:
+                    self.assert_dump(value, value)
+                    self.assert_dump(value, StreamedDict(value.items()))
+                    self.assert_dump(value['times'], StreamedList(value['times']))
+                finally:
+                    jsoncodec.set_backend(backend)
@@ -209,11 +209,9 @@ class JUnitXmlParseTest:
         gh = mock.MagicMock(get_repo=mock.Mock(return_value=repo))
         gha = mock.MagicMock()
 
-        # makes gzipped digest deterministic
-        with mock.patch('gzip.time.time', return_value=0):
-            publisher = Publisher(settings, gh, gha)
-            publisher.publish(stats, results.case_results, conclusion)
-            data = publisher.get_publish_data(stats, results.case_results, conclusion).with_check_url('html')
+        publisher = Publisher(settings, gh, gha)
+        publisher.publish(stats, results.case_results, conclusion)
+        data = publisher.get_publish_data(stats, results.case_results, conclusion).with_check_url('html')
 
         return check_runs, data
 
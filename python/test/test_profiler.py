@@ -0,0 +1,201 @@
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+import unittest
+
+import mock
+
+from publish.profiler import PhaseProfiler, ProfileCapture, get_peak_rss, hash_string
+from publish.unittestresults import ParsedUnitTestResults, UnitTestCase, get_test_results
+
+
+class TestPhaseProfiler(unittest.TestCase):
+
+    @staticmethod
+    def create_profiler(clock: list, cpu_clock: list, memory: list) -> PhaseProfiler:
+        return PhaseProfiler(clock=mock.MagicMock(side_effect=clock),
+                             cpu_clock=mock.MagicMock(side_effect=cpu_clock),
+                             memory=mock.MagicMock(side_effect=memory),
+                             peak_memory=lambda: 4096)
+
+    def test_phase(self):
+        profiler = self.create_profiler(clock=[0.0, 1.0, 2.5, 3.0, 3.5, 4.0, 6.0, 10.0],
+                                        cpu_clock=[0.0, 0.5, 1.5, 2.0, 2.25, 2.5, 3.5, 5.0],
+                                        memory=[1024, 2048, 3072])
+        with profiler.phase('parse JUnit XML files'):
+            pass
+        with profiler.phase('parse JUnit XML files'):
+            pass
+        with self.assertRaises(ValueError):
+            with profiler.phase('aggregate results'):
+                raise ValueError()
+
+        self.assertEqual(dict(
+            wall_seconds=10.0, cpu_seconds=5.0, peak_rss=4096, phases=[
+                dict(phase='parse JUnit XML files', calls=2, wall_seconds=2.0, cpu_seconds=1.25, rss=2048, peak_rss=4096),
+                dict(phase='aggregate results', calls=1, wall_seconds=2.0, cpu_seconds=1.0, rss=3072, peak_rss=4096),
+            ]
+        ), profiler.to_dict())
+
+    def test_phase_with_tracemalloc(self):
+        profiler = PhaseProfiler()
+        tracemalloc.start()
+        try:
+            with profiler.phase('allocate'):
+                data = bytearray(1024 * 1024)
+                del data
+            with profiler.phase('no allocation'):
+                pass
+        finally:
+            tracemalloc.stop()
+        with profiler.phase('not traced'):
+            pass
+
+        phases = profiler.phases
+        self.assertGreaterEqual(phases['allocate'].traced_peak, 1024 * 1024)
+        if sys.version_info >= (3, 9):
+            self.assertLess(phases['no allocation'].traced_peak, 1024 * 1024)
+        self.assertIsNone(phases['not traced'].traced_peak)
+
+    def test_phase_with_tracemalloc_without_reset_peak(self):
+        # Python 3.7 and 3.8 do not provide tracemalloc.reset_peak
+        traced = mock.Mock(spec=['is_tracing', 'get_traced_memory'],
+                           is_tracing=mock.Mock(return_value=True),
+                           get_traced_memory=mock.Mock(side_effect=[(1024, 4096), (1024, 8192)]))
+        profiler = PhaseProfiler()
+        with mock.patch('publish.profiler.tracemalloc', traced):
+            with profiler.phase('allocate'):
+                pass
+            with profiler.phase('allocate'):
+                pass
+        self.assertEqual(8192, profiler.phases['allocate'].traced_peak)
+
+    def test_phase_inspects_process_once(self):
+        with mock.patch('psutil.Process') as process:
+            process.return_value.memory_info.return_value = mock.MagicMock(rss=1024)
+            profiler = PhaseProfiler(peak_memory=lambda: 4096)
+            for _ in range(3):
+                with profiler.phase('parse files'):
+                    pass
+        process.assert_called_once_with()
+        self.assertEqual(3, profiler.phases['parse files'].calls)
+        self.assertEqual(1024, profiler.phases['parse files'].rss)
+
+    def test_get_peak_rss(self):
+        self.assertGreater(get_peak_rss(), 0)
+        with mock.patch.dict(sys.modules, {'resource': None}), \
+             mock.patch('psutil.Process') as process:
+            process.return_value.memory_info.return_value = mock.MagicMock(spec=['rss'])
+            self.assertIsNone(get_peak_rss())
+            self.assertIsNone(get_peak_rss(process.return_value))
+
+    def test_log_stats(self):
+        profiler = self.create_profiler(clock=[0.0, 1.0, 2.5, 3.0],
+                                        cpu_clock=[0.0, 0.5, 1.5, 2.0],
+                                        memory=[1024 * 1024])
+        with profiler.phase('parse JUnit XML files'):
+            pass
+
+        with self.assertLogs('publish', 'INFO') as logs:
+            profiler.log_stats()
+        self.assertEqual(['INFO:publish:Phases:\n'
+                          'phase                  calls  wall seconds  cpu seconds      rss  peak rss\n'
+                          'parse JUnit XML files      1         1.500        1.000  1.0 MiB   1.0 MiB\n'
+                          'total                                3.000        2.000            1.0 MiB'],
+                         logs.output)
+
+
+class TestProfileCapture(unittest.TestCase):
+
+    parsed = ParsedUnitTestResults(
+        files=1,
+        errors=[],
+        suites=1,
+        suite_tests=3,
+        suite_skipped=0,
+        suite_failures=1,
+        suite_errors=0,
+        suite_time=3,
+        suite_details=[],
+        cases=[
+            UnitTestCase(result_file='result.xml', test_file=None, line=None, class_name='class', test_name='test1',
+                         result='success', message=None, content=None, stdout='out', stderr=None, time=1.5),
+            UnitTestCase(result_file='result.xml', test_file=None, line=None, class_name='class', test_name='test2',
+                         result='failure', message='secret message', content='content', stdout=None, stderr=None, time=2.0),
+            UnitTestCase(result_file='result.xml', test_file=None, line=None, class_name='class', test_name='test2',
+                         result='success', message=None, content=None, stdout=None, stderr=None, time=None),
+        ]
+    ).with_commit('commit')
+
+    def test_hash_string(self):
+        self.assertIsNone(hash_string(None))
+        self.assertEqual('sha256:9f86d081884c7d65', hash_string('test'))
+
+    def do_test_capture(self, cpu: bool, memory: bool, hash_strings: bool) -> dict:
+        with tempfile.TemporaryDirectory() as path:
+            directory = os.path.join(path, 'profile')
+            with ProfileCapture(directory, cpu=cpu, memory=memory, hash_strings=hash_strings, top=2) as capture:
+                self.assertEqual(memory, tracemalloc.is_tracing())
+                for phase in ['parse files', 'parse files', 'aggregate results']:
+                    with capture.profiler.phase(phase):
+                        pass
+                capture.describe(self.parsed, get_test_results(self.parsed, False))
+            self.assertFalse(tracemalloc.is_tracing())
+
+            expected = ['profile.json'] + (['cpu.prof', 'cpu.txt'] if cpu else []) + (['memory.txt'] if memory else [])
+            self.assertEqual(sorted(expected), sorted(os.listdir(directory)))
+            with open(os.path.join(directory, 'profile.json'), 'rt', encoding='utf-8') as r:
+                profile = json.load(r)
+            if memory:
+                with open(os.path.join(directory, 'memory.txt'), 'rt', encoding='utf-8') as r:
+                    memory_report = r.read()
+                # repeated phases do not take snapshots
+                self.assertEqual(['before parse files', 'before aggregate results', 'end'],
+                                 [line.split(':')[0] for line in memory_report.split('\n\n')])
+                self.assertIn('growth since before parse files:', memory_report)
+            return profile
+
+    def test_capture(self):
+        for cpu, memory in [(True, False), (False, True), (True, True), (False, False)]:
+            with self.subTest(cpu=cpu, memory=memory):
+                profile = self.do_test_capture(cpu, memory, hash_strings=True)
+                self.assertEqual((cpu, memory, True), (profile['cpu'], profile['memory'], profile['hashed']))
+                self.assertEqual(['parse files', 'aggregate results'], [phase['phase'] for phase in profile['phases']['phases']])
+                self.assertEqual(2, profile['phases']['phases'][0]['calls'])
+
+    def test_describe(self):
+        profile = self.do_test_capture(cpu=False, memory=False, hash_strings=True)
+        self.assertEqual(dict(
+            files=[dict(file=hash_string('result.xml'), size=None)],
+            errors=0,
+            suites=1,
+            tests=2,
+            runs=3,
+            max_runs_per_test=2,
+            results=dict(failure=1, success=2),
+            class_names=dict(count=3, max=5, total=15),
+            test_names=dict(count=3, max=5, total=15),
+            messages=dict(count=1, max=14, total=14),
+            contents=dict(count=1, max=7, total=7),
+            stdout=dict(count=1, max=3, total=3),
+            stderr=dict(count=0, max=0, total=0),
+            slowest_runs=[
+                dict(class_name=hash_string('class'), test_name=hash_string('test2'), time=2.0),
+                dict(class_name=hash_string('class'), test_name=hash_string('test1'), time=1.5),
+            ]
+        ), profile['results'])
+        self.assertNotIn('secret', json.dumps(profile))
+
+        profile = self.do_test_capture(cpu=False, memory=False, hash_strings=False)
+        self.assertEqual([dict(file='result.xml', size=None)], profile['results']['files'])
+        self.assertEqual(dict(class_name='class', test_name='test2', time=2.0), profile['results']['slowest_runs'][0])
+
+    def test_write_failure(self):
+        with tempfile.TemporaryDirectory() as path:
+            with mock.patch('json.dump', side_effect=OSError('disk full')), \
+                 self.assertLogs('publish', 'WARNING') as logs:
+                with ProfileCapture(path, cpu=False, memory=False):
+                    pass
+            self.assertEqual([f'WARNING:publish:Failed to write profile to {path}'], [log.split('\n')[0] for log in logs.output])
@@ -1,18 +1,19 @@
 import pathlib
 import unittest
 from collections import defaultdict
+from typing import Optional
 
 import mock
 
 from publish import Annotation, UnitTestSuite, UnitTestRunResults, UnitTestRunDeltaResults, CaseMessages, \
-    get_json_path, get_error_annotation, get_digest_from_stats, \
+    get_json_path, get_error_annotation, get_digest_from_stats, digest_header, \
     all_tests_label_md, skipped_tests_label_md, failed_tests_label_md, passed_tests_label_md, test_errors_label_md, \
     duration_label_md, SomeTestChanges, abbreviate, abbreviate_bytes, get_test_name, get_formatted_digits, digit_space, \
     get_magnitude, get_delta, as_short_commit, as_delta, as_stat_number, as_stat_duration, get_stats_from_digest, \
-    digest_string, ungest_string, get_details_line_md, get_commit_line_md, restrict_unicode, \
-    get_short_summary, get_short_summary_md, get_long_summary_md, get_long_summary_with_runs_md, \
+    digest_string, ungest_string, deflate_string, inflate_string, digest_v1_format, get_details_line_md, get_commit_line_md, restrict_unicode, \
+    get_short_summary, get_short_summary_md, get_long_summary_md, summary_truncated_md, get_long_summary_with_runs_md, \
     get_long_summary_without_runs_md,  get_long_summary_with_digest_md, get_test_changes_md, get_test_changes_list_md,  \
-    get_test_changes_summary_md, get_case_annotations, get_case_annotation, get_suite_annotations, \
+    get_test_changes_summary_md, get_case_annotations, get_limited_annotations, truncate_bytes, get_failure_fingerprint, get_case_annotation, get_suite_annotations, \
     get_suite_annotations_for_suite, get_all_tests_list_annotation, get_skipped_tests_list_annotation, get_case_messages, \
     chunk_test_list, message_is_contained_in_content
 from publish.junit import parse_junit_xml_files, process_junit_xml_elems
@@ -508,7 +509,8 @@ class PublishTest(unittest.TestCase):
             commit='commit'
         ))
         self.assertTrue(isinstance(digest, str))
-        self.assertTrue(len(digest) > 100)
+        self.assertEqual('izbUMdIx1jHRMdUx0zHXsdCx1DE00DE01DE00jE01lFKzs/NzSxRigUA', digest)
+        self.assertEqual('[1,2,3,4,5,6,7,8,9,10,11,12,13,"commit"]', inflate_string(digest))
         stats = get_stats_from_digest(digest)
         self.assertEqual(stats, UnitTestRunResults(
             files=1, errors=[], suites=2, duration=3, suite_details=None,
@@ -524,20 +526,36 @@ class PublishTest(unittest.TestCase):
         string = ungest_string(digest)
         self.assertEqual(string, 'abc')
 
+    def test_deflate_inflate_string(self):
+        digest = deflate_string('abc')
+        self.assertEqual('S0xKBgA=', digest)
+        self.assertEqual('abc', inflate_string(digest))
+
     def test_get_stats_from_digest(self):
+        expected = UnitTestRunResults(
+            files=1, errors=[], suites=2, duration=3, suite_details=None,
+            tests=4, tests_succ=5, tests_skip=6, tests_fail=7, tests_error=8,
+            runs=9, runs_succ=10, runs_skip=11, runs_fail=12, runs_error=13,
+            commit='commit'
+        )
+        self.assertEqual(expected, get_stats_from_digest('izbUMdIx1jHRMdUx0zHXsdCx1DE00DE01DE00jE01lFKzs/NzSxRigUA'))
+
+        # digests written by earlier versions
         self.assertEqual(
+            expected,
             get_stats_from_digest('H4sIAAAAAAAC/0XOwQ6CMBAE0F8hPXtgEVT8GdMUSDYCJdv2ZP'
                                   'x3psLW28zbZLIfM/E8BvOs6FKZkDj+SoMyJLGR/Yp6RcUh5lOr'
                                   '+RWSc4DuD2/eALcCk+UZcC8winiBPCCS1rzXn1HnqC5wzBEpnH'
-                                  'PUKOgc5QedXxaOaJq+O+lMT3jdAAAA'),
-            UnitTestRunResults(
-                files=1, errors=[], suites=2, duration=3, suite_details=None,
-                tests=4, tests_succ=5, tests_skip=6, tests_fail=7, tests_error=8,
-                runs=9, runs_succ=10, runs_skip=11, runs_fail=12, runs_error=13,
-                commit='commit'
-            )
+                                  'PUKOgc5QedXxaOaJq+O+lMT3jdAAAA', digest_v1_format)
         )
 
+        # digests written by later versions may have more fields
+        self.assertEqual(expected, get_stats_from_digest('izbUMdIx1jHRMdUx0zHXsdCx1DE00DE01DE00jE01lFKzs/NzSxR0jE00VFKKy0pLUpVigUA'))
+
+        with self.assertRaises(ValueError) as e:
+            get_stats_from_digest('digest', 'v3;zstd;base64')
+        self.assertEqual('Unsupported digest format: v3;zstd;base64', str(e.exception))
+
     def test_get_short_summary(self):
         self.assertEqual('No tests found', get_short_summary(UnitTestRunResults(files=0, errors=[], suites=0, duration=123, suite_details=self.details, tests=0, tests_succ=0, tests_skip=0, tests_fail=0, tests_error=0, runs=0, runs_succ=0, runs_skip=0, runs_fail=0, runs_error=0, commit='commit')))
         self.assertEqual('10 tests found in 2m 3s', get_short_summary(UnitTestRunResults(files=1, errors=[], suites=2, duration=123, suite_details=self.details, tests=10, tests_succ=0, tests_skip=0, tests_fail=0, tests_error=0, runs=0, runs_succ=0, runs_skip=0, runs_fail=0, runs_error=0, commit='commit')))
@@ -978,16 +996,14 @@ class PublishTest(unittest.TestCase):
         )
 
     def test_get_long_summary_with_digest_md_with_single_run(self):
-        # makes gzipped digest deterministic
-        with mock.patch('gzip.time.time', return_value=0):
-            actual = get_long_summary_with_digest_md(
-                UnitTestRunResults(
-                    files=1, errors=[], suites=2, duration=3, suite_details=self.details,
-                    tests=4, tests_succ=5, tests_skip=6, tests_fail=7, tests_error=8,
-                    runs=4, runs_succ=5, runs_skip=6, runs_fail=7, runs_error=8,
-                    commit='commit'
-                )
+        actual = get_long_summary_with_digest_md(
+            UnitTestRunResults(
+                files=1, errors=[], suites=2, duration=3, suite_details=self.details,
+                tests=4, tests_succ=5, tests_skip=6, tests_fail=7, tests_error=8,
+                runs=4, runs_succ=5, runs_skip=6, runs_fail=7, runs_error=8,
+                commit='commit'
             )
+        )
 
         self.assertEqual(actual, f'4 {all_tests_label_md}   5 {passed_tests_label_md}  3s {duration_label_md}\n'
                                  f'2 suites  6 {skipped_tests_label_md}\n'
@@ -995,23 +1011,18 @@ class PublishTest(unittest.TestCase):
                                  '\n'
                                  'Results for commit commit.\n'
                                  '\n'
-                                 '[test-results]:data:application/gzip;base64,'
-                                 'H4sIAAAAAAAC/02MywqAIBQFfyVct+kd/UyEJVzKjKuuon/vZF'
-                                 'juzsyBOYWibbFiyIo8E9aTC1ACZs+TI7MDKyAO91x13KP1UkI0'
-                                 'v1jpgGg/oSbaILpPLMyGYXoY9nvsPTPNvfzXAiexwGlLGq3JAe'
-                                 'K6buousrLZAAAA\n')
+                                 '[test-results]:data:v2;deflate;base64,'
+                                 'izbUMdIx1jHRMdUx0zHXsUBiKSXn5+ZmlijFAgA=\n')
 
     def test_get_long_summary_with_digest_md_with_multiple_runs(self):
-        # makes gzipped digest deterministic
-        with mock.patch('gzip.time.time', return_value=0):
-            actual = get_long_summary_with_digest_md(
-                UnitTestRunResults(
-                    files=1, errors=[], suites=2, duration=3, suite_details=self.details,
-                    tests=4, tests_succ=5, tests_skip=6, tests_fail=7, tests_error=0,
-                    runs=9, runs_succ=10, runs_skip=11, runs_fail=12, runs_error=0,
-                    commit='commit'
-                )
+        actual = get_long_summary_with_digest_md(
+            UnitTestRunResults(
+                files=1, errors=[], suites=2, duration=3, suite_details=self.details,
+                tests=4, tests_succ=5, tests_skip=6, tests_fail=7, tests_error=0,
+                runs=9, runs_succ=10, runs_skip=11, runs_fail=12, runs_error=0,
+                commit='commit'
             )
+        )
 
         self.assertEqual(actual, f'1 files  {digit_space}2 suites   3s {duration_label_md}\n'
                                  f'4 {all_tests_label_md} {digit_space}5 {passed_tests_label_md} {digit_space}6 {skipped_tests_label_md} {digit_space}7 {failed_tests_label_md}\n'
@@ -1019,23 +1030,18 @@ class PublishTest(unittest.TestCase):
                                  '\n'
                                  'Results for commit commit.\n'
                                  '\n'
-                                 '[test-results]:data:application/gzip;base64,'
-                                 'H4sIAAAAAAAC/03MwQqDMBAE0F+RnD24aiv6M0VShaVqZJOciv'
-                                 '/e0brR28wbmK8ZeRq86TLKM+Mjh6OUKO8ofWC3oFaoGMI+1Zpf'
-                                 'PloLeFzw4RXwTDD2PAGaBIOIE0gBkbjsf+0Z9Y6KBP87IoXzjk'
-                                 'qF+51188wBRdP2A3NU1srcAAAA\n')
+                                 '[test-results]:data:v2;deflate;base64,'
+                                 'izbUMdIx1jHRMdUx0zHXMdCx1DE00DE01DE0AnKUkvNzczNLlGIB\n')
 
     def test_get_long_summary_with_digest_md_with_test_errors(self):
-        # makes gzipped digest deterministic
-        with mock.patch('gzip.time.time', return_value=0):
-            actual = get_long_summary_with_digest_md(
-                UnitTestRunResults(
-                    files=1, errors=[], suites=2, duration=3, suite_details=self.details,
-                    tests=4, tests_succ=5, tests_skip=6, tests_fail=7, tests_error=8,
-                    runs=9, runs_succ=10, runs_skip=11, runs_fail=12, runs_error=13,
-                    commit='commit'
-                )
+        actual = get_long_summary_with_digest_md(
+            UnitTestRunResults(
+                files=1, errors=[], suites=2, duration=3, suite_details=self.details,
+                tests=4, tests_succ=5, tests_skip=6, tests_fail=7, tests_error=8,
+                runs=9, runs_succ=10, runs_skip=11, runs_fail=12, runs_error=13,
+                commit='commit'
             )
+        )
 
         self.assertEqual(actual, f'1 files  {digit_space}2 suites   3s {duration_label_md}\n'
                                  f'4 {all_tests_label_md} {digit_space}5 {passed_tests_label_md} {digit_space}6 {skipped_tests_label_md} {digit_space}7 {failed_tests_label_md} {digit_space}8 {test_errors_label_md}\n'
@@ -1043,23 +1049,18 @@ class PublishTest(unittest.TestCase):
                                  '\n'
                                  'Results for commit commit.\n'
                                  '\n'
-                                 '[test-results]:data:application/gzip;base64,'
-                                 'H4sIAAAAAAAC/0XOwQ6CMBAE0F8hPXtgEVT8GdMUSDYCJdv2ZP'
-                                 'x3psLW28zbZLIfM/E8BvOs6FKZkDj+SoMyJLGR/Yp6RcUh5lOr'
-                                 '+RWSc4DuD2/eALcCk+UZcC8winiBPCCS1rzXn1HnqC5wzBEpnH'
-                                 'PUKOgc5QedXxaOaJq+O+lMT3jdAAAA\n')
+                                 '[test-results]:data:v2;deflate;base64,'
+                                 'izbUMdIx1jHRMdUx0zHXsdCx1DE00DE01DE00jE01lFKzs/NzSxRigUA\n')
 
     def test_get_long_summary_with_digest_md_with_parse_errors(self):
-        # makes gzipped digest deterministic
-        with mock.patch('gzip.time.time', return_value=0):
-            actual = get_long_summary_with_digest_md(
-                UnitTestRunResults(
-                    files=1, errors=errors, suites=2, duration=3, suite_details=self.details,
-                    tests=4, tests_succ=5, tests_skip=6, tests_fail=7, tests_error=8,
-                    runs=9, runs_succ=10, runs_skip=11, runs_fail=12, runs_error=13,
-                    commit='commit'
-                )
+        actual = get_long_summary_with_digest_md(
+            UnitTestRunResults(
+                files=1, errors=errors, suites=2, duration=3, suite_details=self.details,
+                tests=4, tests_succ=5, tests_skip=6, tests_fail=7, tests_error=8,
+                runs=9, runs_succ=10, runs_skip=11, runs_fail=12, runs_error=13,
+                commit='commit'
             )
+        )
 
         self.assertEqual(actual, f'1 files  {digit_space}1 errors  {digit_space}2 suites   3s {duration_label_md}\n'
                                  f'4 {all_tests_label_md} {digit_space}5 {passed_tests_label_md} {digit_space}6 {skipped_tests_label_md} {digit_space}7 {failed_tests_label_md} {digit_space}8 {test_errors_label_md}\n'
@@ -1067,28 +1068,23 @@ class PublishTest(unittest.TestCase):
                                  '\n'
                                  'Results for commit commit.\n'
                                  '\n'
-                                 '[test-results]:data:application/gzip;base64,'
-                                 'H4sIAAAAAAAC/0XOwQ6CMBAE0F8hPXtgEVT8GdMUSDYCJdv2ZP'
-                                 'x3psLW28zbZLIfM/E8BvOs6FKZkDj+SoMyJLGR/Yp6RcUh5lOr'
-                                 '+RWSc4DuD2/eALcCk+UZcC8winiBPCCS1rzXn1HnqC5wzBEpnH'
-                                 'PUKOgc5QedXxaOaJq+O+lMT3jdAAAA\n')
+                                 '[test-results]:data:v2;deflate;base64,'
+                                 'izbUMdIx1jHRMdUx0zHXsdCx1DE00DE01DE00jE01lFKzs/NzSxRigUA\n')
 
     def test_get_long_summary_with_digest_md_with_delta(self):
-        # makes gzipped digest deterministic
-        with mock.patch('gzip.time.time', return_value=0):
-            actual = get_long_summary_with_digest_md(
-                UnitTestRunDeltaResults(
-                    files=n(1, 2), errors=[], suites=n(2, -3), duration=d(3, 4), suite_details=self.details,
-                    tests=n(4, -5), tests_succ=n(5, 6), tests_skip=n(6, -7), tests_fail=n(7, 8), tests_error=n(8, -9),
-                    runs=n(9, 10), runs_succ=n(10, -11), runs_skip=n(11, 12), runs_fail=n(12, -13), runs_error=n(13, 14),
-                    commit='123456789abcdef0', reference_type='type', reference_commit='0123456789abcdef'
-                ), UnitTestRunResults(
-                    files=1, errors=[], suites=2, duration=3, suite_details=self.details,
-                    tests=4, tests_succ=5, tests_skip=6, tests_fail=7, tests_error=8,
-                    runs=4, runs_succ=5, runs_skip=6, runs_fail=7, runs_error=8,
-                    commit='commit'
-                )
+        actual = get_long_summary_with_digest_md(
+            UnitTestRunDeltaResults(
+                files=n(1, 2), errors=[], suites=n(2, -3), duration=d(3, 4), suite_details=self.details,
+                tests=n(4, -5), tests_succ=n(5, 6), tests_skip=n(6, -7), tests_fail=n(7, 8), tests_error=n(8, -9),
+                runs=n(9, 10), runs_succ=n(10, -11), runs_skip=n(11, 12), runs_fail=n(12, -13), runs_error=n(13, 14),
+                commit='123456789abcdef0', reference_type='type', reference_commit='0123456789abcdef'
+            ), UnitTestRunResults(
+                files=1, errors=[], suites=2, duration=3, suite_details=self.details,
+                tests=4, tests_succ=5, tests_skip=6, tests_fail=7, tests_error=8,
+                runs=4, runs_succ=5, runs_skip=6, runs_fail=7, runs_error=8,
+                commit='commit'
             )
+        )
 
         self.assertEqual(actual, f'1 files  +{digit_space}2  {digit_space}2 suites   - 3   3s {duration_label_md} +4s\n'
                                  f'4 {all_tests_label_md}  - {digit_space}5  {digit_space}5 {passed_tests_label_md} +{digit_space}6  {digit_space}6 {skipped_tests_label_md}  - {digit_space}7  {digit_space}7 {failed_tests_label_md} +{digit_space}8  {digit_space}8 {test_errors_label_md}  - {digit_space}9 \n'
@@ -1096,28 +1092,23 @@ class PublishTest(unittest.TestCase):
                                  '\n'
                                  'Results for commit 12345678. ± Comparison against type commit 01234567.\n'
                                  '\n'
-                                 '[test-results]:data:application/gzip;base64,'
-                                 'H4sIAAAAAAAC/02MywqAIBQFfyVct+kd/UyEJVzKjKuuon/vZF'
-                                 'juzsyBOYWibbFiyIo8E9aTC1ACZs+TI7MDKyAO91x13KP1UkI0'
-                                 'v1jpgGg/oSbaILpPLMyGYXoY9nvsPTPNvfzXAiexwGlLGq3JAe'
-                                 'K6buousrLZAAAA\n')
+                                 '[test-results]:data:v2;deflate;base64,'
+                                 'izbUMdIx1jHRMdUx0zHXsUBiKSXn5+ZmlijFAgA=\n')
 
     def test_get_long_summary_with_digest_md_with_delta_and_parse_errors(self):
-        # makes gzipped digest deterministic
-        with mock.patch('gzip.time.time', return_value=0):
-            actual = get_long_summary_with_digest_md(
-                UnitTestRunDeltaResults(
-                    files=n(1, 2), errors=errors, suites=n(2, -3), duration=d(3, 4), suite_details=self.details,
-                    tests=n(4, -5), tests_succ=n(5, 6), tests_skip=n(6, -7), tests_fail=n(7, 8), tests_error=n(8, -9),
-                    runs=n(9, 10), runs_succ=n(10, -11), runs_skip=n(11, 12), runs_fail=n(12, -13), runs_error=n(13, 14),
-                    commit='123456789abcdef0', reference_type='type', reference_commit='0123456789abcdef'
-                ), UnitTestRunResults(
-                    files=1, errors=[], suites=2, duration=3, suite_details=self.details,
-                    tests=4, tests_succ=5, tests_skip=6, tests_fail=7, tests_error=8,
-                    runs=4, runs_succ=5, runs_skip=6, runs_fail=7, runs_error=8,
-                    commit='commit'
-                )
+        actual = get_long_summary_with_digest_md(
+            UnitTestRunDeltaResults(
+                files=n(1, 2), errors=errors, suites=n(2, -3), duration=d(3, 4), suite_details=self.details,
+                tests=n(4, -5), tests_succ=n(5, 6), tests_skip=n(6, -7), tests_fail=n(7, 8), tests_error=n(8, -9),
+                runs=n(9, 10), runs_succ=n(10, -11), runs_skip=n(11, 12), runs_fail=n(12, -13), runs_error=n(13, 14),
+                commit='123456789abcdef0', reference_type='type', reference_commit='0123456789abcdef'
+            ), UnitTestRunResults(
+                files=1, errors=[], suites=2, duration=3, suite_details=self.details,
+                tests=4, tests_succ=5, tests_skip=6, tests_fail=7, tests_error=8,
+                runs=4, runs_succ=5, runs_skip=6, runs_fail=7, runs_error=8,
+                commit='commit'
             )
+        )
 
         self.assertEqual(actual, f'1 files  +{digit_space}2  {digit_space}1 errors  {digit_space}2 suites   - 3   3s {duration_label_md} +4s\n'
                                  f'4 {all_tests_label_md}  - {digit_space}5  {digit_space}5 {passed_tests_label_md} +{digit_space}6  {digit_space}6 {skipped_tests_label_md}  - {digit_space}7  {digit_space}7 {failed_tests_label_md} +{digit_space}8  {digit_space}8 {test_errors_label_md}  - {digit_space}9 \n'
@@ -1125,11 +1116,8 @@ class PublishTest(unittest.TestCase):
                                  '\n'
                                  'Results for commit 12345678. ± Comparison against type commit 01234567.\n'
                                  '\n'
-                                 '[test-results]:data:application/gzip;base64,'
-                                 'H4sIAAAAAAAC/02MywqAIBQFfyVct+kd/UyEJVzKjKuuon/vZF'
-                                 'juzsyBOYWibbFiyIo8E9aTC1ACZs+TI7MDKyAO91x13KP1UkI0'
-                                 'v1jpgGg/oSbaILpPLMyGYXoY9nvsPTPNvfzXAiexwGlLGq3JAe'
-                                 'K6buousrLZAAAA\n')
+                                 '[test-results]:data:v2;deflate;base64,'
+                                 'izbUMdIx1jHRMdUx0zHXsUBiKSXn5+ZmlijFAgA=\n')
 
     def test_get_long_summary_with_digest_md_with_delta_results_only(self):
         with self.assertRaises(ValueError) as context:
@@ -1141,6 +1129,86 @@ class PublishTest(unittest.TestCase):
             ))
         self.assertIn('stats must be UnitTestRunResults when no digest_stats is given', context.exception.args)
 
+    def test_get_long_summary_with_digest_md_with_max_bytes(self):
+        stats = UnitTestRunResults(
+            files=1, errors=[], suites=2, duration=3, suite_details=self.details,
+            tests=4, tests_succ=5, tests_skip=6, tests_fail=7, tests_error=0,
+            runs=4, runs_succ=5, runs_skip=6, runs_fail=7, runs_error=0,
+            commit='commit'
+        )
+        changes = SomeTestChanges([f'test {i:04d}' for i in range(1001)], ['test 1000'], [], [])
+        summary = get_long_summary_with_digest_md(stats, test_changes=changes)
+        digest = get_digest_from_stats(stats)
+        self.assertEqual(summary, get_long_summary_with_digest_md(stats, test_changes=changes, max_bytes=len(summary.encode('utf8'))))
+
+        # lists of test changes are shortened to fit the summary into max_bytes, the digest is retained
+        for max_bytes in [10000, 1000]:
+            with self.subTest(max_bytes=max_bytes):
+                limited = get_long_summary_with_digest_md(stats, test_changes=changes, max_bytes=max_bytes)
+                self.assertLessEqual(len(limited.encode('utf8')), max_bytes)
+                self.assertTrue(limited.endswith(f'\n{digest_header}{digest}\n'))
+                self.assertIn('This pull request <b>removes</b> 1000 tests.', limited)
+                self.assertIn('test 0000\n', limited)
+                self.assertIn('…\n```\n', limited)
+                self.assertEqual(stats.without_suite_details(), get_stats_from_digest(limited.split(digest_header)[1].strip()))
+
+        # with too little space, whole sections are omitted, which is noted
+        digest_line = f'\n{digest_header}{digest}\n'
+        without_changes = get_long_summary_md(stats).rstrip('\n') + f'\n\n{summary_truncated_md}\n'
+        self.assertEqual(f'{without_changes}{digest_line}',
+                         get_long_summary_with_digest_md(stats, test_changes=changes, max_bytes=len(f'{without_changes}{digest_line}'.encode('utf8'))))
+        short = f'{get_short_summary_md(stats)}\n\n{summary_truncated_md}\n'
+        self.assertEqual(f'{short}{digest_line}',
+                         get_long_summary_with_digest_md(stats, test_changes=changes, max_bytes=len(f'{short}{digest_line}'.encode('utf8'))))
+
+        # only the single-line short summary is ever cut at some byte
+        limited = get_long_summary_with_digest_md(stats, test_changes=changes, max_bytes=len(digest_line) + 20)
+        self.assertEqual(f'{truncate_bytes(get_short_summary_md(stats), 20)}{digest_line}', limited)
+        self.assertEqual(digest_line, get_long_summary_with_digest_md(stats, test_changes=changes, max_bytes=0))
+
+    def test_get_long_summary_md_with_max_bytes_keeps_markdown_intact(self):
+        stats = UnitTestRunResults(
+            files=1, errors=[], suites=2, duration=3, suite_details=self.details,
+            tests=4, tests_succ=5, tests_skip=6, tests_fail=7, tests_error=0,
+            runs=4, runs_succ=5, runs_skip=6, runs_fail=7, runs_error=0,
+            commit='commit'
+        )
+        changes = SomeTestChanges([f'test {i:04d}' for i in range(1001)], ['test 1000'],
+                                  [f'test {i:04d}' for i in range(500)], [])
+        full = get_long_summary_md(stats, 'https://details', changes)
+        for max_bytes in range(0, len(full.encode('utf8')) + 1, 97):
+            with self.subTest(max_bytes=max_bytes):
+                summary = get_long_summary_md(stats, 'https://details', changes, max_bytes=max_bytes)
+                self.assertLessEqual(len(summary.encode('utf8')), max_bytes)
+                self.assertEqual(summary.count('<details>'), summary.count('</details>'))
+                self.assertEqual(0, summary.count('```') % 2)
+
+    def test_get_long_summary_md_with_max_bytes_and_disabled_test_changes(self):
+        stats = UnitTestRunResults(
+            files=1, errors=[], suites=2, duration=3, suite_details=self.details,
+            tests=4, tests_succ=5, tests_skip=6, tests_fail=7, tests_error=0,
+            runs=4, runs_succ=5, runs_skip=6, runs_fail=7, runs_error=0,
+            commit='commit'
+        )
+        changes = SomeTestChanges([f'test {i:04d}' for i in range(1001)], ['test 1000'], [], [])
+        summary = get_long_summary_md(stats, test_changes=changes, test_list_changes_limit=0)
+        self.assertNotIn('<details>', summary)
+        # a limit of 0 disables the lists of test changes, they are not rendered to fit the summary
+        with mock.patch('publish.get_test_changes_summary_md', wraps=get_test_changes_summary_md) as test_changes_summary:
+            limited = get_long_summary_md(stats, test_changes=changes, test_list_changes_limit=0, max_bytes=len(summary.encode('utf8')) - 1)
+        self.assertNotIn('<details>', limited)
+        self.assertIn(summary_truncated_md, limited)
+        self.assertTrue(all(call.args[1] == 0 for call in test_changes_summary.call_args_list))
+
+    def test_truncate_bytes(self):
+        self.assertEqual('string', truncate_bytes('string', 6))
+        self.assertEqual('st…', truncate_bytes('string', 5))
+        self.assertEqual('…', truncate_bytes('string', 3))
+        self.assertEqual('', truncate_bytes('string', 2))
+        # multi-byte characters are not cut
+        self.assertEqual('✅…', truncate_bytes('✅✅✅', 7))
+        self.assertEqual('…', truncate_bytes('✅✅✅', 5))
+
     def test_get_test_changes_md(self):
         self.assertEqual(
             '<details>\n'
@@ -1763,6 +1831,10 @@ class PublishTest(unittest.TestCase):
 
         self.assertEqual(expected, annotations)
 
+        # test errors first, then test failures of most runs
+        annotations = get_case_annotations(results, report_individual_runs=False, ranked=True)
+        self.assertEqual([expected[1], expected[3], expected[0], expected[2]], annotations)
+
     def test_get_case_annotations_report_individual_runs(self):
         results = create_unit_test_case_results({
             (None, 'class1', 'test1'): {
@@ -1821,6 +1893,75 @@ class PublishTest(unittest.TestCase):
 
         self.assertEqual(expected, annotations)
 
+        annotations = get_case_annotations(results, report_individual_runs=True, ranked=True)
+        self.assertEqual([expected[2], expected[1], expected[0]], annotations)
+
+    def test_get_failure_fingerprint(self):
+        def case(result: str, message: Optional[str], content: Optional[str]) -> UnitTestCase:
+            return UnitTestCase(result_file='result file', test_file='test file', line=1, class_name='class', test_name='test',
+                                result=result, message=message, content=content, stdout='stdout', stderr='stderr', time=1.2)
+
+        fingerprint = get_failure_fingerprint(case('failure', 'expected 1 but was 2', 'at /home/runner/work/test.py:12 in object at 0x7f3a2c'))
+        self.assertEqual('failure:expected <number> but was <number> at <path>:<number> in object at <address>', fingerprint)
+        self.assertEqual(fingerprint, get_failure_fingerprint(case('failure', 'expected 3 but was 45', 'at C:\\work\\other\\test.py:7  in object at 0xdeadbeef')))
+        self.assertNotEqual(fingerprint, get_failure_fingerprint(case('error', 'expected 1 but was 2', 'at /home/runner/work/test.py:12 in object at 0x7f3a2c')))
+        self.assertNotEqual(fingerprint, get_failure_fingerprint(case('failure', 'expected a but was b', 'at /home/runner/work/test.py:12 in object at 0x7f3a2c')))
+        self.assertEqual('error:', get_failure_fingerprint(case('error', None, None)))
+
+    def test_get_case_annotations_clustered(self):
+        def case(test_name: str, result: str, line: int) -> UnitTestCase:
+            return UnitTestCase(result_file='result file', test_file='test file', line=line, class_name='class', test_name=test_name,
+                                result=result, message=f'{result} in fixture', content=f'at fixture.py:{line}',
+                                stdout=None, stderr=None, time=None)
+
+        results = create_unit_test_case_results({
+            ('test file', 'class', 'test1'): dict(failure=[case('test1', 'failure', 1)]),
+            ('test file', 'class', 'test2'): dict(error=[case('test2', 'error', 2)]),
+            ('test file', 'class', 'test3'): dict(failure=[case('test3', 'failure', 3)]),
+            ('test file', 'class', 'test4'): dict(error=[case('test4', 'error', 4)]),
+            ('test file', 'class', 'test5'): dict(failure=[case('test5', 'failure', 5)]),
+        })
+        annotations = get_case_annotations(results, report_individual_runs=False)
+        self.assertEqual(5, len(annotations))
+
+        self.assertEqual(annotations, get_case_annotations(results, report_individual_runs=False, cluster_size=4))
+        self.assertEqual([
+            Annotation(path='test file', start_line=1, end_line=1, start_column=None, end_column=None, annotation_level='warning',
+                       message='3 tests failed the same way, see "Raw output" for details of the first test:\n'
+                               'test file ‑ class ‑ test1\ntest file ‑ class ‑ test3\ntest file ‑ class ‑ test5',
+                       title='3 tests failed the same way', raw_details='failure in fixture\nat fixture.py:1'),
+            annotations[1],
+            annotations[3],
+        ], get_case_annotations(results, report_individual_runs=False, cluster_size=3))
+
+        clustered = get_case_annotations(results, report_individual_runs=False, cluster_size=2)
+        self.assertEqual(['3 tests failed the same way', '2 tests with error the same way'], [annotation.title for annotation in clustered])
+        self.assertEqual('failure', clustered[1].annotation_level)
+
+        # test errors rank first
+        ranked = get_case_annotations(results, report_individual_runs=False, ranked=True, cluster_size=2)
+        self.assertEqual([clustered[1], clustered[0]], ranked)
+
+    def test_get_limited_annotations(self):
+        def annotation(level: str, title: Optional[str]) -> Annotation:
+            return Annotation(path='file', start_line=1, end_line=1, start_column=None, end_column=None,
+                              annotation_level=level, message=f'{level} message', title=title, raw_details=None)
+
+        annotations = [annotation('failure', 'error 1'), annotation('warning', 'failure 1'), annotation('warning', None), annotation('notice', 'log 1')]
+        self.assertEqual(annotations, get_limited_annotations(annotations, 4))
+        self.assertEqual(annotations, get_limited_annotations(annotations, 5))
+        self.assertEqual([], get_limited_annotations([], 0))
+
+        def aggregate(count: int, max_annotations: int, level: str, raw_details: str) -> Annotation:
+            is_are, label = ('is', 'annotation') if count == 1 else ('are', 'annotations')
+            return Annotation(path='.github', start_line=0, end_line=0, start_column=None, end_column=None, annotation_level=level,
+                              message=f'There {is_are} {count} more {label} than published (max_annotations is {max_annotations}), see "Raw output" for their titles.',
+                              title=f'{count} more {label}', raw_details=raw_details)
+
+        self.assertEqual(annotations[:3] + [aggregate(1, 3, 'notice', 'log 1')], get_limited_annotations(annotations, 3))
+        self.assertEqual(annotations[:2] + [aggregate(2, 2, 'warning', 'warning message\nlog 1')], get_limited_annotations(annotations, 2))
+        self.assertEqual([aggregate(4, 0, 'failure', 'error 1\nfailure 1\nwarning message\nlog 1')], get_limited_annotations(annotations, 0))
+
     def test_get_error_annotation(self):
         self.assertEqual(Annotation(path='file', start_line=0, end_line=0, start_column=None, end_column=None, annotation_level='failure', message='message', title='Error processing result file', raw_details='file'), get_error_annotation(ParseError('file', 'message', None, None, None)))
         self.assertEqual(Annotation(path='file', start_line=12, end_line=12, start_column=None, end_column=None, annotation_level='failure', message='message', title='Error processing result file', raw_details='file'), get_error_annotation(ParseError('file', 'message', 12, None, None)))
@@ -1,9 +1,12 @@
 import dataclasses
+import importlib.util
+import io
 import json
 import os
 import pathlib
 import sys
 import tempfile
+import threading
 import unittest
 from collections.abc import Collection
 from datetime import datetime, timezone
@@ -16,13 +19,17 @@ from github import Github, GithubException
 from publish import __version__, get_json_path, comment_mode_off, comment_mode_always, \
     comment_mode_changes, comment_mode_changes_failures, comment_mode_changes_errors, \
     comment_mode_failures, comment_mode_errors, Annotation, default_annotations, \
-    get_error_annotation, digest_header, get_digest_from_stats, \
+    get_error_annotation, digest_prefix, digest_header, digest_v1_header, get_digest_from_stats, summary_truncated_md, \
     all_tests_list, skipped_tests_list, none_annotations, \
     all_tests_label_md, skipped_tests_label_md, failed_tests_label_md, passed_tests_label_md, test_errors_label_md, \
     duration_label_md, digit_space, pull_request_build_mode_merge, punctuation_space, \
-    get_long_summary_with_digest_md
+    get_long_summary_with_digest_md, get_all_tests_list
 from publish.github_action import GithubAction
+from publish.instrumentation import ApiInstrumentation
+from publish.profiler import PhaseProfiler
 from publish.publisher import Publisher, Settings, PublishData
+from publish.store import ResultsStore, StoredResults
+from publish.tracing import Tracer
 from publish.unittestresults import UnitTestSuite, UnitTestCase, ParseError, UnitTestRunResults, UnitTestCaseResults, \
     create_unit_test_case_results, get_test_results, get_stats, ParsedUnitTestResultsWithCommit, UnitTestRunDeltaResults, \
     get_stats_delta
@@ -85,6 +92,8 @@ class TestPublisher(unittest.TestCase):
                         report_individual_runs=False,
                         dedup_classes_by_file_name=False,
                         check_run_annotation=default_annotations,
+                        max_annotations: Optional[int] = None,
+                        cluster_annotations: Optional[int] = None,
                         event: Optional[dict] = {'before': 'before'},
                         event_name: str = 'event name',
                         is_fork: bool = False,
@@ -92,9 +101,22 @@ class TestPublisher(unittest.TestCase):
                         json_thousands_separator: str = punctuation_space,
                         json_suite_details: bool = False,
                         json_test_case_results: bool = False,
+                        json_cases_file: Optional[str] = None,
+                        json_cases_messages: bool = False,
+                        arrow_file: Optional[str] = None,
+                        arrow_suites_file: Optional[str] = None,
+                        arrow_format: str = 'ipc',
                         pull_request_build: str = pull_request_build_mode_merge,
                         test_changes_limit: Optional[int] = 5,
-                        search_pull_requests: bool = False):
+                        max_concurrent_reads: int = 1,
+                        max_concurrent_writes: int = 1,
+                        batch_reads: bool = False,
+                        search_pull_requests: bool = False,
+                        workspace: Optional[str] = None,
+                        skip_unchanged_check_run: bool = False,
+                        defer_annotations: bool = False,
+                        annotations_checkpoint_file: Optional[str] = None,
+                        dry_run_directory: Optional[str] = None):
         return Settings(
             token=None,
             api_url='https://the-github-api-url',
@@ -107,10 +129,16 @@ class TestPublisher(unittest.TestCase):
             is_fork=is_fork,
             repo='owner/repo',
             commit='commit',
+            workspace=workspace,
             json_file=json_file,
             json_thousands_separator=json_thousands_separator,
             json_suite_details=json_suite_details,
             json_test_case_results=json_test_case_results,
+            json_cases_file=json_cases_file,
+            json_cases_messages=json_cases_messages,
+            arrow_file=arrow_file,
+            arrow_suites_file=arrow_suites_file,
+            arrow_format=arrow_format,
             fail_on_errors=True,
             fail_on_failures=True,
             action_fail=False,
@@ -137,10 +165,27 @@ class TestPublisher(unittest.TestCase):
             large_files=False,
             ignore_runs=False,
             check_run_annotation=check_run_annotation,
+            max_annotations=max_annotations,
+            cluster_annotations=cluster_annotations,
             seconds_between_github_reads=1.5,
             seconds_between_github_writes=2.5,
             secondary_rate_limit_wait_seconds=6.0,
+            adaptive_request_pacing=True,
+            max_concurrent_reads=max_concurrent_reads,
+            max_concurrent_writes=max_concurrent_writes,
+            batch_reads=batch_reads,
+            github_api_cache_file=None,
+            results_store_file=None,
+            profile='off',
+            profile_directory='profile',
+            profile_hash_strings=True,
+            trace_file=None,
+            trace_format='otlp',
             search_pull_requests=search_pull_requests,
+            skip_unchanged_check_run=skip_unchanged_check_run,
+            defer_annotations=defer_annotations,
+            annotations_checkpoint_file=annotations_checkpoint_file,
+            dry_run_directory=dry_run_directory,
         )
 
     stats = UnitTestRunResults(
@@ -315,10 +360,8 @@ class TestPublisher(unittest.TestCase):
     base_stats = get_stats.__func__('base')
     past_stats = get_stats.__func__('past')
 
-    # makes gzipped digest deterministic
-    with mock.patch('gzip.time.time', return_value=0):
-        base_digest = get_digest_from_stats(base_stats)
-        past_digest = get_digest_from_stats(past_stats)
+    base_digest = get_digest_from_stats(base_stats)
+    past_digest = get_digest_from_stats(past_stats)
 
     @staticmethod
     def call_mocked_publish(settings: Settings,
@@ -332,15 +375,16 @@ class TestPublisher(unittest.TestCase):
         # mock Publisher and call publish
         publisher = mock.MagicMock(Publisher)
         publisher._settings = settings
+        publisher._store = None
         publisher.get_pulls = mock.Mock(return_value=prs)
         publisher.publish_check = mock.Mock(return_value=pd.with_check_url('html url'))
         publisher.get_publish_data = mock.Mock(return_value=pd)
         Publisher.publish(publisher, stats, cases, 'success')
 
-        # return calls to mocked instance, except call to _logger
+        # return calls to mocked instance, except call to _logger, _phase and _span
         mock_calls = [(call[0], call.args, call.kwargs)
                       for call in publisher.mock_calls
-                      if not call[0].startswith('_logger.')]
+                      if not call[0].startswith('_logger.') and not call[0].startswith('_phase') and not call[0].startswith('_span')]
         return mock_calls
 
     def test_get_test_list_annotations(self):
@@ -562,6 +606,110 @@ class TestPublisher(unittest.TestCase):
         self.assertEqual((self.published_data.with_check_url('html url'), ), args)
         self.assertEqual({}, kwargs)
 
+    def do_test_publish_comments_on_multiple_pulls(self, max_concurrent_writes: int, fail: bool = False):
+        settings = self.create_settings(max_concurrent_writes=max_concurrent_writes)
+        gh, gha, req, repo, commit = self.create_mocks(digest=self.base_digest, check_names=[settings.check_name])
+        pulls = [self.create_github_pr(settings.repo, number=number) for number in range(1, 5)]
+        threads = []
+        for pull in pulls:
+            pull.create_issue_comment = mock.Mock(side_effect=lambda body: threads.append(threading.current_thread().name) or mock.MagicMock())
+        if fail:
+            pulls[1].create_issue_comment = mock.Mock(side_effect=GithubException(500, 'server error', None))
+
+        publisher = Publisher(settings, gh, gha)
+        publisher.get_publish_data = mock.Mock(return_value=self.published_data)
+        publisher.publish_check = mock.Mock(return_value=self.published_data.with_check_url('html url'))
+        publisher.get_pulls = mock.Mock(return_value=pulls)
+        # two pull requests share each base commit
+        publisher.get_base_commit_sha = mock.Mock(side_effect=lambda pull: f'base {pull.number % 2}')
+        publisher.get_latest_comment = mock.Mock(return_value=None)
+
+        with mock.patch('publish.publisher.get_all_tests_list', wraps=get_all_tests_list) as all_tests_list_mock:
+            if fail:
+                with self.assertRaises(GithubException):
+                    publisher.publish(self.stats, self.cases, 'success')
+            else:
+                publisher.publish(self.stats, self.cases, 'success')
+
+        # base check runs are read once per base commit, test lists are computed once
+        # comments are published concurrently, so base commits are read in any order
+        self.assertEqual(['base 0', 'base 1'], sorted(call.args[0] for call in repo.get_commit.call_args_list))
+        all_tests_list_mock.assert_called_once_with(self.cases)
+        for pull in pulls:
+            pull.create_issue_comment.assert_called_once()
+        return threads
+
+    def test_publish_comments_on_multiple_pulls(self):
+        threads = self.do_test_publish_comments_on_multiple_pulls(max_concurrent_writes=1)
+        self.assertEqual([threading.current_thread().name] * 4, threads)
+
+    def test_publish_comments_on_multiple_pulls_concurrently(self):
+        threads = self.do_test_publish_comments_on_multiple_pulls(max_concurrent_writes=4)
+        self.assertEqual(4, len(threads))
+        self.assertTrue(all(thread.startswith('github-write') for thread in threads), threads)
+
+        # all comments are published, even if one fails
+        threads = self.do_test_publish_comments_on_multiple_pulls(max_concurrent_writes=4, fail=True)
+        self.assertEqual(3, len(threads))
+
+    def test_publish_with_deferred_annotations(self):
+        settings = self.create_settings(defer_annotations=True)
+        pr = object()
+        mock_calls = self.call_mocked_publish(settings, prs=[pr])
+
+        # deferred annotations are published after everything else
+        self.assertEqual(
+            ['get_publish_data', 'publish_check', 'publish_json', 'publish_job_summary', 'get_pulls', 'publish_comment', 'publish_deferred_annotations'],
+            [mock_call[0] for mock_call in mock_calls]
+        )
+
+    def test_publish_with_deferred_annotations_and_failing_comment(self):
+        settings = self.create_settings(defer_annotations=True)
+        publisher = mock.MagicMock(Publisher)
+        publisher._settings = settings
+        publisher._store = None
+        publisher.get_pulls = mock.Mock(return_value=[object()])
+        publisher.publish_check = mock.Mock(return_value=self.published_data.with_check_url('html url'))
+        publisher.get_publish_data = mock.Mock(return_value=self.published_data)
+        publisher.publish_comment = mock.Mock(side_effect=RuntimeError('failed'))
+
+        with self.assertRaises(RuntimeError):
+            Publisher.publish(publisher, self.stats, create_unit_test_case_results(self.cases), 'success')
+        publisher.publish_deferred_annotations.assert_called_once_with()
+
+    def test_publish_with_failing_deferred_annotations_and_failing_comment(self):
+        settings = self.create_settings(defer_annotations=True)
+        publisher = mock.MagicMock(Publisher)
+        publisher._settings = settings
+        publisher._store = None
+        publisher.get_pulls = mock.Mock(return_value=[object()])
+        publisher.publish_check = mock.Mock(return_value=self.published_data.with_check_url('html url'))
+        publisher.get_publish_data = mock.Mock(return_value=self.published_data)
+        publisher.publish_comment = mock.Mock(side_effect=RuntimeError('failed comment'))
+        publisher.publish_deferred_annotations = mock.Mock(side_effect=ValueError('failed annotations'))
+
+        with mock.patch('publish.publisher.logger') as l:
+            with self.assertRaises(RuntimeError) as e:
+                Publisher.publish(publisher, self.stats, create_unit_test_case_results(self.cases), 'success')
+        self.assertEqual('failed comment', str(e.exception))
+        publisher.publish_deferred_annotations.assert_called_once_with()
+        l.warning.assert_called_once_with('Failed to publish deferred annotations: failed annotations')
+
+    def test_publish_with_failing_deferred_annotations(self):
+        settings = self.create_settings(defer_annotations=True)
+        publisher = mock.MagicMock(Publisher)
+        publisher._settings = settings
+        publisher._store = None
+        publisher.get_pulls = mock.Mock(return_value=[object()])
+        publisher.publish_check = mock.Mock(return_value=self.published_data.with_check_url('html url'))
+        publisher.get_publish_data = mock.Mock(return_value=self.published_data)
+        publisher.publish_deferred_annotations = mock.Mock(side_effect=ValueError('failed annotations'))
+
+        with self.assertRaises(ValueError) as e:
+            Publisher.publish(publisher, self.stats, create_unit_test_case_results(self.cases), 'success')
+        self.assertEqual('failed annotations', str(e.exception))
+        publisher.publish_comment.assert_called_once()
+
     def test_publish_without_job_summary_and_comment_on_fork(self):
         settings = self.create_settings(is_fork=True, comment_mode=comment_mode_off, job_summary=False)
         mock_calls = self.call_mocked_publish(settings, prs=[object()])
@@ -683,6 +831,7 @@ class TestPublisher(unittest.TestCase):
         settings = self.create_settings(compare_earlier=True)
         publisher = mock.MagicMock(Publisher)
         publisher._settings = settings
+        publisher._store = None
         publisher.get_check_run = mock.Mock(return_value=bcr)
         publisher.get_stats_from_check_run = mock.Mock(return_value=bs)
         publisher.get_stats_delta = mock.Mock(return_value=bs)
@@ -755,6 +904,7 @@ class TestPublisher(unittest.TestCase):
         settings = self.create_settings(compare_earlier=True)
         publisher = mock.MagicMock(Publisher)
         publisher._settings = settings
+        publisher._store = None
         publisher.get_check_run = mock.Mock(return_value=bcr)
         publisher.get_stats_from_check_run = mock.Mock(return_value=bs)
         publisher.get_stats_delta = mock.Mock(return_value=bs)
@@ -768,10 +918,8 @@ class TestPublisher(unittest.TestCase):
             ['class ‑ skipped \\U0001d484', 'class ‑ skipped \\U0001d485']
         ))
 
-        # makes gzipped digest deterministic
-        with mock.patch('gzip.time.time', return_value=0):
-            Publisher.publish_comment(publisher, 'title', stats, pr, 'html://url', cases)
-            expected_digest = f'{digest_header}{get_digest_from_stats(stats)}'
+        Publisher.publish_comment(publisher, 'title', stats, pr, 'html://url', cases)
+        expected_digest = f'{digest_header}{get_digest_from_stats(stats)}'
 
         mock_calls = publisher.mock_calls
 
@@ -865,6 +1013,7 @@ class TestPublisher(unittest.TestCase):
         settings = self.create_settings(compare_earlier=True)
         publisher = mock.MagicMock(Publisher)
         publisher._settings = settings
+        publisher._store = None
         publisher.get_check_run = mock.Mock(return_value=None)
         publisher.get_base_commit_sha = mock.Mock(return_value=stats.commit)
         publisher.get_test_lists_from_check_run = mock.Mock(return_value=(None, None))
@@ -893,6 +1042,7 @@ class TestPublisher(unittest.TestCase):
         settings = self.create_settings(compare_earlier=True)
         publisher = mock.MagicMock(Publisher)
         publisher._settings = settings
+        publisher._store = None
         publisher.get_check_run = mock.Mock(return_value=None)
         publisher.get_base_commit_sha = mock.Mock(return_value=None)
         publisher.get_test_lists_from_check_run = mock.Mock(return_value=(None, None))
@@ -948,6 +1098,7 @@ class TestPublisher(unittest.TestCase):
         settings = self.create_settings(comment_mode=comment_mode_always, compare_earlier=False)
         publisher = mock.MagicMock(Publisher)
         publisher._settings = settings
+        publisher._store = None
         publisher.get_test_lists_from_check_run = mock.Mock(return_value=(None, None))
         publisher.get_latest_comment = mock.Mock(return_value=lc)
         publisher.reuse_comment = mock.Mock(return_value=one_exists)
@@ -1008,7 +1159,7 @@ class TestPublisher(unittest.TestCase):
     def do_test_reuse_comment(self, earlier_body: str, expected_body: str):
         comment = mock.MagicMock()
         publisher = mock.MagicMock(Publisher)
-        Publisher.reuse_comment(publisher, comment, earlier_body)
+        self.assertTrue(Publisher.reuse_comment(publisher, comment, earlier_body))
 
         comment.edit.assert_called_once_with(expected_body)
         self.assertEqual(0, len(publisher.mock_calls))
@@ -1023,6 +1174,36 @@ class TestPublisher(unittest.TestCase):
         self.do_test_reuse_comment(earlier_body='comment already updated\n:recycle: Has been updated',
                                    expected_body='comment already updated\n:recycle: Has been updated')
 
+    def test_reuse_comment_unchanged(self):
+        body = 'comment\n:recycle: This comment has been updated with latest results.'
+        for earlier_body in ['comment', body]:
+            with self.subTest(earlier_body=earlier_body):
+                comment = mock.MagicMock(body=body)
+                publisher = mock.MagicMock(Publisher)
+                self.assertTrue(Publisher.reuse_comment(publisher, comment, earlier_body))
+                comment.edit.assert_not_called()
+
+    def test_reuse_comment_failing_edit(self):
+        comment = mock.MagicMock(id=42, body='earlier comment', edit=mock.Mock(side_effect=GithubException(403, 'forbidden', None)))
+        publisher = mock.MagicMock(Publisher)
+        publisher._gha = mock.MagicMock()
+        self.assertFalse(Publisher.reuse_comment(publisher, comment, 'comment'))
+        publisher._gha.warning.assert_called_once_with('Failed to edit existing comment #42, creating a new comment')
+
+    def test_publish_comment_with_failing_edit(self):
+        settings = self.create_settings(event={'pull_request': {'base': {'sha': 'commit base'}}}, event_name='pull_request')
+        gh, gha, req, repo, commit = self.create_mocks(digest=self.base_digest, check_names=[settings.check_name])
+        pr = self.create_github_pr(settings.repo, base_commit_sha='base-commit')
+        latest_comment = mock.MagicMock(id=42, body='earlier comment', edit=mock.Mock(side_effect=GithubException(403, 'forbidden', None)))
+        publisher = Publisher(settings, gh, gha)
+        publisher.get_latest_comment = mock.Mock(return_value=latest_comment)
+
+        publisher.publish_comment(settings.comment_title, self.stats, pr)
+
+        # the comment could not be edited, so a new comment is created
+        latest_comment.edit.assert_called_once()
+        pr.create_issue_comment.assert_called_once_with(latest_comment.edit.call_args.args[0].split('\n:recycle:')[0])
+
     def test_get_pull_from_event(self):
         settings = self.create_settings()
         gh, gha, req, repo, commit = self.create_mocks()
@@ -1205,11 +1386,19 @@ class TestPublisher(unittest.TestCase):
         self.assertEqual(results, actual)
 
     def test_get_stats_from_summary_md_recycled(self):
-        summary = f'body\n\n{digest_header}H4sIAGpapmIC/1WMyw7CIBQFf6Vh7QK4FMGfMeQWEmJbDI9V479LI6DuzsxJ5iDOrzaR2wSXiaTi84ClRJN92CvSivXI5yX7vqeCWIX4iod/VsGGcMavf8LGGGILxrKfPaba7j3Ghvj0ROeWg86/NQzb5nMFIhCBgnbUzQAIVik+c6W1YU5KVPoqNF04teT1BvQuAoL9AAAA\n:recycle: This comment has been updated with latest results.'
+        summary = f'body\n\n{digest_v1_header}H4sIAGpapmIC/1WMyw7CIBQFf6Vh7QK4FMGfMeQWEmJbDI9V479LI6DuzsxJ5iDOrzaR2wSXiaTi84ClRJN92CvSivXI5yX7vqeCWIX4iod/VsGGcMavf8LGGGILxrKfPaba7j3Ghvj0ROeWg86/NQzb5nMFIhCBgnbUzQAIVik+c6W1YU5KVPoqNF04teT1BvQuAoL9AAAA\n:recycle: This comment has been updated with latest results.'
         actual = Publisher.get_stats_from_summary_md(summary)
         self.assertIsNotNone(actual)
         self.assertEqual(6, actual.tests)
 
+    def test_get_stats_from_summary_md_without_digest(self):
+        self.assertIsNone(Publisher.get_stats_from_summary_md('body\n'))
+
+    def test_get_stats_from_summary_md_unsupported_format(self):
+        # digest written by a later version of this action
+        summary = f'body\n\n{digest_prefix}v3;zstd;base64,KLUv/QBYaQAAW10=\n'
+        self.assertIsNone(Publisher.get_stats_from_summary_md(summary))
+
     @staticmethod
     def mock_check_run(name: str, status: str, started_at: datetime, summary: str) -> mock.Mock:
         run = mock.MagicMock(status=status, started_at=started_at, output=mock.MagicMock(summary=summary))
@@ -1308,12 +1497,12 @@ class TestPublisher(unittest.TestCase):
     all_annotations = [all_tests_annotation, skipped_tests_annotation, other_annotation]
 
     def test_get_test_lists_from_none_check_run(self):
-        self.assertEqual((None, None), Publisher.get_test_lists_from_check_run(None))
+        self.assertEqual((None, None), Publisher.get_test_lists_from_check_run(mock.MagicMock(Publisher), None))
 
     def test_get_test_lists_from_check_run_single_test(self):
         check_run = mock.Mock()
         check_run.get_annotations = mock.Mock(return_value=self.all_annotations)
-        self.assertEqual((['class ‑ test1'], ['class ‑ test4']), Publisher.get_test_lists_from_check_run(check_run))
+        self.assertEqual((['class ‑ test1'], ['class ‑ test4']), Publisher.get_test_lists_from_check_run(mock.MagicMock(Publisher), check_run))
 
     def test_get_test_lists_from_check_run_more_tests(self):
         annotation1 = mock.Mock()
@@ -1336,7 +1525,7 @@ class TestPublisher(unittest.TestCase):
         check_run.get_annotations = mock.Mock(return_value=annotations)
         self.assertEqual(
             (['test one', 'test two', 'test three'], ['skip one', 'skip two', 'skip three']),
-            Publisher.get_test_lists_from_check_run(check_run)
+            Publisher.get_test_lists_from_check_run(mock.MagicMock(Publisher), check_run)
         )
 
     def test_get_test_lists_from_check_run_chunked_tests(self):
@@ -1370,7 +1559,7 @@ class TestPublisher(unittest.TestCase):
         check_run.get_annotations = mock.Mock(return_value=annotations)
         self.assertEqual(
             (['test one', 'test two', 'test three', 'test four'], ['skip one', 'skip two', 'skip three', 'skip four']),
-            Publisher.get_test_lists_from_check_run(check_run)
+            Publisher.get_test_lists_from_check_run(mock.MagicMock(Publisher), check_run)
         )
 
     def test_get_test_lists_from_check_run_none_raw_details(self):
@@ -1387,7 +1576,7 @@ class TestPublisher(unittest.TestCase):
         annotations = [annotation1, annotation2]
         check_run = mock.Mock()
         check_run.get_annotations = mock.Mock(return_value=annotations)
-        self.assertEqual((None, None), Publisher.get_test_lists_from_check_run(check_run))
+        self.assertEqual((None, None), Publisher.get_test_lists_from_check_run(mock.MagicMock(Publisher), check_run))
 
     def test_get_test_lists_from_generated_annotations(self):
         cases = create_unit_test_case_results({
@@ -1405,7 +1594,7 @@ class TestPublisher(unittest.TestCase):
         check_run.get_annotations = mock.Mock(return_value=annotations)
         self.assertEqual(
             (['class ‑ test abcd', 'class ‑ test efgh', 'class ‑ test ijkl'], ['class ‑ test efgh', 'class ‑ test ijkl']),
-            Publisher.get_test_lists_from_check_run(check_run)
+            Publisher.get_test_lists_from_check_run(mock.MagicMock(Publisher), check_run)
         )
 
     def test_get_publish_data_without_annotations(self):
@@ -1431,9 +1620,7 @@ class TestPublisher(unittest.TestCase):
         gh, gha, req, repo, commit = self.create_mocks(commit=mock.Mock(), digest=None, check_names=[])
         publisher = Publisher(settings, gh, gha)
 
-        # makes gzipped digest deterministic
-        with mock.patch('gzip.time.time', return_value=0):
-            actual = publisher.get_publish_data(self.stats.with_errors(errors), self.cases, 'conclusion')
+        actual = publisher.get_publish_data(self.stats.with_errors(errors), self.cases, 'conclusion')
 
         error_annotations = [get_error_annotation(error) for error in errors]
         annotations = error_annotations + [
@@ -1458,7 +1645,7 @@ class TestPublisher(unittest.TestCase):
             f'\n'
             f'Results for commit commit.\n'
         )
-        summary_with_digest = summary + "\n[test-results]:data:application/gzip;base64,H4sIAAAAAAAC/0WMSw6DMAwFr4Ky7qL5UGgvg1AAySqQyklWiLvzoBh2nnnyLGqgsY/qU2hj3aNQMVM62AC6zG2iMAOtK18w2NKxGoEmZu9h3C2+9IMoLzG0NEJc/03PHBimguE870Fbn7f0bv7n3sJnTT9FSE1rGB+miRJIrnUDujAKa+MAAAA=\n"
+        summary_with_digest = summary + "\n[test-results]:data:v2;deflate;base64,BcGpDQAgEADBXtAruI+nFoJCIQiG/sPMEDVHMY+CKk5QqFij0ZGMCGndc/ZL8wM=\n"
         expected = PublishData(
             title=f"{title_errors}7 errors, 6 fail, 5 skipped, 4 pass in 57m 36s",
             summary=summary,
@@ -1478,9 +1665,7 @@ class TestPublisher(unittest.TestCase):
         gh, gha, req, repo, commit = self.create_mocks(commit=mock.Mock(), digest=None, check_names=[])
         publisher = Publisher(settings, gh, gha)
 
-        # makes gzipped digest deterministic
-        with mock.patch('gzip.time.time', return_value=0):
-            published_data = publisher.publish_check(self.stats.with_errors(errors), self.cases, 'conclusion')
+        published_data = publisher.publish_check(self.stats.with_errors(errors), self.cases, 'conclusion')
 
         repo.get_commit.assert_not_called()
         error_annotations = [get_error_annotation(error).to_dict() for error in errors]
@@ -1511,11 +1696,8 @@ class TestPublisher(unittest.TestCase):
                            '\n'
                            'Results for commit commit.\n'
                            '\n'
-                           '[test-results]:data:application/gzip;base64,'
-                           'H4sIAAAAAAAC/0WOSQqEMBBFryJZu+g4tK2XkRAVCoc0lWQl3t'
-                           '3vULqr9z48alUDTb1XTaLTRPlI4YQM0EU2gdwCzIEYwjllAq2P'
-                           '1sIUrxjpD1E+YjA0QXwf0TM7hqlgOC5HMP/dt/RevnK18F3THx'
-                           'FS08fz1s0zBZBc2w5zHdX73QAAAA==\n'.format(errors='{} errors\u2004\u2003'.format(len(errors)) if len(errors) > 0 else ''),
+                           '[test-results]:data:v2;deflate;base64,'
+                           'izbUMdIx1jEy0jHRMdUx0zHXMbbQsdCx1DE00DE01FFKzs/NzSxRigUA\n'.format(errors='{} errors\u2004\u2003'.format(len(errors)) if len(errors) > 0 else ''),
                 'annotations': annotations
             }
         )
@@ -1539,6 +1721,19 @@ class TestPublisher(unittest.TestCase):
             '}'
         )
 
+    def test_get_publish_data_with_max_check_run_summary_bytes(self):
+        settings = self.create_settings(event={})
+        gh, gha, req, repo, commit = self.create_mocks(commit=mock.Mock(), digest=None, check_names=[])
+        publisher = Publisher(settings, gh, gha)
+        expected_digest = f'{digest_header}{get_digest_from_stats(self.stats)}'
+
+        max_bytes = len(expected_digest) + 150
+        with mock.patch('publish.publisher.max_check_run_summary_bytes', max_bytes):
+            actual = publisher.get_publish_data(self.stats, self.cases, 'conclusion')
+
+        self.assertLessEqual(len(actual.summary_with_digest.encode('utf8')), max_bytes)
+        self.assertTrue(actual.summary_with_digest.endswith(f'{summary_truncated_md}\n\n{expected_digest}\n'))
+
     def test_get_publish_data_with_base_stats(self):
         self.do_test_get_publish_data_with_base_stats([])
 
@@ -1551,9 +1746,7 @@ class TestPublisher(unittest.TestCase):
         gh, gha, req, repo, commit = self.create_mocks(commit=mock.Mock(), digest=self.past_digest, check_names=[settings.check_name])
         publisher = Publisher(settings, gh, gha)
 
-        # makes gzipped digest deterministic
-        with mock.patch('gzip.time.time', return_value=0):
-            actual = publisher.get_publish_data(self.stats.with_errors(errors), self.cases, 'conclusion')
+        actual = publisher.get_publish_data(self.stats.with_errors(errors), self.cases, 'conclusion')
 
         repo.get_commit.assert_called_once_with(earlier_commit)
         error_annotations = [get_error_annotation(error) for error in errors]
@@ -1566,11 +1759,8 @@ class TestPublisher(unittest.TestCase):
             f'Results for commit commit.\u2003± Comparison against earlier commit past.\n'
         )
         summary_with_digest = (summary + '\n'
-            '[test-results]:data:application/gzip;base64,'
-            'H4sIAAAAAAAC/0WMSw6DMAwFr4Ky7qL5UGgvg1AAySqQyklWiL'
-            'vzoBh2nnnyLGqgsY/qU2hj3aNQMVM62AC6zG2iMAOtK18w2NKx'
-            'GoEmZu9h3C2+9IMoLzG0NEJc/03PHBimguE870Fbn7f0bv7n3s'
-            'JnTT9FSE1rGB+miRJIrnUDujAKa+MAAAA=\n'
+            '[test-results]:data:v2;deflate;base64,'
+            'BcGpDQAgEADBXtAruI+nFoJCIQiG/sPMEDVHMY+CKk5QqFij0ZGMCGndc/ZL8wM=\n'
         )
         expected = PublishData(
             title='{}7 errors, 6 fail, 5 skipped, 4 pass in 57m 36s'.format('{} parse errors, '.format(len(errors)) if len(errors) > 0 else ''),
@@ -1609,9 +1799,7 @@ class TestPublisher(unittest.TestCase):
             cases=self.cases,
         )
 
-        # makes gzipped digest deterministic
-        with mock.patch('gzip.time.time', return_value=0):
-            check_run, data = publisher.publish_check(data)
+        check_run, data = publisher.publish_check(data)
 
         repo.get_commit.assert_called_once_with(earlier_commit)
         error_annotations = [get_error_annotation(error).to_dict() for error in errors]
@@ -1629,11 +1817,8 @@ class TestPublisher(unittest.TestCase):
                            '\n'
                            'Results for commit commit.\u2003± Comparison against earlier commit past.\n'
                            '\n'
-                           '[test-results]:data:application/gzip;base64,'
-                           'H4sIAAAAAAAC/0WOSQqEMBBFryJZu+g4tK2XkRAVCoc0lWQl3t'
-                           '3vULqr9z48alUDTb1XTaLTRPlI4YQM0EU2gdwCzIEYwjllAq2P'
-                           '1sIUrxjpD1E+YjA0QXwf0TM7hqlgOC5HMP/dt/RevnK18F3THx'
-                           'FS08fz1s0zBZBc2w5zHdX73QAAAA==\n'.format(errors='{} errors\u2004\u2003'.format(len(errors)) if len(errors) > 0 else ''),
+                           '[test-results]:data:v2;deflate;base64,'
+                           'izbUMdIx1jEy0jHRMdUx0zHXMbbQsdCx1DE00DE01FFKzs/NzSxRigUA\n'.format(errors='{} errors\u2004\u2003'.format(len(errors)) if len(errors) > 0 else ''),
                 'annotations': error_annotations + [
                     {'path': 'test file', 'start_line': 0, 'end_line': 0, 'annotation_level': 'warning', 'message': 'result file [took 1s]', 'title': '1 out of 2 runs failed: test (class)', 'raw_details': 'message\ncontent\nstdout\nstderr'},
                     {'path': 'test file', 'start_line': 0, 'end_line': 0, 'annotation_level': 'failure', 'message': 'result file [took 1s]', 'title': '1 out of 2 runs with error: test2 (class)', 'raw_details': 'error message\nerror content\nerror stdout\nerror stderr'},
@@ -1664,6 +1849,56 @@ class TestPublisher(unittest.TestCase):
             '}'
         )
 
+    def test_get_publish_data_with_results_store(self):
+        earlier_commit = 'past'
+        settings = self.create_settings(event={'before': earlier_commit})
+        gh, gha, req, repo, commit = self.create_mocks(commit=mock.Mock(), digest=self.past_digest, check_names=[settings.check_name])
+        store = ResultsStore()
+        store.put((settings.repo, settings.check_name, earlier_commit), StoredResults(stats=self.past_stats, all_tests=None, skipped_tests=None))
+        publisher = Publisher(settings, gh, gha, store=store)
+
+        actual = publisher.get_publish_data(self.stats, self.cases, 'conclusion')
+
+        repo.get_commit.assert_not_called()
+        self.assertEqual(self.past_stats, actual.before_stats)
+        self.assertEqual(Publisher(settings, gh, gha).get_publish_data(self.stats, self.cases, 'conclusion'), actual)
+        repo.get_commit.assert_called_once_with(earlier_commit)
+
+    def test_get_publish_data_with_max_annotations(self):
+        settings = self.create_settings(event={}, max_annotations=1)
+        gh, gha, req, repo, commit = self.create_mocks(commit=mock.Mock(), digest=None, check_names=[])
+        publisher = Publisher(settings, gh, gha)
+
+        actual = publisher.get_publish_data(self.stats, self.cases, 'conclusion')
+
+        # test errors rank first, test lists are not limited
+        self.assertEqual([
+            Annotation(path='test file', start_line=0, end_line=0, start_column=None, end_column=None, annotation_level='failure', message='result file\u2003[took 1s]', title='1 out of 2 runs with error: test2 (class)', raw_details='error message\nerror content\nerror stdout\nerror stderr'),
+            Annotation(path='.github', start_line=0, end_line=0, start_column=None, end_column=None, annotation_level='warning', message='There is 1 more annotation than published (max_annotations is 1), see "Raw output" for their titles.', title='1 more annotation', raw_details='1 out of 2 runs failed: test (class)'),
+            Annotation(path='.github', start_line=0, end_line=0, start_column=None, end_column=None, annotation_level='notice', message='There is 1 skipped test, see "Raw output" for the name of the skipped test.', title='1 skipped test found', raw_details='class ‑ test3'),
+            Annotation(path='.github', start_line=0, end_line=0, start_column=None, end_column=None, annotation_level='notice', message='There are 3 tests, see "Raw output" for the full list of tests.', title='3 tests found', raw_details='class ‑ test\nclass ‑ test2\nclass ‑ test3'),
+        ], actual.annotations)
+
+    def test_get_results_from_cases(self):
+        cases = create_unit_test_case_results({
+            (None, 'class', 'test b'): {'success': [None]},
+            (None, 'class', 'test a'): {'skipped': [None]},
+            (None, 'class', 'test 𝒂'): {'skipped': [None]},
+        })
+        stats = self.stats.with_errors(errors)
+        expected_stats = dataclasses.replace(self.stats, errors=[], suite_details=None)
+
+        for annotations, expected_all_tests, expected_skipped_tests in [
+            ([], None, None),
+            ([all_tests_list], ['class ‑ test \\U0001d482', 'class ‑ test a', 'class ‑ test b'], None),
+            ([all_tests_list, skipped_tests_list], ['class ‑ test \\U0001d482', 'class ‑ test a', 'class ‑ test b'], ['class ‑ test \\U0001d482', 'class ‑ test a']),
+        ]:
+            with self.subTest(annotations=annotations):
+                settings = self.create_settings(check_run_annotation=annotations)
+                publisher = Publisher(settings, mock.MagicMock(), None)
+                self.assertEqual(StoredResults(stats=expected_stats, all_tests=expected_all_tests, skipped_tests=expected_skipped_tests),
+                                 publisher.get_results_from_cases(stats, cases))
+
     def test_get_publish_data_without_compare_or_check_run(self):
         for compare_earlier, check_run in [(False, True), (True, False), (False, False)]:
             earlier_commit = 'past'
@@ -1671,9 +1906,7 @@ class TestPublisher(unittest.TestCase):
             gh, gha, req, repo, commit = self.create_mocks(commit=mock.Mock(), digest=self.past_digest, check_names=[settings.check_name])
             publisher = Publisher(settings, gh, gha)
 
-            # makes gzipped digest deterministic
-            with mock.patch('gzip.time.time', return_value=0):
-                actual = publisher.get_publish_data(self.stats, self.cases, 'conclusion')
+            actual = publisher.get_publish_data(self.stats, self.cases, 'conclusion')
 
             repo.get_commit.assert_not_called()
             summary = (
@@ -1683,7 +1916,7 @@ class TestPublisher(unittest.TestCase):
                 f'\n'
                 f'Results for commit commit.\n'
             )
-            summary_with_digest = summary + "\n[test-results]:data:application/gzip;base64,H4sIAAAAAAAC/0WMSw6DMAwFr4Ky7qL5UGgvg1AAySqQyklWiLvzoBh2nnnyLGqgsY/qU2hj3aNQMVM62AC6zG2iMAOtK18w2NKxGoEmZu9h3C2+9IMoLzG0NEJc/03PHBimguE870Fbn7f0bv7n3sJnTT9FSE1rGB+miRJIrnUDujAKa+MAAAA=\n"
+            summary_with_digest = summary + "\n[test-results]:data:v2;deflate;base64,BcGpDQAgEADBXtAruI+nFoJCIQiG/sPMEDVHMY+CKk5QqFij0ZGMCGndc/ZL8wM=\n"
             annotations = [
                 Annotation(path='test file', start_line=0, end_line=0, start_column=None, end_column=None, annotation_level='warning', message='result file [took 1s]', title='1 out of 2 runs failed: test (class)', raw_details='message\ncontent\nstdout\nstderr'),
                 Annotation(path='test file', start_line=0, end_line=0, start_column=None, end_column=None, annotation_level='failure', message='result file [took 1s]', title='1 out of 2 runs with error: test2 (class)', raw_details='error message\nerror content\nerror stdout\nerror stderr'),
@@ -1710,6 +1943,143 @@ class TestPublisher(unittest.TestCase):
     def test_publish_check_many_annotations(self):
         self.do_test_publish_check_annotations(123)
 
+    def test_get_check_run_content_hash(self):
+        data = self.publish_data
+        content_hash = Publisher.get_check_run_content_hash('check name', data)
+        self.assertRegex(content_hash, '^sha256:[0-9a-f]{64}$')
+        self.assertEqual(content_hash, Publisher.get_check_run_content_hash('check name', dataclasses.replace(data)))
+        self.assertEqual(content_hash, Publisher.get_check_run_content_hash('check name', data.with_check_url('url')))
+        for other_name, other_data in [
+            ('other name', data),
+            ('check name', dataclasses.replace(data, conclusion='other')),
+            ('check name', dataclasses.replace(data, title='other')),
+            ('check name', dataclasses.replace(data, summary_with_digest='other')),
+            ('check name', dataclasses.replace(data, annotations=data.annotations[:-1])),
+            ('check name', dataclasses.replace(data, annotations=[dataclasses.replace(data.annotations[0], message='other')])),
+        ]:
+            with self.subTest(name=other_name, data=other_data):
+                self.assertNotEqual(content_hash, Publisher.get_check_run_content_hash(other_name, other_data))
+
+    def test_publish_check_skip_unchanged(self):
+        for annotations in [10, 123]:
+            data = dataclasses.replace(
+                self.publish_data,
+                annotations=[Annotation(path=f'file {i}', start_line=i, end_line=i+1, start_column=None, end_column=None, annotation_level='info', message=f'message {i}', title=f'title {1}', raw_details=f'details {i}')
+                             for i in range(annotations)]
+            )
+            settings = self.create_settings(skip_unchanged_check_run=True)
+            content_hash = Publisher.get_check_run_content_hash(settings.check_name, data)
+
+            for existing_hash, expect_publish in [(None, True), ('sha256:other', True), (content_hash, False)]:
+                with self.subTest(annotations=annotations, existing_hash=existing_hash):
+                    gh, gha, req, repo, commit = self.create_mocks(commit=mock.Mock(), digest=self.past_digest, check_names=[settings.check_name])
+                    check_run = mock.MagicMock(html_url='mock url')
+                    repo.create_check_run = mock.MagicMock(return_value=check_run)
+                    publisher = Publisher(settings, gh, gha)
+                    existing_check_run = mock.MagicMock(html_url='existing url', external_id=existing_hash) if existing_hash else None
+                    publisher.get_check_run = mock.Mock(return_value=existing_check_run)
+
+                    published_data = publisher.publish_check(data)
+
+                    publisher.get_check_run.assert_called_once_with(settings.commit)
+                    if not expect_publish:
+                        repo.create_check_run.assert_not_called()
+                        self.assertEqual(data.with_check_url('existing url'), published_data)
+                        continue
+
+                    self.assertEqual(data.with_check_url('mock url'), published_data)
+                    # the content hash is set only with the last batch of annotations
+                    create_kwargs = repo.create_check_run.call_args.kwargs
+                    if annotations <= 50:
+                        self.assertEqual(content_hash, create_kwargs.get('external_id'))
+                        check_run.edit.assert_not_called()
+                    else:
+                        self.assertNotIn('external_id', create_kwargs)
+                        self.assertEqual([{}, dict(external_id=content_hash)],
+                                         [{k: v for k, v in call.kwargs.items() if k != 'output'} for call in check_run.edit.call_args_list])
+
+    def test_publish_check_with_deferred_annotations(self):
+        for annotations in [10, 123]:
+            with self.subTest(annotations=annotations):
+                data = dataclasses.replace(
+                    self.publish_data,
+                    annotations=[Annotation(path=f'file {i}', start_line=i, end_line=i+1, start_column=None, end_column=None, annotation_level='info', message=f'message {i}', title=f'title {1}', raw_details=f'details {i}')
+                                 for i in range(annotations)]
+                )
+                settings = self.create_settings(defer_annotations=True)
+                gh, gha, req, repo, commit = self.create_mocks(commit=mock.Mock(), digest=self.past_digest, check_names=[settings.check_name])
+                check_run = mock.MagicMock(html_url='mock url')
+                repo.create_check_run = mock.MagicMock(return_value=check_run)
+                publisher = Publisher(settings, gh, gha)
+
+                published_data = publisher.publish_check(data)
+
+                # the check run is created with the first 50 annotations, the remaining annotations are deferred
+                self.assertEqual(data.with_check_url('mock url'), published_data)
+                self.assertEqual([annotation.to_dict() for annotation in data.annotations[:50]],
+                                 repo.create_check_run.call_args.kwargs['output']['annotations'])
+                check_run.edit.assert_not_called()
+
+                publisher.publish_deferred_annotations()
+                self.assertEqual([[annotation.to_dict() for annotation in data.annotations[start:start+50]]
+                                  for start in range(50, annotations, 50)],
+                                 [call.kwargs['output']['annotations'] for call in check_run.edit.call_args_list])
+
+                # deferred annotations are published only once
+                publisher.publish_deferred_annotations()
+                self.assertEqual((annotations - 1) // 50, check_run.edit.call_count)
+
+    def test_publish_check_resumes_from_annotations_checkpoint(self):
+        data = dataclasses.replace(
+            self.publish_data,
+            annotations=[Annotation(path=f'file {i}', start_line=i, end_line=i+1, start_column=None, end_column=None, annotation_level='info', message=f'message {i}', title=f'title {1}', raw_details=f'details {i}')
+                         for i in range(223)]
+        )
+        batches = [[annotation.to_dict() for annotation in data.annotations[start:start+50]] for start in range(0, 223, 50)]
+
+        with tempfile.TemporaryDirectory() as path:
+            settings = self.create_settings(annotations_checkpoint_file=os.path.join(path, 'checkpoint.json'))
+            gh, gha, req, repo, commit = self.create_mocks(commit=mock.Mock(), digest=self.past_digest, check_names=[settings.check_name])
+            check_run = mock.MagicMock(html_url='mock url', id=1234)
+            # the third batch fails
+            check_run.edit = mock.Mock(side_effect=[None, GithubException(500, 'server error', None)])
+            repo.create_check_run = mock.MagicMock(return_value=check_run)
+
+            with self.assertRaises(GithubException):
+                Publisher(settings, gh, gha).publish_check(data)
+            self.assertEqual(batches[0], repo.create_check_run.call_args.kwargs['output']['annotations'])
+            self.assertEqual(batches[1:3], [call.kwargs['output']['annotations'] for call in check_run.edit.call_args_list])
+
+            # a retry continues with the failed batch in the same check run
+            check_run.edit = mock.Mock()
+            repo.create_check_run.reset_mock()
+            repo.get_check_run = mock.Mock(return_value=check_run)
+            with self.assertLogs('publish', 'INFO') as logs:
+                published_data = Publisher(settings, gh, gha).publish_check(data)
+            self.assertEqual(data.with_check_url('mock url'), published_data)
+            self.assertIn('INFO:publish:Resuming publishing annotations to check mock url after 2 of 5 batches', logs.output)
+            repo.get_check_run.assert_called_once_with(1234)
+            repo.create_check_run.assert_not_called()
+            self.assertEqual(batches[2:], [call.kwargs['output']['annotations'] for call in check_run.edit.call_args_list])
+            # the content hash is set with the last batch
+            self.assertEqual(Publisher.get_check_run_content_hash(settings.check_name, data), check_run.edit.call_args.kwargs['external_id'])
+
+            # another retry has nothing left to publish
+            check_run.edit.reset_mock()
+            published_data = Publisher(settings, gh, gha).publish_check(data)
+            self.assertEqual(data.with_check_url('mock url'), published_data)
+            repo.create_check_run.assert_not_called()
+            check_run.edit.assert_not_called()
+
+            # a check run with different content starts from scratch
+            repo.get_check_run.reset_mock()
+            other_data = dataclasses.replace(data, title='other title')
+            published_data = Publisher(settings, gh, gha).publish_check(other_data)
+            self.assertEqual(other_data.with_check_url('mock url'), published_data)
+            repo.get_check_run.assert_not_called()
+            repo.create_check_run.assert_called_once()
+            self.assertEqual(4, check_run.edit.call_count)
+
     def do_test_publish_check_annotations(self, annotations: int):
         annotations = [Annotation(path=f'file {i}', start_line=i, end_line=i+1, start_column=None, end_column=None, annotation_level='info', message=f'message {i}', title=f'title {1}', raw_details=f'details {i}')
                        for i in range(annotations)]
@@ -2046,6 +2416,215 @@ class TestPublisher(unittest.TestCase):
                         self.assertEqual('json', args.args[0])
                         self.assertEqual(json.dumps(expected, ensure_ascii=False), args.args[1])
 
+    def test_write_json_streamed(self):
+        annotations = [Annotation(path='tëst.py', start_line=1, end_line=2, start_column=None, end_column=None,
+                                  annotation_level='warning', message='mëssage\nline', title=None, raw_details='details')]
+        for data in [self.publish_data,
+                     dataclasses.replace(self.publish_data, annotations=[], cases=create_unit_test_case_results()),
+                     dataclasses.replace(self.publish_data, annotations=annotations, stats_with_delta=None, before_stats=None),
+                     dataclasses.replace(self.publish_data, annotations=annotations * 3, check_url='http://check-run.url')]:
+            for json_suite_details, json_test_case_results in [(False, False), (True, True)]:
+                for api, phases in [(None, None), (dict(requests=1), dict(wall_seconds=1.0, phases=[]))]:
+                    with self.subTest(annotations=len(data.annotations), json_suite_details=json_suite_details,
+                                      json_test_case_results=json_test_case_results, api=api):
+                        settings = self.create_settings(json_suite_details=json_suite_details,
+                                                        json_test_case_results=json_test_case_results)
+                        expected = dict(data.to_dict(settings.json_thousands_separator, json_suite_details, json_test_case_results))
+                        if api is not None:
+                            expected.update(api=api, phases=phases)
+
+                        writer = io.StringIO()
+                        Publisher.write_json(data, writer, settings, api, phases)
+                        self.assertEqual(json.dumps(expected, ensure_ascii=False, indent=2), writer.getvalue())
+
+    def test_publish_json_cases_file(self):
+        data = dataclasses.replace(self.publish_data, cases=self.cases)
+        expected = [
+            {'commit': 'commit', 'class_name': 'class', 'test_name': 'test', 'state': 'success', 'result': 'success', 'result_file': 'result file', 'time': 1.2},
+            {'commit': 'commit', 'class_name': 'class', 'test_name': 'test', 'state': 'failure', 'result': 'failure', 'result_file': 'result file', 'time': 1.234, 'message': 'message'},
+            {'commit': 'commit', 'class_name': 'class', 'test_name': 'test2', 'state': 'skipped', 'result': 'skipped', 'result_file': 'result file', 'message': 'skipped'},
+            {'commit': 'commit', 'class_name': 'class', 'test_name': 'test2', 'state': 'error', 'result': 'error', 'result_file': 'result file', 'time': 1.2345, 'message': 'error message'},
+            {'commit': 'commit', 'class_name': 'class', 'test_name': 'test3', 'state': 'skipped', 'result': 'skipped', 'result_file': 'result file', 'message': 'skipped'},
+        ]
+
+        for messages in [False, True]:
+            with self.subTest(messages=messages), tempfile.TemporaryDirectory() as path:
+                filepath = os.path.join(path, 'cases.jsonl')
+                settings = self.create_settings(json_cases_file=filepath, json_cases_messages=messages)
+                gh, gha, req, repo, commit = self.create_mocks(digest=self.base_digest, check_names=[settings.check_name])
+                publisher = Publisher(settings, gh, gha)
+
+                # a second publish appends to the file
+                publisher.publish_json(data)
+                publisher.publish_json(data)
+                gha.error.assert_not_called()
+
+                with open(filepath, encoding='utf-8') as r:
+                    actual = [json.loads(line) for line in r]
+
+                expected_lines = expected if messages else [{k: v for k, v in line.items() if k != 'message'} for line in expected]
+                self.assertEqual(expected_lines * 2, actual)
+
+    def test_publish_json_cases_file_without_cases(self):
+        with tempfile.TemporaryDirectory() as path:
+            filepath = os.path.join(path, 'cases.jsonl')
+            settings = self.create_settings(json_cases_file=filepath)
+            gh, gha, req, repo, commit = self.create_mocks(digest=self.base_digest, check_names=[settings.check_name])
+            Publisher(settings, gh, gha).publish_json(dataclasses.replace(self.publish_data, cases=None))
+            self.assertFalse(os.path.exists(filepath))
+
+    def test_publish_json_cases_file_failure(self):
+        with tempfile.TemporaryDirectory() as path:
+            settings = self.create_settings(json_cases_file=path)
+            gh, gha, req, repo, commit = self.create_mocks(digest=self.base_digest, check_names=[settings.check_name])
+            Publisher(settings, gh, gha).publish_json(dataclasses.replace(self.publish_data, cases=self.cases))
+            gha.error.assert_called_once_with(f"Failed to write JSON Lines file {path}: [Errno 21] Is a directory: '{path}'")
+            # the json output is provided nevertheless
+            gha.add_to_output.assert_called_once()
+
+    @unittest.skipUnless(importlib.util.find_spec('pyarrow') is not None, 'pyarrow not installed')
+    def test_publish_arrow(self):
+        import pyarrow.ipc
+
+        suites = [UnitTestSuite(name='suite', tests=2, skipped=0, failures=1, errors=0, stdout=None, stderr=None)]
+        data = dataclasses.replace(self.publish_data, cases=self.cases, stats=dataclasses.replace(self.stats, suite_details=suites))
+        with tempfile.TemporaryDirectory() as path:
+            cases_file = os.path.join(path, 'cases.arrow')
+            suites_file = os.path.join(path, 'suites.arrow')
+            settings = self.create_settings(arrow_file=cases_file, arrow_suites_file=suites_file)
+            gh, gha, req, repo, commit = self.create_mocks(digest=self.base_digest, check_names=[settings.check_name])
+            Publisher(settings, gh, gha).publish_arrow(data)
+            gha.error.assert_not_called()
+
+            with pyarrow.memory_map(cases_file, 'r') as source:
+                cases = pyarrow.ipc.open_file(source).read_all()
+            with pyarrow.memory_map(suites_file, 'r') as source:
+                suites = pyarrow.ipc.open_file(source).read_all()
+
+        self.assertEqual(5, cases.num_rows)
+        self.assertEqual({'commit'}, set(cases.column('commit').to_pylist()))
+        self.assertEqual(['success', 'failure', 'skipped', 'error', 'skipped'], cases.column('state').to_pylist())
+        self.assertEqual(['suite'], suites.column('name').to_pylist())
+
+    def test_publish_arrow_without_pyarrow(self):
+        with tempfile.TemporaryDirectory() as path, mock.patch.dict(sys.modules, {'pyarrow': None}):
+            filepath = os.path.join(path, 'cases.arrow')
+            settings = self.create_settings(arrow_file=filepath)
+            gh, gha, req, repo, commit = self.create_mocks(digest=self.base_digest, check_names=[settings.check_name])
+            Publisher(settings, gh, gha).publish_arrow(dataclasses.replace(self.publish_data, cases=self.cases))
+            gha.error.assert_called_once_with(f'Writing Arrow file {filepath} requires the pyarrow package: '
+                                              f'import of pyarrow halted; None in sys.modules')
+            self.assertFalse(os.path.exists(filepath))
+
+    def test_publish_arrow_without_files(self):
+        settings = self.create_settings()
+        publisher = mock.MagicMock(Publisher)
+        publisher._settings = settings
+        publisher._store = None
+        publisher.get_publish_data = mock.Mock(return_value=self.publish_data)
+        publisher.publish_check = mock.Mock(return_value=self.publish_data)
+        Publisher.publish(publisher, self.stats, self.cases, 'success')
+        publisher.publish_arrow.assert_not_called()
+
+        publisher._settings = self.create_settings(arrow_suites_file='suites.arrow')
+        Publisher.publish(publisher, self.stats, self.cases, 'success')
+        publisher.publish_arrow.assert_called_once_with(self.publish_data)
+
+    def test_publish_json_with_api_instrumentation(self):
+        instrumentation = ApiInstrumentation()
+        instrumentation.record('GET', '/repos/owner/repo/commits/commit/check-runs', None, 200, 0.2, bytes_received=1234)
+
+        with tempfile.TemporaryDirectory() as path:
+            filepath = os.path.join(path, 'file.json')
+            settings = self.create_settings(json_file=filepath)
+            gh, gha, req, repo, commit = self.create_mocks(digest=self.base_digest, check_names=[settings.check_name])
+            publisher = Publisher(settings, gh, gha, instrumentation)
+
+            publisher.publish_json(self.publish_data)
+            gha.error.assert_not_called()
+
+            with open(filepath, encoding='utf-8') as r:
+                actual = json.load(r)
+
+        self.assertEqual(instrumentation.to_dict(), actual['api'])
+        self.assertEqual(['GET /repos/{owner}/{repo}/commits/{sha}/check-runs'],
+                         [endpoint['endpoint'] for endpoint in actual['api']['endpoints']])
+
+        # the json output does not contain the api section
+        self.assertEqual(1, gha.add_to_output.call_count)
+        self.assertNotIn('api', json.loads(gha.add_to_output.call_args.args[1]))
+
+    def test_publish_json_with_phases(self):
+        clock = mock.MagicMock(side_effect=[0.0, 1.0, 3.5, 4.0])
+        profiler = PhaseProfiler(clock=clock, cpu_clock=lambda: 0.0, memory=lambda: 1024, peak_memory=lambda: 2048)
+        with profiler.phase('parse JUnit XML files'):
+            pass
+
+        with tempfile.TemporaryDirectory() as path:
+            filepath = os.path.join(path, 'file.json')
+            settings = self.create_settings(json_file=filepath)
+            gh, gha, req, repo, commit = self.create_mocks(digest=self.base_digest, check_names=[settings.check_name])
+            publisher = Publisher(settings, gh, gha, profiler=profiler)
+
+            publisher.publish_json(self.publish_data)
+            gha.error.assert_not_called()
+
+            with open(filepath, encoding='utf-8') as r:
+                actual = json.load(r)
+
+        self.assertEqual(dict(wall_seconds=4.0, cpu_seconds=0.0, peak_rss=2048, phases=[
+            dict(phase='parse JUnit XML files', calls=1, wall_seconds=2.5, cpu_seconds=0.0, rss=1024, peak_rss=2048)
+        ]), actual['phases'])
+        self.assertNotIn('api', actual)
+
+        # the json output does not contain the phases section
+        self.assertNotIn('phases', json.loads(gha.add_to_output.call_args.args[1]))
+
+    def test_publish_phases(self):
+        settings = self.create_settings(job_summary=True, comment_mode=comment_mode_always, compare_earlier=False)
+        gh, gha, req, repo, commit = self.create_mocks(digest=self.base_digest, check_names=[settings.check_name])
+        profiler = PhaseProfiler()
+        publisher = Publisher(settings, gh, gha, profiler=profiler)
+
+        with mock.patch('publish.publisher.Publisher.publish_check', side_effect=lambda data: data), \
+             mock.patch('publish.publisher.Publisher.publish_json'), \
+             mock.patch('publish.publisher.Publisher.publish_job_summary'), \
+             mock.patch('publish.publisher.Publisher.get_pulls', return_value=[]):
+            publisher.publish(self.stats, self.cases, 'success')
+
+        self.assertEqual(['build annotations', 'build summary', 'build digest', 'publish check run',
+                          'publish json', 'publish job summary', 'publish comments'],
+                         list(profiler.phases))
+
+    def test_publish_spans(self):
+        settings = self.create_settings(job_summary=True, comment_mode=comment_mode_always, compare_earlier=False)
+        gh, gha, req, repo, commit = self.create_mocks(digest=self.base_digest, check_names=[settings.check_name])
+        tracer = Tracer('test')
+        publisher = Publisher(settings, gh, gha, profiler=PhaseProfiler(tracer=tracer))
+        pull = mock.MagicMock(state='open', merge_commit_sha=None)
+        pull.base.repo.full_name = settings.repo
+        pull.head.sha = settings.commit
+
+        with mock.patch('publish.publisher.Publisher.publish_json'), \
+             mock.patch('publish.publisher.Publisher.publish_job_summary'), \
+             mock.patch('publish.publisher.Publisher.publish_comment'), \
+             mock.patch('publish.publisher.Publisher.get_all_pulls', return_value=[pull]):
+            publisher.publish(self.stats, self.cases, 'success')
+
+        spans = {span.name: span for span in tracer.spans}
+        self.assertEqual(['test', 'get publish data', 'build annotations', 'build summary', 'build digest',
+                          'publish check run', 'publish check run batch', 'publish json', 'publish job summary',
+                          'publish comments', 'get pulls', 'publish comment'],
+                         [span.name for span in tracer.spans])
+        for name, parent in [('get publish data', 'test'),
+                             ('build annotations', 'get publish data'),
+                             ('publish check run batch', 'publish check run'),
+                             ('get pulls', 'publish comments'),
+                             ('publish comment', 'publish comments')]:
+            with self.subTest(span=name):
+                self.assertEqual(spans[parent].span_id, spans[name].parent_span_id)
+        self.assertEqual(dict(batch=0, annotations=4), spans['publish check run batch'].attributes)
+
     def test_publish_job_summary_without_delta(self):
         settings = self.create_settings(job_summary=True)
         gh, gha, req, repo, commit = self.create_mocks(digest=self.base_digest, check_names=[settings.check_name])
@@ -2135,10 +2714,8 @@ class TestPublisher(unittest.TestCase):
         publisher = Publisher(settings, gh, gha)
         publisher.get_latest_comment = mock.Mock(return_value=None)
 
-        # makes gzipped digest deterministic
-        with mock.patch('gzip.time.time', return_value=0):
-            publisher.publish_comment(settings.comment_title, self.stats, pr)
-            expected_digest = f'{digest_header}{get_digest_from_stats(self.stats)}'
+        publisher.publish_comment(settings.comment_title, self.stats, pr)
+        expected_digest = f'{digest_header}{get_digest_from_stats(self.stats)}'
 
         pr.create_issue_comment.assert_called_once_with(
             f'## Comment Title\n'
@@ -2151,6 +2728,115 @@ class TestPublisher(unittest.TestCase):
             f'{expected_digest}\n'
         )
 
+    def test_publish_comment_with_max_comment_bytes(self):
+        settings = self.create_settings(event={'pull_request': {'base': {'sha': 'commit base'}}}, event_name='pull_request')
+        gh, gha, req, repo, commit = self.create_mocks(digest=self.base_digest, check_names=[settings.check_name])
+        pr = self.create_github_pr(settings.repo, base_commit_sha='base-commit')
+        publisher = Publisher(settings, gh, gha)
+        publisher.get_latest_comment = mock.Mock(return_value=None)
+
+        expected_digest = f'{digest_header}{get_digest_from_stats(self.stats)}'
+        with mock.patch('publish.publisher.max_comment_bytes', len(expected_digest) + 200):
+            publisher.publish_comment(settings.comment_title, self.stats, pr)
+
+        # sections of the body are omitted, but the body retains the digest
+        body = pr.create_issue_comment.call_args.args[0]
+        self.assertLessEqual(len(body.encode('utf8')), len(expected_digest) + 200)
+        self.assertTrue(body.startswith('## Comment Title\n'))
+        self.assertTrue(body.endswith(f'{summary_truncated_md}\n\n{expected_digest}\n'))
+
+    def test_publish_comment_with_results_store(self):
+        settings = self.create_settings(event={'pull_request': {'base': {'sha': 'commit base'}}}, event_name='pull_request')
+        store = ResultsStore()
+
+        bodies = []
+        for expect_read in [True, False]:
+            with self.subTest(expect_read=expect_read):
+                gh, gha, req, repo, commit = self.create_mocks(digest=self.base_digest, check_names=[settings.check_name])
+                pr = self.create_github_pr(settings.repo, base_commit_sha='base-commit')
+                publisher = Publisher(settings, gh, gha, store=store)
+                publisher.get_latest_comment = mock.Mock(return_value=None)
+
+                publisher.publish_comment(settings.comment_title, self.stats, pr)
+
+                # results of the base commit are read from the API only once, then from the store
+                if expect_read:
+                    repo.get_commit.assert_called_once_with('commit base')
+                else:
+                    repo.get_commit.assert_not_called()
+                pr.create_issue_comment.assert_called_once()
+                bodies.append(pr.create_issue_comment.call_args.args[0])
+
+        self.assertEqual(bodies[0], bodies[1])
+        self.assertEqual(StoredResults(stats=self.base_stats, all_tests=None, skipped_tests=None),
+                         store.get((settings.repo, settings.check_name, 'commit base')))
+        self.assertEqual((2, 1), (store.hits, store.misses))
+
+    def test_publish_dry_run(self):
+        with tempfile.TemporaryDirectory() as path:
+            directory = os.path.join(path, 'dry-run')
+            event = {'pull_request': {'number': 12, 'base': {'sha': 'commit base', 'ref': 'main'}}}
+            settings = self.create_settings(event=event, event_name='pull_request', dry_run_directory=directory)
+            store = ResultsStore()
+            store.put((settings.repo, settings.check_name, 'commit base'), StoredResults(self.base_stats, None, None))
+            gh, gha, req, repo, commit = self.create_mocks(digest=self.base_digest, check_names=[settings.check_name])
+            publisher = Publisher(settings, gh, gha, store=store)
+
+            publisher.publish(self.stats, self.cases, 'success')
+
+            # the repository is never requested
+            gh.get_repo.assert_not_called()
+            self.assertEqual([], repo.mock_calls)
+            self.assertEqual([], req.mock_calls)
+            gha.add_to_job_summary.assert_called_once()
+
+            data = publisher.get_publish_data(self.stats, self.cases, 'success')
+            with open(os.path.join(directory, 'check-run.json'), 'rt', encoding='utf-8') as r:
+                self.assertEqual(dict(name=settings.check_name, head_sha=settings.commit, status='completed', conclusion='success',
+                                      output=dict(title=data.title, summary=data.summary_with_digest,
+                                                  annotations=[annotation.to_dict() for annotation in data.annotations])),
+                                 json.load(r))
+
+            # the comment equals the comment published when not in dry run
+            publisher = Publisher(dataclasses.replace(settings, dry_run_directory=None), gh, gha, store=store)
+            publisher.get_latest_comment = mock.Mock(return_value=None)
+            pr = self.create_github_pr(settings.repo, base_commit_sha='commit base')
+            publisher.publish_comment(settings.comment_title, self.stats, pr, None, self.cases)
+            with open(os.path.join(directory, 'comment.md'), 'rt', encoding='utf-8') as r:
+                body = r.read()
+            self.assertEqual(pr.create_issue_comment.call_args.args[0], body)
+            self.assertIn('Comparison against base commit base.', body)
+
+    def test_publish_dry_run_without_pull_request(self):
+        with tempfile.TemporaryDirectory() as path:
+            settings = self.create_settings(dry_run_directory=path)
+            gh, gha, req, repo, commit = self.create_mocks(digest=self.base_digest, check_names=[settings.check_name])
+
+            Publisher(settings, gh, gha).publish(self.stats, self.cases, 'success')
+
+            # earlier results are not read from the API
+            self.assertEqual([], repo.mock_calls)
+            self.assertEqual(['check-run.json'], os.listdir(path))
+
+    def test_publish_dry_run_with_results_store(self):
+        with tempfile.TemporaryDirectory() as path:
+            settings = self.create_settings(dry_run_directory=path)
+            store = ResultsStore()
+            gh, gha, req, repo, commit = self.create_mocks(digest=self.base_digest, check_names=[settings.check_name])
+
+            Publisher(settings, gh, gha, store=store).publish(self.stats, self.cases, 'success')
+
+            # the check run of the commit is not published, so its results are not stored
+            self.assertNotIn((settings.repo, settings.check_name, settings.commit), store)
+            self.assertEqual(0, len(store))
+
+            # a later real run of the same commit stores its results
+            settings = dataclasses.replace(settings, dry_run_directory=None, comment_mode=comment_mode_off)
+            publisher = Publisher(settings, gh, gha, store=store)
+            publisher.publish_check = mock.Mock(side_effect=lambda data: data)
+            publisher.publish(self.stats, self.cases, 'success')
+            self.assertIn((settings.repo, settings.check_name, settings.commit), store)
+
     def test_publish_comment_not_required(self):
         # same as test_publish_comment but require_comment returns False
         with mock.patch('publish.publisher.Publisher.require_comment', return_value=False):
@@ -2178,10 +2864,8 @@ class TestPublisher(unittest.TestCase):
         compare.merge_base_commit.sha = None
         repo.compare = mock.Mock(return_value=compare)
 
-        # makes gzipped digest deterministic
-        with mock.patch('gzip.time.time', return_value=0):
-            publisher.publish_comment(settings.comment_title, self.stats, pr)
-            expected_digest = f'{digest_header}{get_digest_from_stats(self.stats)}'
+        publisher.publish_comment(settings.comment_title, self.stats, pr)
+        expected_digest = f'{digest_header}{get_digest_from_stats(self.stats)}'
 
         pr.create_issue_comment.assert_called_once_with(
             '## Comment Title\n'
@@ -2203,10 +2887,8 @@ class TestPublisher(unittest.TestCase):
         publisher = Publisher(settings, gh, gha)
         publisher.get_latest_comment = mock.Mock(return_value=None)
 
-        # makes gzipped digest deterministic
-        with mock.patch('gzip.time.time', return_value=0):
-            publisher.publish_comment(settings.comment_title, self.stats, pr)
-            expected_digest = f'{digest_header}{get_digest_from_stats(self.stats)}'
+        publisher.publish_comment(settings.comment_title, self.stats, pr)
+        expected_digest = f'{digest_header}{get_digest_from_stats(self.stats)}'
 
         pr.create_issue_comment.assert_called_once_with(
             '## Comment Title\n'
@@ -2228,10 +2910,8 @@ class TestPublisher(unittest.TestCase):
         publisher = Publisher(settings, gh, gha)
         publisher.get_latest_comment = mock.Mock(return_value=None)
 
-        # makes gzipped digest deterministic
-        with mock.patch('gzip.time.time', return_value=0):
-            publisher.publish_comment(settings.comment_title, self.stats, pr, 'http://check-run.url')
-            expected_digest = f'{digest_header}{get_digest_from_stats(self.stats)}'
+        publisher.publish_comment(settings.comment_title, self.stats, pr, 'http://check-run.url')
+        expected_digest = f'{digest_header}{get_digest_from_stats(self.stats)}'
 
         pr.create_issue_comment.assert_called_once_with(
             '## Comment Title\n'
@@ -2259,10 +2939,8 @@ class TestPublisher(unittest.TestCase):
         stats.update(tests_fail=0, tests_error=0, runs_fail=0, runs_error=0)
         stats = UnitTestRunResults.from_dict(stats)
 
-        # makes gzipped digest deterministic
-        with mock.patch('gzip.time.time', return_value=0):
-            publisher.publish_comment(settings.comment_title, stats, pr, 'http://check-run.url')
-            expected_digest = f'{digest_header}{get_digest_from_stats(stats)}'
+        publisher.publish_comment(settings.comment_title, stats, pr, 'http://check-run.url')
+        expected_digest = f'{digest_header}{get_digest_from_stats(stats)}'
 
         pr.create_issue_comment.assert_called_once_with(
             '## Comment Title\n'
@@ -2344,6 +3022,29 @@ class TestPublisher(unittest.TestCase):
 
         return publisher
 
+    def test_get_base_commit_sha_from_workspace(self):
+        pr = mock.MagicMock()
+        pr.base.ref = 'master'
+        pr.base.sha = 'base sha'
+
+        for merge_base, expected_sha, expected_compare_calls in [
+            ('local merge base commit sha', 'local merge base commit sha', []),
+            (None, 'merge base commit sha', [mock.call('master', 'commit')])
+        ]:
+            with self.subTest(merge_base=merge_base):
+                settings = self.create_settings(event={}, event_name='push', workspace='/workspace')
+                publisher = mock.MagicMock(_settings=settings)
+                compare = mock.MagicMock()
+                compare.merge_base_commit.sha = 'merge base commit sha'
+                publisher._repo.compare = mock.Mock(return_value=compare)
+
+                with mock.patch('publish.publisher.get_merge_base', return_value=merge_base) as get_merge_base:
+                    result = Publisher.get_base_commit_sha(publisher, pr)
+
+                self.assertEqual(expected_sha, result)
+                get_merge_base.assert_called_once_with('/workspace', ['refs/remotes/origin/master', 'base sha'], 'commit')
+                self.assertEqual(expected_compare_calls, publisher._repo.compare.mock_calls)
+
     def test_get_base_commit_sha_compare_exception(self):
         pr = mock.MagicMock()
 
@@ -2409,6 +3110,82 @@ class TestPublisher(unittest.TestCase):
             }
         )
 
+    @staticmethod
+    def get_graphql_commit(check_run_id: int, summary: str, has_next_page: bool = False, annotations: List[dict] = []) -> dict:
+        return {'checkSuites': {'pageInfo': {'hasNextPage': has_next_page}, 'nodes': [{'checkRuns': {
+            'pageInfo': {'hasNextPage': False},
+            'nodes': [{'databaseId': check_run_id, 'name': 'Check Name', 'status': 'COMPLETED',
+                       'startedAt': '2024-01-01T00:00:00Z', 'title': 'title', 'summary': summary,
+                       'annotations': {'pageInfo': {'hasNextPage': False}, 'nodes': annotations}}]
+        }}]}}
+
+    def do_test_read_references(self, response: Union[dict, Exception]):
+        settings = self.create_settings(event={'before': 'before', 'pull_request': {'base': {'sha': 'base'}}},
+                                        event_name='pull_request', batch_reads=True)
+        gh, gha, req, repo, commit = self.create_mocks(repo_name='repo', repo_login='owner', digest=self.base_digest, check_names=[settings.check_name])
+        gh.create_from_raw_data = Github().create_from_raw_data
+        repo.url = 'https://api/repos/owner/repo'
+        req.requestJsonAndCheck = mock.Mock(side_effect=response) if isinstance(response, Exception) else mock.Mock(return_value=({}, response))
+        pr = self.create_github_pr(settings.repo, number=1234)
+
+        publisher = Publisher(settings, gh, gha)
+        publisher.get_pulls = mock.Mock(return_value=[pr])
+        publisher.read_references(self.stats)
+        return publisher, req, repo, pr
+
+    def test_read_references(self):
+        summary = f'summary\n{digest_header}{self.base_digest}'
+        all_tests = {'title': '1 test found', 'message': 'There is 1 test, see "Raw output" for the name of the test', 'rawDetails': 'class ‑ test1'}
+        comment = {'databaseId': 42, 'viewerDidAuthor': True, 'isMinimized': False, 'url': 'https://github.com/comment',
+                   'body': '## Comment Title\nresults for commit abc'}
+        publisher, req, repo, pr = self.do_test_read_references({'data': {'repository': {
+            'commit0': self.get_graphql_commit(1, summary),
+            'commit1': self.get_graphql_commit(2, summary, annotations=[all_tests]),
+            'pull0': {'comments': {'nodes': [comment]}}
+        }}})
+
+        req.requestJsonAndCheck.assert_called_once()
+        query = req.requestJsonAndCheck.call_args.kwargs['input']
+        self.assertEqual(dict(owner='owner', name='repo', checkName='Check Name'), query['variables'])
+        self.assertIn('commit0: object(oid: "before")', query['query'])
+        self.assertIn('commit1: object(oid: "base")', query['query'])
+        self.assertIn('pull0: pullRequest(number: 1234)', query['query'])
+
+        # all reads are answered by the single GraphQL request
+        before_check_run = publisher.get_check_run('before')
+        self.assertEqual((1, 'before', 'completed', summary), (before_check_run.id, before_check_run.head_sha, before_check_run.status, before_check_run.output.summary))
+        self.assertEqual(self.base_stats, publisher.get_stats_from_check_run(before_check_run))
+        base_check_run = publisher.get_check_run('base')
+        self.assertEqual(2, base_check_run.id)
+        self.assertEqual('https://api/repos/owner/repo/check-runs/2', base_check_run.url)
+        self.assertEqual((['class ‑ test1'], None), publisher.get_test_lists_from_check_run(base_check_run))
+        latest_comment = publisher.get_latest_comment(pr)
+        self.assertEqual((42, comment['body'], 'https://api/repos/owner/repo/issues/comments/42', 'https://github.com/comment'),
+                         (latest_comment.id, latest_comment.body, latest_comment.url, latest_comment.html_url))
+        repo.get_commit.assert_not_called()
+        pr.get_issue_comment.assert_not_called()
+        req.requestJsonAndCheck.assert_called_once()
+
+    def test_read_references_incomplete(self):
+        summary = f'summary\n{digest_header}{self.base_digest}'
+        publisher, req, repo, pr = self.do_test_read_references({'data': {'repository': {
+            'commit0': self.get_graphql_commit(1, summary, has_next_page=True),
+            'commit1': None,
+        }}})
+
+        # reads that are not answered by the GraphQL request are read individually
+        self.assertEqual(self.base_stats, publisher.get_stats_from_check_run(publisher.get_check_run('before')))
+        self.assertEqual(self.base_stats, publisher.get_stats_from_check_run(publisher.get_check_run('base')))
+        self.assertEqual([mock.call('before'), mock.call('base')], repo.get_commit.call_args_list)
+
+    def test_read_references_failure(self):
+        with self.assertLogs('publish', 'WARNING') as logs:
+            publisher, req, repo, pr = self.do_test_read_references(GithubException(400, 'unsupported'))
+        self.assertEqual(['WARNING:publish:Failed to read check runs and comments via GraphQL: 400 "unsupported"'], logs.output)
+
+        self.assertEqual(self.base_stats, publisher.get_stats_from_check_run(publisher.get_check_run('before')))
+        repo.get_commit.assert_called_once_with('before')
+
     comments = [
         {
             'id': 'comment one',
@@ -0,0 +1,170 @@
+import dataclasses
+import logging
+import re
+import sys
+import time
+import unittest
+from collections import Counter
+from typing import List, Tuple, Dict
+
+import github
+import mock
+from flask import Flask, request
+
+from api_server import start_api, stop_api
+from publish import get_long_summary_with_digest_md, digest_header
+from publish.publisher import Publisher
+from publish_test_results import get_github
+import test_publisher
+from test_unittestresults import create_unit_test_run_results
+
+logger = logging.getLogger('publish')
+
+
+@unittest.skipUnless(sys.platform != 'win32', 'Stopping the server is slow on Windows')
+class TestPublisherConcurrency(unittest.TestCase):
+
+    port = 12381
+    base_url = f'http://localhost:{port}/api'
+    delay = 0.05
+    pulls = 4
+
+    stats = create_unit_test_run_results(suite_details=[])
+    earlier_stats = create_unit_test_run_results(tests=20, commit='earlier')
+
+    def create_app(self, requests: List[str], comments: Dict[int, str]) -> Flask:
+        app = Flask('fake-api')
+        url = self.base_url
+        summary = get_long_summary_with_digest_md(self.earlier_stats)
+
+        @app.before_request
+        def delay():
+            if request.path != '/health':
+                requests.append(f'{request.method} {request.path}')
+                time.sleep(self.delay)
+
+        @app.route('/health')
+        def health():
+            return {'health': 'alive'}
+
+        @app.route('/api/repos/owner/repo')
+        def repo():
+            return {'name': 'repo', 'full_name': 'owner/repo', 'owner': {'login': 'owner'}, 'url': f'{url}/repos/owner/repo'}
+
+        @app.route('/api/repos/owner/repo/commits/<sha>')
+        def commit(sha: str):
+            return {'sha': sha, 'url': f'{url}/repos/owner/repo/commits/{sha}'}
+
+        @app.route('/api/repos/owner/repo/commits/<sha>/check-runs')
+        def check_runs(sha: str):
+            return {'total_count': 1, 'check_runs': [{
+                'id': abs(hash(sha)), 'name': 'Check Name', 'head_sha': sha, 'status': 'completed',
+                'output': {'title': 'title', 'summary': summary},
+                'url': f'{url}/repos/owner/repo/check-runs/{abs(hash(sha))}'
+            }]}
+
+        def graphql_check_runs(sha: str):
+            return {'checkSuites': {'pageInfo': {'hasNextPage': False}, 'nodes': [{'checkRuns': {
+                'pageInfo': {'hasNextPage': False},
+                'nodes': [{'databaseId': abs(hash(sha)), 'name': 'Check Name', 'status': 'COMPLETED',
+                           'startedAt': '2024-01-01T00:00:00Z', 'title': 'title', 'summary': summary,
+                           'annotations': {'pageInfo': {'hasNextPage': False}, 'nodes': []}}]
+            }}]}}
+
+        @app.route('/api/repos/owner/repo/check-runs/<int:check_run_id>/annotations')
+        def annotations(check_run_id: int):
+            return []
+
+        @app.route('/api/repos/owner/repo/commits/<sha>/pulls')
+        def pulls(sha: str):
+            return [{
+                'number': number, 'state': 'open', 'merge_commit_sha': 'merge',
+                'head': {'sha': sha, 'ref': f'branch-{number}', 'repo': {'full_name': 'owner/repo'}},
+                'base': {'sha': f'base-{number}', 'ref': f'main-{number}', 'repo': {'full_name': 'owner/repo'}},
+                'url': f'{url}/repos/owner/repo/pulls/{number}', 'issue_url': f'{url}/repos/owner/repo/issues/{number}'
+            } for number in range(1, self.pulls + 1)]
+
+        @app.route('/api/repos/owner/repo/compare/<base>...<head>')
+        def compare(base: str, head: str):
+            return {'merge_base_commit': {'sha': f'{base}-sha'}}
+
+        @app.route('/api/graphql', methods=['POST'])
+        def graphql():
+            query = request.json['query']
+            if query.startswith('query ListReferences'):
+                commits = {f'commit{idx}': graphql_check_runs(sha)
+                           for idx, sha in re.findall(r'commit(\d+): object\(oid: "([^"]+)"\)', query)}
+                pulls = {f'pull{idx}': {'comments': {'nodes': []}}
+                         for idx in re.findall(r'pull(\d+): pullRequest', query)}
+                return {'data': {'repository': {**commits, **pulls}}}
+            return {'data': {'repository': {'pullRequest': {'comments': {'nodes': []}}}}}
+
+        @app.route('/api/repos/owner/repo/check-runs', methods=['POST'])
+        def create_check_run():
+            return {'id': 1, 'html_url': 'http://github.com/owner/repo/runs/1'}
+
+        @app.route('/api/repos/owner/repo/issues/<int:number>/comments', methods=['POST'])
+        def create_comment(number: int):
+            # the digest contains a timestamp, so we drop it
+            comments[number] = request.json['body'].split(digest_header)[0]
+            return {'id': number, 'body': request.json['body'], 'html_url': f'http://github.com/owner/repo/pull/{number}'}
+
+        return app
+
+    def publish(self, max_concurrent_reads: int = 1, batch_reads: bool = False) -> Tuple[float, List[str], Dict[int, str]]:
+        requests = []
+        comments = {}
+        server = start_api(self.create_app(requests, comments), self.port, threaded=True)
+        try:
+            settings = test_publisher.TestPublisher.create_settings(event={'before': 'earlier'}, event_name='push',
+                                                                    max_concurrent_reads=max_concurrent_reads,
+                                                                    batch_reads=batch_reads)
+            settings = dataclasses.replace(settings, graphql_url=f'{self.base_url}/graphql')
+            gh = get_github(github.Auth.Token('token'), self.base_url, verify=True, retries=1, backoff_factor=0.1,
+                            seconds_between_requests=None, seconds_between_writes=None, secondary_rate_wait=3,
+                            max_concurrent_requests=max_concurrent_reads)
+            publisher = Publisher(settings, gh, mock.MagicMock())
+
+            start = time.monotonic()
+            publisher.publish(self.stats, {}, 'success')
+            duration = time.monotonic() - start
+        finally:
+            stop_api(server)
+
+        logger.info(f'publishing with {max_concurrent_reads} concurrent reads{" in batches" if batch_reads else ""} '
+                    f'took {duration:.3f}s and {len(requests)} requests')
+        return duration, requests, comments
+
+    def test_publish_concurrently(self):
+        sequential_duration, sequential_requests, sequential_comments = self.publish(max_concurrent_reads=1)
+        concurrent_duration, concurrent_requests, concurrent_comments = self.publish(max_concurrent_reads=8)
+
+        # concurrent reads issue exactly the same requests
+        self.assertEqual(Counter(sequential_requests), Counter(concurrent_requests))
+        self.assertEqual(sequential_comments, concurrent_comments)
+        self.assertEqual(5 + 5 * self.pulls + 1 + self.pulls, len(sequential_requests))
+
+        # writes happen after all reads
+        writes = [idx for idx, req in enumerate(concurrent_requests) if req.startswith('POST') and 'graphql' not in req]
+        self.assertEqual(list(range(len(concurrent_requests) - 1 - self.pulls, len(concurrent_requests))), writes)
+
+        # sequential reads take at least the sum of delays, concurrent reads take considerably less
+        self.assertGreaterEqual(sequential_duration, len(sequential_requests) * self.delay)
+        self.assertLess(concurrent_duration, sequential_duration * 0.6)
+
+    def test_publish_batched(self):
+        sequential_duration, sequential_requests, sequential_comments = self.publish()
+        batched_duration, batched_requests, batched_comments = self.publish(batch_reads=True)
+
+        # check runs and comments are read with a single GraphQL request
+        self.assertEqual(self.pulls, len(sequential_comments))
+        self.assertEqual(sequential_comments, batched_comments)
+        self.assertEqual(['GET /api/repos/owner/repo',
+                          'GET /api/repos/owner/repo/commits/commit',
+                          'GET /api/repos/owner/repo/commits/commit/pulls'] +
+                         [f'GET /api/repos/owner/repo/compare/main-{pull}...commit' for pull in range(1, self.pulls + 1)] +
+                         ['POST /api/graphql',
+                          'POST /api/repos/owner/repo/check-runs'] +
+                         [f'POST /api/repos/owner/repo/issues/{pull}/comments' for pull in range(1, self.pulls + 1)],
+                         batched_requests)
+        self.assertLess(batched_duration, sequential_duration)
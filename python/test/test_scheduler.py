@@ -0,0 +1,243 @@
+import json
+import sys
+import time
+import unittest
+from typing import List, Optional
+
+import github
+import mock
+from flask import Flask, request, Response
+
+from api_server import ApiServerTestCase
+from publish.scheduler import TokenBucket, RequestScheduler, ScheduledRetry, min_seconds_between_reads, min_seconds_between_writes
+from publish_test_results import get_github
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def rate_limit(remaining: int, limit: int = 5000, reset_in: int = 1000, now: Optional[float] = None) -> dict:
+    return {'X-RateLimit-Remaining': str(remaining),
+            'X-RateLimit-Limit': str(limit),
+            'X-RateLimit-Reset': str(int(time.time() if now is None else now) + reset_in)}
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_reserve(self):
+        clock = FakeClock()
+        bucket = TokenBucket(2.0, clock=clock)
+        self.assertEqual(0.0, bucket.reserve())
+        self.assertEqual(2.0, bucket.reserve())
+        self.assertEqual(4.0, bucket.reserve())
+
+        # tokens refill over time, up to capacity
+        clock.now += 10
+        self.assertEqual(0.0, bucket.reserve())
+        self.assertEqual(2.0, bucket.reserve())
+
+        clock.now += 3
+        self.assertEqual(1.0, bucket.reserve())
+
+    def test_reserve_capacity(self):
+        clock = FakeClock()
+        bucket = TokenBucket(1.0, capacity=3.0, clock=clock)
+        self.assertEqual([0.0, 0.0, 0.0, 1.0], [bucket.reserve() for _ in range(4)])
+
+    def test_reserve_without_interval(self):
+        bucket = TokenBucket(0.0, clock=FakeClock())
+        self.assertEqual([0.0, 0.0, 0.0], [bucket.reserve() for _ in range(3)])
+
+
+class TestRequestScheduler(unittest.TestCase):
+
+    def create_scheduler(self, reads: float = 1.0, writes: float = 2.0) -> (RequestScheduler, FakeClock):
+        clock = FakeClock()
+        return RequestScheduler(reads, writes, jitter=0.0, clock=clock, sleep=clock.sleep), clock
+
+    def test_get_kind(self):
+        self.assertEqual('read', RequestScheduler.get_kind('GET', '/repos/owner/repo'))
+        self.assertEqual('read', RequestScheduler.get_kind('HEAD', '/repos/owner/repo'))
+        self.assertEqual('read', RequestScheduler.get_kind('POST', '/graphql'))
+        self.assertEqual('read', RequestScheduler.get_kind('POST', '/api/graphql'))
+        self.assertEqual('write', RequestScheduler.get_kind('POST', '/repos/owner/repo/check-runs'))
+        self.assertEqual('write', RequestScheduler.get_kind('PATCH', '/repos/owner/repo/check-runs/1'))
+        self.assertEqual('write', RequestScheduler.get_kind('DELETE', '/repos/owner/repo/issues/comments/1'))
+
+    def test_acquire_paces_reads_and_writes_independently(self):
+        scheduler, clock = self.create_scheduler()
+        scheduler.acquire('GET', '/one')
+        scheduler.acquire('POST', '/one')
+        scheduler.acquire('GET', '/two')
+        scheduler.acquire('POST', '/two')
+        # the write waits less as the read took time to wait as well
+        self.assertEqual([1.0, 1.0], clock.sleeps)
+        self.assertEqual(4, scheduler.requests)
+        self.assertEqual(2.0, scheduler.pacing_seconds)
+
+    def test_update_speeds_up_to_minimum(self):
+        scheduler, clock = self.create_scheduler()
+        for _ in range(100):
+            scheduler.update('GET', '/repo', 200, rate_limit(4000))
+            scheduler.update('POST', '/check-runs', 201, rate_limit(4000))
+        self.assertEqual(min_seconds_between_reads, scheduler.interval('read'))
+        self.assertEqual(min_seconds_between_writes, scheduler.interval('write'))
+
+        # configured seconds below the minimum are respected
+        scheduler, clock = self.create_scheduler(reads=0.01, writes=0.5)
+        for _ in range(100):
+            scheduler.update('GET', '/repo', 200, {})
+            scheduler.update('POST', '/check-runs', 201, {})
+        self.assertEqual(0.01, scheduler.interval('read'))
+        self.assertEqual(0.5, scheduler.interval('write'))
+
+    def test_update_throttles(self):
+        secondary = json.dumps({'message': 'You have exceeded a secondary rate limit. Please wait a few minutes before you try again.'})
+        for status, headers, body in [(403, {'X-RateLimit-Remaining': '0'}, None),
+                                      (403, {}, secondary),
+                                      (403, {'Retry-After': '60'}, None),
+                                      (429, {}, None),
+                                      (200, {'Retry-After': '1'}, None)]:
+            with self.subTest(status=status, headers=headers, body=body):
+                scheduler, clock = self.create_scheduler()
+                for _ in range(100):
+                    scheduler.update('GET', '/repo', 200, {})
+                scheduler.update('GET', '/repo', status, headers, body)
+                self.assertEqual(1.0, scheduler.interval('read'))
+                self.assertEqual(2.0, scheduler.interval('write'))
+                self.assertEqual(1, scheduler.throttled)
+
+    def test_update_does_not_throttle_forbidden(self):
+        for body in [None, '', json.dumps({'message': 'Resource not accessible by integration'}),
+                     json.dumps({'message': 'Bad credentials'}), 'not json']:
+            with self.subTest(body=body):
+                scheduler, clock = self.create_scheduler()
+                scheduler.update('GET', '/repo', 403, rate_limit(4000, now=clock.now), body)
+                self.assertEqual(0, scheduler.throttled)
+                self.assertEqual(0.8, scheduler.interval('read'))
+
+    def test_update_spreads_remaining_rate_limit(self):
+        scheduler, clock = self.create_scheduler(reads=1.0, writes=2.0)
+        scheduler.update('GET', '/repo', 200, rate_limit(400, reset_in=300, now=clock.now))
+        self.assertEqual(0.8, scheduler.interval('read'))
+        scheduler.update('GET', '/repo', 200, rate_limit(400, reset_in=300, now=clock.now))
+        self.assertEqual(0.75, scheduler.interval('read'))
+
+        # the interval recovers when the rate limit resets
+        scheduler.update('GET', '/repo', 200, rate_limit(5000, reset_in=3600, now=clock.now))
+        self.assertAlmostEqual(0.6, scheduler.interval('read'))
+
+    def test_update_spreads_remaining_rate_limit_at_most_twice_the_seconds(self):
+        # 50 requests left with 30 minutes to reset would pace requests by 36s
+        scheduler, clock = self.create_scheduler(reads=1.0, writes=2.0)
+        scheduler.update('GET', '/repo', 200, rate_limit(50, limit=1000, reset_in=1800, now=clock.now))
+        scheduler.update('POST', '/check-runs', 200, rate_limit(49, limit=1000, reset_in=1800, now=clock.now))
+        self.assertEqual(2.0, scheduler.interval('read'))
+        self.assertEqual(4.0, scheduler.interval('write'))
+
+        scheduler.update('GET', '/repo', 429, rate_limit(48, limit=1000, reset_in=1800, now=clock.now))
+        self.assertEqual(2.0, scheduler.interval('read'))
+
+    def test_update_waits_for_exhausted_rate_limit(self):
+        scheduler, clock = self.create_scheduler()
+        with self.assertLogs('publish', 'INFO') as logs:
+            scheduler.update('GET', '/repo', 200, rate_limit(0, reset_in=100, now=clock.now))
+        self.assertEqual(['INFO:publish:GitHub API rate limit exhausted, waiting 101s for reset'], logs.output)
+
+        scheduler.acquire('POST', '/check-runs')
+        self.assertEqual([101.0], clock.sleeps)
+
+        # after the reset, requests are not delayed any further
+        scheduler.acquire('GET', '/repo')
+        self.assertEqual(1, len(clock.sleeps))
+
+    def test_backoff(self):
+        clock = FakeClock()
+        scheduler = RequestScheduler(1.0, 2.0, jitter=0.5, clock=clock, sleep=clock.sleep)
+        with mock.patch('publish.scheduler.random.uniform', return_value=0.5):
+            scheduler.backoff('POST', '/check-runs', 4.0)
+        self.assertEqual([6.0], clock.sleeps)
+        self.assertEqual(6.0, scheduler.backoff_seconds)
+        self.assertEqual(6.0, scheduler.waiting_seconds)
+        self.assertEqual(1, scheduler.throttled)
+
+        with self.assertLogs('publish', 'INFO') as logs:
+            scheduler.log_stats()
+        self.assertEqual(['INFO:publish:Waited 6.0s for 0 GitHub API requests (0.0s pacing, 6.0s backing off after 1 rate limits)'], logs.output)
+
+    def test_scheduled_retry(self):
+        scheduler = mock.MagicMock(RequestScheduler)
+        retry = ScheduledRetry(scheduler=scheduler, total=3, backoff_factor=1, secondary_rate_wait=60)
+        self.assertIn(403, retry.status_forcelist)
+        self.assertIn(429, retry.status_forcelist)
+
+        retry = retry.increment('GET', '/repo', error=ConnectionError())
+        retry = retry.increment('GET', '/repo', error=ConnectionError())
+        self.assertIs(scheduler, retry.scheduler)
+        retry.sleep()
+        scheduler.backoff.assert_called_once_with('GET', '/repo', retry.get_backoff_time())
+
+
+@unittest.skipUnless(sys.platform != 'win32', 'Stopping the server is slow on Windows')
+class TestRequestSchedulerWithGitHub(ApiServerTestCase):
+
+    port = 12383
+
+    def setUp(self) -> None:
+        self.responses: List[Response] = []
+        self.requests = []
+        super().setUp()
+
+    def add_routes(self, app: Flask) -> None:
+        @app.route('/api/repos/owner/repo')
+        def repo():
+            self.requests.append(f'{request.method} {request.path}')
+            if self.responses:
+                return self.responses.pop(0)
+            body = json.dumps({'name': 'repo', 'full_name': 'owner/repo'})
+            return Response(body, status=200, content_type='application/json', headers=rate_limit(4000))
+
+    def get_repo(self) -> RequestScheduler:
+        clock = FakeClock()
+        scheduler = RequestScheduler(1.0, 2.0, jitter=0.0, clock=clock, sleep=clock.sleep)
+        gh = get_github(github.Auth.Token('token'), self.base_url, verify=True, retries=3, backoff_factor=0.1,
+                        seconds_between_requests=1.0, seconds_between_writes=2.0, secondary_rate_wait=30,
+                        scheduler=scheduler)
+        self.assertEqual('owner/repo', gh.get_repo('owner/repo').full_name)
+        self.assertEqual('owner/repo', gh.get_repo('owner/repo').full_name)
+        return scheduler
+
+    def test_paces_requests(self):
+        scheduler = self.get_repo()
+        self.assertEqual(['GET /api/repos/owner/repo'] * 2, self.requests)
+        self.assertEqual(2, scheduler.requests)
+        self.assertEqual(0, scheduler.throttled)
+        # each response that does not signal a rate limit shortens the interval
+        self.assertAlmostEqual(0.8, scheduler.pacing_seconds)
+        self.assertAlmostEqual(0.64, scheduler.interval('read'))
+
+    def test_backs_off_on_retry_after(self):
+        self.responses.append(Response(json.dumps({'message': 'Too many requests'}), status=429,
+                                       content_type='application/json', headers={'Retry-After': '7'}))
+        scheduler = self.get_repo()
+        self.assertEqual(['GET /api/repos/owner/repo'] * 3, self.requests)
+        self.assertEqual(7.0, scheduler.backoff_seconds)
+        self.assertEqual(1, scheduler.throttled)
+
+    def test_backs_off_on_secondary_rate_limit(self):
+        self.responses.append(Response(json.dumps({'message': 'You have exceeded a secondary rate limit'}), status=403,
+                                       content_type='application/json'))
+        scheduler = self.get_repo()
+        self.assertEqual(['GET /api/repos/owner/repo'] * 3, self.requests)
+        self.assertEqual(30.0, scheduler.backoff_seconds)
+        self.assertEqual(1, scheduler.throttled)
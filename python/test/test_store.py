@@ -0,0 +1,115 @@
+import json
+import os
+import tempfile
+import unittest
+
+from publish import get_digest_from_stats
+from publish.store import ResultsStore, StoredResults, results_store_version
+from publish.unittestresults import UnitTestRunResults
+
+stats = UnitTestRunResults(files=1, errors=[], suites=2, duration=3, suite_details=None,
+                           tests=4, tests_succ=5, tests_skip=6, tests_fail=7, tests_error=8,
+                           runs=9, runs_succ=10, runs_skip=11, runs_fail=12, runs_error=13,
+                           commit='commit')
+digest_size = len(get_digest_from_stats(stats))
+
+
+def key(commit: str) -> tuple:
+    return 'owner/repo', 'Test Results', commit
+
+
+def results(*tests: str) -> StoredResults:
+    return StoredResults(stats=stats, all_tests=list(tests) or None, skipped_tests=None)
+
+
+class TestResultsStore(unittest.TestCase):
+
+    def test_size(self):
+        self.assertEqual(0, StoredResults(stats=None, all_tests=None, skipped_tests=None).size)
+        self.assertEqual(digest_size, results().size)
+        self.assertEqual(digest_size + 7, StoredResults(stats=stats, all_tests=['one', 'two'], skipped_tests=['a']).size)
+
+    def test_put_and_get(self):
+        store = ResultsStore()
+        self.assertIsNone(store.get(key('one')))
+        self.assertNotIn(key('one'), store)
+        store.put(key('one'), results('test'))
+        self.assertIn(key('one'), store)
+        self.assertEqual(results('test'), store.get(key('one')))
+        self.assertIsNone(store.get(('owner/repo', 'Other Results', 'one')))
+        store.put(key('one'), results('other test'))
+        self.assertEqual(results('other test'), store.get(key('one')))
+        self.assertEqual(1, len(store))
+        self.assertEqual(digest_size + len('other test'), store.size)
+        self.assertEqual((2, 2), (store.hits, store.misses))
+
+    def test_evicts_least_recently_used(self):
+        store = ResultsStore(max_size=2 * digest_size + 10)
+        store.put(key('one'), results('11111'))
+        store.put(key('two'), results('22222'))
+        # accessing 'one' makes 'two' the least recently used entry
+        store.get(key('one'))
+        store.put(key('three'), results('33333'))
+
+        self.assertEqual(results('11111'), store.get(key('one')))
+        self.assertIsNone(store.get(key('two')))
+        self.assertEqual(results('33333'), store.get(key('three')))
+        self.assertEqual(2 * digest_size + 10, store.size)
+
+        # entries larger than the store are not stored at all
+        store.put(key('large'), results('1' * (2 * digest_size + 11)))
+        self.assertIsNone(store.get(key('large')))
+        self.assertEqual(2, len(store))
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as path:
+            filename = os.path.join(path, 'results.json')
+            store = ResultsStore(filename)
+            store.put(key('one'), StoredResults(stats=stats, all_tests=['test a', 'test b'], skipped_tests=['test b']))
+            store.put(key('two'), StoredResults(stats=None, all_tests=None, skipped_tests=None))
+            store.put(key('three'), results('test ✅'))
+            store.save()
+
+            loaded = ResultsStore(filename).load()
+            self.assertEqual(3, len(loaded))
+            self.assertEqual(store.size, loaded.size)
+            self.assertEqual(StoredResults(stats=stats, all_tests=['test a', 'test b'], skipped_tests=['test b']), loaded.get(key('one')))
+            self.assertEqual(StoredResults(stats=None, all_tests=None, skipped_tests=None), loaded.get(key('two')))
+            self.assertEqual(results('test ✅'), loaded.get(key('three')))
+
+            # stats are stored as digests
+            with open(filename, 'rt', encoding='utf-8') as r:
+                saved = json.load(r)
+            self.assertEqual([list(key('one')), dict(digest=get_digest_from_stats(stats), all_tests=['test a', 'test b'], skipped_tests=['test b'])],
+                             saved['entries'][0])
+
+            # loading respects the size limit, keeping the most recently used entries
+            loaded = ResultsStore(filename, max_size=digest_size + 6).load()
+            self.assertEqual(2, len(loaded))
+            self.assertIsNone(loaded.get(key('one')))
+            self.assertEqual(results('test ✅'), loaded.get(key('three')))
+
+    def test_load_missing_unsupported_and_corrupt_files(self):
+        with tempfile.TemporaryDirectory() as path:
+            filename = os.path.join(path, 'results.json')
+            self.assertEqual(0, len(ResultsStore(filename).load()))
+
+            with open(filename, 'wt', encoding='utf-8') as w:
+                json.dump(dict(version=results_store_version + 1, entries=[[list(key('one')), dict(digest=None)]]), w)
+            self.assertEqual(0, len(ResultsStore(filename).load()))
+
+            with open(filename, 'wt', encoding='utf-8') as w:
+                w.write('{"version": 1, "entries": [')
+            with self.assertLogs('publish', 'WARNING') as logs:
+                self.assertEqual(0, len(ResultsStore(filename).load()))
+            self.assertTrue(logs.output[0].startswith(f'WARNING:publish:Failed to load results store file {filename}: '))
+
+    def test_log_stats(self):
+        store = ResultsStore()
+        store.put(key('one'), results())
+        store.get(key('one'))
+        store.get(key('two'))
+        with self.assertLogs('publish', 'INFO') as logs:
+            store.log_stats()
+        self.assertEqual([f'INFO:publish:Results store: 1 of 2 reference commits found (50%), '
+                          f'results of 1 commits stored in {digest_size} Bytes'], logs.output)
@@ -0,0 +1,137 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+import mock
+
+from publish import __version__
+from publish.tracing import Tracer, span_kind_client, span_kind_internal, get_otlp_attributes
+
+
+class TestTracer(unittest.TestCase):
+
+    @staticmethod
+    def create_tracer() -> Tracer:
+        return Tracer('root', {'github.repository': 'owner/repo', 'github.run_id': None},
+                      clock=mock.MagicMock(side_effect=range(0, 100000000, 1000000)))
+
+    def test_span(self):
+        tracer = self.create_tracer()
+        with tracer.span('outer', file='file.xml', missing=None):
+            with tracer.span('inner') as inner:
+                inner.set_attribute('tests', 12)
+        with self.assertRaises(ValueError):
+            with tracer.span('failing'):
+                raise ValueError('value')
+
+        root, outer, inner, failing = tracer.spans
+        self.assertEqual(['root', 'outer', 'inner', 'failing'], [span.name for span in tracer.spans])
+        self.assertEqual((None, root.span_id, outer.span_id, root.span_id),
+                         (root.parent_span_id, outer.parent_span_id, inner.parent_span_id, failing.parent_span_id))
+        self.assertEqual(dict(file='file.xml'), outer.attributes)
+        self.assertEqual(dict(tests=12), inner.attributes)
+        self.assertEqual('ValueError: value', failing.error)
+        self.assertEqual((1000000, 4000000), (outer.start_ns, outer.end_ns))
+        self.assertEqual(16, len(root.span_id))
+        self.assertEqual(32, len(tracer.trace_id))
+        # the root span ends when the trace is written
+        self.assertIsNone(root.end_ns)
+
+    def test_span_in_thread(self):
+        tracer = self.create_tracer()
+
+        def run():
+            with tracer.span('in thread'):
+                pass
+
+        with tracer.span('outer'):
+            thread = threading.Thread(target=run, name='reader')
+            thread.start()
+            thread.join()
+
+        spans = {span.name: span for span in tracer.spans}
+        # spans of other threads do not nest in spans of the main thread
+        self.assertEqual(tracer.root.span_id, spans['in thread'].parent_span_id)
+        self.assertEqual((1, 2), (spans['outer'].thread_id, spans['in thread'].thread_id))
+        self.assertEqual('reader', spans['in thread'].thread_name)
+
+    def test_record(self):
+        tracer = self.create_tracer()
+        with tracer.span('outer'):
+            tracer.record('GET /repos', 0.0005, kind=span_kind_client, error='HTTP status 500', status=500)
+
+        root, outer, request = tracer.spans
+        self.assertEqual(('GET /repos', span_kind_client, outer.span_id, 1500000, 2000000, 'HTTP status 500', dict(status=500)),
+                         (request.name, request.kind, request.parent_span_id, request.start_ns, request.end_ns, request.error, request.attributes))
+
+    def test_get_otlp_attributes(self):
+        self.assertEqual([
+            dict(key='bool', value=dict(boolValue=True)),
+            dict(key='int', value=dict(intValue='12')),
+            dict(key='float', value=dict(doubleValue=1.5)),
+            dict(key='str', value=dict(stringValue='täst')),
+        ], get_otlp_attributes(dict(bool=True, int=12, float=1.5, str='täst')))
+
+    def test_write_otlp(self):
+        tracer = self.create_tracer()
+        with self.assertRaises(RuntimeError):
+            with tracer.span('phase', file='file.xml'):
+                raise RuntimeError('failed')
+
+        with tempfile.TemporaryDirectory() as path:
+            filepath = os.path.join(path, 'trace.json')
+            tracer.write(filepath, 'otlp')
+            with open(filepath, 'rt', encoding='utf-8') as r:
+                lines = r.readlines()
+
+        self.assertEqual(1, len(lines))
+        root, phase = tracer.spans
+        self.assertEqual(dict(resourceSpans=[dict(
+            resource=dict(attributes=[dict(key='github.repository', value=dict(stringValue='owner/repo'))]),
+            scopeSpans=[dict(
+                scope=dict(name='publish', version=__version__),
+                spans=[
+                    dict(traceId=tracer.trace_id, spanId=root.span_id, name='root', kind=span_kind_internal,
+                         startTimeUnixNano='0', endTimeUnixNano='3000000',
+                         attributes=[dict(key='thread.id', value=dict(intValue='1')),
+                                     dict(key='thread.name', value=dict(stringValue='MainThread'))],
+                         status={}),
+                    dict(traceId=tracer.trace_id, spanId=phase.span_id, parentSpanId=root.span_id, name='phase',
+                         kind=span_kind_internal, startTimeUnixNano='1000000', endTimeUnixNano='2000000',
+                         attributes=[dict(key='file', value=dict(stringValue='file.xml')),
+                                     dict(key='thread.id', value=dict(intValue='1')),
+                                     dict(key='thread.name', value=dict(stringValue='MainThread'))],
+                         status=dict(code=2, message='RuntimeError: failed')),
+                ]
+            )]
+        )]), json.loads(lines[0]))
+
+    def test_write_chrome(self):
+        tracer = self.create_tracer()
+        with tracer.span('phase', file='file.xml'):
+            tracer.record('GET /repos', 0.0005, kind=span_kind_client)
+
+        with tempfile.TemporaryDirectory() as path:
+            filepath = os.path.join(path, 'trace.json')
+            tracer.write(filepath, 'chrome')
+            with open(filepath, 'rt', encoding='utf-8') as r:
+                trace = json.load(r)
+
+        pid = os.getpid()
+        self.assertEqual(dict(
+            traceEvents=[
+                dict(name='thread_name', ph='M', pid=pid, tid=1, args=dict(name='MainThread')),
+                dict(name='root', cat='internal', ph='X', ts=0.0, dur=4000.0, pid=pid, tid=1, args={}),
+                dict(name='phase', cat='internal', ph='X', ts=1000.0, dur=2000.0, pid=pid, tid=1, args=dict(file='file.xml')),
+                dict(name='GET /repos', cat='client', ph='X', ts=1500.0, dur=500.0, pid=pid, tid=1, args={}),
+            ],
+            displayTimeUnit='ms',
+            otherData={'github.repository': 'owner/repo', 'trace_id': tracer.trace_id, 'start_time_unix_nano': 0}
+        ), trace)
+
+    def test_write_unsupported_format(self):
+        with tempfile.TemporaryDirectory() as path, self.assertRaises(ValueError) as e:
+            self.create_tracer().write(os.path.join(path, 'trace.json'), 'zipkin')
+        self.assertEqual('Unsupported trace format: zipkin', str(e.exception))